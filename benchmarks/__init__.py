@@ -0,0 +1,5 @@
+"""Benchmarks for the beets wrapper and the MCP server.
+
+Run `python -m benchmarks --help` from the repository root for the options.
+See the Benchmarks section of `docs/developer/DEVELOPER-GUIDE.md`.
+"""
@@ -0,0 +1,83 @@
+"""Command line entry point of the benchmarks.
+
+Example:
+    python -m benchmarks --sizes 10000 100000 --output bench.json
+"""
+
+import argparse
+import fnmatch
+import json
+import sys
+
+from .cases import CASES
+from .generate import prepare_library
+from .runner import run_benchmarks
+
+
+def main(argv=None):
+    """Generates the libraries, runs the cases and writes the JSON report."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark the beets wrapper and the MCP tools.",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10000, 100000, 1000000],
+        help="Number of tracks of each synthetic library.",
+    )
+    parser.add_argument(
+        "--cases",
+        nargs="+",
+        default=["*"],
+        help="Glob patterns selecting cases, e.g. 'library.*'.",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per case.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument(
+        "--workdir",
+        default=".benchmarks",
+        help="Directory for the generated libraries, reused between runs.",
+    )
+    parser.add_argument(
+        "--regenerate", action="store_true", help="Regenerate existing libraries."
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="Keep the query cache enabled."
+    )
+    parser.add_argument(
+        "--snapshot", action="store_true", help="Enable the track snapshot."
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    args = parser.parse_args(argv)
+
+    names = [
+        c.name
+        for c in CASES
+        if any(fnmatch.fnmatch(c.name, pattern) for pattern in args.cases)
+    ]
+    if not names:
+        parser.error("No case matches the given patterns.")
+    env = {
+        "SMARTPLAYLIST_SNAPSHOT_ENABLED": str(args.snapshot).lower(),
+        "SMARTPLAYLIST_FULLTEXT_ENABLED": "true",
+    }
+    if not args.cache:
+        env["SMARTPLAYLIST_QUERY_CACHE_MAX_ENTRIES"] = "0"
+
+    libraries = {
+        size: prepare_library(args.workdir, size, args.seed, args.regenerate)
+        for size in args.sizes
+    }
+    report = run_benchmarks(libraries, names, args.repeat, env)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""The operations measured by the benchmarks.
+
+Each case calls one `Library` method or one MCP tool against a synthetic
+library and returns the number of rows it produced.
+"""
+
+import asyncio
+import dataclasses
+import os
+import time
+from typing import Any, Callable
+
+from smartplaylist.beets_wrapper.library import Library
+
+QUERY = "genre:Jazz"
+"""The beets query used by the query cases, matching about 8% of tracks."""
+
+RANGE_QUERY = "year:1990..1999"
+
+TEXT = "summer love"
+"""The free text searched by the full-text cases, as a bare beets query too."""
+
+ITEM_ID = 1
+"""The track the similarity cases find neighbours of."""
+
+FIELDS = ("id", "title", "artist", "album", "genre", "year", "path")
+"""The fields read by the projection cases, as returned by `search_library`."""
+
+
+def _read_items(library: Library, query: str) -> int:
+    rows = [tuple(getattr(item, f) for f in FIELDS) for item in library.items(query)]
+    return len(rows)
+
+
+@dataclasses.dataclass
+class Case:
+    """A benchmarked operation.
+
+    Attributes:
+        name: The case name, e.g. `library.items`.
+        kind: `library` for wrapper methods, `mcp` for MCP tools or `cli` for
+            command line cold starts.
+        run: A callable receiving the library and the playlist directory and
+            returning the number of rows produced.
+    """
+
+    name: str
+    kind: str
+    run: Callable[[Library, str], int]
+
+
+def _tool(name: str, /, **kwargs: Any) -> Callable[[Library, str], int]:
+    def run(library: Library, playlist_dir: str) -> int:
+        from smartplaylist.mcp_server import main
+
+        tool = getattr(main, name)
+        result = tool(**kwargs)
+        if asyncio.iscoroutine(result):
+            result = asyncio.run(result)
+        return _count(result)
+
+    return run
+
+
+def _cli(*args: str) -> Callable[[Library, str], int]:
+    def run(library: Library, playlist_dir: str) -> int:
+        from .startup import cold_start
+
+        cold_start(list(args))
+        return 1
+
+    return run
+
+
+def _refresh(force: bool) -> Callable[[Library, str], int]:
+    def run(library: Library, playlist_dir: str) -> int:
+        if not library.saved_playlists():
+            for year in range(1950, 2025):
+                library.save_playlist(f"Year {year}", f"year:{year}", sort="title")
+                library.save_playlist(f"Jazz {year}", f"genre:Jazz year:{year}")
+        return len(library.refresh_playlists("m3u", force=force))
+
+    return run
+
+
+PLAYLIST_FILES = 2000
+"""The number of playlist files listed by the `list_playlists` cases."""
+
+
+def _list_playlists(library: Library, playlist_dir: str) -> int:
+    names = [f"bench-{i:04d}.m3u8" for i in range(PLAYLIST_FILES)]
+    if not os.path.exists(os.path.join(playlist_dir, names[-1])):
+        for i, name in enumerate(names):
+            with open(os.path.join(playlist_dir, name), "w") as f:
+                f.writelines(f"/music/{i}/{n}.mp3\n" for n in range(50))
+        # Age the directory, as a listing made in the same timestamp tick as
+        # the last change is not reused.
+        past = time.time() - 60
+        os.utime(playlist_dir, (past, past))
+    return len(library.list_playlists("m3u8"))
+
+
+def _count(result: Any) -> int:
+    for attribute in ("tracks", "genres", "values", "playlists", "matches"):
+        rows = getattr(result, attribute, None)
+        if rows is not None:
+            return len(rows)
+    return getattr(result, "track_count", 1)
+
+
+CASES = [
+    Case("cli.version", "cli", _cli("--version")),
+    Case("cli.help", "cli", _cli("--help")),
+    Case("library.items", "library", lambda lib, _: len(lib.items(QUERY))),
+    Case("library.items_range", "library", lambda lib, _: len(lib.items(RANGE_QUERY))),
+    Case(
+        "library.items_fields", "library", lambda lib, _: _read_items(lib, RANGE_QUERY)
+    ),
+    Case(
+        "library.items_projected",
+        "library",
+        lambda lib, _: len(lib.items_projected(RANGE_QUERY, FIELDS)),
+    ),
+    Case(
+        "library.items_page",
+        "library",
+        lambda lib, _: len(lib.items_page(QUERY, limit=100, sort="title").items),
+    ),
+    Case(
+        "library.items_page_text",
+        "library",
+        lambda lib, _: len(lib.records_page(TEXT, FIELDS, limit=50).records),
+    ),
+    Case(
+        "library.fulltext_search",
+        "library",
+        lambda lib, _: len(lib.fulltext_search(TEXT, limit=50, fields=FIELDS)),
+    ),
+    Case(
+        "library.resolve_names",
+        "library",
+        lambda lib, _: len(lib.resolve_names("sumer lov", limit=10)),
+    ),
+    Case(
+        "library.similar_tracks",
+        "library",
+        lambda lib, _: len(lib.similar_tracks(ITEM_ID, k=50, fields=FIELDS)),
+    ),
+    Case("library.albums", "library", lambda lib, _: len(lib.albums(RANGE_QUERY))),
+    Case(
+        "library.get_statistics",
+        "library",
+        lambda lib, _: lib.get_statistics(include_size=False).total_tracks,
+    ),
+    Case("library.list_genres", "library", lambda lib, _: len(lib.list_genres())),
+    Case("library.list_facet", "library", lambda lib, _: len(lib.list_facet("artist"))),
+    Case(
+        "library.create_playlist",
+        "library",
+        lambda lib, directory: (
+            lib.create_playlist(QUERY, os.path.join(directory, "bench.m3u")).track_count
+        ),
+    ),
+    Case(
+        "library.create_playlist_extm3u",
+        "library",
+        lambda lib, directory: (
+            lib.create_playlist(
+                RANGE_QUERY, os.path.join(directory, "bench.m3u8"), "extm3u"
+            ).track_count
+        ),
+    ),
+    Case(
+        "library.create_playlist_smooth",
+        "library",
+        lambda lib, directory: (
+            lib.create_playlist(
+                QUERY, os.path.join(directory, "bench.m3u"), order="smooth"
+            ).track_count
+        ),
+    ),
+    Case(
+        "library.build_playlist",
+        "library",
+        lambda lib, directory: (
+            lib.build_playlist(
+                RANGE_QUERY,
+                os.path.join(directory, "bench.m3u"),
+                max_length=7200,
+                max_per_artist=3,
+            ).track_count
+        ),
+    ),
+    Case(
+        "library.build_playlist_size",
+        "library",
+        lambda lib, directory: (
+            lib.build_playlist(
+                RANGE_QUERY,
+                os.path.join(directory, "bench.m3u"),
+                max_length=86400,
+                max_size=700_000_000,
+            ).track_count
+        ),
+    ),
+    Case(
+        "library.create_playlist_xspf",
+        "library",
+        lambda lib, directory: (
+            lib.create_playlist(
+                RANGE_QUERY, os.path.join(directory, "bench.xspf")
+            ).track_count
+        ),
+    ),
+    Case(
+        "library.create_playlists_by_field",
+        "library",
+        lambda lib, directory: len(
+            lib.create_playlists_by_field(directory, "m3u", field="genre")
+        ),
+    ),
+    Case("library.refresh_playlists", "library", _refresh(force=False)),
+    Case("library.refresh_playlists_force", "library", _refresh(force=True)),
+    Case("library.list_playlists", "library", _list_playlists),
+    Case("mcp.get_library_statistics", "mcp", _tool("get_library_statistics")),
+    Case("mcp.list_genres", "mcp", _tool("list_genres")),
+    Case("mcp.list_facet", "mcp", _tool("list_facet", field="year")),
+    Case("mcp.list_playlists", "mcp", _tool("list_playlists")),
+    Case("mcp.search_library", "mcp", _tool("search_library", query=QUERY, limit=100)),
+    Case(
+        "mcp.search_library_large",
+        "mcp",
+        _tool("search_library", query=RANGE_QUERY, limit=1000),
+    ),
+    Case("mcp.resolve_names", "mcp", _tool("resolve_names", name="hiphop")),
+    Case("mcp.fulltext_search", "mcp", _tool("fulltext_search", text=TEXT, limit=50)),
+    Case("mcp.similar_tracks", "mcp", _tool("similar_tracks", item_id=ITEM_ID, k=50)),
+    Case(
+        "mcp.create_playlist",
+        "mcp",
+        _tool("create_playlist", playlist_name="bench", query=QUERY),
+    ),
+    Case(
+        "mcp.build_playlist",
+        "mcp",
+        _tool(
+            "build_playlist",
+            playlist_name="bench",
+            query=RANGE_QUERY,
+            max_minutes=120,
+            max_per_artist=3,
+        ),
+    ),
+    Case(
+        "mcp.create_playlists_by_field",
+        "mcp",
+        _tool("create_playlists_by_field", field="decade", prefix="Decade - "),
+    ),
+]
+"""Every benchmark case, in run order."""
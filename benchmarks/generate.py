@@ -0,0 +1,233 @@
+"""Synthetic beets libraries for benchmarking.
+
+This module writes beets databases of any size straight into SQLite, without
+audio files. Artist popularity follows a Zipf distribution, each artist
+sticks to one main genre, and tracks are grouped into albums of 8 to 14
+tracks, so queries, facets and playlists see realistic selectivity.
+"""
+
+import os
+import random
+import sqlite3
+from typing import Any, Iterator
+
+import yaml
+from beets import library as beets_library  # type: ignore
+
+GENRES = {
+    "Rock": 20,
+    "Pop": 15,
+    "Electronic": 12,
+    "Hip-Hop": 10,
+    "Jazz": 8,
+    "Classical": 6,
+    "Metal": 6,
+    "Folk": 5,
+    "Soul": 4,
+    "Blues": 4,
+    "Country": 4,
+    "Reggae": 3,
+    "Punk": 3,
+}
+"""The genres of the generated tracks and their relative weights."""
+
+FORMATS = {"MP3": 55, "FLAC": 30, "AAC": 10, "OGG": 5}
+"""The audio formats of the generated tracks and their relative weights."""
+
+KEYS = [
+    f"{note}{mode}"
+    for note in ("C", "Db", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B")
+    for mode in ("", "m")
+]
+"""The musical keys assigned to the generated tracks."""
+
+WORDS = (
+    "love night blue day heart fire dream light rain home road time world "
+    "girl dance baby soul river star summer gold street moon wild city sky"
+).split()
+
+TRACKS_PER_ARTIST = 40
+"""The average number of tracks per generated artist."""
+
+MUSIC_DIR = "/music"
+"""The directory the generated paths point into. No files are written."""
+
+_CHUNK_SIZE = 10000
+
+
+def _weighted(rng: random.Random, weights: dict[str, int]) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+
+
+def _artists(rng: random.Random, count: int) -> list[dict[str, Any]]:
+    artists = []
+    for rank in range(count):
+        artists.append(
+            {
+                "name": f"{_title(rng)} {rank}",
+                "genre": _weighted(rng, GENRES),
+                "start": int(rng.gauss(1990, 15)),
+                "weight": 1.0 / (rank + 1) ** 1.1,
+            }
+        )
+    return artists
+
+
+def generate_rows(
+    size: int, seed: int = 0
+) -> Iterator[tuple[dict[str, Any], list[dict[str, Any]]]]:
+    """Generates albums and their tracks.
+
+    Args:
+        size: The total number of tracks.
+        seed: The random seed, so runs are reproducible.
+
+    Yields:
+        The album fields and the fields of its tracks, without ids.
+    """
+    rng = random.Random(seed)
+    artists = _artists(rng, max(10, size // TRACKS_PER_ARTIST))
+    weights = [a["weight"] for a in artists]
+    generated = 0
+    album_number = 0
+    while generated < size:
+        artist = rng.choices(artists, weights=weights)[0]
+        album_number += 1
+        album_title = f"{_title(rng)} {album_number}"
+        year = min(2025, max(1950, artist["start"] + rng.randint(0, 30)))
+        added = 1.5e9 + rng.random() * 2.5e8
+        fmt = _weighted(rng, FORMATS)
+        count = min(rng.randint(8, 14), size - generated)
+        album = {
+            "album": album_title,
+            "albumartist": artist["name"],
+            "genre": artist["genre"],
+            "year": year,
+            "added": added,
+        }
+        tracks = []
+        for number in range(1, count + 1):
+            title = _title(rng)
+            tracks.append(
+                {
+                    "path": os.fsencode(
+                        f"{MUSIC_DIR}/{artist['name']}/{album_title}/"
+                        f"{number:02d} {title}.{fmt.lower()}"
+                    ),
+                    "title": title,
+                    "artist": artist["name"],
+                    "albumartist": artist["name"],
+                    "album": album_title,
+                    "genre": artist["genre"],
+                    "year": year,
+                    "track": number,
+                    "tracktotal": count,
+                    "length": max(30.0, rng.gauss(240, 60)),
+                    "bitrate": 1000 * rng.choice((128, 192, 256, 320))
+                    if fmt != "FLAC"
+                    else rng.randint(700, 1100) * 1000,
+                    "samplerate": 44100,
+                    "bitdepth": 16 if fmt == "FLAC" else 0,
+                    "channels": 2,
+                    "format": fmt,
+                    "bpm": rng.randint(60, 180),
+                    "initial_key": rng.choice(KEYS),
+                    "added": added,
+                    "mtime": added,
+                }
+            )
+        generated += count
+        yield album, tracks
+
+
+def _insert(conn: sqlite3.Connection, table: str, rows: list[dict[str, Any]]):
+    columns = list(rows[0])
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})",
+        [tuple(row[c] for c in columns) for row in rows],
+    )
+
+
+def generate_database(db_path: str, size: int, seed: int = 0):
+    """Writes a synthetic beets database.
+
+    The schema is created by beets, then rows are inserted in bulk. Every
+    fixed field not generated holds its beets default, as if beets had
+    written the row.
+
+    Args:
+        db_path: The database file to create. An existing file is replaced.
+        size: The number of tracks.
+        seed: The random seed.
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    beets_library.Library(db_path)._close()
+
+    item_defaults = {
+        field: kind.to_sql(kind.null)
+        for field, kind in beets_library.Item._fields.items()
+        if field != "id"
+    }
+    album_defaults = {
+        field: kind.to_sql(kind.null)
+        for field, kind in beets_library.Album._fields.items()
+        if field != "id"
+    }
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        albums: list[dict[str, Any]] = []
+        items: list[dict[str, Any]] = []
+        for album_id, (album, tracks) in enumerate(generate_rows(size, seed), 1):
+            albums.append({**album_defaults, **album, "id": album_id})
+            items.extend(
+                {**item_defaults, **track, "album_id": album_id} for track in tracks
+            )
+            if len(items) >= _CHUNK_SIZE:
+                _insert(conn, "albums", albums)
+                _insert(conn, "items", items)
+                albums, items = [], []
+        if items:
+            _insert(conn, "albums", albums)
+            _insert(conn, "items", items)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def prepare_library(workdir: str, size: int, seed: int = 0, force: bool = False) -> str:
+    """Returns a beets configuration for a synthetic library, creating it once.
+
+    Args:
+        workdir: The directory holding generated databases and playlists.
+        size: The number of tracks.
+        seed: The random seed.
+        force: Whether to regenerate an existing database.
+
+    Returns:
+        The path of the beets configuration file.
+    """
+    base = os.path.join(os.path.abspath(workdir), f"library-{size}-{seed}")
+    os.makedirs(base, exist_ok=True)
+    db_path = os.path.join(base, "library.db")
+    config_path = os.path.join(base, "config.yaml")
+    if force or not os.path.exists(db_path):
+        generate_database(db_path, size, seed)
+    with open(config_path, "w") as f:
+        yaml.dump(
+            {
+                "library": db_path,
+                "directory": MUSIC_DIR,
+                "plugins": [],
+                "smartplaylist": {"playlist_dir": os.path.join(base, "playlists")},
+            },
+            f,
+        )
+    return config_path
@@ -0,0 +1,150 @@
+"""Measurement of the benchmark cases.
+
+Every case runs in a fresh process, so its peak resident set size is not
+inflated by earlier cases. A case is called once to warm up, then timed
+`repeat` times, then called once more under `tracemalloc` to measure the
+peak of Python allocations.
+"""
+
+import concurrent.futures
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Optional
+
+from .cases import CASES
+
+
+def _peak_rss() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _latency(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        "max": ordered[-1],
+    }
+
+
+def run_case(
+    config_path: str, name: str, repeat: int, env: dict[str, str]
+) -> dict[str, Any]:
+    """Measures one case. Meant to run in a dedicated process.
+
+    Args:
+        config_path: The beets configuration of the library.
+        name: The name of the case.
+        repeat: The number of timed calls.
+        env: Environment variables overriding the application settings.
+
+    Returns:
+        The latency of the calls in seconds, the peak resident set size and
+        its growth during the case, the peak of Python allocations in bytes
+        and the number of rows returned.
+    """
+    os.environ.update(env)
+    os.environ["SMARTPLAYLIST_CONFIG_PATH"] = config_path
+
+    from smartplaylist.beets_wrapper.library import Library
+    from smartplaylist.settings import Settings
+
+    case = next(c for c in CASES if c.name == name)
+    library = Library(config_path, Settings())
+    # Like the server at startup, so reads never wait for the snapshot.
+    library.load_snapshot()
+    # Like a sync, so full-text searches find their index.
+    library._update_fulltext_index()
+    playlist_dir = os.path.join(os.path.dirname(config_path), "playlists")
+    os.makedirs(playlist_dir, exist_ok=True)
+
+    baseline_rss = _peak_rss()
+    rows = case.run(library, playlist_dir)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        case.run(library, playlist_dir)
+        samples.append(time.perf_counter() - start)
+    peak_rss = _peak_rss()
+
+    tracemalloc.start()
+    try:
+        case.run(library, playlist_dir)
+        _, peak_alloc = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    library.close()
+    return {
+        "case": name,
+        "kind": case.kind,
+        "repeat": repeat,
+        "rows": rows,
+        "latency": _latency(samples),
+        "peak_rss_bytes": peak_rss,
+        "rss_growth_bytes": peak_rss - baseline_rss,
+        "peak_alloc_bytes": peak_alloc,
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(
+    libraries: dict[int, str],
+    names: list[str],
+    repeat: int,
+    env: dict[str, str],
+) -> dict[str, Any]:
+    """Measures cases against libraries of several sizes.
+
+    Args:
+        libraries: The beets configuration of each library, keyed by size.
+        names: The names of the cases to run.
+        repeat: The number of timed calls per case.
+        env: Environment variables overriding the application settings.
+
+    Returns:
+        The report, with the environment and one result per size and case.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for size, config_path in libraries.items():
+        for name in names:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, mp_context=context
+            ) as executor:
+                result = executor.submit(
+                    run_case, config_path, name, repeat, env
+                ).result()
+            results.append({"size": size, **result})
+            print(
+                f"{size:>9} {name:<36} {result['latency']['median'] * 1000:10.2f} ms",
+                file=sys.stderr,
+            )
+    return {
+        "commit": _commit(),
+        "created": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": env,
+        "results": results,
+    }
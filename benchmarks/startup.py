@@ -0,0 +1,54 @@
+"""Cold start measurement of the command line interface.
+
+The CLI is started in a fresh interpreter with `-X importtime`, which reports
+the time spent importing each module on stderr.
+"""
+
+import os
+import subprocess
+import sys
+from typing import Optional
+
+CLI_MODULE = "smartplaylist.cli.main"
+"""The module whose cumulative import time is the CLI startup cost."""
+
+
+def parse_import_times(report: str) -> dict[str, int]:
+    """Parses the output of `python -X importtime`.
+
+    Args:
+        report: The stderr of the interpreter.
+
+    Returns:
+        The cumulative import time of each imported module, in microseconds.
+    """
+    times = {}
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+def cold_start(args: list[str], env: Optional[dict[str, str]] = None) -> dict[str, int]:
+    """Runs the CLI in a fresh interpreter and reports its import times.
+
+    Args:
+        args: The CLI arguments, e.g. `["--version"]`.
+        env: Environment variables added to the current environment.
+
+    Returns:
+        The cumulative import time of each imported module, in microseconds.
+
+    Raises:
+        subprocess.CalledProcessError: If the CLI exits with an error.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "smartplaylist.main", *args],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, **(env or {})},
+    )
+    return parse_import_times(completed.stderr)
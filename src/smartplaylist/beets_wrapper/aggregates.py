@@ -0,0 +1,71 @@
+"""SQL aggregates over the beets database.
+
+This module computes library-wide totals directly against the beets SQLite
+schema, without hydrating beets `Item` objects. It only relies on the fixed
+`items` and `albums` columns; anything stored as a flexible attribute must go
+through the beets query API instead.
+"""
+
+import os
+import sqlite3
+
+from . import models
+
+LIBRARY_TOTALS_SQL = """
+    SELECT
+        COUNT(*),
+        COUNT(DISTINCT NULLIF(artist, '')),
+        COALESCE(SUM(length), 0.0),
+        COUNT(DISTINCT NULLIF(genre, '')),
+        (SELECT COUNT(*) FROM albums)
+    FROM items
+"""
+
+
+def library_totals(conn: sqlite3.Connection) -> models.Statistics:
+    """Computes the library totals with a single aggregate query.
+
+    The returned `total_size` is always 0, since beets does not store file
+    sizes in the database. Use `total_file_size` to compute it.
+
+    Args:
+        conn: An open connection to the beets database.
+
+    Returns:
+        An object containing the library totals.
+
+    Raises:
+        sqlite3.Error: If the query fails, e.g. because of an unexpected schema.
+    """
+    tracks, artists, duration, genres, albums = conn.execute(
+        LIBRARY_TOTALS_SQL
+    ).fetchone()
+    return models.Statistics(
+        total_tracks=tracks,
+        total_albums=albums,
+        total_artists=artists,
+        total_size=0,
+        total_duration=float(duration),
+        total_genres=genres,
+    )
+
+
+def total_file_size(conn: sqlite3.Connection) -> int:
+    """Sums the on-disk size of every item in the library.
+
+    Only the `path` column is read; files that cannot be accessed count as 0
+    bytes, matching the behavior of beets' `filesize` field.
+
+    Args:
+        conn: An open connection to the beets database.
+
+    Returns:
+        The total size of the library in bytes.
+    """
+    total = 0
+    for (path,) in conn.execute("SELECT path FROM items"):
+        try:
+            total += os.path.getsize(os.fsdecode(path))
+        except (OSError, TypeError, ValueError):
+            pass
+    return total
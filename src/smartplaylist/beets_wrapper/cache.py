@@ -0,0 +1,258 @@
+"""Query result cache for the beets wrapper.
+
+This module provides a `QueryCache`, a thread-safe LRU cache whose entries are
+tagged with the database revision they were computed from. An entry is only
+returned while the revision is unchanged and its time-to-live has not expired,
+so writes to the library invalidate cached results automatically.
+"""
+
+import collections
+import dataclasses
+import shlex
+import sys
+import threading
+import time
+from typing import Any, Callable, Hashable, Iterable, Iterator, Optional
+
+from . import models
+
+
+def normalize_query(query: Optional[str]) -> str:
+    """Returns a canonical form of a beets query string.
+
+    Whitespace and quoting are normalized. Terms of a plain conjunction are
+    also sorted, since their order does not change the result; queries with
+    `,` alternatives or sort terms keep their order.
+
+    Args:
+        query: The beets query string.
+
+    Returns:
+        The normalized query string.
+    """
+    if not query:
+        return ""
+    try:
+        terms = shlex.split(query)
+    except ValueError:
+        terms = query.split()
+    if "," not in terms and not any(
+        t and t[-1] in "+-" and ":" not in t for t in terms
+    ):
+        terms.sort()
+    return shlex.join(terms)
+
+
+def estimate_size(value: Any) -> int:
+    """Roughly estimates the memory used by a cached value, in bytes.
+
+    Args:
+        value: A cached value made of tuples, lists, strings, numbers and
+            dataclasses.
+
+    Returns:
+        The estimated size in bytes.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        size += sum(estimate_size(v) for v in value)
+    elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+        size += sum(
+            estimate_size(getattr(value, f.name)) for f in dataclasses.fields(value)
+        )
+    return size
+
+
+class Recorder:
+    """Records the values of an iterable as they are consumed.
+
+    Recording stops, and `values` becomes None, as soon as the recorded values
+    exceed the byte budget, so wrapping a large stream costs no extra memory.
+
+    Attributes:
+        budget: The maximum estimated size of the recorded values.
+        size: The estimated size of the values recorded so far.
+        values: The recorded values, or None if the budget was exceeded.
+    """
+
+    def __init__(self, budget: int):
+        """Initializes the recorder.
+
+        Args:
+            budget: The maximum estimated size of the recorded values.
+        """
+        self.budget = budget
+        self.size = 0
+        self.values: Optional[list[Any]] = None
+        self.reset()
+
+    def reset(self):
+        """Discards the recorded values, e.g. before replaying a stream."""
+        self.size = 0
+        self.values = [] if self.budget > 0 else None
+
+    def record(self, iterable: Iterable[Any]) -> Iterator[Any]:
+        """Yields the values of an iterable, recording them on the way.
+
+        Args:
+            iterable: The values to pass through.
+
+        Yields:
+            Each value of the iterable.
+        """
+        for value in iterable:
+            if self.values is not None:
+                self.size += sys.getsizeof(value)
+                if self.size > self.budget:
+                    self.values = None
+                else:
+                    self.values.append(value)
+            yield value
+
+
+@dataclasses.dataclass
+class _Entry:
+    revision: str
+    value: Any
+    size: int
+    expires: float
+
+
+class QueryCache:
+    """A revision-aware LRU cache with entry, byte and time limits.
+
+    Attributes:
+        max_entries: The maximum number of cached entries. 0 disables caching.
+        max_bytes: The maximum estimated size of all cached values.
+        ttl: The number of seconds an entry stays valid.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initializes an empty cache.
+
+        Args:
+            max_entries: The maximum number of cached entries.
+            max_bytes: The maximum estimated size of all cached values.
+            ttl: The number of seconds an entry stays valid.
+            clock: The time source used for expiry.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: collections.OrderedDict[Hashable, _Entry] = (
+            collections.OrderedDict()
+        )
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores anything at all."""
+        return self.max_entries > 0 and self.max_bytes > 0 and self.ttl > 0
+
+    @property
+    def max_entry_bytes(self) -> int:
+        """The largest value worth caching, so one entry cannot flush the rest."""
+        return self.max_bytes // 4
+
+    def get(self, key: Hashable, revision: Optional[str]) -> Optional[Any]:
+        """Returns a cached value if it is still valid.
+
+        Args:
+            key: The cache key, typically including the normalized query.
+            revision: The current database revision. None always misses.
+
+        Returns:
+            The cached value, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                entry.revision != revision or entry.expires <= self._clock()
+            ):
+                self._remove(key)
+                self._evictions += 1
+                entry = None
+            if entry is None or revision is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.value
+
+    def put(
+        self,
+        key: Hashable,
+        revision: Optional[str],
+        value: Any,
+        size: Optional[int] = None,
+    ):
+        """Stores a value computed from a given database revision.
+
+        Values larger than the byte budget are not cached. Least recently used
+        entries are evicted to make room.
+
+        Args:
+            key: The cache key.
+            revision: The database revision the value was computed from. None
+                skips caching.
+            value: The value to cache. It must not be mutated afterwards.
+            size: The size of the value in bytes, estimated if not given.
+        """
+        if revision is None or not self.enabled:
+            return
+        if size is None:
+            size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(
+                revision=revision,
+                value=value,
+                size=size,
+                expires=self._clock() + self.ttl,
+            )
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self):
+        """Drops every cached entry."""
+        with self._lock:
+            self._evictions += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def stats(self) -> models.CacheStats:
+        """Returns a snapshot of the cache counters.
+
+        Returns:
+            An object describing the current state of the cache.
+        """
+        with self._lock:
+            return models.CacheStats(
+                entries=len(self._entries),
+                bytes=self._bytes,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                max_entries=self.max_entries,
+                max_bytes=self.max_bytes,
+            )
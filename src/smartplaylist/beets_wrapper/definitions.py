@@ -0,0 +1,190 @@
+"""Saved smart playlist definitions.
+
+This module provides a `PlaylistRegistry` holding the definition (query, sort
+and limit) of every saved playlist, along with a digest of the tracks each
+playlist was last written from. It is persisted as a JSON file next to the
+beets database, so a refresh can tell which playlists changed and leave the
+other files alone.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+from typing import Iterable, Optional
+
+from . import models, storage
+
+REGISTRY_FILENAME = "playlists.json"
+
+REGISTRY_VERSION = 1
+
+
+def result_digest(
+    definition: models.PlaylistDefinition,
+    rows: Iterable[tuple[int, float]],
+    *salt: object,
+) -> str:
+    """Returns a digest of the tracks a playlist is written from.
+
+    Args:
+        definition: The playlist definition. Its query, sort and limit are
+            part of the digest.
+        rows: The id and modification time of each track, in playlist order.
+        salt: Other values the playlist file depends on, e.g. the path
+            rewriting settings.
+
+    Returns:
+        A hex digest that changes whenever a track is added, removed,
+        reordered or modified.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    header = [definition.query, definition.sort, definition.limit, *map(str, salt)]
+    h.update(json.dumps(header).encode("utf-8"))
+    for item_id, mtime in rows:
+        h.update(f"\n{item_id}:{mtime!r}".encode("ascii"))
+    return h.hexdigest()
+
+
+def refresh_revision(revision: str, *salt: object) -> str:
+    """Returns the revision a playlist refresh is recorded at.
+
+    Args:
+        revision: The database revision.
+        salt: Other values the playlist file depends on, e.g. the path
+            rewriting settings.
+
+    Returns:
+        A token that changes with the database or any of `salt`.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    h.update(json.dumps([str(v) for v in salt]).encode("utf-8"))
+    return f"{revision}-{h.hexdigest()}"
+
+
+class PlaylistRegistry:
+    """The saved playlist definitions of a library.
+
+    The registry is reloaded whenever its file is modified by another
+    process, such as the command line while the MCP server runs.
+
+    Attributes:
+        path: Path to the JSON file the registry is persisted to.
+        lock: Serializes changes to the registry and refreshes of its
+            playlists.
+    """
+
+    def __init__(self, path: str):
+        """Initializes an empty registry.
+
+        Args:
+            path: Path to the JSON file the registry is persisted to.
+        """
+        self.path = path
+        self.lock = threading.RLock()
+        self._definitions: dict[str, models.PlaylistDefinition] = {}
+        self._signature: Optional[tuple[int, int]] = None
+
+    def _file_signature(self) -> Optional[tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _reload(self):
+        """Loads the persisted definitions if the file changed since last read.
+
+        Raises:
+            OSError: If the file exists but cannot be read.
+            ValueError: If the file is not a valid registry.
+        """
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        definitions = {}
+        if signature is not None:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != REGISTRY_VERSION:
+                raise ValueError(
+                    f"Unsupported playlist registry version: {data.get('version')}"
+                )
+            for entry in data.get("playlists", []):
+                definition = models.PlaylistDefinition(**entry)
+                definitions[definition.name] = definition
+        self._definitions = definitions
+        self._signature = signature
+
+    def definitions(self) -> list[models.PlaylistDefinition]:
+        """Returns every saved definition, ordered by name.
+
+        Returns:
+            Copies of the definitions.
+        """
+        with self.lock:
+            self._reload()
+            return [
+                dataclasses.replace(d) for _, d in sorted(self._definitions.items())
+            ]
+
+    def get(self, name: str) -> Optional[models.PlaylistDefinition]:
+        """Returns a copy of a saved definition.
+
+        Args:
+            name: The playlist name.
+
+        Returns:
+            The definition, or None if no playlist has this name.
+        """
+        with self.lock:
+            self._reload()
+            definition = self._definitions.get(name)
+            return dataclasses.replace(definition) if definition else None
+
+    def put(self, *definitions: models.PlaylistDefinition):
+        """Adds or replaces definitions and persists the registry.
+
+        Args:
+            definitions: The definitions, keyed by their names.
+
+        Raises:
+            OSError: If the registry cannot be written.
+        """
+        with self.lock:
+            self._reload()
+            for definition in definitions:
+                self._definitions[definition.name] = dataclasses.replace(definition)
+            self._save()
+
+    def remove(self, name: str) -> bool:
+        """Removes a definition and persists the registry.
+
+        Args:
+            name: The playlist name.
+
+        Returns:
+            True if the definition existed.
+
+        Raises:
+            OSError: If the registry cannot be written.
+        """
+        with self.lock:
+            self._reload()
+            if self._definitions.pop(name, None) is None:
+                return False
+            self._save()
+            return True
+
+    def _save(self):
+        """Persists the registry next to the database."""
+        data = {
+            "version": REGISTRY_VERSION,
+            "playlists": [
+                dataclasses.asdict(d) for _, d in sorted(self._definitions.items())
+            ],
+        }
+        with storage.atomic_write(self.path) as f:
+            json.dump(data, f, indent=2)
+        self._signature = self._file_signature()
@@ -16,6 +16,12 @@ class ImportError(BeetsWrapperError):
     pass
 
 
+class PoolTimeoutError(BeetsWrapperError):
+    """Raised when no pooled database connection frees up in time."""
+
+    pass
+
+
 class QueryError(BeetsWrapperError):
     """Raised when an error occurs during a library query."""
 
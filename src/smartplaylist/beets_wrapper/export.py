@@ -0,0 +1,252 @@
+"""Streaming playlist export.
+
+This module writes playlist files from an iterator of entries without holding
+the playlist in memory. Entries are rows holding the file path of a track
+followed by the fields of a `formats.PlaylistFormat`, which renders them.
+Files are written to a temporary file in the target directory and renamed
+into place, so readers never see a partial playlist.
+"""
+
+import collections
+import dataclasses
+import os
+import uuid
+from typing import IO, Any, Iterable, Optional
+
+from . import models
+from .formats import PlaylistFormat
+
+Entry = tuple[Any, ...]
+"""A row holding the file path followed by the values of the fields of the
+playlist format, e.g. `("/music/a.mp3",)` for plain M3U."""
+
+WRITE_BUFFER_SIZE = 1 << 20
+"""The size of the write buffer used for playlist files, in bytes."""
+
+FANOUT_BUFFER_SIZE = 64 * 1024
+"""The size of the write buffer of each playlist written by `PlaylistSetWriter`."""
+
+MAX_OPEN_PLAYLISTS = 64
+"""The default number of files `PlaylistSetWriter` keeps open at a time."""
+
+
+UNSAFE_FILENAME_CHARS = frozenset('/\\:*?"<>|\0')
+"""Characters replaced when a playlist name is turned into a file name."""
+
+
+def safe_filename(name: str) -> str:
+    """Turns a playlist name, such as a genre, into a portable file name.
+
+    Args:
+        name: The playlist name.
+
+    Returns:
+        The name with path separators and reserved characters replaced by
+        underscores.
+    """
+    name = "".join("_" if c in UNSAFE_FILENAME_CHARS else c for c in name).strip()
+    return name.lstrip(".") or "_"
+
+
+def _tmp_path(path: str) -> str:
+    """Returns a unique temporary path next to a playlist file."""
+    directory, filename = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, f".{filename}.{uuid.uuid4().hex}.tmp")
+
+
+def write_playlist(
+    path: str,
+    entries: Iterable[Entry],
+    playlist_format: Optional[PlaylistFormat] = None,
+) -> models.PlaylistExport:
+    """Writes a playlist file from a stream of entries, atomically.
+
+    Args:
+        path: The path to the playlist file.
+        entries: The rows to render.
+        playlist_format: The format rendering the rows. Defaults to plain M3U,
+            one file path per line.
+
+    Returns:
+        The number of entries written and the size of the file.
+
+    Raises:
+        OSError: If the file cannot be written. The original file, if any, is
+            left untouched.
+    """
+    playlist_format = playlist_format or PlaylistFormat()
+    render = playlist_format.entry
+    tmp_path = _tmp_path(path)
+    track_count = 0
+    try:
+        with open(
+            tmp_path, "x", encoding="utf-8", newline="\n", buffering=WRITE_BUFFER_SIZE
+        ) as f:
+            f.write(playlist_format.header())
+            for location, *values in entries:
+                track_count += 1
+                f.write(render(track_count, location, values))
+            f.write(playlist_format.footer(track_count))
+        bytes_written = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return models.PlaylistExport(
+        path=path, track_count=track_count, bytes_written=bytes_written
+    )
+
+
+@dataclasses.dataclass
+class _Target:
+    tmp_path: str
+    track_count: int = 0
+    created: bool = False
+
+
+class PlaylistSetWriter:
+    """Writes many playlist files from a single stream of entries.
+
+    Entries can be written to the playlists in any interleaving. At most
+    `max_open_files` temporary files are open at a time; the least recently
+    written one is closed, and reopened for appending, when another is needed.
+    The playlists are renamed into place together by `commit`, and discarded
+    if the writer is left because of an exception.
+
+    Attributes:
+        max_open_files: The maximum number of files open at a time.
+        playlist_format: The format rendering the entries.
+    """
+
+    def __init__(
+        self,
+        max_open_files: int = MAX_OPEN_PLAYLISTS,
+        playlist_format: Optional[PlaylistFormat] = None,
+    ):
+        """Initializes a writer with no playlists.
+
+        Args:
+            max_open_files: The maximum number of files open at a time.
+            playlist_format: The format rendering the entries. Defaults to
+                plain M3U, one file path per line.
+        """
+        self.max_open_files = max(1, max_open_files)
+        self.playlist_format = playlist_format or PlaylistFormat()
+        self._targets: dict[str, _Target] = {}
+        self._open: collections.OrderedDict[str, IO[str]] = collections.OrderedDict()
+
+    def __enter__(self) -> "PlaylistSetWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+
+    def add(self, path: str):
+        """Registers a playlist, so it is written even if it gets no entries.
+
+        Args:
+            path: The path to the playlist file.
+
+        Raises:
+            ValueError: If a playlist with this path is already registered.
+        """
+        if path in self._targets:
+            raise ValueError(f"Playlist '{path}' is already registered.")
+        self._targets[path] = _Target(tmp_path=_tmp_path(path))
+
+    def write(self, path: str, entry: Entry):
+        """Appends an entry to a playlist, registering it if needed.
+
+        Args:
+            path: The path to the playlist file.
+            entry: The row to render.
+
+        Raises:
+            OSError: If the temporary file cannot be written.
+        """
+        f = self._open.get(path)
+        if f is None:
+            if path not in self._targets:
+                self.add(path)
+            f = self._reopen(path)
+        else:
+            self._open.move_to_end(path)
+        target = self._targets[path]
+        target.track_count += 1
+        location, *values = entry
+        f.write(self.playlist_format.entry(target.track_count, location, values))
+
+    def _reopen(self, path: str) -> IO[str]:
+        """Opens the temporary file of a playlist, closing the oldest if needed."""
+        while len(self._open) >= self.max_open_files:
+            _, oldest = self._open.popitem(last=False)
+            oldest.close()
+        target = self._targets[path]
+        f = open(
+            target.tmp_path,
+            "a" if target.created else "x",
+            encoding="utf-8",
+            newline="\n",
+            buffering=FANOUT_BUFFER_SIZE,
+        )
+        if not target.created:
+            f.write(self.playlist_format.header())
+        target.created = True
+        self._open[path] = f
+        return f
+
+    def _close_all(self):
+        while self._open:
+            _, f = self._open.popitem()
+            f.close()
+
+    def commit(self) -> list[models.PlaylistExport]:
+        """Closes every playlist and renames it into place.
+
+        Returns:
+            The track count and size of each playlist, in registration order.
+
+        Raises:
+            OSError: If a playlist cannot be written. Temporary files are
+                removed.
+        """
+        try:
+            self._close_all()
+            exports = []
+            for path, target in self._targets.items():
+                footer = self.playlist_format.footer(target.track_count)
+                with open(
+                    target.tmp_path,
+                    "a" if target.created else "x",
+                    encoding="utf-8",
+                    newline="\n",
+                ) as f:
+                    if not target.created:
+                        f.write(self.playlist_format.header())
+                    f.write(footer)
+                target.created = True
+                bytes_written = os.path.getsize(target.tmp_path)
+                os.replace(target.tmp_path, path)
+                target.created = False
+                exports.append(
+                    models.PlaylistExport(
+                        path=path,
+                        track_count=target.track_count,
+                        bytes_written=bytes_written,
+                    )
+                )
+        except BaseException:
+            self.abort()
+            raise
+        self._targets = {}
+        return exports
+
+    def abort(self):
+        """Closes and removes every temporary file not yet renamed into place."""
+        self._close_all()
+        for target in self._targets.values():
+            if target.created and os.path.exists(target.tmp_path):
+                os.unlink(target.tmp_path)
+        self._targets = {}
@@ -0,0 +1,132 @@
+"""Materialized facet index for the beets library.
+
+This module provides a `FacetIndex` holding precomputed value to track count
+tables for a fixed set of fields. The index is persisted as a JSON file next to
+the beets database and tagged with the database revision it was built from, so
+it can be reused across processes until the library changes.
+"""
+
+import json
+import logging
+import sqlite3
+from typing import Optional
+
+from . import exceptions, models, storage
+
+logger = logging.getLogger(__name__)
+
+FACET_INDEX_FILENAME = "facets.json"
+
+FACET_EXPRESSIONS: dict[str, str] = {
+    "genre": "NULLIF(genre, '')",
+    "artist": "NULLIF(artist, '')",
+    "albumartist": "NULLIF(albumartist, '')",
+    "year": "NULLIF(year, 0)",
+    "decade": "NULLIF(year, 0) / 10 * 10",
+    "format": "NULLIF(format, '')",
+}
+"""SQL expressions computing the value of each facet field; NULL is skipped."""
+
+FACET_FIELDS = tuple(FACET_EXPRESSIONS)
+
+
+class FacetIndex:
+    """Precomputed value counts for the fields in `FACET_FIELDS`.
+
+    Attributes:
+        path: Path to the JSON file the index is persisted to.
+        revision: The database revision the index was built from, or None if
+            the index is empty.
+    """
+
+    def __init__(self, path: str):
+        """Initializes an empty facet index.
+
+        Args:
+            path: Path to the JSON file the index is persisted to.
+        """
+        self.path = path
+        self.revision: Optional[str] = None
+        self._facets: dict[str, list[models.FacetValue]] = {}
+
+    def values(self, field: str) -> list[models.FacetValue]:
+        """Returns the value counts of a facet field.
+
+        Args:
+            field: One of the `FACET_FIELDS`.
+
+        Returns:
+            The facet values, most common first.
+
+        Raises:
+            exceptions.QueryError: If the field is not a facet field.
+        """
+        if field not in FACET_EXPRESSIONS:
+            raise exceptions.QueryError(
+                f"Unsupported facet field '{field}'. "
+                f"Expected one of: {', '.join(FACET_FIELDS)}"
+            )
+        return self._facets.get(field, [])
+
+    def build(self, conn: sqlite3.Connection, revision: str):
+        """Rebuilds every facet table from the database.
+
+        Args:
+            conn: An open connection to the beets database.
+            revision: The database revision the index is built from.
+        """
+        facets = {}
+        for field, expression in FACET_EXPRESSIONS.items():
+            rows = conn.execute(
+                f"SELECT {expression} AS value, COUNT(*) AS n FROM items "
+                "WHERE value IS NOT NULL GROUP BY value ORDER BY n DESC, value"
+            )
+            facets[field] = [
+                models.FacetValue(value=str(value), count=count)
+                for value, count in rows
+            ]
+        self._facets = facets
+        self.revision = revision
+
+    def load(self, revision: str) -> bool:
+        """Loads the persisted index if it was built from the given revision.
+
+        Args:
+            revision: The current database revision.
+
+        Returns:
+            True if the persisted index was loaded, False if it is missing,
+            unreadable or stale.
+        """
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("revision") != revision:
+            return False
+        self._facets = {
+            field: [models.FacetValue(value=v, count=c) for v, c in values]
+            for field, values in data.get("facets", {}).items()
+        }
+        self.revision = revision
+        return True
+
+    def save(self):
+        """Persists the index next to the database.
+
+        Failures are logged and ignored, so a read-only data directory only
+        costs a rebuild in the next process.
+        """
+        data = {
+            "revision": self.revision,
+            "facets": {
+                field: [[v.value, v.count] for v in values]
+                for field, values in self._facets.items()
+            },
+        }
+        try:
+            with storage.atomic_write(self.path) as f:
+                json.dump(data, f)
+        except OSError as e:
+            logger.warning(f"Could not persist facet index to {self.path}: {e}")
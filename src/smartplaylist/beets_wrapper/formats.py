@@ -0,0 +1,230 @@
+"""Playlist file formats.
+
+This module defines how playlist files are rendered. A `PlaylistFormat` names
+the item fields it needs besides the file path, and renders a header, one
+entry per track and a footer, so playlists can be streamed from a database
+cursor one row at a time. Formats are looked up by name, or by the file
+extension of the playlist, in a registry that `register_format` extends.
+"""
+
+import json
+import os
+import urllib.parse
+from typing import Any, Iterable, Optional, Sequence
+from xml.sax.saxutils import escape
+
+from . import exceptions
+
+
+def _one_line(value: Any) -> str:
+    """Returns a field value as text that fits on a single line."""
+    return str(value or "").replace("\r", " ").replace("\n", " ")
+
+
+def _seconds(length: Optional[float]) -> int:
+    """Returns a track length in whole seconds, or -1 if it is unknown."""
+    return round(length) if length else -1
+
+
+class PlaylistFormat:
+    """A playlist file format, writing one file path per line.
+
+    Subclasses override the rendering methods and declare the item fields
+    they need in `fields`. Each entry is rendered from the playlist location
+    of the track, after path rewriting, followed by the values of `fields`.
+
+    Attributes:
+        name: The name of the format, e.g. `m3u`.
+        extension: The file extension of playlists in this format.
+        fields: The item fields rendered with each entry, besides the path.
+    """
+
+    name = "m3u"
+    extension = "m3u8"
+    fields: tuple[str, ...] = ()
+
+    def header(self) -> str:
+        """Returns the text written before the first entry."""
+        return ""
+
+    def entry(self, index: int, location: str, values: Sequence[Any]) -> str:
+        """Renders one track.
+
+        Args:
+            index: The position of the track in the playlist, from 1.
+            location: The file path of the track, as written to the playlist.
+            values: The values of `fields` for the track.
+
+        Returns:
+            The text of the entry, ending with a newline.
+        """
+        return f"{location}\n"
+
+    def footer(self, count: int) -> str:
+        """Returns the text written after the last entry.
+
+        Args:
+            count: The number of entries written.
+        """
+        return ""
+
+    def count_entries(self, lines: Iterable[bytes]) -> int:
+        """Counts the tracks of a playlist file in this format.
+
+        Args:
+            lines: The lines of the file, read in binary mode.
+
+        Returns:
+            The number of tracks.
+        """
+        return sum(1 for line in lines if line.strip() and not line.startswith(b"#"))
+
+
+class ExtendedM3U(PlaylistFormat):
+    """Extended M3U, with the duration, artist and title of every track."""
+
+    name = "extm3u"
+    extension = "m3u8"
+    fields = ("length", "artist", "title")
+
+    def header(self) -> str:
+        return "#EXTM3U\n"
+
+    def entry(self, index: int, location: str, values: Sequence[Any]) -> str:
+        length, artist, title = values
+        label = _one_line(title)
+        if artist:
+            label = f"{_one_line(artist)} - {label}"
+        return f"#EXTINF:{_seconds(length)},{label}\n{location}\n"
+
+
+class PLS(PlaylistFormat):
+    """The PLS format, with the title and duration of every track."""
+
+    name = "pls"
+    extension = "pls"
+    fields = ("title", "length")
+
+    def header(self) -> str:
+        return "[playlist]\n"
+
+    def entry(self, index: int, location: str, values: Sequence[Any]) -> str:
+        title, length = values
+        return (
+            f"File{index}={location}\n"
+            f"Title{index}={_one_line(title)}\n"
+            f"Length{index}={_seconds(length)}\n"
+        )
+
+    def footer(self, count: int) -> str:
+        return f"NumberOfEntries={count}\nVersion=2\n"
+
+    def count_entries(self, lines: Iterable[bytes]) -> int:
+        return sum(1 for line in lines if line.startswith(b"File"))
+
+
+class XSPF(PlaylistFormat):
+    """The XML Shareable Playlist Format."""
+
+    name = "xspf"
+    extension = "xspf"
+    fields = ("title", "artist", "album", "length")
+
+    def header(self) -> str:
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<playlist version="1" xmlns="http://xspf.org/ns/0/">\n'
+            "  <trackList>\n"
+        )
+
+    def entry(self, index: int, location: str, values: Sequence[Any]) -> str:
+        title, artist, album, length = values
+        if "://" not in location:
+            uri = urllib.parse.quote(location)
+            location = f"file://{uri}" if os.path.isabs(location) else uri
+        lines = [f"    <track><location>{escape(location)}</location>"]
+        for tag, value in (("title", title), ("creator", artist), ("album", album)):
+            if value:
+                lines.append(f"<{tag}>{escape(str(value))}</{tag}>")
+        if length:
+            lines.append(f"<duration>{round(length * 1000)}</duration>")
+        return "".join(lines) + "</track>\n"
+
+    def footer(self, count: int) -> str:
+        return "  </trackList>\n</playlist>\n"
+
+    def count_entries(self, lines: Iterable[bytes]) -> int:
+        return sum(line.count(b"<track>") for line in lines)
+
+
+class JSONLines(PlaylistFormat):
+    """One JSON object per track, with its path and main tags."""
+
+    name = "jsonl"
+    extension = "jsonl"
+    fields = ("id", "title", "artist", "album", "length")
+
+    def entry(self, index: int, location: str, values: Sequence[Any]) -> str:
+        record = dict(zip(self.fields, values))
+        record["path"] = location
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+FORMATS: dict[str, PlaylistFormat] = {}
+"""The registered formats, keyed by name."""
+
+EXTENSIONS: dict[str, str] = {}
+"""The name of the format used for each file extension."""
+
+
+def register_format(playlist_format: PlaylistFormat, *extensions: str):
+    """Registers a format, replacing any format with the same name.
+
+    Args:
+        playlist_format: The format.
+        extensions: The file extensions that select this format by default.
+    """
+    FORMATS[playlist_format.name] = playlist_format
+    for extension in extensions:
+        EXTENSIONS[extension.lower()] = playlist_format.name
+
+
+register_format(PlaylistFormat(), "m3u", "m3u8")
+register_format(ExtendedM3U())
+register_format(PLS(), "pls")
+register_format(XSPF(), "xspf")
+register_format(JSONLines(), "jsonl", "json")
+
+
+def get_format(name: str) -> PlaylistFormat:
+    """Returns a registered format by name.
+
+    Args:
+        name: The name of the format, e.g. `extm3u`.
+
+    Returns:
+        The format.
+
+    Raises:
+        exceptions.QueryError: If no format has this name.
+    """
+    try:
+        return FORMATS[name.lower()]
+    except KeyError:
+        raise exceptions.QueryError(
+            f"Unsupported playlist format '{name}'. "
+            f"Expected one of: {', '.join(FORMATS)}"
+        ) from None
+
+
+def format_for_extension(extension: str) -> PlaylistFormat:
+    """Returns the format of playlists with a file extension.
+
+    Args:
+        extension: The file extension, with or without the leading dot.
+
+    Returns:
+        The format registered for the extension, or plain M3U if none is.
+    """
+    name = EXTENSIONS.get(extension.lstrip(".").lower(), PlaylistFormat.name)
+    return FORMATS[name]
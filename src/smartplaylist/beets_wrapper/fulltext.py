@@ -0,0 +1,176 @@
+"""Full-text index of the beets library.
+
+This module maintains an SQLite FTS5 table indexing the text fields of every
+item, so free-text searches are answered from the index instead of substring
+scans of the `items` table. The table is an external content table over
+`items`: it stores only the index, and triggers on `items` keep it up to date
+whenever rows are added, changed or removed, by SmartPlaylist or by beets
+itself. `uninstall` removes the table and the triggers.
+"""
+
+import re
+import sqlite3
+from typing import Sequence
+
+from beets.dbcore.db import Transaction  # type: ignore
+
+from . import exceptions
+
+FULLTEXT_TABLE = "smartplaylist_fts"
+"""The name of the FTS5 table, in the beets database."""
+
+FULLTEXT_FIELDS = ("title", "artist", "albumartist", "album", "genre", "composer")
+"""The item fields indexed, in column order."""
+
+FULLTEXT_WEIGHTS = (4.0, 3.0, 2.0, 2.0, 1.0, 1.0)
+"""The BM25 weight of each indexed field, so title and artist matches rank
+first."""
+
+_TRIGGERS = tuple(f"{FULLTEXT_TABLE}_{event}" for event in ("ai", "ad", "au"))
+
+_TERM = re.compile(r'(?:(\w+):)?("[^"]*"?|[^\s"]+)')
+
+
+def _schema() -> list[str]:
+    """Returns the statements creating the index table and its triggers."""
+    columns = ", ".join(FULLTEXT_FIELDS)
+    new = ", ".join(f"new.{f}" for f in FULLTEXT_FIELDS)
+    old = ", ".join(f"old.{f}" for f in FULLTEXT_FIELDS)
+    insert = f"INSERT INTO {FULLTEXT_TABLE}(rowid, {columns}) VALUES (new.id, {new});"
+    delete = (
+        f"INSERT INTO {FULLTEXT_TABLE}({FULLTEXT_TABLE}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old});"
+    )
+    ai, ad, au = _TRIGGERS
+    return [
+        (
+            f"CREATE VIRTUAL TABLE {FULLTEXT_TABLE} USING fts5({columns}, "
+            "content='items', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        ),
+        f"CREATE TRIGGER {ai} AFTER INSERT ON items BEGIN {insert} END",
+        f"CREATE TRIGGER {ad} AFTER DELETE ON items BEGIN {delete} END",
+        (
+            f"CREATE TRIGGER {au} AFTER UPDATE OF {columns} ON items "
+            f"BEGIN {delete} {insert} END"
+        ),
+    ]
+
+
+def is_installed(conn: sqlite3.Connection) -> bool:
+    """Tells whether the index table and all its triggers exist.
+
+    Args:
+        conn: An open connection to the beets database.
+    """
+    names = [FULLTEXT_TABLE, *_TRIGGERS]
+    (count,) = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master "
+        f"WHERE name IN ({', '.join('?' * len(names))})",
+        names,
+    ).fetchone()
+    return count == len(names)
+
+
+def install(tx: Transaction):
+    """Creates the index and its triggers, and indexes the existing items.
+
+    Any previous, possibly incomplete, installation is replaced. Everything
+    happens in one savepoint, so the index is either complete or absent.
+
+    Args:
+        tx: An open beets transaction on the library database.
+
+    Raises:
+        sqlite3.Error: If SQLite was built without FTS5, or the database
+            cannot be written.
+    """
+    tx.mutate("SAVEPOINT smartplaylist_fts_install")
+    try:
+        uninstall(tx)
+        for statement in _schema():
+            tx.mutate(statement)
+        tx.mutate(f"INSERT INTO {FULLTEXT_TABLE}({FULLTEXT_TABLE}) VALUES ('rebuild')")
+    except BaseException:
+        tx.mutate("ROLLBACK TO smartplaylist_fts_install")
+        raise
+    finally:
+        tx.mutate("RELEASE smartplaylist_fts_install")
+
+
+def uninstall(tx: Transaction):
+    """Drops the index and its triggers, if they exist.
+
+    Args:
+        tx: An open beets transaction on the library database.
+
+    Raises:
+        sqlite3.Error: If the database cannot be written.
+    """
+    for trigger in _TRIGGERS:
+        tx.mutate(f"DROP TRIGGER IF EXISTS {trigger}")
+    tx.mutate(f"DROP TABLE IF EXISTS {FULLTEXT_TABLE}")
+
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def match_expression(text: str) -> str:
+    """Translates free text into an FTS5 query.
+
+    Every word must match, as a prefix of an indexed word, so `coltr` finds
+    `Coltrane`. Double-quoted words must match as an exact phrase, and a word
+    or phrase can be restricted to one field with `field:`, e.g.
+    `artist:davis "kind of blue"`. Other FTS5 syntax is matched literally.
+
+    Args:
+        text: The free text.
+
+    Returns:
+        The FTS5 query expression.
+
+    Raises:
+        exceptions.QueryError: If the text holds no word.
+    """
+    terms = []
+    for field, term in _TERM.findall(text):
+        quoted = term.startswith('"')
+        words = term.strip('"')
+        if not re.search(r"\w", words):
+            continue
+        phrase = _phrase(words) if quoted else _phrase(words) + "*"
+        if field in FULLTEXT_FIELDS:
+            phrase = f"{field} : {phrase}"
+        elif field:
+            phrase = _phrase(f"{field} {words}") + ("" if quoted else "*")
+        terms.append(phrase)
+    if not terms:
+        raise exceptions.QueryError(f"Invalid full-text query '{text}': no words.")
+    return " ".join(terms)
+
+
+def search(
+    conn: sqlite3.Connection,
+    expression: str,
+    limit: int,
+    weights: Sequence[float] = FULLTEXT_WEIGHTS,
+) -> list[tuple[int, float]]:
+    """Finds the best matches of an FTS5 query.
+
+    Args:
+        conn: An open connection to the beets database.
+        expression: The FTS5 query, e.g. from `match_expression`.
+        limit: The maximum number of matches to return.
+        weights: The BM25 weight of each indexed field.
+
+    Returns:
+        The id and relevance score of each match, best first. Scores are
+        positive and only comparable within one search.
+    """
+    bm25 = f"bm25({FULLTEXT_TABLE}, {', '.join(map(repr, map(float, weights)))})"
+    return conn.execute(
+        f"SELECT rowid, -{bm25} AS score FROM {FULLTEXT_TABLE} "
+        f"WHERE {FULLTEXT_TABLE} MATCH ? ORDER BY score DESC, rowid LIMIT ?",
+        (expression, limit),
+    ).fetchall()
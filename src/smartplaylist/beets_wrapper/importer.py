@@ -0,0 +1,331 @@
+"""In-process parallel import of a music directory into a beets library.
+
+This module replaces the `beet import` subprocess for the read-only import
+mode used by SmartPlaylist (`move: no`, `copy: no`, `write: no`,
+`autotag: no`). The directory tree is walked with `os.scandir`, tags are read
+in a pool of worker processes, and each directory is added as one album, as
+beets does when importing as-is, in large batched transactions.
+"""
+
+import collections
+import concurrent.futures
+import contextlib
+import fnmatch
+import logging
+import multiprocessing
+import os
+import time
+from typing import Callable, Iterator, Optional, Sequence
+
+from beets.library import Item, Library  # type: ignore
+
+from . import models
+from .manifest import FileSignature, Manifest, file_signature
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = frozenset(
+    {
+        ".aac",
+        ".aif",
+        ".aifc",
+        ".aiff",
+        ".alac",
+        ".ape",
+        ".asf",
+        ".dsf",
+        ".flac",
+        ".m4a",
+        ".m4b",
+        ".mp3",
+        ".mp4",
+        ".mpc",
+        ".oga",
+        ".ogg",
+        ".opus",
+        ".wav",
+        ".wma",
+        ".wv",
+    }
+)
+"""File extensions of the audio formats beets can read tags from."""
+
+DEFAULT_IGNORE = (".*", "*~", "System Volume Information", "lost+found")
+"""The beets default `ignore` patterns."""
+
+READ_CHUNK_SIZE = 64
+"""The number of files sent to a worker process at a time."""
+
+ProgressCallback = Callable[[int, int], None]
+"""A callable receiving the number of files processed and the total."""
+
+
+def scan_entries(
+    root: str, ignore: Sequence[str] = DEFAULT_IGNORE
+) -> Iterator[tuple[str, list[os.DirEntry]]]:
+    """Walks a directory tree and yields the audio files of each directory.
+
+    Args:
+        root: The directory to walk.
+        ignore: Glob patterns of file and directory names to skip.
+
+    Yields:
+        Each directory containing audio files, with the directory entries of
+        those files sorted by name. Directories are visited in sorted order.
+
+    Raises:
+        OSError: If the root directory cannot be read.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        files = []
+        subdirs = []
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            if directory == root:
+                raise
+            logger.warning(f"Skipping unreadable directory {directory}")
+            continue
+        for entry in entries:
+            if any(fnmatch.fnmatch(entry.name, pattern) for pattern in ignore):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif (
+                entry.is_file()
+                and os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS
+            ):
+                files.append(entry)
+        if files:
+            yield directory, sorted(files, key=lambda e: e.name)
+        stack.extend(sorted(subdirs, reverse=True))
+
+
+def scan_directory(
+    root: str, ignore: Sequence[str] = DEFAULT_IGNORE
+) -> Iterator[tuple[str, list[str]]]:
+    """Walks a directory tree and yields the audio file paths of each directory.
+
+    Args:
+        root: The directory to walk.
+        ignore: Glob patterns of file and directory names to skip.
+
+    Yields:
+        Each directory containing audio files, with the sorted paths of those
+        files.
+
+    Raises:
+        OSError: If the root directory cannot be read.
+    """
+    for directory, entries in scan_entries(root, ignore):
+        yield directory, [entry.path for entry in entries]
+
+
+def read_item_values(path: str) -> tuple[Optional[dict], Optional[str]]:
+    """Reads the tags of a file into beets item field values.
+
+    This runs in the worker processes, so it returns plain values rather than
+    an `Item` bound to a database.
+
+    Args:
+        path: The path to the audio file.
+
+    Returns:
+        The field values and None, or None and an error message if the file
+        could not be read.
+    """
+    try:
+        item = Item.from_path(os.fsencode(path))
+    except Exception as e:
+        return None, str(e)
+    return {key: item[key] for key in item.keys() if key != "id"}, None
+
+
+def _read_chunk(paths: list[str]) -> list[tuple[Optional[dict], Optional[str]]]:
+    """Reads the tags of a chunk of files in a worker process."""
+    return [read_item_values(path) for path in paths]
+
+
+def _read_in_windows(
+    executor: concurrent.futures.Executor, paths: list[str], window: int
+) -> Iterator[tuple[Optional[dict], Optional[str]]]:
+    """Reads files in chunks, with at most `window` chunks submitted at once.
+
+    Args:
+        executor: The pool of worker processes.
+        paths: The paths to the audio files.
+        window: The largest number of chunks read or waiting to be read.
+
+    Yields:
+        The result of `read_item_values` for each path, in order.
+    """
+    pending: collections.deque[concurrent.futures.Future] = collections.deque()
+    for start in range(0, len(paths), READ_CHUNK_SIZE):
+        pending.append(
+            executor.submit(_read_chunk, paths[start : start + READ_CHUNK_SIZE])
+        )
+        if len(pending) >= window:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+@contextlib.contextmanager
+def read_all(
+    paths: list[str], workers: int
+) -> Iterator[Iterator[tuple[Optional[dict], Optional[str]]]]:
+    """Reads the tags of files, in parallel when there are several workers.
+
+    Files are sent to the workers in chunks of `READ_CHUNK_SIZE`, and only
+    a few chunks per worker are submitted ahead of the reader, so memory use
+    does not grow with the number of files. When the block exits, early or
+    on an error, the chunks not yet started are cancelled.
+
+    Args:
+        paths: The paths to the audio files.
+        workers: The number of processes reading tags.
+
+    Yields:
+        An iterator over the result of `read_item_values` for each path, in
+        order.
+    """
+    if workers <= 1 or len(paths) < READ_CHUNK_SIZE:
+        yield map(read_item_values, paths)
+        return
+    # Forking a multi-threaded process, such as the MCP server, can copy
+    # locks held by other threads into the workers and deadlock them.
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("forkserver")
+    )
+    try:
+        yield _read_in_windows(executor, paths, 2 * workers)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def import_files(
+    lib: Library,
+    albums: Sequence[Sequence[str]],
+    workers: int = 1,
+    batch_size: int = 1000,
+    progress: Optional[ProgressCallback] = None,
+) -> models.ImportStats:
+    """Reads audio files and adds them to a beets library as albums.
+
+    Args:
+        lib: The beets library to import into.
+        albums: The paths of the files of each album to create.
+        workers: The number of processes reading tags.
+        batch_size: The number of items inserted per transaction.
+        progress: Called with the number of files processed and the total
+            after each batch.
+
+    Returns:
+        The import counts. `files` counts the files given.
+
+    Raises:
+        concurrent.futures.process.BrokenProcessPool: If a worker dies.
+    """
+    stats = models.ImportStats()
+    total = sum(len(files) for files in albums)
+    stats.files = total
+    paths = [path for files in albums for path in files]
+
+    processed = 0
+    pending: list[list[Item]] = []
+    pending_items = 0
+
+    def flush():
+        nonlocal pending, pending_items
+        with lib.transaction():
+            for items in pending:
+                lib.add_album(items)
+        stats.albums += len(pending)
+        stats.imported += pending_items
+        pending, pending_items = [], 0
+        if progress is not None:
+            progress(processed, total)
+
+    with read_all(paths, workers) as results:
+        for files in albums:
+            items = []
+            for path in files:
+                values, error = next(results)
+                processed += 1
+                if values is None:
+                    logger.warning(f"Error reading {path}: {error}")
+                    stats.failed += 1
+                else:
+                    items.append(Item(**values))
+            if items:
+                pending.append(items)
+                pending_items += len(items)
+            if pending_items >= batch_size:
+                flush()
+        flush()
+    return stats
+
+
+def import_tree(
+    lib: Library,
+    root: str,
+    workers: int = 1,
+    batch_size: int = 1000,
+    ignore: Sequence[str] = DEFAULT_IGNORE,
+    progress: Optional[ProgressCallback] = None,
+    manifest: Optional[Manifest] = None,
+) -> models.ImportStats:
+    """Imports the audio files under a directory into a beets library.
+
+    Files are imported in place and their tags are left untouched. Files
+    already in the library are skipped. Each directory becomes one album.
+    The signatures of the files seen are saved to the scan manifest, so the
+    next incremental sync only reads the files changed since the import.
+
+    Args:
+        lib: The beets library to import into.
+        root: The directory to import.
+        workers: The number of processes reading tags.
+        batch_size: The number of items inserted per transaction.
+        ignore: Glob patterns of file and directory names to skip.
+        progress: Called with the number of files processed and the total
+            after each batch.
+        manifest: The scan manifest to replace once the files are imported.
+
+    Returns:
+        The import counts and duration.
+
+    Raises:
+        OSError: If the root directory cannot be read.
+        concurrent.futures.process.BrokenProcessPool: If a worker dies.
+    """
+    start = time.monotonic()
+    with lib.transaction() as tx:
+        existing = {os.fsdecode(p) for (p,) in tx.query("SELECT path FROM items")}
+
+    tree: dict[str, FileSignature] = {}
+    albums = []
+    for _, entries in scan_entries(root, ignore):
+        new = []
+        for entry in entries:
+            try:
+                tree[entry.path] = file_signature(entry.stat())
+            except OSError:
+                continue
+            if entry.path not in existing:
+                new.append(entry.path)
+        if new:
+            albums.append(new)
+    files = len(tree)
+
+    stats = import_files(lib, albums, workers, batch_size, progress)
+    if manifest is not None:
+        manifest.root = os.path.abspath(root)
+        manifest.files = tree
+        manifest.save()
+    stats.skipped = files - stats.files
+    stats.files = files
+    stats.elapsed = time.monotonic() - start
+    return stats
@@ -5,15 +5,87 @@ interacting with a beets music library. It abstracts away the direct use of the
 beets internal API and CLI commands.
 """
 
+import contextlib
+import dataclasses
+import logging
+import math
 import os
 import shutil
+import sqlite3
 import subprocess
-from typing import Dict, Optional
+import threading
+import time
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Sequence,
+    TypeVar,
+)
 
+import numpy as np
 from beets import config, library  # type: ignore
+from beets.dbcore import query as dbquery  # type: ignore
 
+from smartplaylist import metrics
 from smartplaylist.settings import Settings
-from . import exceptions, models
+from . import (
+    aggregates,
+    cache,
+    definitions,
+    exceptions,
+    export,
+    formats,
+    fulltext,
+    importer,
+    models,
+    ordering,
+    selection,
+    sql,
+    sync,
+    vectorized,
+)
+from .facets import FACET_EXPRESSIONS, FACET_FIELDS, FACET_INDEX_FILENAME, FacetIndex
+from .manifest import MANIFEST_FILENAME, Manifest
+from .names import NAME_INDEX_FILENAME, NameIndex
+from .pool import ConnectionPool
+from .similarity import SIMILARITY_INDEX_FILENAME, SimilarityIndex
+from .snapshot import TrackSnapshot
+from .storage import PersistedIndex
+
+logger = logging.getLogger(__name__)
+
+_Index = TypeVar("_Index", bound=PersistedIndex)
+
+_ID_CHUNK_SIZE = 500
+"""The number of ids bound to one `IN` list, below SQLite's parameter limit."""
+
+_LISTING_SETTLE_NS = 2_000_000_000
+"""How long a directory must have been unchanged for its listing to be reused.
+
+Coarse file system timestamps can hide changes made within the same tick as
+the listing, so such listings are read again on the next call."""
+
+
+def _order_key(value) -> tuple:
+    """Returns a sort key ordering values the way SQLite orders `IFNULL(v, '')`.
+
+    Args:
+        value: A field value.
+
+    Returns:
+        A key that sorts numbers before strings and strings before bytes.
+    """
+    if value is None:
+        value = ""
+    if isinstance(value, (int, float)):
+        return 0, value
+    if isinstance(value, str):
+        return 1, value
+    return 2, bytes(value)
 
 
 class Library:
@@ -25,7 +97,9 @@ class Library:
     Attributes:
         config_path: Path to the beets configuration file.
         settings: The application settings object.
+        db_path: Path to the beets SQLite database file.
         lib: An instance of the beets `Library` class.
+        cache: The cache of query results, keyed by the database revision.
     """
 
     def __init__(self, config_path: str, settings: Settings):
@@ -40,41 +114,520 @@ class Library:
         """
         self.config_path = config_path
         self.settings = settings
+        self._pool: Optional[ConnectionPool] = None
+        self._revision: Optional[tuple[tuple[int, int], str]] = None
+        self._facet_index: Optional[FacetIndex] = None
+        self._facet_lock = threading.Lock()
+        self._name_index: Optional[NameIndex] = None
+        self._name_lock = threading.Lock()
+        self._similarity_index: Optional[SimilarityIndex] = None
+        self._similarity_lock = threading.Lock()
+        self._manifest: Optional[Manifest] = None
+        self._playlist_registry: Optional[definitions.PlaylistRegistry] = None
+        self._playlist_listing: Optional[tuple[str, int, list[str]]] = None
+        self._track_counts: Dict[str, tuple[int, int, int]] = {}
+        self._playlist_lock = threading.Lock()
+        self._snapshot: Optional[TrackSnapshot] = None
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._snapshot_thread_lock = threading.Lock()
+        self.cache = cache.QueryCache(
+            max_entries=settings.query_cache_max_entries,
+            max_bytes=settings.query_cache_max_bytes,
+            ttl=settings.query_cache_ttl,
+        )
         try:
             config.set_file(config_path)
-            self.lib = library.Library(config["library"].as_filename())
+            self.db_path = str(config["library"].as_filename())
+            self.lib = library.Library(self.db_path)
         except Exception as e:
             raise exceptions.BeetsWrapperError(
                 f"Failed to initialize beets library: {e}"
             ) from e
 
-    def import_dir(self, path: str):
+    @property
+    def pool(self) -> ConnectionPool:
+        """The pool of read-only connections to the library database."""
+        if self._pool is None:
+            self._pool = ConnectionPool(
+                self.db_path,
+                max_size=self._pool_size(),
+                on_connect=self.lib.add_functions,
+            )
+        return self._pool
+
+    def _pool_size(self) -> int:
+        """Returns the maximum number of pooled read connections."""
+        return self.settings.library_pool_size or self.settings.mcp_worker_threads
+
+    def pool_stats(self) -> models.PoolStats:
+        """Returns the statistics of the connection pool, without creating it.
+
+        Returns:
+            The pool statistics, all zero until the pool is first used.
+        """
+        pool = self._pool
+        if pool is None:
+            return models.PoolStats(max_size=self._pool_size())
+        return pool.stats()
+
+    @contextlib.contextmanager
+    def read_connection(self) -> Iterator[sqlite3.Connection]:
+        """Checks out a pooled read-only connection to the library database.
+
+        Yields:
+            An open SQLite connection.
+
+        Raises:
+            exceptions.BeetsWrapperError: If no connection could be obtained.
+        """
+        with self.pool.connection() as conn:
+            yield conn
+
+    @property
+    def data_dir(self) -> str:
+        """The directory holding the database and the derived indexes."""
+        return os.path.dirname(os.path.abspath(self.db_path))
+
+    @property
+    def music_dir(self) -> str:
+        """The music directory configured in beets."""
+        return str(config["directory"].as_filename())
+
+    @property
+    def playlist_dir(self) -> str:
+        """The playlist directory configured for the smartplaylist plugin."""
+        return config["smartplaylist"]["playlist_dir"].get(str)
+
+    @property
+    def ignore_patterns(self) -> list[str]:
+        """The glob patterns of file and directory names beets ignores."""
+        return config["ignore"].as_str_seq()
+
+    @property
+    def manifest(self) -> Manifest:
+        """The scan manifest written by the last incremental sync."""
+        if self._manifest is None:
+            self._manifest = Manifest(os.path.join(self.data_dir, MANIFEST_FILENAME))
+        return self._manifest
+
+    @property
+    def playlist_registry(self) -> definitions.PlaylistRegistry:
+        """The saved smart playlist definitions."""
+        if self._playlist_registry is None:
+            self._playlist_registry = definitions.PlaylistRegistry(
+                os.path.join(self.data_dir, definitions.REGISTRY_FILENAME)
+            )
+        return self._playlist_registry
+
+    def revision(self) -> str:
+        """Returns a token identifying the current state of the database.
+
+        The token combines the database file's modification time and size with
+        the highest item id and item mtime. The query is skipped while the
+        file itself is unchanged, so repeated calls only cost a `stat`.
+
+        Returns:
+            A string that changes whenever the library is modified.
+
+        Raises:
+            exceptions.BeetsWrapperError: If the database cannot be read.
+        """
+        try:
+            st = os.stat(self.db_path)
+            signature = (st.st_mtime_ns, st.st_size)
+            cached = self._revision
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            with self.read_connection() as conn:
+                max_id, max_mtime = conn.execute(
+                    "SELECT MAX(id), MAX(mtime) FROM items"
+                ).fetchone()
+        except (OSError, sqlite3.Error) as e:
+            raise exceptions.BeetsWrapperError(
+                f"Failed to read the library revision: {e}"
+            ) from e
+        revision = f"{st.st_mtime_ns}-{st.st_size}-{max_id or 0}-{max_mtime or 0}"
+        self._revision = (signature, revision)
+        return revision
+
+    def _cache_revision(self) -> Optional[str]:
+        """Returns the revision used to key cached results.
+
+        Returns:
+            The current database revision, or None if caching is disabled, the
+            revision cannot be read or the snapshot is being reloaded, in which
+            case the cache is bypassed.
+        """
+        if not self.cache.enabled:
+            return None
+        try:
+            revision = self.revision()
+        except exceptions.BeetsWrapperError:
+            return None
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.revision != revision:
+            # Results may come from the previous snapshot until it is reloaded.
+            return None
+        return revision
+
+    def _current_index(
+        self,
+        attribute: str,
+        lock: threading.Lock,
+        create: Callable[[], _Index],
+        build: Callable[[_Index, sqlite3.Connection, str], None],
+    ) -> _Index:
+        """Returns a persisted index matching the current database revision.
+
+        The in-memory index held in `attribute` is reused while the revision
+        is unchanged. Otherwise the persisted index is loaded, or rebuilt and
+        persisted if it is stale.
+
+        Args:
+            attribute: The name of the attribute holding the index.
+            lock: The lock serializing the loads and builds of the index.
+            create: Returns a new empty index.
+            build: Builds an index from a database connection and revision.
+
+        Returns:
+            The current index.
+        """
+        revision = self.revision()
+        index = getattr(self, attribute)
+        if index is not None and index.revision == revision:
+            return index
+        with lock:
+            index = getattr(self, attribute)
+            if index is not None and index.revision == revision:
+                return index
+            index = create()
+            if not index.load(revision):
+                with self.read_connection() as conn:
+                    build(index, conn, revision)
+                index.save()
+            setattr(self, attribute, index)
+            return index
+
+    def _current_facet_index(self) -> FacetIndex:
+        """Returns the facet index, see `_current_index`."""
+        return self._current_index(
+            "_facet_index",
+            self._facet_lock,
+            lambda: FacetIndex(os.path.join(self.data_dir, FACET_INDEX_FILENAME)),
+            FacetIndex.build,
+        )
+
+    def _current_name_index(self) -> NameIndex:
+        """Returns the name index, see `_current_index`."""
+        return self._current_index(
+            "_name_index",
+            self._name_lock,
+            lambda: NameIndex(os.path.join(self.data_dir, NAME_INDEX_FILENAME)),
+            NameIndex.build,
+        )
+
+    def _current_similarity_index(self) -> SimilarityIndex:
+        """Returns the similarity index, see `_current_index`."""
+        return self._current_index(
+            "_similarity_index",
+            self._similarity_lock,
+            lambda: SimilarityIndex(
+                os.path.join(self.data_dir, SIMILARITY_INDEX_FILENAME)
+            ),
+            self._build_similarity_index,
+        )
+
+    def _build_similarity_index(
+        self, index: SimilarityIndex, conn: sqlite3.Connection, revision: str
+    ):
+        """Builds the similarity index, approximate for large libraries.
+
+        Libraries of at least `similarity_approximate_min_tracks` tracks also
+        get an inverted file index of about the square root of their size
+        cells.
+        """
+        threshold = self.settings.similarity_approximate_min_tracks
+        (count,) = conn.execute("SELECT COUNT(*) FROM items").fetchone()
+        cells = 0
+        if threshold and count >= threshold:
+            cells = min(4096, int(math.sqrt(count)))
+        index.build(conn, revision, cells=cells)
+
+    def snapshot(self) -> Optional[TrackSnapshot]:
+        """Returns the in-memory track snapshot, without waiting for a reload.
+
+        The snapshot is only kept when `snapshot_enabled` is set. It is loaded
+        at startup and after each sync, see `load_snapshot`. When another
+        process changes the database, the previous snapshot keeps being
+        served while a new one is loaded in the background.
+
+        Returns:
+            The snapshot, or None if it is disabled or not loaded yet.
+        """
+        if not self.settings.snapshot_enabled:
+            return None
+        snapshot = self._snapshot
+        try:
+            stale = snapshot is None or snapshot.revision != self.revision()
+        except exceptions.BeetsWrapperError:
+            return snapshot
+        if stale:
+            self._reload_snapshot_in_background()
+        return snapshot
+
+    def load_snapshot(self) -> Optional[TrackSnapshot]:
+        """Loads the track snapshot for the current revision, if it is stale.
+
+        Returns:
+            The snapshot, or None if it is disabled or cannot be loaded.
+        """
+        if not self.settings.snapshot_enabled:
+            return None
+        with self._snapshot_lock:
+            try:
+                revision = self.revision()
+                snapshot = self._snapshot
+                if snapshot is not None and snapshot.revision == revision:
+                    return snapshot
+                with self.read_connection() as conn:
+                    snapshot = TrackSnapshot.load(conn, revision)
+            except (sqlite3.Error, exceptions.BeetsWrapperError) as e:
+                logger.warning(f"Could not load the track snapshot: {e}")
+                return None
+            self._snapshot = snapshot
+        stats = snapshot.stats()
+        logger.info(
+            f"Loaded snapshot of {stats.rows} tracks using {stats.total_bytes} "
+            f"bytes: {stats.column_bytes}"
+        )
+        return snapshot
+
+    def _reload_snapshot_in_background(self):
+        """Starts loading the track snapshot in a thread, unless one is running."""
+        with self._snapshot_thread_lock:
+            thread = self._snapshot_thread
+            if thread is not None and thread.is_alive():
+                return
+            self._snapshot_thread = threading.Thread(
+                target=self.load_snapshot, name="snapshot-loader", daemon=True
+            )
+            self._snapshot_thread.start()
+
+    def snapshot_stats(self) -> Optional[models.SnapshotStats]:
+        """Reports the memory used by the loaded snapshot, per column.
+
+        Returns:
+            The snapshot statistics, or None if no snapshot is loaded.
+        """
+        snapshot = self._snapshot
+        return snapshot.stats() if snapshot is not None else None
+
+    def _library_changed(self):
+        """Drops derived state after a write and reloads the snapshot.
+
+        The name and similarity indexes are rebuilt too, so names are
+        resolved and similar tracks found against the library as synced,
+        without a rebuild on the next request.
+        """
+        self.cache.invalidate()
+        self.load_snapshot()
+        for name, current in (
+            ("name", self._current_name_index),
+            ("similarity", self._current_similarity_index),
+        ):
+            try:
+                current()
+            except Exception as e:
+                logger.warning(f"Could not refresh the {name} index: {e}")
+
+    @metrics.instrument("library")
+    def resolve_names(
+        self,
+        name: str,
+        fields: Optional[Sequence[str]] = None,
+        limit: int = 5,
+        min_score: float = 0.25,
+    ) -> list[models.NameMatch]:
+        """Finds the artists, album artists, albums and genres closest to a name.
+
+        Names are compared by trigram similarity, ignoring case, accents,
+        punctuation and spaces, so `Bjork` resolves to `Björk` and `hiphop`
+        to `Hip-Hop`. The trigram index is rebuilt after each sync and
+        persisted next to the database.
+
+        Args:
+            name: The name, possibly misspelled.
+            fields: The fields to search, among `artist`, `albumartist`,
+                `album` and `genre`. Defaults to all of them.
+            limit: The maximum number of matches to return.
+            min_score: The lowest similarity returned, between 0 and 1.
+
+        Returns:
+            The matching values, most similar first, then most common first.
+
+        Raises:
+            exceptions.QueryError: If a field is not supported, or the name has
+                no letter or digit.
+            exceptions.BeetsWrapperError: If reading the name index fails.
+        """
+        try:
+            return self._current_name_index().resolve(
+                name, fields, limit=limit, min_score=min_score
+            )
+        except exceptions.BeetsWrapperError:
+            raise
+        except Exception as e:
+            raise exceptions.BeetsWrapperError(
+                f"Failed to resolve name '{name}': {e}"
+            ) from e
+
+    @metrics.instrument("library")
+    def list_facet(self, field: str) -> list[models.FacetValue]:
+        """Returns the values of a field with their track counts.
+
+        Args:
+            field: One of `genre`, `artist`, `albumartist`, `year`, `decade`
+                or `format`.
+
+        Returns:
+            A list of FacetValue objects, most common first.
+
+        Raises:
+            exceptions.QueryError: If the field is not supported.
+            exceptions.BeetsWrapperError: If reading the facet index fails.
+        """
+        try:
+            return self._current_facet_index().values(field)
+        except exceptions.BeetsWrapperError:
+            raise
+        except Exception as e:
+            raise exceptions.BeetsWrapperError(
+                f"Failed to list facet '{field}': {e}"
+            ) from e
+
+    def close(self):
+        """Closes the pooled connections and the beets database handles."""
+        if self._pool is not None:
+            self._pool.close()
+        self.lib._close()
+
+    @metrics.instrument("library")
+    def import_dir(
+        self,
+        path: str,
+        workers: Optional[int] = None,
+        progress: Optional[importer.ProgressCallback] = None,
+    ) -> models.ImportStats:
         """Imports music from a directory into the beets library.
 
+        Files are imported in place without modifying their tags. Tags are
+        read in parallel by a pool of worker processes and the tracks are
+        inserted in batched transactions.
+
         Args:
             path: Path to the directory to import.
+            workers: The number of processes reading tags. Defaults to the
+                `import_workers` setting, or to one per CPU.
+            progress: Called with the number of files processed and the total
+                after each batch.
+
+        Returns:
+            The import counts and duration.
 
         Raises:
             exceptions.ImportError: If the import fails.
         """
-        beet_executable = shutil.which("beet") or ".venv/bin/beet"
+        if workers is None:
+            workers = self.settings.import_workers
+        self._update_fulltext_index()
         try:
-            subprocess.run(
-                [
-                    beet_executable,
-                    "-c",
-                    self.config_path,
-                    "import",
-                    "-q",
-                    path,
-                ],
-                check=True,
+            return importer.import_tree(
+                self.lib,
+                path,
+                workers=workers or os.cpu_count() or 1,
+                batch_size=self.settings.import_batch_size,
+                ignore=self.ignore_patterns,
+                progress=progress,
+                manifest=self.manifest,
             )
-        except subprocess.CalledProcessError as e:
+        except Exception as e:
             raise exceptions.ImportError(
                 f"Failed to import music from {path}: {e}"
             ) from e
+        finally:
+            self._library_changed()
+
+    @metrics.instrument("library")
+    def sync_library(
+        self,
+        path: Optional[str] = None,
+        workers: Optional[int] = None,
+        progress: Optional[importer.ProgressCallback] = None,
+    ) -> models.SyncStats:
+        """Incrementally brings the library up to date with the music directory.
+
+        The directory tree is compared with the scan manifest saved by the
+        previous sync. Only new and changed files have their tags read, and
+        the rows of deleted files are removed.
 
+        Args:
+            path: The music directory. Defaults to the beets `directory`.
+            workers: The number of processes reading tags. Defaults to the
+                `import_workers` setting, or to one per CPU.
+            progress: Called with the number of files processed and the total
+                after each batch of new or changed files.
+
+        Returns:
+            The sync counts and duration.
+
+        Raises:
+            exceptions.UpdateError: If the sync fails.
+        """
+        if workers is None:
+            workers = self.settings.import_workers
+        self._update_fulltext_index()
+        try:
+            if path is None:
+                path = self.music_dir
+            return sync.sync_tree(
+                self.lib,
+                path,
+                self.manifest,
+                workers=workers or os.cpu_count() or 1,
+                batch_size=self.settings.import_batch_size,
+                ignore=self.ignore_patterns,
+                progress=progress,
+            )
+        except Exception as e:
+            raise exceptions.UpdateError(f"Failed to sync the library: {e}") from e
+        finally:
+            self._library_changed()
+
+    def _update_fulltext_index(self):
+        """Creates the full-text index if enabled, or removes it if disabled.
+
+        Once installed, the index is kept up to date by triggers on every
+        write to the library, so it is installed before imports and syncs.
+        Failures are logged and ignored, as the index is only needed by
+        `fulltext_search`.
+        """
+        enabled = self.settings.fulltext_enabled
+        try:
+            with self.read_connection() as conn:
+                if fulltext.is_installed(conn) == enabled:
+                    return
+            with self.lib.transaction() as tx:
+                if enabled:
+                    fulltext.install(tx)
+                else:
+                    fulltext.uninstall(tx)
+            action = "Installed" if enabled else "Removed"
+            logger.info(f"{action} the full-text index of the library.")
+        except Exception as e:
+            logger.warning(f"Could not update the full-text index: {e}")
+
+    @metrics.instrument("library")
     def update_library(self):
         """Updates the beets library by scanning for new and changed files.
 
@@ -98,7 +651,10 @@ class Library:
             raise exceptions.UpdateError(
                 f"Failed to update the library. stdout: {e.stdout}, stderr: {e.stderr}"
             ) from e
+        finally:
+            self._library_changed()
 
+    @metrics.instrument("library")
     def items(self, query: Optional[str] = None) -> list[models.Item]:
         """Fetches a list of items from the library matching a query.
 
@@ -118,6 +674,454 @@ class Library:
                 f"Failed to query items with '{query}': {e}"
             ) from e
 
+    @metrics.instrument("library")
+    def items_projected(
+        self,
+        query: Optional[str] = None,
+        fields: Sequence[str] = ("id", "title", "artist", "album", "path"),
+        sort: Optional[str] = None,
+    ) -> list[tuple]:
+        """Fetches some fields of every item matching a query.
+
+        Only the requested columns are read and no beets `Item` is built:
+        each match is returned as a lightweight record, a named tuple whose
+        attributes are the requested fields. Values are those stored in the
+        database, with paths as bytes and missing values replaced by the beets
+        default of the field.
+
+        Args:
+            query: The beets query to execute.
+            fields: The fixed item fields to return.
+            sort: A sort term such as `year`, `year+` or `year-`. Defaults to
+                the sort in the query, or to the item id.
+
+        Returns:
+            One record per matching item, in sort order.
+
+        Raises:
+            exceptions.QueryError: If the query, sort or a field is invalid.
+        """
+        fields = tuple(fields)
+        expressions, params = sql.projection(fields)
+        record = models.record_type(fields)
+        compiled = sql.compile_query(query)
+        field, ascending = sql.sort_spec(compiled, sort)
+        try:
+            snapshot = self.snapshot()
+            mask = None
+            if (
+                snapshot is not None
+                and field in snapshot.columns
+                and all(f in snapshot.columns for f in fields)
+            ):
+                mask = vectorized.evaluate(compiled.beets_query, snapshot)
+            if snapshot is not None and mask is not None:
+                rows = vectorized.sorted_rows(snapshot, mask, field, ascending)
+                return list(map(record._make, snapshot.project(rows, fields)))
+            if compiled.is_fast:
+                order = "ASC" if ascending else "DESC"
+                key = f"IFNULL({field}, '')"
+                with self.read_connection() as conn:
+                    cursor = conn.execute(
+                        *sql.select_items(
+                            compiled,
+                            expressions,
+                            order_by=f"{key} {order}, id {order}",
+                            column_params=params,
+                        )
+                    )
+                    return list(map(record._make, cursor))
+            return [
+                record._make(item.get(f) for f in fields)
+                for item in self._sorted_slow(compiled, field, ascending)
+            ]
+        except Exception as e:
+            raise exceptions.QueryError(
+                f"Failed to query items with '{query}': {e}"
+            ) from e
+
+    @metrics.instrument("library")
+    def items_page(
+        self,
+        query: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: Optional[str] = None,
+    ) -> models.ItemPage:
+        """Fetches one page of the items matching a query.
+
+        Pages are ordered by a single fixed column and the item id, and
+        navigated with keyset pagination, so fetching a page costs the same
+        whatever its position. When the snapshot is enabled, queries it covers
+        are evaluated as vectorized masks over its columns instead. Queries
+        that beets can only evaluate in Python are paginated over the full
+        beets result. The ids on each page and the match count are cached
+        until the library changes.
+
+        Args:
+            query: The beets query to execute.
+            limit: The maximum number of items to return.
+            cursor: The `next_cursor` of the previous page, if any.
+            sort: A sort term such as `year`, `year+` or `year-`. Defaults to
+                the sort in the query, or to the item id.
+
+        Returns:
+            The page of items with the total number of matches.
+
+        Raises:
+            exceptions.QueryError: If the query, sort or cursor is invalid.
+        """
+        try:
+            ids, total_count, next_cursor = self._page_ids(query, limit, cursor, sort)
+            return models.ItemPage(self._items_by_id(ids), total_count, next_cursor)
+        except exceptions.QueryError:
+            raise
+        except Exception as e:
+            raise exceptions.QueryError(
+                f"Failed to query items with '{query}': {e}"
+            ) from e
+
+    @metrics.instrument("library")
+    def records_page(
+        self,
+        query: Optional[str] = None,
+        fields: Sequence[str] = ("id", "title", "artist", "album", "path"),
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: Optional[str] = None,
+    ) -> models.RecordPage:
+        """Fetches some fields of one page of the items matching a query.
+
+        Pages are the same as those of `items_page`, but hold records with
+        only the requested fields, as returned by `items_projected`.
+
+        Args:
+            query: The beets query to execute.
+            fields: The fixed item fields to return.
+            limit: The maximum number of items to return.
+            cursor: The `next_cursor` of the previous page, if any.
+            sort: A sort term such as `year`, `year+` or `year-`. Defaults to
+                the sort in the query, or to the item id.
+
+        Returns:
+            The page of records with the total number of matches.
+
+        Raises:
+            exceptions.QueryError: If the query, sort, cursor or a field is
+                invalid.
+        """
+        fields = tuple(fields)
+        sql.projection(fields)
+        try:
+            ids, total_count, next_cursor = self._page_ids(query, limit, cursor, sort)
+            records = self._records_by_id(ids, fields)
+            return models.RecordPage(records, total_count, next_cursor)
+        except exceptions.QueryError:
+            raise
+        except Exception as e:
+            raise exceptions.QueryError(
+                f"Failed to query items with '{query}': {e}"
+            ) from e
+
+    def _page_ids(
+        self,
+        query: Optional[str],
+        limit: int,
+        cursor: Optional[str],
+        sort: Optional[str],
+    ) -> tuple[tuple[int, ...], int, Optional[str]]:
+        """Finds the ids on a page of a query, with the match count and cursor."""
+        compiled = sql.compile_query(query)
+        field, ascending = sql.sort_spec(compiled, sort)
+        after = sql.decode_cursor(cursor, field, ascending) if cursor else None
+        normalized = cache.normalize_query(query)
+        revision = self._cache_revision()
+        cache_key = ("items_page", normalized, field, ascending, cursor, limit)
+        cached = self.cache.get(cache_key, revision)
+        if cached is None:
+            snapshot = self.snapshot()
+            mask = None
+            if snapshot is not None and field in snapshot.columns:
+                mask = vectorized.evaluate(compiled.beets_query, snapshot)
+            if snapshot is not None and mask is not None:
+                cached = self._page_ids_snapshot(
+                    snapshot, mask, field, ascending, after, limit
+                )
+            elif compiled.is_fast:
+                cached = self._page_ids_sql(
+                    compiled, field, ascending, after, limit, normalized, revision
+                )
+            else:
+                cached = self._page_ids_slow(compiled, field, ascending, after, limit)
+            self.cache.put(cache_key, revision, cached)
+        return cached
+
+    def _page_ids_sql(
+        self,
+        compiled: sql.CompiledQuery,
+        field: str,
+        ascending: bool,
+        after: Optional[tuple],
+        limit: int,
+        normalized: str,
+        revision: Optional[str],
+    ) -> tuple[tuple[int, ...], int, Optional[str]]:
+        """Finds a page of a fast query with SQL keyset pagination."""
+        key = f"IFNULL({field}, '')"
+        order = "ASC" if ascending else "DESC"
+        bound = None
+        if after is not None:
+            bound = f"({key}, id) {'>' if ascending else '<'} (?, ?)"
+        with self.read_connection() as conn:
+            total = self.cache.get(("count", normalized), revision)
+            if total is None:
+                (total,) = conn.execute(
+                    *sql.select_items(compiled, ["COUNT(*)"])
+                ).fetchone()
+                self.cache.put(("count", normalized), revision, total)
+            rows = conn.execute(
+                *sql.select_items(
+                    compiled,
+                    [key, "id"],
+                    where=bound,
+                    params=after or (),
+                    order_by=f"{key} {order}, id {order}",
+                    limit=limit + 1,
+                )
+            ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = sql.encode_cursor(field, ascending, *rows[-1])
+        return tuple(item_id for _, item_id in rows), total, next_cursor
+
+    def _page_ids_snapshot(
+        self,
+        snapshot: TrackSnapshot,
+        mask: np.ndarray,
+        field: str,
+        ascending: bool,
+        after: Optional[tuple],
+        limit: int,
+    ) -> tuple[tuple[int, ...], int, Optional[str]]:
+        """Finds a page of a query evaluated over the snapshot columns."""
+        rows = vectorized.sorted_rows(snapshot, mask, field, ascending, after)
+        page = rows[: limit + 1].tolist()
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            last = page[-1]
+            next_cursor = sql.encode_cursor(
+                field,
+                ascending,
+                snapshot.sort_value(last, field),
+                snapshot.sort_value(last, "id"),
+            )
+        ids = snapshot.numbers("id")[page].tolist()
+        return tuple(ids), int(mask.sum()), next_cursor
+
+    def _page_ids_slow(
+        self,
+        compiled: sql.CompiledQuery,
+        field: str,
+        ascending: bool,
+        after: Optional[tuple],
+        limit: int,
+    ) -> tuple[tuple[int, ...], int, Optional[str]]:
+        """Finds a page of a query that beets evaluates in Python."""
+        matches = self._sorted_slow(compiled, field, ascending)
+        page = matches
+        if after is not None:
+            bound = (_order_key(after[0]), after[1])
+            page = [
+                i
+                for i in matches
+                if (
+                    (_order_key(i.get(field)), i.id) > bound
+                    if ascending
+                    else (_order_key(i.get(field)), i.id) < bound
+                )
+            ]
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            last = page[-1]
+            next_cursor = sql.encode_cursor(field, ascending, last.get(field), last.id)
+        return tuple(item.id for item in page), len(matches), next_cursor
+
+    def _sorted_slow(
+        self, compiled: sql.CompiledQuery, field: str, ascending: bool
+    ) -> list:
+        """Evaluates a query with beets and sorts the items by a field and id."""
+
+        def key(item) -> tuple:
+            return _order_key(item.get(field)), item.id
+
+        return sorted(
+            self.lib.items(compiled.beets_query), key=key, reverse=not ascending
+        )
+
+    def _items_by_id(self, ids: Iterable[int]) -> list[models.Item]:
+        """Fetches items by id with a single query, preserving the id order.
+
+        When the snapshot is enabled, the items are served from it instead
+        and only carry the snapshot fields.
+
+        Args:
+            ids: The ids of the items to fetch.
+
+        Returns:
+            The items that still exist, in the order of `ids`.
+        """
+        ids = list(ids)
+        if not ids:
+            return []
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            return snapshot.items(ids)
+        by_id = {item.id: item for item in self.lib.items(dbquery.InQuery("id", ids))}
+        return [models.Item(by_id[i]) for i in ids if i in by_id]
+
+    def _records_by_id(self, ids: Iterable[int], fields: tuple) -> list[tuple]:
+        """Fetches some fields of items by id, preserving the id order.
+
+        Args:
+            ids: The ids of the items to fetch.
+            fields: The fixed item fields to return.
+
+        Returns:
+            Records of the items that still exist, in the order of `ids`.
+        """
+        ids = list(ids)
+        if not ids:
+            return []
+        expressions, params = sql.projection(fields)
+        record = models.record_type(fields)
+        snapshot = self.snapshot()
+        if snapshot is not None and all(f in snapshot.columns for f in fields):
+            rows = snapshot.rows_for_ids(ids)
+            return list(map(record._make, snapshot.project(rows, fields)))
+        by_id = {}
+        with self.read_connection() as conn:
+            for start in range(0, len(ids), _ID_CHUNK_SIZE):
+                chunk = ids[start : start + _ID_CHUNK_SIZE]
+                for item_id, *values in conn.execute(
+                    f"SELECT id, {', '.join(expressions)} FROM items "
+                    f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                    [*params, *chunk],
+                ):
+                    by_id[item_id] = record._make(values)
+        return [by_id[i] for i in ids if i in by_id]
+
+    @metrics.instrument("library")
+    def fulltext_search(
+        self,
+        text: str,
+        limit: int = 50,
+        fields: Sequence[str] = ("id", "title", "artist", "album", "path"),
+    ) -> list[tuple]:
+        """Ranks the items matching free text with the full-text index.
+
+        The title, artist, album artist, album, genre and composer of every
+        item are indexed. Every word of the text must match the start of an
+        indexed word, see `fulltext.match_expression`, and matches are ranked
+        by BM25 relevance. The index is created by syncs and imports while
+        the `fulltext_enabled` setting is on.
+
+        Args:
+            text: The free text, e.g. `coltrane "giant steps"`.
+            limit: The maximum number of items to return.
+            fields: The fixed item fields to return.
+
+        Returns:
+            One record per match, best first, as returned by
+            `items_projected` with an additional `score` attribute.
+
+        Raises:
+            exceptions.QueryError: If the text or a field is invalid.
+            exceptions.BeetsWrapperError: If the index is disabled, not built
+                yet or cannot be searched.
+        """
+        fields = tuple(fields)
+        sql.projection(fields)
+        expression = fulltext.match_expression(text)
+        if not self.settings.fulltext_enabled:
+            raise exceptions.BeetsWrapperError(
+                "The full-text index is disabled. Set SMARTPLAYLIST_FULLTEXT_ENABLED "
+                "and sync the library to build it."
+            )
+        try:
+            with self.read_connection() as conn:
+                if not fulltext.is_installed(conn):
+                    raise exceptions.BeetsWrapperError(
+                        "The full-text index is not built yet. Sync the library "
+                        "to build it."
+                    )
+                matches = fulltext.search(conn, expression, limit)
+            scores = dict(matches)
+            projected = tuple(dict.fromkeys(("id", *fields)))
+            positions = [projected.index(f) for f in fields]
+            record = models.record_type((*fields, "score"))
+            return [
+                record._make((*(r[i] for i in positions), scores[r[0]]))
+                for r in self._records_by_id(scores, projected)
+            ]
+        except exceptions.BeetsWrapperError:
+            raise
+        except Exception as e:
+            raise exceptions.BeetsWrapperError(
+                f"Failed to search the library for '{text}': {e}"
+            ) from e
+
+    @metrics.instrument("library")
+    def similar_tracks(
+        self,
+        item_id: int,
+        k: int = 10,
+        fields: Sequence[str] = ("id", "title", "artist", "album", "path"),
+    ) -> list[tuple]:
+        """Finds the items most similar to an item.
+
+        Items are compared by their genre, year, bpm, length, bitrate and
+        initial key, see `similarity.SimilarityIndex`. The feature vectors are
+        rebuilt after each sync or import, or on first use after another
+        process changed the library, and persisted next to the database.
+
+        Args:
+            item_id: The id of the item.
+            k: The number of similar items to return.
+            fields: The fixed item fields to return.
+
+        Returns:
+            One record per similar item, nearest first, as returned by
+            `items_projected` with an additional `distance` attribute. The
+            item itself is left out.
+
+        Raises:
+            exceptions.QueryError: If a field is invalid or no item has this id.
+            exceptions.BeetsWrapperError: If the index cannot be searched.
+        """
+        fields = tuple(fields)
+        sql.projection(fields)
+        try:
+            neighbours = self._current_similarity_index().nearest(item_id, k)
+            distances = dict(neighbours)
+            projected = tuple(dict.fromkeys(("id", *fields)))
+            positions = [projected.index(f) for f in fields]
+            record = models.record_type((*fields, "distance"))
+            return [
+                record._make((*(r[i] for i in positions), round(distances[r[0]], 4)))
+                for r in self._records_by_id(distances, projected)
+            ]
+        except exceptions.BeetsWrapperError:
+            raise
+        except Exception as e:
+            raise exceptions.BeetsWrapperError(
+                f"Failed to find tracks similar to track {item_id}: {e}"
+            ) from e
+
+    @metrics.instrument("library")
     def albums(self, query: Optional[str] = None) -> list[models.Album]:
         """Fetches a list of albums from the library matching a query.
 
@@ -137,63 +1141,782 @@ class Library:
                 f"Failed to query albums with '{query}': {e}"
             ) from e
 
-    def create_playlist(self, query: str, path: str):
+    def playlist_format(
+        self, path: str, name: Optional[str] = None
+    ) -> formats.PlaylistFormat:
+        """Returns the format a playlist file is written in.
+
+        Args:
+            path: The path to the playlist file, or its extension.
+            name: The name of the format, e.g. `extm3u`. Defaults to the
+                `playlist_format` setting, or to the format registered for
+                the file extension.
+
+        Returns:
+            The playlist format.
+
+        Raises:
+            exceptions.QueryError: If the format is unknown.
+        """
+        name = name or self.settings.playlist_format
+        if name:
+            return formats.get_format(name)
+        return formats.format_for_extension(os.path.splitext(path)[1] or path)
+
+    @metrics.instrument("library")
+    def create_playlist(
+        self,
+        query: str,
+        path: str,
+        playlist_format: Optional[str] = None,
+        order: Optional[str] = None,
+    ) -> models.PlaylistExport:
         """Creates a playlist file from a query, with optional path rewriting.
 
+        The query is executed once. When beets can evaluate it in SQL, only the
+        `path` column and the fields rendered by the playlist format are read
+        and streamed to the file, so memory use does not depend on the size of
+        the playlist. The file is replaced atomically. Entries of playlists
+        that fit in the query cache are cached until the library changes.
+
         Args:
             query: The beets query to use to generate the playlist.
             path: The path to the playlist file.
+            playlist_format: The name of the playlist format, e.g. `extm3u`.
+                Defaults to the format of the file extension, see
+                `playlist_format`.
+            order: `smooth` to sequence the tracks for smooth transitions in
+                tempo, key and year without repeating artists, see
+                `ordering.sequence`. The tracks are then held in memory.
+                Defaults to the order of the query.
+
+        Returns:
+            The number of tracks and bytes written.
 
         Raises:
+            exceptions.QueryError: If the playlist format or order is unknown.
             exceptions.BeetsWrapperError: If the playlist creation fails.
         """
+        fmt = self.playlist_format(path, playlist_format)
+        if order is not None:
+            ordering.check_order(order)
         try:
-            items = self.lib.items(query)
-            rewrite_from = self.settings.music_library_path_from
-            rewrite_to = self.settings.music_library_path_to
-            with open(path, "w") as f:
-                for item in items:
-                    item_path = item.path.decode("utf-8")
-                    if rewrite_from and rewrite_to:
-                        item_path = item_path.replace(
-                            str(rewrite_from), str(rewrite_to)
-                        )
-                    f.write(f"{item_path}\n")
+            revision = self._cache_revision()
+            cache_key = (
+                "playlist_entries",
+                cache.normalize_query(query),
+                fmt.name,
+                order,
+            )
+            entries = self.cache.get(cache_key, revision)
+            if entries is not None:
+                return export.write_playlist(path, entries, fmt)
+
+            recorder = cache.Recorder(self.cache.max_entry_bytes if revision else 0)
+            result = self._stream_playlist(query, path, fmt, recorder, order)
+            if recorder.values is not None:
+                self.cache.put(
+                    cache_key, revision, tuple(recorder.values), recorder.size
+                )
+            return result
         except Exception as e:
             raise exceptions.BeetsWrapperError(f"Failed to create playlist: {e}") from e
 
-    def get_statistics(self) -> models.Statistics:
+    def _stream_playlist(
+        self,
+        query: str,
+        path: str,
+        fmt: formats.PlaylistFormat,
+        recorder: cache.Recorder,
+        order: Optional[str] = None,
+    ) -> models.PlaylistExport:
+        """Runs a playlist query and streams its entries to a file.
+
+        Args:
+            query: The beets query to use to generate the playlist.
+            path: The path to the playlist file.
+            fmt: The playlist format.
+            recorder: Records the entries for the query cache.
+            order: The order to sequence the entries in, or None for the
+                order of the query.
+
+        Returns:
+            The number of tracks and bytes written.
+        """
+        fields = fmt.fields
+        if order is not None:
+            fields = (*fields, *ordering.ORDER_FIELDS)
+
+        def sequenced(entries: Iterator[tuple]) -> Iterable[tuple]:
+            return entries if order is None else ordering.ordered(entries, order)
+
+        compiled = sql.compile_query(query)
+        order_by = sql.order_clause(compiled)
+        if compiled.is_fast and order_by is not None:
+            try:
+                expressions, params = sql.projection(fields)
+                with self.read_connection() as conn:
+                    cursor = conn.execute(
+                        *sql.select_items(
+                            compiled,
+                            ["path", *expressions],
+                            order_by=order_by,
+                            column_params=params,
+                        )
+                    )
+                    if order is None:
+                        streamed = self._playlist_rows(cursor)
+                        return export.write_playlist(
+                            path, recorder.record(streamed), fmt
+                        )
+                    # Sequencing needs every row, so the connection goes back
+                    # to the pool before the tracks are ordered.
+                    rows = cursor.fetchall()
+                entries = sequenced(self._playlist_rows(rows))
+                return export.write_playlist(path, recorder.record(entries), fmt)
+            except exceptions.PoolTimeoutError:
+                raise
+            except (sqlite3.Error, exceptions.BeetsWrapperError):
+                recorder.reset()
+        items = self.lib.items(query)
+        entries = self._playlist_rows(
+            (item.path, *(item.get(f) for f in fields)) for item in items
+        )
+        return export.write_playlist(path, recorder.record(sequenced(entries)), fmt)
+
+    def _playlist_rows(self, rows: Iterable[Sequence]) -> Iterator[tuple]:
+        """Decodes item paths and applies the configured path rewriting.
+
+        Args:
+            rows: The raw item path, as stored by beets, followed by the
+                values of the fields of the playlist format.
+
+        Yields:
+            The playlist location of each item followed by the field values.
+        """
+        rewrite_from = self.settings.music_library_path_from
+        rewrite_to = self.settings.music_library_path_to
+        for item_path, *values in rows:
+            entry = item_path.decode("utf-8")
+            if rewrite_from and rewrite_to:
+                entry = entry.replace(str(rewrite_from), str(rewrite_to))
+            yield entry, *values
+
+    @metrics.instrument("library")
+    def build_playlist(
+        self,
+        query: str,
+        path: str,
+        max_length: Optional[float] = None,
+        max_size: Optional[int] = None,
+        max_per_artist: Optional[int] = None,
+        playlist_format: Optional[str] = None,
+        order: Optional[str] = None,
+    ) -> models.PlaylistSelection:
+        """Creates a playlist filling a total length and/or file size.
+
+        Among the tracks matching the query, at most `max_per_artist` of each
+        artist are kept, in query order, and the subset coming closest to the
+        budgets without exceeding them is written, see `selection.select`.
+        Only the length, bitrate, artist, path and the fields rendered by the
+        playlist format are read. With a size budget, sizes are estimated
+        from the bitrate and length, and only the files of the tracks
+        selected with these estimates are stat'ed, see
+        `selection.select_measured`.
+
+        Args:
+            query: The beets query selecting the candidate tracks.
+            path: The path to the playlist file.
+            max_length: The largest total length, in seconds.
+            max_size: The largest total file size, in bytes.
+            max_per_artist: The largest number of tracks of one artist.
+            playlist_format: The name of the playlist format, e.g. `extm3u`.
+                Defaults to the format of the file extension, see
+                `playlist_format`.
+            order: `smooth` to sequence the selected tracks, see
+                `create_playlist`. Defaults to the order of the query.
+
+        Returns:
+            The number of tracks and bytes written, and the total length and
+            size of the selected tracks.
+
+        Raises:
+            exceptions.QueryError: If no budget is given, if a limit is not
+                positive, or if the playlist format or order is unknown.
+            exceptions.BeetsWrapperError: If the playlist creation fails.
+        """
+        if max_length is None and max_size is None:
+            raise exceptions.QueryError("A total length or size must be given.")
+        if any(v is not None and v <= 0 for v in (max_length, max_size)):
+            raise exceptions.QueryError("The total length and size must be positive.")
+        if max_per_artist is not None and max_per_artist < 1:
+            raise exceptions.QueryError("The limit per artist must be at least 1.")
+        fmt = self.playlist_format(path, playlist_format)
+        if order is not None:
+            ordering.check_order(order)
+        entry_fields = fmt.fields
+        if order is not None:
+            entry_fields = (*entry_fields, *ordering.ORDER_FIELDS)
+        fields = ("path", "length", "bitrate", "artist", *entry_fields)
+        fields = tuple(dict.fromkeys(fields))
+        positions = [fields.index(f) for f in entry_fields]
+        path_at, length_at, bitrate_at, artist_at = range(4)
+        records = self.items_projected(query, fields)
+        try:
+            if max_per_artist is not None:
+                kept = selection.limit_per_artist(
+                    [r[artist_at] for r in records], max_per_artist
+                )
+                records = [records[i] for i in kept.tolist()]
+            lengths = np.array([r[length_at] or 0.0 for r in records], np.float64)
+
+            def file_sizes(indexes: Iterable[int]) -> list[int]:
+                return [
+                    selection.file_size(r[path_at], r[bitrate_at], r[length_at])
+                    for r in map(records.__getitem__, indexes)
+                ]
+
+            if max_size is not None:
+                bitrates = np.array([r[bitrate_at] or 0 for r in records], np.int64)
+                selected, sizes = selection.select_measured(
+                    lengths,
+                    selection.estimate_sizes(bitrates, lengths),
+                    file_sizes,
+                    max_length,
+                    max_size,
+                )
+            else:
+                sizes = np.zeros(len(records), np.int64)
+                selected = selection.select(lengths, sizes, max_length)
+                # Without a size budget, only the selected files are stat'ed.
+                sizes[selected] = file_sizes(selected.tolist())
+            entries = self._playlist_rows(
+                (records[i][0], *(records[i][p] for p in positions))
+                for i in selected.tolist()
+            )
+            if order is not None:
+                entries = ordering.ordered(entries, order)
+            result = export.write_playlist(path, entries, fmt)
+            return models.PlaylistSelection(
+                path=result.path,
+                track_count=result.track_count,
+                bytes_written=result.bytes_written,
+                total_length=float(lengths[selected].sum()),
+                total_size=int(sizes[selected].sum()),
+                candidates=len(records),
+            )
+        except Exception as e:
+            raise exceptions.BeetsWrapperError(f"Failed to build playlist: {e}") from e
+
+    @metrics.instrument("library")
+    def create_playlists_by_field(
+        self,
+        directory: str,
+        extension: str,
+        field: Optional[str] = None,
+        queries: Optional[Mapping[str, str]] = None,
+        query: Optional[str] = None,
+        prefix: str = "",
+        playlist_format: Optional[str] = None,
+    ) -> list[models.PlaylistExport]:
+        """Creates many playlists from a single scan of the library.
+
+        The matching tracks are partitioned either by the value of a field,
+        with one playlist per value, or by a set of named queries, with one
+        playlist per query. A track can belong to several query playlists.
+        Every playlist is written while the library is read once, with a
+        bounded number of open files, and all of them are renamed into place
+        at the end. Playlists whose names map to the same file name get a
+        numbered suffix, e.g. `AC_DC (2).m3u8`.
+
+        Args:
+            directory: The directory to write the playlists to.
+            extension: The playlist file extension, e.g. `m3u8`.
+            field: One of `genre`, `artist`, `albumartist`, `year`, `decade`
+                or `format`. Tracks without a value are skipped.
+            queries: The beets query of each playlist, keyed by playlist name.
+            query: A beets query restricting the tracks considered.
+            prefix: A prefix for the playlist file names.
+            playlist_format: The name of the playlist format, e.g. `extm3u`.
+                Defaults to the format of the extension, see
+                `playlist_format`.
+
+        Returns:
+            The track count and size of each playlist. Query playlists come
+            first in the order given, field playlists in order of appearance.
+
+        Raises:
+            exceptions.QueryError: If the field or format is unsupported, if
+                both or neither of `field` and `queries` are given, or if a
+                query is invalid.
+            exceptions.BeetsWrapperError: If the playlist creation fails.
+        """
+        if (field is None) == (not queries):
+            raise exceptions.QueryError(
+                "Exactly one of a field or a set of queries must be given."
+            )
+        if field is not None and field not in FACET_EXPRESSIONS:
+            raise exceptions.QueryError(
+                f"Unsupported playlist field '{field}'. "
+                f"Expected one of: {', '.join(FACET_FIELDS)}"
+            )
+
+        paths: dict[str, str] = {}
+        taken: set[str] = set()
+
+        def playlist_path(name: str) -> str:
+            path = paths.get(name)
+            if path is not None:
+                return path
+            # Names differing only by unsafe characters or case would share a
+            # file, on case-insensitive file systems for the latter.
+            filename = export.safe_filename(f"{prefix}{name}")
+            path = os.path.join(directory, f"{filename}.{extension}")
+            copy = 1
+            while path.casefold() in taken:
+                copy += 1
+                path = os.path.join(directory, f"{filename} ({copy}).{extension}")
+            taken.add(path.casefold())
+            paths[name] = path
+            return path
+
+        fmt = self.playlist_format(extension, playlist_format)
+        base = sql.compile_query(query)
+        named = [(name, sql.compile_query(q)) for name, q in (queries or {}).items()]
+        try:
+            with export.PlaylistSetWriter(playlist_format=fmt) as writer:
+                for name, _ in named:
+                    writer.add(playlist_path(name))
+                partitions = self._partition_items(base, field, named, fmt.fields)
+                for names, row in partitions:
+                    (entry,) = self._playlist_rows([row])
+                    for name in names:
+                        writer.write(playlist_path(name), entry)
+                return writer.commit()
+        except Exception as e:
+            raise exceptions.BeetsWrapperError(
+                f"Failed to create playlists: {e}"
+            ) from e
+
+    def _partition_items(
+        self,
+        base: sql.CompiledQuery,
+        field: Optional[str],
+        named: list[tuple[str, sql.CompiledQuery]],
+        fields: Sequence[str] = (),
+    ) -> Iterator[tuple[list[str], tuple]]:
+        """Scans the library once and assigns each track to its playlists.
+
+        Args:
+            base: The query restricting the tracks considered.
+            field: The field to partition by, if partitioning by value.
+            named: The named queries to partition by otherwise.
+            fields: The item fields to read with each path.
+
+        Yields:
+            The names of the playlists each track belongs to, with its path
+            followed by the values of `fields`, in the order beets would list
+            the tracks.
+        """
+        order_by = sql.order_clause(base)
+        if base.is_fast and order_by and all(c.is_fast for _, c in named):
+            started = False
+            try:
+                with self.read_connection() as conn:
+                    if field is not None:
+                        columns = [FACET_EXPRESSIONS[field]]
+                        params: list = []
+                    else:
+                        columns = [c.where for _, c in named if c.where is not None]
+                        params = [v for _, c in named for v in c.subvals]
+                    expressions, projected = sql.projection(fields)
+                    rows = conn.execute(
+                        *sql.select_items(
+                            base,
+                            [*columns, "path", *expressions],
+                            order_by=order_by,
+                            column_params=[*params, *projected],
+                        )
+                    )
+                    split = len(columns)
+                    for row in rows:
+                        started = True
+                        flags = row[:split]
+                        if field is not None:
+                            names = [] if flags[0] is None else [str(flags[0])]
+                        else:
+                            names = [n for (n, _), f in zip(named, flags) if f]
+                        if names:
+                            yield names, row[split:]
+                return
+            except exceptions.PoolTimeoutError:
+                raise
+            except (sqlite3.Error, exceptions.BeetsWrapperError):
+                if started:
+                    raise
+
+        for item in self.lib.items(base.query):
+            if field is not None:
+                if field == "decade":
+                    value = (item.get("year") or 0) // 10 * 10
+                else:
+                    value = item.get(field)
+                names = [str(value)] if value else []
+            else:
+                names = [n for n, c in named if c.beets_query.match(item)]
+            if names:
+                yield names, (item.path, *(item.get(f) for f in fields))
+
+    @metrics.instrument("library")
+    def save_playlist(
+        self,
+        name: str,
+        query: str,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> models.PlaylistDefinition:
+        """Saves a smart playlist definition, replacing any with the same name.
+
+        The playlist file is written by the next `refresh_playlists`.
+
+        Args:
+            name: The name of the playlist, which also names its file.
+            query: The beets query selecting the tracks.
+            sort: A sort term such as `year`, `year+` or `year-`. Defaults to
+                the sort in the query, or to the item id.
+            limit: The maximum number of tracks.
+
+        Returns:
+            The saved definition.
+
+        Raises:
+            exceptions.QueryError: If the name, query, sort or limit is invalid,
+                or another saved playlist would be written to the same file.
+            exceptions.BeetsWrapperError: If the definition cannot be saved.
+        """
+        if not name.strip():
+            raise exceptions.QueryError("A saved playlist needs a name.")
+        if limit is not None and limit < 1:
+            raise exceptions.QueryError(f"Invalid playlist limit: {limit}")
+        sql.sort_spec(sql.compile_query(query), sort)
+        definition = models.PlaylistDefinition(
+            name=name, query=query, sort=sort, limit=limit
+        )
+        filename = export.safe_filename(name)
+        registry = self.playlist_registry
+        try:
+            with registry.lock:
+                for other in registry.definitions():
+                    if (
+                        other.name != name
+                        and export.safe_filename(other.name) == filename
+                    ):
+                        raise exceptions.QueryError(
+                            f"Playlist '{name}' would overwrite the file of "
+                            f"saved playlist '{other.name}'."
+                        )
+                registry.put(definition)
+        except exceptions.QueryError:
+            raise
+        except Exception as e:
+            raise exceptions.BeetsWrapperError(
+                f"Failed to save playlist '{name}': {e}"
+            ) from e
+        return definition
+
+    def saved_playlists(self) -> list[models.PlaylistDefinition]:
+        """Returns the saved smart playlist definitions, ordered by name.
+
+        Raises:
+            exceptions.BeetsWrapperError: If the registry cannot be read.
+        """
+        try:
+            return self.playlist_registry.definitions()
+        except Exception as e:
+            raise exceptions.BeetsWrapperError(
+                f"Failed to read the saved playlists: {e}"
+            ) from e
+
+    @metrics.instrument("library")
+    def delete_saved_playlist(self, name: str) -> bool:
+        """Removes a saved smart playlist definition.
+
+        The playlist file, if any, is left in place.
+
+        Args:
+            name: The name of the playlist.
+
+        Returns:
+            True if the definition existed.
+
+        Raises:
+            exceptions.BeetsWrapperError: If the registry cannot be written.
+        """
+        try:
+            return self.playlist_registry.remove(name)
+        except Exception as e:
+            raise exceptions.BeetsWrapperError(
+                f"Failed to delete playlist '{name}': {e}"
+            ) from e
+
+    @metrics.instrument("library")
+    def refresh_playlists(
+        self,
+        extension: str,
+        names: Optional[Iterable[str]] = None,
+        force: bool = False,
+    ) -> list[models.PlaylistRefresh]:
+        """Rewrites the saved playlists whose tracks changed.
+
+        A playlist is skipped without running its query while the database
+        revision, the playlist format and the path rewriting settings are the
+        ones it was last refreshed with. Otherwise the ids and
+        modification times of its tracks are read, and the file is only
+        rewritten if their digest differs from the one recorded at the last
+        refresh, or if the file is missing.
+
+        Args:
+            extension: The playlist file extension, e.g. `m3u8`.
+            names: The playlists to refresh. Defaults to every saved playlist.
+            force: Whether to rewrite every playlist, changed or not.
+
+        Returns:
+            The result of each refresh, ordered by playlist name.
+
+        Raises:
+            exceptions.QueryError: If a name is not a saved playlist, or a
+                saved query is no longer valid.
+            exceptions.BeetsWrapperError: If a playlist cannot be written.
+        """
+        registry = self.playlist_registry
+        with registry.lock:
+            saved = self.saved_playlists()
+            if names is not None:
+                wanted = set(names)
+                unknown = wanted - {d.name for d in saved}
+                if unknown:
+                    raise exceptions.QueryError(
+                        f"Unknown saved playlists: {', '.join(sorted(unknown))}"
+                    )
+                saved = [d for d in saved if d.name in wanted]
+            if not saved:
+                return []
+            fmt = self.playlist_format(extension)
+            try:
+                revision: Optional[str] = definitions.refresh_revision(
+                    self.revision(),
+                    fmt.name,
+                    self.settings.music_library_path_from,
+                    self.settings.music_library_path_to,
+                )
+            except exceptions.BeetsWrapperError:
+                revision = None
+            os.makedirs(self.playlist_dir, exist_ok=True)
+            results = []
+            updated = []
+            try:
+                for definition in saved:
+                    result, state = self._refresh_playlist(
+                        definition, extension, fmt, revision, force
+                    )
+                    results.append(result)
+                    if state != definition:
+                        updated.append(state)
+            except BaseException:
+                # Record the playlists refreshed so far, so the next refresh
+                # does not rewrite them again, without hiding the failure.
+                if updated:
+                    try:
+                        registry.put(*updated)
+                    except OSError as e:
+                        logger.warning(f"Failed to save the playlist registry: {e}")
+                raise
+            if updated:
+                try:
+                    registry.put(*updated)
+                except OSError as e:
+                    raise exceptions.BeetsWrapperError(
+                        f"Failed to save the playlist registry: {e}"
+                    ) from e
+            return results
+
+    def _refresh_playlist(
+        self,
+        definition: models.PlaylistDefinition,
+        extension: str,
+        fmt: formats.PlaylistFormat,
+        revision: Optional[str],
+        force: bool,
+    ) -> tuple[models.PlaylistRefresh, models.PlaylistDefinition]:
+        """Rewrites one saved playlist if its tracks changed.
+
+        Args:
+            definition: The saved definition with the state of its last
+                refresh.
+            extension: The playlist file extension.
+            fmt: The playlist format.
+            revision: The current revision of the database and the output
+                settings, if it could be read.
+            force: Whether to rewrite the playlist even if it is unchanged.
+
+        Returns:
+            The result of the refresh and the definition with its new state.
+        """
+        filename = export.safe_filename(definition.name)
+        path = os.path.join(self.playlist_dir, f"{filename}.{extension}")
+        current = (
+            not force
+            and definition.path == path
+            and definition.digest is not None
+            and os.path.exists(path)
+        )
+        if current and revision is not None and definition.revision == revision:
+            result = models.PlaylistRefresh(
+                definition.name, path, definition.track_count, changed=False
+            )
+            return result, definition
+
+        fields = ("path", *fmt.fields)
+        projected = tuple(dict.fromkeys(("id", "mtime", *fields)))
+        records = self.items_projected(definition.query, projected, definition.sort)
+        if definition.limit is not None:
+            records = records[: definition.limit]
+        digest = definitions.result_digest(
+            definition,
+            (r[:2] for r in records),
+            fmt.name,
+            self.settings.music_library_path_from,
+            self.settings.music_library_path_to,
+        )
+        changed = not current or digest != definition.digest
+        bytes_written = 0
+        if changed:
+            positions = [projected.index(f) for f in fields]
+            rows = (tuple(r[i] for i in positions) for r in records)
+            try:
+                written = export.write_playlist(path, self._playlist_rows(rows), fmt)
+                bytes_written = written.bytes_written
+            except Exception as e:
+                raise exceptions.BeetsWrapperError(
+                    f"Failed to write playlist '{definition.name}': {e}"
+                ) from e
+        state = dataclasses.replace(
+            definition,
+            path=path,
+            digest=digest,
+            revision=revision,
+            track_count=len(records),
+        )
+        result = models.PlaylistRefresh(
+            definition.name, path, len(records), changed, bytes_written
+        )
+        return result, state
+
+    @metrics.instrument("library")
+    def get_statistics(self, include_size: bool = True) -> models.Statistics:
         """Returns high-level statistics for the library.
 
+        The totals are computed from the snapshot when it is enabled, or with
+        a single aggregate query against the database, cached until the
+        library changes. If that query cannot run, the statistics are
+        computed by iterating over the library items instead.
+
+        Args:
+            include_size: Whether to compute the total file size, which
+                requires a `stat` of every file in the library.
+
         Returns:
             An object containing library statistics.
 
         Raises:
             exceptions.BeetsWrapperError: If fetching statistics fails.
         """
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            stats = snapshot.statistics()
+            if include_size:
+                with self.read_connection() as conn:
+                    stats.total_size = aggregates.total_file_size(conn)
+            return stats
+        revision = self._cache_revision()
+        cache_key = ("statistics", include_size)
+        cached = self.cache.get(cache_key, revision)
+        if cached is not None:
+            return dataclasses.replace(cached)
         try:
-            total_tracks = len(self.lib.items())
-            total_albums = len(self.lib.albums())
-            total_artists = len(set(i.artist for i in self.lib.items()))
-            total_size = sum(i.filesize for i in self.lib.items())
-            return models.Statistics(
-                total_tracks=total_tracks,
-                total_albums=total_albums,
-                total_artists=total_artists,
-                total_size=total_size,
+            with self.read_connection() as conn:
+                stats = aggregates.library_totals(conn)
+                if include_size:
+                    stats.total_size = aggregates.total_file_size(conn)
+            self.cache.put(cache_key, revision, dataclasses.replace(stats))
+            return stats
+        except exceptions.PoolTimeoutError:
+            raise
+        except (sqlite3.Error, exceptions.BeetsWrapperError) as e:
+            logger.warning(
+                f"Could not aggregate statistics, counting items instead: {e}"
             )
+
+        try:
+            return self._get_statistics_from_items(include_size)
         except Exception as e:
             raise exceptions.BeetsWrapperError(f"Failed to get statistics: {e}") from e
 
+    def _get_statistics_from_items(self, include_size: bool) -> models.Statistics:
+        """Computes library statistics in a single pass over the beets items.
+
+        Args:
+            include_size: Whether to compute the total file size.
+
+        Returns:
+            An object containing library statistics.
+        """
+        total_tracks = 0
+        total_size = 0
+        total_duration = 0.0
+        artists = set()
+        genres = set()
+        for item in self.lib.items():
+            total_tracks += 1
+            if item.artist:
+                artists.add(item.artist)
+            if item.genre:
+                genres.add(item.genre)
+            total_duration += item.length or 0.0
+            if include_size:
+                total_size += item.filesize
+        return models.Statistics(
+            total_tracks=total_tracks,
+            total_albums=len(self.lib.albums()),
+            total_artists=len(artists),
+            total_size=total_size,
+            total_duration=total_duration,
+            total_genres=len(genres),
+        )
+
+    @metrics.instrument("library")
     def list_genres(self) -> list[models.Genre]:
         """Returns a list of all genres in the library with their track counts.
 
+        The counts are served from the facet index. If it is unavailable, the
+        genres are counted by iterating over the library items instead.
+
         Returns:
             A list of Genre objects.
 
         Raises:
             exceptions.BeetsWrapperError: If listing genres fails.
         """
+        try:
+            return [
+                models.Genre(name=v.value, count=v.count)
+                for v in self._current_facet_index().values("genre")
+            ]
+        except exceptions.PoolTimeoutError:
+            raise
+        except (sqlite3.Error, exceptions.BeetsWrapperError):
+            pass
+
         try:
             all_items = self.lib.items()
             genre_counts: Dict[str, int] = {}
@@ -234,27 +1957,110 @@ class Library:
                 f"Failed to check for beets database: {e}"
             ) from e
 
-    def list_playlists(self, playlist_extension: str) -> list[models.Playlist]:
-        """Returns a list of all found playlist files.
+    @metrics.instrument("library")
+    def list_playlists(
+        self, playlist_extension: str, track_counts: bool = True
+    ) -> list[models.Playlist]:
+        """Returns the playlist files in the playlist directory.
+
+        The directory is listed with `os.scandir`, and the names in the
+        listing are reused while the modification time of the directory is
+        unchanged. Each file is stat'ed on every call. Track counts are read
+        from the files on first request and cached until the size or
+        modification time of the file changes.
 
         Args:
             playlist_extension: The file extension for playlists (e.g., "m3u8").
+            track_counts: Whether to count the tracks of each playlist.
 
         Returns:
-            A list of Playlist objects.
+            A list of Playlist objects, ordered by name, with the query of the
+            saved playlists.
 
         Raises:
             exceptions.BeetsWrapperError: If listing playlists fails.
         """
         try:
-            playlist_dir = config["smartplaylist"]["playlist_dir"].get(str)
-            if not os.path.isdir(playlist_dir):
-                return []
-
+            playlist_dir = self.playlist_dir
+            names = self._scan_playlist_dir(playlist_dir)
+            queries = {d.path: d.query for d in self.saved_playlists() if d.path}
             playlists = []
-            for filename in os.listdir(playlist_dir):
-                if filename.endswith(playlist_extension):
-                    playlists.append(models.Playlist(name=filename))
+            for name in names:
+                if not name.endswith(playlist_extension):
+                    continue
+                path = os.path.join(playlist_dir, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                playlist = models.Playlist(
+                    name=name,
+                    path=path,
+                    size=st.st_size,
+                    mtime=st.st_mtime,
+                    query=queries.get(path),
+                )
+                if track_counts:
+                    playlist.track_count = self._track_count(path, st)
+                playlists.append(playlist)
             return playlists
         except Exception as e:
             raise exceptions.BeetsWrapperError(f"Failed to list playlists: {e}") from e
+
+    def _scan_playlist_dir(self, playlist_dir: str) -> list[str]:
+        """Lists the files of the playlist directory, reusing the last listing.
+
+        Args:
+            playlist_dir: The playlist directory.
+
+        Returns:
+            The names of the files, in order. Empty if the directory does not
+            exist.
+        """
+        try:
+            mtime_ns = os.stat(playlist_dir).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+        with self._playlist_lock:
+            listing = self._playlist_listing
+        if listing is not None and listing[:2] == (playlist_dir, mtime_ns):
+            return listing[2]
+
+        scanned_at = time.time_ns()
+        with os.scandir(playlist_dir) as it:
+            names = sorted(
+                e.name for e in it if e.is_file() and not e.name.startswith(".")
+            )
+        paths = {os.path.join(playlist_dir, name) for name in names}
+        with self._playlist_lock:
+            if scanned_at - mtime_ns > _LISTING_SETTLE_NS:
+                self._playlist_listing = (playlist_dir, mtime_ns, names)
+            self._track_counts = {
+                path: count
+                for path, count in self._track_counts.items()
+                if path in paths
+            }
+        return names
+
+    def _track_count(self, path: str, st: os.stat_result) -> int:
+        """Counts the tracks of a playlist file, caching the count.
+
+        Args:
+            path: The path to the playlist file.
+            st: The `stat` result of the file.
+
+        Returns:
+            The number of tracks, according to the format of the file
+            extension.
+        """
+        signature = (st.st_mtime_ns, st.st_size)
+        with self._playlist_lock:
+            cached = self._track_counts.get(path)
+        if cached is not None and cached[:2] == signature:
+            return cached[2]
+        fmt = formats.format_for_extension(os.path.splitext(path)[1])
+        with open(path, "rb") as f:
+            count = fmt.count_entries(f)
+        with self._playlist_lock:
+            self._track_counts[path] = (*signature, count)
+        return count
@@ -0,0 +1,163 @@
+"""Process-wide management of the beets library handle.
+
+This module provides a `LibraryManager` that keeps a single `Library` open for
+the lifetime of a process, such as the MCP server, and only reopens it when
+the beets configuration file or the application settings change.
+"""
+
+import contextlib
+import logging
+import os
+import threading
+from typing import Iterator, Optional
+
+from smartplaylist.settings import Settings
+from . import models
+from .library import Library
+
+logger = logging.getLogger(__name__)
+
+
+def _config_signature(config_path: str) -> Optional[tuple[int, int]]:
+    """Returns a cheap fingerprint of a configuration file.
+
+    Args:
+        config_path: Path to the beets configuration file.
+
+    Returns:
+        The modification time and size of the file, or None if it is missing.
+    """
+    try:
+        st = os.stat(config_path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class LibraryManager:
+    """Owns a long-lived `Library` shared by every caller in the process.
+
+    The library is opened on first use. Subsequent calls return the same
+    instance until the configuration file changes on disk or different
+    settings are supplied, in which case a new one is opened. Closing a beets
+    handle closes the database connections of every thread, so a replaced
+    handle is only closed once the last `lease` on it is released.
+    """
+
+    def __init__(self):
+        """Initializes an empty manager."""
+        self._lock = threading.Lock()
+        self._library: Optional[Library] = None
+        self._settings: Optional[Settings] = None
+        self._signature: Optional[tuple[int, int]] = None
+        self._reloads = 0
+        self._leases: dict[Library, int] = {}
+
+    def get(self, settings: Settings) -> Library:
+        """Returns the shared library, opening or reloading it if needed.
+
+        The library may be closed by a later reload; callers using it for
+        more than a quick read should hold a `lease` instead.
+
+        Args:
+            settings: The application settings.
+
+        Returns:
+            The shared Library instance.
+
+        Raises:
+            exceptions.BeetsWrapperError: If the library cannot be initialized.
+        """
+        with self._lock:
+            return self._current(settings)
+
+    @contextlib.contextmanager
+    def lease(self, settings: Settings) -> Iterator[Library]:
+        """Holds the shared library open for the duration of a block.
+
+        Args:
+            settings: The application settings.
+
+        Yields:
+            The shared Library instance, opened or reloaded if needed. It is
+            not closed before the block exits, even if it is replaced.
+
+        Raises:
+            exceptions.BeetsWrapperError: If the library cannot be initialized.
+        """
+        with self._lock:
+            library = self._current(settings)
+            self._leases[library] = self._leases.get(library, 0) + 1
+        try:
+            yield library
+        finally:
+            self._release(library)
+
+    def _current(self, settings: Settings) -> Library:
+        """Returns the shared library, reloading it if needed. Holds the lock."""
+        config_path = str(settings.beets_config_path)
+        signature = _config_signature(config_path)
+        current = self._library
+        if (
+            current is not None
+            and current.config_path == config_path
+            and self._settings == settings
+            and self._signature == signature
+        ):
+            return current
+
+        library = Library(config_path, settings)
+        if current is not None:
+            logger.info(f"Reloading beets library from {config_path}")
+            self._retire(current)
+            self._reloads += 1
+        self._library = library
+        self._settings = settings
+        self._signature = signature
+        return library
+
+    def _retire(self, library: Library):
+        """Closes a replaced library now, or when its last lease is released."""
+        if library not in self._leases:
+            library.close()
+
+    def _release(self, library: Library):
+        """Releases a lease, closing the library if it was replaced meanwhile."""
+        with self._lock:
+            count = self._leases.pop(library) - 1
+            if count:
+                self._leases[library] = count
+                return
+            if library is self._library:
+                return
+        library.close()
+
+    @property
+    def current(self) -> Optional[Library]:
+        """The shared library if it has been opened, without opening it."""
+        return self._library
+
+    def close(self):
+        """Closes the shared library, once the leases on it are released."""
+        with self._lock:
+            if self._library is not None:
+                self._retire(self._library)
+            self._library = None
+            self._settings = None
+            self._signature = None
+
+    def stats(self) -> Optional[models.PoolStats]:
+        """Returns the connection pool statistics of the shared library.
+
+        Only the current state is read: the manager lock is not taken, so this
+        never waits for a library being opened, and no pool is created.
+
+        Returns:
+            The pool statistics, or None if no library has been opened yet.
+        """
+        library, reloads = self._library, self._reloads
+        if library is None:
+            return None
+        stats = library.pool_stats()
+        stats.reloads = reloads
+        return stats
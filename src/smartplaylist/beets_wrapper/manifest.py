@@ -0,0 +1,97 @@
+"""Scan manifest of the music directory.
+
+This module provides a `Manifest` recording the size, modification time and
+inode of every audio file seen by the last sync. It is persisted as a JSON
+file next to the beets database, so the next sync can tell which files are
+new, changed or deleted from a directory walk alone.
+"""
+
+import json
+import logging
+import os
+from typing import Optional
+
+from . import storage
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+
+MANIFEST_VERSION = 1
+
+FileSignature = tuple[int, int, int]
+"""The size, modification time in nanoseconds and inode of a file."""
+
+
+def file_signature(st: os.stat_result) -> FileSignature:
+    """Returns the signature of a file from its `stat` result.
+
+    Args:
+        st: The result of `os.stat` or `os.DirEntry.stat`.
+
+    Returns:
+        The size, modification time in nanoseconds and inode of the file.
+    """
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class Manifest:
+    """The file signatures recorded by the last sync.
+
+    Attributes:
+        path: Path to the JSON file the manifest is persisted to.
+        root: The music directory the manifest describes, or None if the
+            manifest is empty.
+        files: The signature of each file, keyed by path.
+    """
+
+    def __init__(self, path: str):
+        """Initializes an empty manifest.
+
+        Args:
+            path: Path to the JSON file the manifest is persisted to.
+        """
+        self.path = path
+        self.root: Optional[str] = None
+        self.files: dict[str, FileSignature] = {}
+
+    def load(self, root: str) -> bool:
+        """Loads the persisted manifest if it describes the given directory.
+
+        Args:
+            root: The music directory.
+
+        Returns:
+            True if the manifest was loaded, False if it is missing,
+            unreadable or was written for another directory.
+        """
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != MANIFEST_VERSION or data.get("root") != root:
+            return False
+        self.root = root
+        self.files = {
+            path: (size, mtime_ns, inode)
+            for path, (size, mtime_ns, inode) in data.get("files", {}).items()
+        }
+        return True
+
+    def save(self):
+        """Persists the manifest next to the database.
+
+        Failures are logged and ignored, so a read-only data directory only
+        costs a slower next sync.
+        """
+        data = {
+            "version": MANIFEST_VERSION,
+            "root": self.root,
+            "files": self.files,
+        }
+        try:
+            with storage.atomic_write(self.path) as f:
+                json.dump(data, f, separators=(",", ":"))
+        except OSError as e:
+            logger.warning(f"Could not persist scan manifest to {self.path}: {e}")
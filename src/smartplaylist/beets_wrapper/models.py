@@ -4,8 +4,10 @@ This module defines the data structures used to represent beets library objects
 such as items, albums, and statistics in a Pythonic way.
 """
 
+import collections
 import dataclasses
-from typing import List
+import functools
+from typing import Any, Dict, List, Optional, Sequence
 
 
 @dataclasses.dataclass
@@ -16,13 +18,18 @@ class Statistics:
         total_tracks: The total number of tracks in the library.
         total_albums: The total number of albums in the library.
         total_artists: The total number of unique artists in the library.
+            Tracks without an artist are not counted as one.
         total_size: The total size of the library in bytes.
+        total_duration: The total length of all tracks in seconds.
+        total_genres: The total number of unique genres in the library.
     """
 
     total_tracks: int
     total_albums: int
     total_artists: int
     total_size: int
+    total_duration: float = 0.0
+    total_genres: int = 0
 
 
 @dataclasses.dataclass
@@ -38,15 +45,190 @@ class Genre:
     count: int
 
 
+@dataclasses.dataclass
+class FacetValue:
+    """Represents one value of a facet field with its track count.
+
+    Attributes:
+        value: The field value, as a string.
+        count: The number of tracks with this value.
+    """
+
+    value: str
+    count: int
+
+
+@dataclasses.dataclass
+class NameMatch:
+    """Represents a field value resembling a name.
+
+    Attributes:
+        field: The field holding the value, e.g. `artist`.
+        value: The value, as stored in the library.
+        count: The number of tracks with this value.
+        score: The trigram similarity of the value and the name, from 0 to 1.
+    """
+
+    field: str
+    value: str
+    count: int
+    score: float
+
+
 @dataclasses.dataclass
 class Playlist:
     """Represents a playlist file.
 
     Attributes:
         name: The name of the playlist file.
+        path: The path to the playlist file.
+        size: The size of the file in bytes.
+        mtime: The modification time of the file, in seconds since the epoch.
+        track_count: The number of tracks in the playlist, if it was counted.
+        query: The beets query of the saved playlist the file was written
+            from, if any.
     """
 
     name: str
+    path: Optional[str] = None
+    size: int = 0
+    mtime: float = 0.0
+    track_count: Optional[int] = None
+    query: Optional[str] = None
+
+
+@dataclasses.dataclass
+class PlaylistExport:
+    """Represents the result of writing a playlist file.
+
+    Attributes:
+        path: The path to the playlist file.
+        track_count: The number of tracks written to the playlist.
+        bytes_written: The size of the playlist file in bytes.
+    """
+
+    path: str
+    track_count: int
+    bytes_written: int
+
+
+@dataclasses.dataclass
+class PlaylistSelection:
+    """Represents the result of writing a playlist filling a length or size.
+
+    Attributes:
+        path: The path to the playlist file.
+        track_count: The number of tracks written to the playlist.
+        bytes_written: The size of the playlist file in bytes.
+        total_length: The total length of the selected tracks, in seconds.
+        total_size: The total file size of the selected tracks, in bytes.
+        candidates: The number of tracks the selection was made from, after
+            the limit per artist.
+    """
+
+    path: str
+    track_count: int
+    bytes_written: int
+    total_length: float
+    total_size: int
+    candidates: int
+
+
+@dataclasses.dataclass
+class PlaylistDefinition:
+    """Represents a saved smart playlist and the state of its last refresh.
+
+    Attributes:
+        name: The name of the playlist, which also names its file.
+        query: The beets query selecting the tracks.
+        sort: A sort term such as `year`, `year+` or `year-`, or None for the
+            sort in the query, or the item id.
+        limit: The maximum number of tracks, or None for no limit.
+        path: The path the playlist was last written to.
+        digest: The digest of the tracks the playlist was last written from.
+        revision: The database revision, combined with the playlist format
+            and path rewriting settings, at the last refresh.
+        track_count: The number of tracks at the last refresh.
+    """
+
+    name: str
+    query: str
+    sort: Optional[str] = None
+    limit: Optional[int] = None
+    path: Optional[str] = None
+    digest: Optional[str] = None
+    revision: Optional[str] = None
+    track_count: int = 0
+
+
+@dataclasses.dataclass
+class PlaylistRefresh:
+    """Represents the result of refreshing a saved playlist.
+
+    Attributes:
+        name: The name of the playlist.
+        path: The path to the playlist file.
+        track_count: The number of tracks in the playlist.
+        changed: Whether the file was rewritten.
+        bytes_written: The size of the file written, or 0 if it was left as
+            it was.
+    """
+
+    name: str
+    path: str
+    track_count: int
+    changed: bool
+    bytes_written: int = 0
+
+
+@dataclasses.dataclass
+class PoolStats:
+    """Represents the state of the pooled library connections.
+
+    Attributes:
+        max_size: The maximum number of read connections in the pool.
+        open_connections: The number of read connections currently open.
+        idle_connections: The number of open connections not checked out.
+        in_use_connections: The number of connections currently checked out.
+        created: The total number of connections opened by the pool.
+        acquisitions: The total number of times a connection was checked out.
+        waits: The number of acquisitions that had to wait for a free connection.
+        reloads: The number of times the library was reopened after a
+            configuration change.
+    """
+
+    max_size: int
+    open_connections: int = 0
+    idle_connections: int = 0
+    in_use_connections: int = 0
+    created: int = 0
+    acquisitions: int = 0
+    waits: int = 0
+    reloads: int = 0
+
+
+@dataclasses.dataclass
+class CacheStats:
+    """Represents the state of the query result cache.
+
+    Attributes:
+        entries: The number of cached entries.
+        bytes: The estimated size of the cached values in bytes.
+        hits: The number of lookups answered from the cache.
+        misses: The number of lookups that were not cached.
+        evictions: The number of entries dropped because they were stale,
+            expired, or pushed out by the size limits.
+        max_entries: The maximum number of cached entries.
+        max_bytes: The maximum estimated size of the cached values.
+    """
+
+    entries: int
+    bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    max_entries: int
+    max_bytes: int
 
 
 class BeetsModel:
@@ -94,3 +276,114 @@ class Album(BeetsModel):
             A list of Item objects belonging to the album.
         """
         return [Item(item) for item in self._beets_item.items()]
+
+
+@dataclasses.dataclass
+class ItemPage:
+    """Represents one page of a paginated item query.
+
+    Attributes:
+        items: The items on this page.
+        total_count: The total number of items matching the query.
+        next_cursor: An opaque cursor to fetch the next page, or None if this
+            is the last page.
+    """
+
+    items: List[Item]
+    total_count: int
+    next_cursor: Optional[str] = None
+
+
+@dataclasses.dataclass
+class RecordPage:
+    """Represents one page of a paginated projection of item fields.
+
+    Attributes:
+        records: Records holding the requested fields of the items on this
+            page, see `record_type`.
+        total_count: The total number of items matching the query.
+        next_cursor: An opaque cursor to fetch the next page, or None if this
+            is the last page.
+    """
+
+    records: List[tuple]
+    total_count: int
+    next_cursor: Optional[str] = None
+
+
+@dataclasses.dataclass
+class ImportStats:
+    """Represents the outcome of an import.
+
+    Attributes:
+        files: The number of audio files found.
+        imported: The number of files added to the library.
+        skipped: The number of files that were already in the library.
+        failed: The number of files whose tags could not be read.
+        albums: The number of albums created.
+        elapsed: The duration of the import in seconds.
+    """
+
+    files: int = 0
+    imported: int = 0
+    skipped: int = 0
+    failed: int = 0
+    albums: int = 0
+    elapsed: float = 0.0
+
+
+@dataclasses.dataclass
+class SyncStats:
+    """Represents the outcome of an incremental library sync.
+
+    Attributes:
+        files: The number of audio files found in the music directory.
+        added: The number of new files added to the library.
+        changed: The number of changed files whose tags were read again.
+        removed: The number of deleted files removed from the library.
+        unchanged: The number of files that were left untouched.
+        failed: The number of files whose tags could not be read.
+        elapsed: The duration of the sync in seconds.
+    """
+
+    files: int = 0
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+
+@dataclasses.dataclass
+class SnapshotStats:
+    """Represents the state of the in-memory track snapshot.
+
+    Attributes:
+        revision: The database revision the snapshot was loaded from.
+        rows: The number of tracks in the snapshot.
+        total_bytes: The memory used by all columns, in bytes.
+        column_bytes: The memory used by each column, in bytes.
+    """
+
+    revision: str
+    rows: int
+    total_bytes: int
+    column_bytes: Dict[str, int] = dataclasses.field(default_factory=dict)
+
+
+@functools.lru_cache(maxsize=64)
+def record_type(fields: Sequence[str]) -> Any:
+    """Returns the record class holding a projection of item fields.
+
+    Records are named tuples: fields are read as attributes or unpacked, and
+    building one costs a single tuple allocation. Classes are cached, so every
+    projection on the same fields shares one class.
+
+    Args:
+        fields: The field names, as a tuple.
+
+    Returns:
+        A named tuple class with one attribute per field.
+    """
+    return collections.namedtuple("Record", fields)
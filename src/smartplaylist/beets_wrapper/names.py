@@ -0,0 +1,245 @@
+"""Trigram index of the names used in the beets library.
+
+This module provides a `NameIndex` over the distinct artist, album artist,
+album and genre values of the library, so misspelled names can be resolved to
+the values actually stored. Names are compared by the trigrams of their
+normalized form, as PostgreSQL's `pg_trgm` does: the similarity of two names
+is the number of trigrams they share divided by the number of distinct
+trigrams of both. The index is an inverted list from each trigram to the
+values containing it, held in NumPy arrays. It is persisted as an `.npz` file
+next to the beets database and tagged with the database revision it was built
+from, like the facet index.
+"""
+
+import logging
+import re
+import sqlite3
+import unicodedata
+from typing import Optional, Sequence
+
+import numpy as np
+
+from . import exceptions, models, storage
+
+logger = logging.getLogger(__name__)
+
+NAME_INDEX_FILENAME = "names.npz"
+
+NAME_FIELDS = ("artist", "albumartist", "album", "genre")
+"""The item fields whose values are indexed."""
+
+_NOT_ALPHANUMERIC = re.compile(r"[\W_]+")
+
+
+def normalize(name: str) -> str:
+    """Returns the form of a name used for comparisons.
+
+    Case, accents, punctuation and spaces are dropped, so `Hip-Hop`,
+    `hip hop` and `hiphop`, or `Björk` and `bjork`, are equal.
+
+    Args:
+        name: The name.
+
+    Returns:
+        The lowercase letters and digits of the name.
+    """
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    letters = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NOT_ALPHANUMERIC.sub("", letters)
+
+
+def trigrams(name: str) -> set[str]:
+    """Returns the trigrams of a name.
+
+    The normalized name is padded with two spaces in front and one behind,
+    so the first letters weigh more and short names still have trigrams.
+
+    Args:
+        name: The name.
+
+    Returns:
+        The distinct trigrams, empty if the name has no letter or digit.
+    """
+    normalized = normalize(name)
+    if not normalized:
+        return set()
+    padded = f"  {normalized} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Trigram index of the values of the fields in `NAME_FIELDS`.
+
+    Attributes:
+        path: Path to the file the index is persisted to.
+        revision: The database revision the index was built from, or None if
+            the index is empty.
+    """
+
+    def __init__(self, path: str):
+        """Initializes an empty name index.
+
+        Args:
+            path: Path to the file the index is persisted to.
+        """
+        self.path = path
+        self.revision: Optional[str] = None
+        self._set_arrays(
+            fields=np.zeros(0, np.int8),
+            values=np.zeros(0, "U1"),
+            counts=np.zeros(0, np.int64),
+            sizes=np.zeros(0, np.int32),
+            grams=np.zeros(0, "U3"),
+            offsets=np.zeros(1, np.int64),
+            postings=np.zeros(0, np.int32),
+        )
+
+    def _set_arrays(self, **arrays: np.ndarray):
+        """Installs the index arrays.
+
+        Args:
+            arrays: `fields`, the index in `NAME_FIELDS` of the field of each
+                value; `values` and `counts`, each value with its number of
+                tracks; `sizes`, the number of trigrams of each value;
+                `grams`, every trigram, sorted; and `offsets` and `postings`,
+                the values containing each trigram, in compressed sparse row
+                form.
+        """
+        self._arrays = arrays
+        self._gram_ids = {g: i for i, g in enumerate(arrays["grams"].tolist())}
+
+    def __len__(self) -> int:
+        return len(self._arrays["values"])
+
+    def build(self, conn: sqlite3.Connection, revision: str):
+        """Rebuilds the index from the database.
+
+        Args:
+            conn: An open connection to the beets database.
+            revision: The database revision the index is built from.
+        """
+        fields: list[int] = []
+        values: list[str] = []
+        counts: list[int] = []
+        sizes: list[int] = []
+        postings: dict[str, list[int]] = {}
+        for code, field in enumerate(NAME_FIELDS):
+            rows = conn.execute(
+                f"SELECT {field}, COUNT(*) FROM items "
+                f"WHERE {field} IS NOT NULL AND {field} != '' "
+                f"GROUP BY {field} ORDER BY {field}"
+            )
+            for value, count in rows:
+                grams = trigrams(str(value))
+                if not grams:
+                    continue
+                index = len(values)
+                for gram in grams:
+                    postings.setdefault(gram, []).append(index)
+                fields.append(code)
+                values.append(str(value))
+                counts.append(count)
+                sizes.append(len(grams))
+        all_grams = sorted(postings)
+        lists = [postings[g] for g in all_grams]
+        self._set_arrays(
+            fields=np.array(fields, np.int8),
+            values=np.array(values, str) if values else np.zeros(0, "U1"),
+            counts=np.array(counts, np.int64),
+            sizes=np.array(sizes, np.int32),
+            grams=np.array(all_grams, "U3"),
+            offsets=np.cumsum([0, *map(len, lists)], dtype=np.int64),
+            postings=np.fromiter(
+                (i for values_of in lists for i in values_of), np.int32
+            ),
+        )
+        self.revision = revision
+
+    def load(self, revision: str) -> bool:
+        """Loads the persisted index if it was built from the given revision.
+
+        Args:
+            revision: The current database revision.
+
+        Returns:
+            True if the persisted index was loaded, False if it is missing,
+            unreadable or stale.
+        """
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["revision"]) != revision:
+                    return False
+                arrays = {name: data[name] for name in data.files}
+        except (OSError, ValueError, KeyError):
+            return False
+        del arrays["revision"]
+        self._set_arrays(**arrays)
+        self.revision = revision
+        return True
+
+    def save(self):
+        """Persists the index next to the database, logging failures."""
+        try:
+            with storage.atomic_write(self.path, "wb") as f:
+                np.savez(f, revision=np.array(self.revision), **self._arrays)
+        except OSError as e:
+            logger.warning(f"Could not persist name index to {self.path}: {e}")
+
+    def resolve(
+        self,
+        name: str,
+        fields: Optional[Sequence[str]] = None,
+        limit: int = 5,
+        min_score: float = 0.25,
+    ) -> list[models.NameMatch]:
+        """Finds the indexed values closest to a name.
+
+        Args:
+            name: The name, possibly misspelled.
+            fields: The fields to search. Defaults to all `NAME_FIELDS`.
+            limit: The maximum number of matches to return.
+            min_score: The lowest similarity returned, between 0 and 1.
+
+        Returns:
+            The matches, most similar first, then most common first.
+
+        Raises:
+            exceptions.QueryError: If a field is not indexed, or the name has
+                no letter or digit.
+        """
+        codes = []
+        for field in fields or NAME_FIELDS:
+            if field not in NAME_FIELDS:
+                raise exceptions.QueryError(
+                    f"Unsupported name field '{field}'. "
+                    f"Expected one of: {', '.join(NAME_FIELDS)}"
+                )
+            codes.append(NAME_FIELDS.index(field))
+        grams = trigrams(name)
+        if not grams:
+            raise exceptions.QueryError(f"Cannot resolve '{name}': no letters.")
+
+        arrays = self._arrays
+        offsets, postings = arrays["offsets"], arrays["postings"]
+        ids = [self._gram_ids.get(g) for g in grams]
+        lists = [postings[offsets[i] : offsets[i + 1]] for i in ids if i is not None]
+        if not lists:
+            return []
+        shared = np.bincount(np.concatenate(lists), minlength=len(self))
+        candidates = np.flatnonzero(shared)
+        if len(codes) < len(NAME_FIELDS):
+            candidates = candidates[np.isin(arrays["fields"][candidates], codes)]
+        common = shared[candidates]
+        scores = common / (len(grams) + arrays["sizes"][candidates] - common)
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((-arrays["counts"][candidates], -scores))[:limit]
+        return [
+            models.NameMatch(
+                field=NAME_FIELDS[arrays["fields"][i]],
+                value=str(arrays["values"][i]),
+                count=int(arrays["counts"][i]),
+                score=round(float(score), 4),
+            )
+            for i, score in zip(candidates[order].tolist(), scores[order].tolist())
+        ]
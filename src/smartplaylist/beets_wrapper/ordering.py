@@ -0,0 +1,294 @@
+"""Sequencing of playlist tracks for smooth transitions.
+
+This module reorders the tracks of a playlist so that consecutive tracks are
+alike, as a DJ would: the cost of a transition grows with the tempo change,
+the distance between the keys on the Camelot wheel and the gap between the
+years, and playing the same artist twice in a row costs extra. beets stores
+no energy level, so the year stands in for the mood of the era.
+
+Finding the cheapest order is a travelling salesman problem, so it is solved
+with heuristics: a greedy walk to the cheapest next track, improved by 2-opt
+moves that reverse a section of the playlist when that lowers the total cost.
+Both steps evaluate the cost of one track against many others at once with
+NumPy. Playlists too large to sequence in one piece are first sorted by tempo
+and split into sections, each sequenced on its own.
+"""
+
+import math
+from typing import Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+
+from . import exceptions
+from .similarity import camelot_key
+
+ORDERS = ("smooth",)
+"""The orders a playlist can be sequenced in, besides the order of the query."""
+
+ORDER_FIELDS = ("bpm", "initial_key", "year", "artist")
+"""The item fields read to sequence a playlist, after the fields of its format."""
+
+BPM_STEP = 0.06
+"""A tempo change costing as much as one step on the Camelot wheel, as a ratio."""
+
+YEAR_STEP = 10
+"""A number of years costing as much as one step on the Camelot wheel."""
+
+SAME_ARTIST_COST = 4.0
+"""The cost of playing the same artist twice in a row."""
+
+MISSING_COST = 1.0
+"""The cost of a tempo, key or year change when either value is unknown."""
+
+_SECTION_SIZE = 8192
+"""The largest number of tracks sequenced in one piece."""
+
+_TWO_OPT_PASSES = 2
+"""The largest number of 2-opt passes over a walk."""
+
+_TWO_OPT_WINDOW = 512
+"""The longest section reversed by a 2-opt move."""
+
+
+def check_order(order: str):
+    """Checks that a playlist order is supported.
+
+    Args:
+        order: The name of the order, e.g. `smooth`.
+
+    Raises:
+        exceptions.QueryError: If the order is unknown.
+    """
+    if order not in ORDERS:
+        raise exceptions.QueryError(
+            f"Unsupported playlist order '{order}'. "
+            f"Expected one of: {', '.join(ORDERS)}"
+        )
+
+
+def _key_costs() -> np.ndarray:
+    """Returns the cost between every two keys, indexed by `_key_code`.
+
+    Each step around the Camelot wheel costs 1, and so does switching between
+    the minor and major keys of one number.
+    """
+    number, minor = np.divmod(np.arange(24), 2)
+    steps = np.abs(number[:, None] - number) % 12
+    costs = np.full((25, 25), MISSING_COST)
+    costs[:24, :24] = np.minimum(steps, 12 - steps) + (minor[:, None] != minor)
+    return costs
+
+
+def _key_code(key: Optional[str]) -> int:
+    """Returns the index of a key in the rows of `_KEY_COSTS`, 24 if unknown."""
+    camelot = camelot_key(key)
+    if camelot is None:
+        return 24
+    return 2 * (camelot[0] - 1) + (camelot[1] == "A")
+
+
+_KEY_COSTS = _key_costs()
+
+_COLUMNS = ("tempo", "year", "key", "artist")
+
+
+class Transitions:
+    """The cost of the transitions between the tracks of a playlist."""
+
+    def __init__(self, rows: Sequence[Sequence]):
+        """Reads the features of the tracks.
+
+        Args:
+            rows: The values of `ORDER_FIELDS` of each track.
+        """
+        bpm = np.array([r[0] or 0 for r in rows], np.float64).reshape(-1)
+        year = np.array([r[2] or 0 for r in rows], np.float64).reshape(-1)
+        # Tempo and year in steps, NaN where unknown.
+        with np.errstate(divide="ignore"):
+            self.tempo = np.where(bpm > 0, np.log(bpm) / math.log1p(BPM_STEP), np.nan)
+        self.year = np.where(year > 0, year / YEAR_STEP, np.nan)
+        self.key = np.array([_key_code(r[1]) for r in rows], np.int8)
+        artists = np.array([r[3] or "" for r in rows], str)
+        self.artist = np.unique(artists, return_inverse=True)[1].reshape(-1)
+        self.artist[artists == ""] = -1
+
+    def __len__(self) -> int:
+        return len(self.key)
+
+    def costs(self, a, b) -> np.ndarray:
+        """Returns the cost of going from tracks `a` to tracks `b`.
+
+        The cost is symmetric. Arguments are track indexes, or arrays of
+        them, broadcast against each other.
+        """
+        costs = _KEY_COSTS[self.key[a], self.key[b]]
+        for feature in (self.tempo, self.year):
+            change = np.abs(feature[a] - feature[b])
+            costs = costs + np.where(np.isnan(change), MISSING_COST, change)
+        artist = self.artist[a]
+        return costs + SAME_ARTIST_COST * ((artist == self.artist[b]) & (artist >= 0))
+
+    def greedy(self, tracks: np.ndarray, start: int) -> np.ndarray:
+        """Walks from a track to the cheapest remaining track, until none is left.
+
+        The remaining tracks are kept in local arrays, the visited track being
+        replaced by the last one, so each step reads contiguous memory.
+
+        Args:
+            tracks: The indexes of the tracks to sequence.
+            start: The position in `tracks` of the first track.
+
+        Returns:
+            The indexes of the tracks, in walking order.
+        """
+        columns = [
+            tracks.copy(),
+            self.tempo[tracks],
+            np.isnan(self.tempo[tracks]),
+            self.year[tracks],
+            np.isnan(self.year[tracks]),
+            self.key[tracks],
+            self.artist[tracks],
+        ]
+        ids, tempo, no_tempo, year, no_year, keys, artists = columns
+        order: np.ndarray = np.empty_like(tracks)
+        position = start
+        for remaining in range(len(tracks) - 1, -1, -1):
+            order[len(tracks) - 1 - remaining] = ids[position]
+            current = [column[position] for column in columns]
+            for column in columns:
+                column[position] = column[remaining]
+            if not remaining:
+                break
+            _, t, t_missing, y, y_missing, key, artist = current
+            costs = _KEY_COSTS[key][keys[:remaining]]
+            for value, missing, values, unknown in (
+                (t, t_missing, tempo, no_tempo),
+                (y, y_missing, year, no_year),
+            ):
+                if missing:
+                    costs += MISSING_COST
+                else:
+                    change = np.abs(values[:remaining] - value)
+                    costs += np.where(unknown[:remaining], MISSING_COST, change)
+            if artist >= 0:
+                costs += SAME_ARTIST_COST * (artists[:remaining] == artist)
+            position = int(np.argmin(costs))
+        return order
+
+    def walk(self, order: np.ndarray) -> "Transitions":
+        """Returns the transitions of the tracks rearranged in walking order.
+
+        Costs between consecutive positions of the walk can then be read
+        from contiguous slices.
+
+        Args:
+            order: The indexes of the tracks, in walking order.
+        """
+        walk = object.__new__(Transitions)
+        for name in _COLUMNS:
+            setattr(walk, name, getattr(self, name)[order])
+        return walk
+
+    def two_opt(self, order: np.ndarray) -> np.ndarray:
+        """Reverses sections of a walk while that lowers its total cost.
+
+        For each track, the best reversal starting after it is applied if it
+        helps. Sections are at most `_TWO_OPT_WINDOW` tracks long, so a pass
+        costs O(n * window) rather than O(n^2).
+
+        Args:
+            order: The indexes of the tracks, in walking order.
+
+        Returns:
+            The improved order.
+        """
+        n = len(order)
+        if n < 4:
+            return order.copy()
+        walk = self.walk(order)
+        columns = [order.copy(), *(getattr(walk, name) for name in _COLUMNS)]
+        # The cost of the transition after each position; the last has none.
+        edges = np.append(walk.costs(slice(0, n - 1), slice(1, n)), 0.0)
+        for _ in range(_TWO_OPT_PASSES):
+            improved = False
+            for i in range(n - 2):
+                # Reversing positions i + 1 to end replaces the transitions
+                # after i and after end by i -> end and i + 1 -> end + 1.
+                last = min(n - 1, i + 2 + _TWO_OPT_WINDOW)
+                joined = walk.costs(i, slice(i + 2, last))
+                rejoined = walk.costs(i + 1, slice(i + 3, last + 1))
+                gains = edges[i] + edges[i + 2 : last] - joined - rejoined
+                if last == n - 1:
+                    # Reversing the tail only adds the transition i -> n - 1.
+                    tail = walk.costs(i, n - 1)
+                    joined = np.append(joined, tail)
+                    rejoined = np.append(rejoined, 0.0)
+                    gains = np.append(gains, edges[i] - tail)
+                best = int(np.argmax(gains))
+                if gains[best] <= 1e-9:
+                    continue
+                end = i + 2 + best
+                for column in columns:
+                    column[i + 1 : end + 1] = column[i + 1 : end + 1][::-1].copy()
+                edges[i + 1 : end] = edges[i + 1 : end][::-1].copy()
+                edges[i], edges[end] = joined[best], rejoined[best]
+                improved = True
+            if not improved:
+                break
+        return columns[0]
+
+    def total(self, order: np.ndarray) -> float:
+        """Returns the total cost of the transitions of a walk."""
+        return float(self.costs(order[:-1], order[1:]).sum()) if len(order) else 0.0
+
+
+def sequence(rows: Sequence[Sequence]) -> np.ndarray:
+    """Returns the smoothest order of a playlist's tracks found.
+
+    The walk starts from the slowest track, so playlists build up in tempo.
+    Playlists of more than `_SECTION_SIZE` tracks are sorted by tempo and
+    split into sections, each walked from where the previous one ended.
+
+    Args:
+        rows: The values of `ORDER_FIELDS` of each track.
+
+    Returns:
+        The indexes of the rows, in playing order.
+    """
+    transitions = Transitions(rows)
+    n = len(transitions)
+    tempo = np.nan_to_num(transitions.tempo, nan=np.inf)
+    sections = max(1, math.ceil(n / _SECTION_SIZE))
+    by_tempo = np.argsort(tempo, kind="stable")
+    order: list[np.ndarray] = []
+    for section in np.array_split(by_tempo, sections):
+        if not len(section):
+            continue
+        start = 0
+        if order:
+            # Continue from the last track of the previous section.
+            start = int(np.argmin(transitions.costs(order[-1][-1], section)))
+        order.append(transitions.two_opt(transitions.greedy(section, start)))
+    return np.concatenate(order) if order else np.zeros(0, np.int64)
+
+
+def ordered(entries: Iterable[tuple], order: str) -> Iterator[tuple]:
+    """Sequences playlist entries read with `ORDER_FIELDS` appended.
+
+    Args:
+        entries: The playlist entries, each followed by the values of
+            `ORDER_FIELDS`.
+        order: The name of the order, see `ORDERS`.
+
+    Yields:
+        The entries in playing order, without the values of `ORDER_FIELDS`.
+
+    Raises:
+        exceptions.QueryError: If the order is unknown.
+    """
+    check_order(order)
+    entries = list(entries)
+    width = len(ORDER_FIELDS)
+    for index in sequence([entry[-width:] for entry in entries]).tolist():
+        yield entries[index][:-width]
@@ -0,0 +1,160 @@
+"""Read connection pool for the beets SQLite database.
+
+This module provides a `ConnectionPool` that keeps a small number of read-only
+SQLite connections open so that queries issued by the wrapper do not pay the
+cost of opening the database on every call.
+"""
+
+import contextlib
+import sqlite3
+import threading
+import urllib.parse
+from typing import Callable, Iterator, Optional
+
+from . import exceptions, models
+
+
+class ConnectionPool:
+    """A bounded pool of read-only SQLite connections.
+
+    A thread checks out one connection for the duration of a read. Nested reads
+    on the same thread reuse the connection that thread already holds, so a
+    thread never holds more than one connection at a time.
+
+    Attributes:
+        db_path: Path to the SQLite database file.
+        max_size: The maximum number of connections the pool may open.
+        timeout: Seconds to wait for a free connection before giving up.
+        on_connect: A callable invoked with each newly opened connection, e.g.
+            to register the SQL functions used by beets queries.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size: int = 4,
+        timeout: float = 5.0,
+        on_connect: Optional[Callable[[sqlite3.Connection], None]] = None,
+    ):
+        """Initializes the connection pool.
+
+        Args:
+            db_path: Path to the SQLite database file.
+            max_size: The maximum number of connections the pool may open.
+            timeout: Seconds to wait for a free connection before giving up.
+            on_connect: A callable invoked with each newly opened connection.
+        """
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.on_connect = on_connect
+        self._cond = threading.Condition()
+        self._idle: list[sqlite3.Connection] = []
+        self._open = 0
+        self._closed = False
+        self._local = threading.local()
+        self._stats = models.PoolStats(max_size=max_size)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens a new read-only connection to the database."""
+        uri = f"file:{urllib.parse.quote(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(
+            uri, uri=True, timeout=self.timeout, check_same_thread=False
+        )
+        conn.execute("PRAGMA query_only = 1")
+        if self.on_connect is not None:
+            self.on_connect(conn)
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        with self._cond:
+            if self._closed:
+                raise exceptions.BeetsWrapperError("Connection pool is closed.")
+            if not self._idle and self._open >= self.max_size:
+                self._stats.waits += 1
+                if not self._cond.wait_for(
+                    lambda: self._idle or self._open < self.max_size or self._closed,
+                    timeout=self.timeout,
+                ):
+                    raise exceptions.PoolTimeoutError(
+                        "Timed out waiting for a free database connection."
+                    )
+                if self._closed:
+                    raise exceptions.BeetsWrapperError("Connection pool is closed.")
+            self._stats.acquisitions += 1
+            if self._idle:
+                return self._idle.pop()
+            self._open += 1
+            self._stats.created += 1
+        try:
+            return self._connect()
+        except sqlite3.Error as e:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise exceptions.BeetsWrapperError(
+                f"Failed to open database connection: {e}"
+            ) from e
+
+    def _release(self, conn: sqlite3.Connection):
+        with self._cond:
+            if self._closed:
+                self._open -= 1
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Checks out a read-only connection for the current thread.
+
+        Yields:
+            An open SQLite connection.
+
+        Raises:
+            exceptions.PoolTimeoutError: If no connection freed up in time.
+            exceptions.BeetsWrapperError: If no connection could be obtained.
+        """
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    def close(self):
+        """Closes all idle connections and rejects further checkouts.
+
+        Connections that are checked out are closed when they are returned.
+        """
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().close()
+                self._open -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> models.PoolStats:
+        """Returns a snapshot of the pool usage counters.
+
+        Returns:
+            An object describing the current state of the pool.
+        """
+        with self._cond:
+            idle = len(self._idle)
+            return models.PoolStats(
+                max_size=self.max_size,
+                open_connections=self._open,
+                idle_connections=idle,
+                in_use_connections=self._open - idle,
+                created=self._stats.created,
+                acquisitions=self._stats.acquisitions,
+                waits=self._stats.waits,
+            )
@@ -0,0 +1,264 @@
+"""Selection of tracks filling a playlist up to a total length or size.
+
+This module chooses, among the tracks matching a query, a subset whose total
+length or file size comes as close as possible to a budget without exceeding
+it, such as two hours of music or the capacity of a USB stick. This is the
+subset sum problem, a knapsack whose values equal the weights, solved by
+dynamic programming over a bitset of the reachable totals with NumPy. The
+budget is divided into `MAX_UNITS` units and weights are rounded down to whole
+units, so no selection fitting the budget is missed; the totals found are
+checked against the exact weights, so the selection never exceeds it.
+"""
+
+import math
+import os
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+MAX_UNITS = 1 << 16
+"""The number of units the budget left to dynamic programming is divided into."""
+
+RESERVE_TRACKS = 32
+"""The number of the heaviest tracks whose weight is left to dynamic programming."""
+
+MEASURE_ROUNDS = 4
+"""The number of times files are measured while filling a size budget, see
+`select_measured`."""
+
+
+def file_size(path: bytes, bitrate: Optional[int], length: Optional[float]) -> int:
+    """Returns the size of a track's file.
+
+    beets does not store file sizes, so the file is stat'ed. The size of a
+    file that cannot be accessed is estimated from its bitrate and length.
+
+    Args:
+        path: The item path, as stored by beets.
+        bitrate: The bitrate of the track, in bits per second.
+        length: The length of the track, in seconds.
+
+    Returns:
+        The size in bytes.
+    """
+    try:
+        return os.path.getsize(os.fsdecode(path))
+    except (OSError, TypeError, ValueError):
+        return int((bitrate or 0) * (length or 0) / 8)
+
+
+def estimate_sizes(bitrates: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Estimates the file size of tracks from their bitrate and length.
+
+    Args:
+        bitrates: The bitrate of each track, in bits per second.
+        lengths: The length of each track, in seconds.
+
+    Returns:
+        The estimated size of each file, in bytes.
+    """
+    return (np.asarray(bitrates, np.float64) * lengths / 8).astype(np.int64)
+
+
+def select_measured(
+    lengths: np.ndarray,
+    estimates: np.ndarray,
+    measure: Callable[[list[int]], Sequence[int]],
+    max_length: Optional[float],
+    max_size: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Chooses the tracks filling a size budget, measuring as few files as possible.
+
+    Tracks are selected with their estimated sizes, then the selected tracks
+    not measured yet are measured and the selection is made again, until it
+    only holds measured tracks. After `MEASURE_ROUNDS` rounds, the selection
+    is made among the measured tracks. Either way the real sizes of the
+    selected tracks fit the budget.
+
+    Args:
+        lengths: The length of each track, in seconds.
+        estimates: The estimated size of each file, in bytes.
+        measure: Returns the real size of the files of some tracks.
+        max_length: The largest total length, in seconds.
+        max_size: The largest total size, in bytes.
+
+    Returns:
+        The indexes of the selected tracks, in order, and the size of each
+        track, real for the measured tracks and estimated for the others.
+    """
+    sizes = np.array(estimates, np.int64)
+    measured = np.zeros(len(sizes), bool)
+    for _ in range(MEASURE_ROUNDS):
+        selected = select(lengths, sizes, max_length, max_size)
+        pending = selected[~measured[selected]]
+        if not len(pending):
+            return selected, sizes
+        sizes[pending] = measure(pending.tolist())
+        measured[pending] = True
+    rows = np.flatnonzero(measured)
+    selected = select(lengths[rows], sizes[rows], max_length, max_size)
+    return rows[selected], sizes
+
+
+def limit_per_artist(artists: Sequence[str], max_per_artist: int) -> np.ndarray:
+    """Keeps the first tracks of each artist.
+
+    Args:
+        artists: The artist of each track, in order of preference.
+        max_per_artist: The number of tracks kept per artist. Tracks without
+            an artist are all kept.
+
+    Returns:
+        The indexes of the kept tracks, in order.
+    """
+    counts: dict[str, int] = {}
+    kept = []
+    for index, artist in enumerate(artists):
+        if artist:
+            counts[artist] = counts.get(artist, 0) + 1
+            if counts[artist] > max_per_artist:
+                continue
+        kept.append(index)
+    return np.array(kept, np.int64)
+
+
+def fill(weights: np.ndarray, capacity: float) -> np.ndarray:
+    """Chooses the tracks whose total weight is closest to a capacity.
+
+    Tracks are taken in order until the capacity left is the weight of
+    `RESERVE_TRACKS` of the heaviest tracks. The rest is filled by dynamic
+    programming over the remaining tracks, in order, stopping as soon as a
+    selection fills it exactly, so earlier tracks are preferred. Each total
+    is reached first by one track, whose index is recorded; the selection is
+    read back by following these tracks from the best total whose exact
+    weight fits.
+
+    Args:
+        weights: The weight of each track, e.g. its length in seconds.
+            Tracks weighing nothing are never selected.
+        capacity: The largest total weight.
+
+    Returns:
+        The indexes of the selected tracks, in order.
+    """
+    weights = np.asarray(weights, np.float64)
+    candidates = np.flatnonzero(weights > 0)
+    if capacity <= 0 or not len(candidates):
+        return np.zeros(0, np.int64)
+    cumulative = np.cumsum(weights[candidates])
+    if cumulative[-1] <= capacity:
+        return candidates
+    reserve = RESERVE_TRACKS * weights[candidates].max()
+    taken = int(np.searchsorted(cumulative, capacity - reserve, side="right"))
+    if taken:
+        capacity -= cumulative[taken - 1]
+    resolution = capacity / MAX_UNITS
+    costs = np.maximum(np.floor(weights / resolution), 1).astype(np.int64)
+    reachable = np.zeros(MAX_UNITS + 1, bool)
+    reachable[0] = True
+    # The track that first reached each total, -1 if it was not reached.
+    reached_by = np.full(MAX_UNITS + 1, -1, np.int64)
+    for index in candidates[taken:].tolist():
+        cost = int(costs[index])
+        if cost > MAX_UNITS:
+            continue
+        totals = np.flatnonzero(reachable[:-cost] & ~reachable[cost:]) + cost
+        reachable[totals] = True
+        reached_by[totals] = index
+        if reachable[MAX_UNITS]:
+            break
+    selected = candidates[:taken].tolist()
+    # Units are rounded down, so the best total may not fit once converted
+    # back to weights; the next best totals are then tried.
+    for best in np.flatnonzero(reachable)[::-1].tolist():
+        chain = []
+        total = best
+        while total:
+            index = int(reached_by[total])
+            chain.append(index)
+            total -= int(costs[index])
+        if weights[chain].sum() <= capacity * (1 + 1e-12):
+            selected.extend(chain)
+            break
+    return np.array(sorted(selected), np.int64)
+
+
+def trim(
+    selected: np.ndarray,
+    primary: np.ndarray,
+    secondary: np.ndarray,
+    primary_capacity: float,
+    secondary_capacity: float,
+) -> np.ndarray:
+    """Makes a selection fit a second budget, then tops it up.
+
+    The selected tracks with the highest ratio of secondary to primary
+    weight, e.g. the largest files per second of music, are dropped until
+    the second budget is met. Unselected tracks are then added in order
+    while they fit both budgets.
+
+    Args:
+        selected: The indexes of the selected tracks.
+        primary: The weight of each track in the first budget.
+        secondary: The weight of each track in the second budget.
+        primary_capacity: The first budget.
+        secondary_capacity: The second budget.
+
+    Returns:
+        The indexes of the selected tracks, in order.
+    """
+    selected = np.asarray(selected, np.int64)
+    excess = secondary[selected].sum() - secondary_capacity
+    if excess > 0:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = secondary[selected] / primary[selected]
+        by_ratio = np.argsort(-np.nan_to_num(ratios, nan=math.inf), kind="stable")
+        dropped = np.cumsum(secondary[selected][by_ratio])
+        count = int(np.searchsorted(dropped, excess)) + 1
+        selected = np.delete(selected, by_ratio[:count])
+    primary_left = primary_capacity - primary[selected].sum()
+    secondary_left = secondary_capacity - secondary[selected].sum()
+    chosen = np.zeros(len(primary), bool)
+    chosen[selected] = True
+    for index in np.flatnonzero(~chosen & (primary > 0)).tolist():
+        if primary[index] <= primary_left and secondary[index] <= secondary_left:
+            chosen[index] = True
+            primary_left -= primary[index]
+            secondary_left -= secondary[index]
+    return np.flatnonzero(chosen)
+
+
+def select(
+    lengths: np.ndarray,
+    sizes: np.ndarray,
+    max_length: Optional[float] = None,
+    max_size: Optional[int] = None,
+) -> np.ndarray:
+    """Chooses the tracks filling a total length and/or size.
+
+    With both budgets, the length is filled first. If the selection is too
+    large, the size is filled instead, and if that selection is too long, it
+    is trimmed to the length, see `trim`.
+
+    Args:
+        lengths: The length of each track, in seconds.
+        sizes: The file size of each track, in bytes.
+        max_length: The largest total length, in seconds.
+        max_size: The largest total size, in bytes.
+
+    Returns:
+        The indexes of the selected tracks, in order.
+    """
+    if max_size is None:
+        if max_length is None:
+            return np.flatnonzero(lengths > 0)
+        return fill(lengths, max_length)
+    if max_length is None:
+        return fill(sizes, max_size)
+    selected = fill(lengths, max_length)
+    if sizes[selected].sum() <= max_size:
+        return selected
+    selected = fill(sizes, max_size)
+    if lengths[selected].sum() <= max_length:
+        return selected
+    return trim(selected, sizes, lengths, max_size, max_length)
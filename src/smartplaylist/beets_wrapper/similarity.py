@@ -0,0 +1,360 @@
+"""Track similarity over feature vectors of the beets library.
+
+This module provides a `SimilarityIndex` holding one feature vector per item,
+built from fields beets already stores: the genre, year, bpm, length, bitrate
+and initial key. Numeric fields are standardized, keys are placed on the
+Camelot wheel, and each feature is scaled by its weight, so the Euclidean
+distance between two vectors measures how different two tracks are. The
+genre is kept as one code per item and adds a fixed penalty when it differs,
+which is the distance between one-hot encodings without storing them.
+
+Nearest neighbours are found with a vectorized scan of the whole matrix. For
+large libraries, an inverted file index can be built: the vectors are
+clustered with k-means and a search only scans the cells whose centroids are
+nearest to the query. The index is persisted as an `.npz` file next to the
+beets database and tagged with the database revision it was built from.
+"""
+
+import logging
+import re
+import sqlite3
+from typing import Optional
+
+import numpy as np
+
+from . import exceptions, storage
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_INDEX_FILENAME = "similarity.npz"
+
+NUMERIC_FEATURES = ("year", "bpm", "length", "bitrate")
+"""The numeric item fields used as features. Zero means unknown."""
+
+FEATURE_WEIGHTS = {
+    "genre": 4.0,
+    "year": 1.0,
+    "bpm": 1.0,
+    "length": 0.5,
+    "bitrate": 0.25,
+    "initial_key": 0.75,
+}
+"""The squared distance each feature contributes for one standard deviation,
+or for a different genre or an opposite key."""
+
+_LOG_SCALED = frozenset({"bpm", "length", "bitrate"})
+
+_KEY = re.compile(r"^([A-G])([#b]?)(m|min|minor)?$", re.IGNORECASE)
+
+_CAMELOT = re.compile(r"^(1[0-2]|[1-9])([AB])$", re.IGNORECASE)
+
+_PITCH_CLASSES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+_KMEANS_SAMPLE = 65536
+_KMEANS_ITERATIONS = 10
+_CHUNK_ROWS = 65536
+
+
+def camelot_key(key: Optional[str]) -> Optional[tuple[int, str]]:
+    """Returns the position of a musical key on the Camelot wheel.
+
+    Args:
+        key: A key as stored by beets, e.g. `C#m` or `Bb`, or in Camelot
+            notation, e.g. `8A`.
+
+    Returns:
+        The wheel number, from 1 to 12, and `A` for minor or `B` for major
+        keys, or None if the key is missing or not recognized.
+    """
+    key = (key or "").strip().replace("♯", "#").replace("♭", "b")
+    camelot = _CAMELOT.match(key)
+    if camelot:
+        return int(camelot.group(1)), camelot.group(2).upper()
+    match = _KEY.match(key)
+    if not match:
+        return None
+    note, accidental, minor = match.groups()
+    pitch = _PITCH_CLASSES[note.upper()] + {"#": 1, "b": -1}.get(accidental, 0)
+    if minor:
+        # A minor key is placed with its relative major, three semitones up.
+        return (7 * (pitch + 3) + 7) % 12 + 1, "A"
+    return (7 * pitch + 7) % 12 + 1, "B"
+
+
+def _key_features(keys: np.ndarray) -> np.ndarray:
+    """Places keys on the Camelot wheel.
+
+    Neighbouring numbers, and the minor and major keys of one number, are
+    equally close. Unknown keys are at the centre of the wheel.
+
+    Args:
+        keys: The initial key of each item.
+
+    Returns:
+        An array with one row of three coordinates per item.
+    """
+    unique, inverse = np.unique(keys, return_inverse=True)
+    # The chord between neighbouring numbers on a unit circle.
+    step = 2 * np.sin(np.pi / 12)
+    coordinates = np.zeros((len(unique), 3))
+    for i, key in enumerate(unique.tolist()):
+        camelot = camelot_key(key)
+        if camelot is not None:
+            angle = 2 * np.pi * camelot[0] / 12
+            mode = step / 2 if camelot[1] == "B" else -step / 2
+            coordinates[i] = np.cos(angle), np.sin(angle), mode
+    return coordinates[inverse.reshape(-1)]
+
+
+def _standardized(values: np.ndarray, log: bool) -> np.ndarray:
+    """Standardizes a numeric feature, with unknown values at the mean.
+
+    Args:
+        values: The field value of each item. Zero or less means unknown.
+        log: Whether to compare the values by ratio rather than difference.
+
+    Returns:
+        The standardized values.
+    """
+    known = values > 0
+    result = np.zeros(len(values))
+    if not known.any():
+        return result
+    present = np.log(values[known]) if log else values[known]
+    std = present.std()
+    result[known] = (present - present.mean()) / (std if std > 0 else 1.0)
+    return result
+
+
+def _squared_distances(vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Returns the squared Euclidean distance of each row to a vector."""
+    difference = vectors - query
+    return np.einsum("ij,ij->i", difference, difference)
+
+
+def _read_features(
+    conn: sqlite3.Connection,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Reads the feature fields of every item, in chunks of rows.
+
+    Args:
+        conn: An open connection to the beets database.
+
+    Returns:
+        The ids, genres and initial keys of the items, ordered by id, and
+        one row per field of `NUMERIC_FEATURES` with 0 for missing values.
+    """
+    fields = ", ".join(("id", "genre", "initial_key", *NUMERIC_FEATURES))
+    cursor = conn.execute(f"SELECT {fields} FROM items ORDER BY id")
+    ids = [np.zeros(0, np.int64)]
+    genres = [np.zeros(0, str)]
+    keys = [np.zeros(0, str)]
+    numeric = [np.zeros((len(NUMERIC_FEATURES), 0))]
+    while rows := cursor.fetchmany(_CHUNK_ROWS):
+        chunk_ids, chunk_genres, chunk_keys, *chunk_numeric = zip(*rows)
+        ids.append(np.array(chunk_ids, np.int64))
+        genres.append(np.array([g or "" for g in chunk_genres], str))
+        keys.append(np.array([k or "" for k in chunk_keys], str))
+        # NULL becomes NaN in a float array, and then unknown.
+        numeric.append(np.nan_to_num(np.array(chunk_numeric, np.float64)))
+    return (
+        np.concatenate(ids),
+        np.concatenate(genres),
+        np.concatenate(keys),
+        np.concatenate(numeric, axis=1),
+    )
+
+
+class SimilarityIndex:
+    """Feature vectors of every item, with an optional inverted file index.
+
+    Attributes:
+        path: Path to the file the index is persisted to.
+        revision: The database revision the index was built from, or None if
+            the index is empty.
+    """
+
+    def __init__(self, path: str):
+        """Initializes an empty similarity index.
+
+        Args:
+            path: Path to the file the index is persisted to.
+        """
+        self.path = path
+        self.revision: Optional[str] = None
+        self.ids = np.zeros(0, np.int64)
+        self.genres = np.zeros(0, np.int32)
+        self.vectors = np.zeros((0, 3 + len(NUMERIC_FEATURES)), np.float32)
+        self.centroids: Optional[np.ndarray] = None
+        self.cell_offsets: Optional[np.ndarray] = None
+        self.cell_rows: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def approximate(self) -> bool:
+        """Whether searches use the inverted file index."""
+        return self.centroids is not None
+
+    def build(
+        self,
+        conn: sqlite3.Connection,
+        revision: str,
+        cells: int = 0,
+        seed: int = 0,
+    ):
+        """Rebuilds the feature vectors from the database.
+
+        Args:
+            conn: An open connection to the beets database.
+            revision: The database revision the index is built from.
+            cells: The number of cells of the inverted file index. 0 builds
+                no index, so every search scans all vectors.
+            seed: The seed of the k-means initialization.
+        """
+        ids, genres, keys, numeric = _read_features(conn)
+
+        weights = FEATURE_WEIGHTS
+        features = [np.sqrt(weights["initial_key"]) * _key_features(keys)]
+        for field, values in zip(NUMERIC_FEATURES, numeric):
+            standardized = _standardized(values, field in _LOG_SCALED)
+            features.append(np.sqrt(weights[field]) * standardized[:, None])
+
+        self.ids = ids
+        codes = np.unique(genres, return_inverse=True)[1]
+        self.genres = codes.reshape(-1).astype(np.int32)
+        self.vectors = np.hstack(features).astype(np.float32)
+        self.centroids = self.cell_offsets = self.cell_rows = None
+        if cells and len(self) > cells:
+            self._build_cells(cells, seed)
+        self.revision = revision
+
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Returns the index of the nearest centroid of each vector."""
+        norms = np.einsum("ij,ij->i", centroids, centroids)
+        cells = np.empty(len(vectors), np.int32)
+        for start in range(0, len(vectors), _CHUNK_ROWS):
+            chunk = vectors[start : start + _CHUNK_ROWS]
+            distances = norms - 2 * chunk @ centroids.T
+            cells[start : start + _CHUNK_ROWS] = distances.argmin(axis=1)
+        return cells
+
+    def _build_cells(self, cells: int, seed: int):
+        """Clusters the vectors with k-means into an inverted file index.
+
+        Args:
+            cells: The number of clusters.
+            seed: The seed of the sampling and initialization.
+        """
+        rng = np.random.default_rng(seed)
+        sample = self.vectors[
+            rng.choice(len(self), min(len(self), _KMEANS_SAMPLE), replace=False)
+        ]
+        centroids = sample[rng.choice(len(sample), cells, replace=False)].copy()
+        for _ in range(_KMEANS_ITERATIONS):
+            assigned = self._assign(sample, centroids)
+            counts = np.bincount(assigned, minlength=cells)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assigned, sample)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+        assigned = self._assign(self.vectors, centroids)
+        self.centroids = centroids
+        self.cell_rows = np.argsort(assigned, kind="stable").astype(np.int32)
+        self.cell_offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(assigned, minlength=cells)))
+        ).astype(np.int64)
+
+    def load(self, revision: str) -> bool:
+        """Loads the persisted index if it was built from the given revision.
+
+        Args:
+            revision: The current database revision.
+
+        Returns:
+            True if the persisted index was loaded, False if it is missing,
+            unreadable or stale.
+        """
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["revision"]) != revision:
+                    return False
+                self.ids = data["ids"]
+                self.genres = data["genres"]
+                self.vectors = data["vectors"]
+                self.centroids = data.get("centroids")
+                self.cell_offsets = data.get("cell_offsets")
+                self.cell_rows = data.get("cell_rows")
+        except (OSError, ValueError, KeyError):
+            return False
+        self.revision = revision
+        return True
+
+    def save(self):
+        """Persists the index next to the database, logging failures."""
+        arrays = {"ids": self.ids, "genres": self.genres, "vectors": self.vectors}
+        if self.approximate:
+            arrays.update(
+                centroids=self.centroids,
+                cell_offsets=self.cell_offsets,
+                cell_rows=self.cell_rows,
+            )
+        try:
+            with storage.atomic_write(self.path, "wb") as f:
+                np.savez(f, revision=np.array(self.revision), **arrays)
+        except OSError as e:
+            logger.warning(f"Could not persist similarity index to {self.path}: {e}")
+
+    def nearest(
+        self, item_id: int, k: int = 10, probes: int = 16
+    ) -> list[tuple[int, float]]:
+        """Finds the items most similar to one item.
+
+        Args:
+            item_id: The id of the item.
+            k: The number of items to return.
+            probes: The number of cells scanned when the inverted file index
+                is built. More cells find more of the exact neighbours.
+
+        Returns:
+            The id of each similar item and its distance to the item, nearest
+            first. The item itself is left out.
+
+        Raises:
+            exceptions.QueryError: If no item has this id.
+        """
+        row = int(np.searchsorted(self.ids, item_id))
+        if row >= len(self) or self.ids[row] != item_id:
+            raise exceptions.QueryError(f"No track with id {item_id}.")
+        query = self.vectors[row]
+
+        if self.approximate:
+            assert self.centroids is not None and self.cell_offsets is not None
+            assert self.cell_rows is not None
+            nearest_cells = np.argsort(_squared_distances(self.centroids, query))
+            candidates = np.concatenate(
+                [
+                    self.cell_rows[self.cell_offsets[c] : self.cell_offsets[c + 1]]
+                    for c in nearest_cells[:probes]
+                ]
+            )
+        else:
+            candidates = np.arange(len(self))
+        candidates = candidates[candidates != row]
+
+        distances = _squared_distances(self.vectors[candidates], query)
+        distances += FEATURE_WEIGHTS["genre"] * (
+            self.genres[candidates] != self.genres[row]
+        )
+        k = min(k, len(candidates))
+        if k <= 0:
+            return []
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.lexsort((self.ids[candidates[top]], distances[top]))]
+        return [
+            (int(i), float(d))
+            for i, d in zip(
+                self.ids[candidates[top]].tolist(), np.sqrt(distances[top]).tolist()
+            )
+        ]
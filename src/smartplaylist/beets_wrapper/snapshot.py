@@ -0,0 +1,420 @@
+"""Columnar in-memory snapshot of the beets `items` table.
+
+This module provides a `TrackSnapshot` holding the core fields of every track
+in compact columns: NumPy arrays for numbers and dictionary-encoded columns of
+interned strings for text. It lets read-only requests be answered without
+hydrating beets `Item` objects. It is loaded at startup and after each sync,
+and reloaded in the background when the database is changed by another
+process.
+"""
+
+import bisect
+import os
+import sqlite3
+import string
+import sys
+from typing import Any, Iterable, Optional, Union, cast
+
+import numpy as np
+
+from . import models
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def ascii_lower(value: str) -> str:
+    """Lowercases the ASCII letters of a string, like SQLite's `LIKE` does.
+
+    Args:
+        value: The string to fold.
+
+    Returns:
+        The string with `A`-`Z` replaced by `a`-`z`.
+    """
+    return value.translate(_ASCII_LOWER)
+
+
+NUMERIC_COLUMNS: dict[str, Any] = {
+    "id": np.int64,
+    "year": np.int32,
+    "length": np.float64,
+    "bitrate": np.int32,
+    "added": np.float64,
+    "mtime": np.float64,
+}
+"""The numeric columns of the snapshot and their NumPy types."""
+
+STRING_COLUMNS = (
+    "title",
+    "artist",
+    "albumartist",
+    "album",
+    "genre",
+    "comments",
+    "path",
+)
+"""The text columns of the snapshot. Paths are kept as decoded strings."""
+
+SNAPSHOT_FIELDS = (
+    "id",
+    "title",
+    "artist",
+    "albumartist",
+    "album",
+    "genre",
+    "comments",
+    "year",
+    "length",
+    "bitrate",
+    "path",
+    "added",
+    "mtime",
+)
+"""The item fields held by the snapshot, in column order.
+
+File sizes are not stored by beets, so they are left out rather than read
+with a `stat` of every file."""
+
+
+class StringColumn:
+    """A dictionary-encoded column of interned strings.
+
+    Attributes:
+        codes: The index of the value of each row in `values`.
+        values: The distinct values of the column.
+    """
+
+    def __init__(self, codes: np.ndarray, values: list[str]):
+        """Initializes the column.
+
+        Args:
+            codes: The index of the value of each row in `values`.
+            values: The distinct values of the column.
+        """
+        self.codes = codes
+        self.values = values
+        self._array: Optional[np.ndarray] = None
+        self._folded: Optional[np.ndarray] = None
+        self._ranks: Optional[np.ndarray] = None
+        self._sorted: Optional[list[str]] = None
+
+    @classmethod
+    def from_values(cls, rows: Iterable[Optional[str]]) -> "StringColumn":
+        """Encodes a sequence of strings. None is stored as an empty string.
+
+        Args:
+            rows: The value of each row.
+
+        Returns:
+            The encoded column.
+        """
+        index: dict[str, int] = {}
+        values: list[str] = []
+        codes = []
+        for value in rows:
+            value = value or ""
+            code = index.get(value)
+            if code is None:
+                code = index[value] = len(values)
+                values.append(sys.intern(value))
+            codes.append(code)
+        return cls(np.array(codes, dtype=np.int32), values)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row: int) -> str:
+        return self.values[self.codes[row]]
+
+    def array(self) -> np.ndarray:
+        """Returns the distinct values as a NumPy string array, built once."""
+        if self._array is None:
+            self._array = np.array(self.values, dtype=np.dtypes.StringDType())
+        return self._array
+
+    def folded(self) -> np.ndarray:
+        """Returns the distinct values with ASCII letters lowercased, built once."""
+        if self._folded is None:
+            self._folded = np.array(
+                [ascii_lower(v) for v in self.values], dtype=np.dtypes.StringDType()
+            )
+        return self._folded
+
+    def ranks(self) -> np.ndarray:
+        """Returns the position of each distinct value in sorted order.
+
+        Strings are compared by code point, which is the order SQLite uses
+        for UTF-8 text.
+        """
+        return self._sort()[0]
+
+    def rank_of(self, value: str) -> float:
+        """Returns the sort key of a value, which need not be in the column.
+
+        Args:
+            value: A string.
+
+        Returns:
+            The rank of the value if it is in the column, or a key between
+            the ranks of its neighbours otherwise.
+        """
+        ordered = self._sort()[1]
+        position = bisect.bisect_left(ordered, value)
+        if position < len(ordered) and ordered[position] == value:
+            return float(position)
+        return position - 0.5
+
+    def _sort(self) -> tuple[np.ndarray, list[str]]:
+        """Returns the ranks and the sorted distinct values, built once."""
+        if self._ranks is None or self._sorted is None:
+            order = sorted(range(len(self.values)), key=self.values.__getitem__)
+            ranks = np.empty(len(order), dtype=np.int64)
+            ranks[order] = np.arange(len(order))
+            self._sorted = [self.values[i] for i in order]
+            self._ranks = ranks
+        return self._ranks, self._sorted
+
+    def select(self, hits: np.ndarray) -> np.ndarray:
+        """Expands a boolean per distinct value into a boolean per row.
+
+        Args:
+            hits: Whether each entry of `values` matches.
+
+        Returns:
+            Whether each row matches.
+        """
+        return hits[self.codes]
+
+    def distinct_nonempty(self) -> int:
+        """Returns the number of distinct non-empty values used by some row."""
+        used = np.unique(self.codes)
+        return sum(1 for code in used if self.values[code])
+
+    @property
+    def nbytes(self) -> int:
+        """The memory used by the codes, the value list and the strings."""
+        return (
+            self.codes.nbytes
+            + sys.getsizeof(self.values)
+            + sum(sys.getsizeof(v) for v in self.values)
+        )
+
+
+Column = Union[np.ndarray, StringColumn]
+
+
+class TrackSnapshot:
+    """The core fields of every track, stored column by column.
+
+    Rows are ordered by item id.
+
+    Attributes:
+        revision: The database revision the snapshot was loaded from.
+        columns: The columns, keyed by field name. NULL values are stored as
+            0 or an empty string.
+        nulls: Whether each row is NULL, for the columns holding NULL values.
+        album_count: The number of albums in the library.
+    """
+
+    def __init__(
+        self,
+        revision: str,
+        columns: dict[str, Column],
+        album_count: int,
+        nulls: Optional[dict[str, np.ndarray]] = None,
+    ):
+        """Initializes the snapshot from prebuilt columns.
+
+        Args:
+            revision: The database revision the snapshot was loaded from.
+            columns: The columns, keyed by field name.
+            album_count: The number of albums in the library.
+            nulls: Whether each row is NULL, for the columns holding NULL
+                values.
+        """
+        self.revision = revision
+        self.columns = columns
+        self.nulls = nulls or {}
+        self.album_count = album_count
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, revision: str) -> "TrackSnapshot":
+        """Loads the snapshot with a single scan of the `items` table.
+
+        Args:
+            conn: An open connection to the beets database.
+            revision: The current database revision.
+
+        Returns:
+            The loaded snapshot.
+
+        Raises:
+            sqlite3.Error: If the query fails.
+        """
+        rows = conn.execute(
+            f"SELECT {', '.join(SNAPSHOT_FIELDS)} FROM items ORDER BY id"
+        ).fetchall()
+        by_field = dict(zip(SNAPSHOT_FIELDS, zip(*rows))) if rows else {}
+        nulls = {}
+        for field, values in by_field.items():
+            null = np.fromiter((v is None for v in values), bool, len(values))
+            if null.any():
+                nulls[field] = null
+        by_field["path"] = tuple(
+            os.fsdecode(p or b"") for p in by_field.get("path", ())
+        )
+
+        columns: dict[str, Column] = {}
+        for field in SNAPSHOT_FIELDS:
+            values = by_field.get(field, ())
+            if field in NUMERIC_COLUMNS:
+                columns[field] = np.array(
+                    [v or 0 for v in values], dtype=NUMERIC_COLUMNS[field]
+                )
+            else:
+                columns[field] = StringColumn.from_values(values)
+        (album_count,) = conn.execute("SELECT COUNT(*) FROM albums").fetchone()
+        return cls(revision, columns, album_count, nulls)
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    def sort_value(self, row: int, field: str) -> Any:
+        """Returns the value SQLite sorts a row by, i.e. `IFNULL(field, '')`.
+
+        Args:
+            row: The row number.
+            field: The name of a snapshot field.
+
+        Returns:
+            The value of the field, or an empty string if it is NULL.
+        """
+        null = self.nulls.get(field)
+        if null is not None and null[row]:
+            return ""
+        value = self.columns[field][row]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def strings(self, field: str) -> StringColumn:
+        """Returns a text column.
+
+        Args:
+            field: One of the `STRING_COLUMNS`.
+
+        Returns:
+            The dictionary-encoded column.
+        """
+        return cast(StringColumn, self.columns[field])
+
+    def numbers(self, field: str) -> np.ndarray:
+        """Returns a numeric column.
+
+        Args:
+            field: One of the `NUMERIC_COLUMNS`.
+
+        Returns:
+            The NumPy array of the column.
+        """
+        return cast(np.ndarray, self.columns[field])
+
+    def rows_for_ids(self, ids: Iterable[int]) -> list[int]:
+        """Returns the row of each item id present in the snapshot.
+
+        Args:
+            ids: Item ids.
+
+        Returns:
+            The matching row numbers, in the order of `ids`.
+        """
+        id_column = self.numbers("id")
+        wanted = np.fromiter(ids, dtype=np.int64)
+        if not len(id_column) or not len(wanted):
+            return []
+        rows = np.minimum(np.searchsorted(id_column, wanted), len(id_column) - 1)
+        return rows[id_column[rows] == wanted].tolist()
+
+    def record(self, row: int) -> dict[str, Any]:
+        """Returns the fields of one row, with the path encoded as beets does.
+
+        Args:
+            row: The row number.
+
+        Returns:
+            The field values keyed by field name.
+        """
+        record: dict[str, Any] = {
+            field: self.strings(field)[row] for field in STRING_COLUMNS
+        }
+        for field in NUMERIC_COLUMNS:
+            record[field] = self.numbers(field)[row].item()
+        record["path"] = os.fsencode(record["path"])
+        return record
+
+    def project(self, rows: Iterable[int], fields: Iterable[str]) -> list[tuple]:
+        """Returns the values of some fields for some rows, as tuples.
+
+        Args:
+            rows: Row numbers.
+            fields: Names of snapshot fields.
+
+        Returns:
+            One tuple of field values per row, in the order of `rows`, with
+            paths encoded as beets does.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = []
+        for field in fields:
+            column = self.columns[field]
+            if isinstance(column, StringColumn):
+                values = column.values
+                selected = [values[code] for code in column.codes[rows].tolist()]
+                if field == "path":
+                    selected = [os.fsencode(path) for path in selected]
+                columns.append(selected)
+            else:
+                columns.append(column[rows].tolist())
+        return list(zip(*columns)) if columns else [() for _ in range(len(rows))]
+
+    def items(self, ids: Iterable[int]) -> list[models.Item]:
+        """Returns items backed by snapshot records, in the order of `ids`.
+
+        Args:
+            ids: Item ids. Ids missing from the snapshot are skipped.
+
+        Returns:
+            The items.
+        """
+        return [models.Item(self.record(row)) for row in self.rows_for_ids(ids)]
+
+    def statistics(self) -> models.Statistics:
+        """Computes the library totals from the columns.
+
+        The snapshot holds no file sizes, so `total_size` is 0.
+
+        Returns:
+            An object containing library statistics.
+        """
+        return models.Statistics(
+            total_tracks=len(self),
+            total_albums=self.album_count,
+            total_artists=self.strings("artist").distinct_nonempty(),
+            total_size=0,
+            total_duration=float(self.numbers("length").sum()),
+            total_genres=self.strings("genre").distinct_nonempty(),
+        )
+
+    def stats(self) -> models.SnapshotStats:
+        """Reports the size of the snapshot and the memory used per column.
+
+        Returns:
+            An object describing the snapshot.
+        """
+        memory = {field: int(column.nbytes) for field, column in self.columns.items()}
+        for field, null in self.nulls.items():
+            memory[field] += int(null.nbytes)
+        return models.SnapshotStats(
+            revision=self.revision,
+            rows=len(self),
+            total_bytes=sum(memory.values()),
+            column_bytes=memory,
+        )
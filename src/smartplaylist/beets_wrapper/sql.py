@@ -0,0 +1,250 @@
+"""Translation of beets queries into SQL over the `items` table.
+
+This module reuses the beets query parser to turn a query string into a SQL
+`WHERE` clause that can be combined with custom column lists, ordering and
+limits. Queries that beets can only evaluate in Python, such as queries on
+flexible attributes, are reported as slow so callers can fall back to the
+beets query API.
+"""
+
+import base64
+import binascii
+import dataclasses
+import json
+from typing import Any, Optional, Sequence
+
+from beets.dbcore import query as dbquery  # type: ignore
+from beets.library import Item, Library  # type: ignore
+from beets.library.queries import parse_query_string  # type: ignore
+
+from . import exceptions
+
+ITEM_COLUMNS = frozenset(Item._fields)
+"""The names of the fixed columns of the beets `items` table."""
+
+
+@dataclasses.dataclass
+class CompiledQuery:
+    """A beets query translated into SQL.
+
+    Attributes:
+        query: The beets query string.
+        beets_query: The parsed beets query object.
+        sort: The sort parsed from the query string.
+        where: The SQL condition selecting matching item ids, or None if the
+            query can only be evaluated by beets in Python.
+        subvals: The parameters of the `where` condition.
+    """
+
+    query: str
+    beets_query: Any
+    sort: Any
+    where: Optional[str]
+    subvals: Sequence[Any]
+
+    @property
+    def is_fast(self) -> bool:
+        """Whether the query can be evaluated entirely in SQL."""
+        return self.where is not None
+
+
+def compile_query(query: Optional[str]) -> CompiledQuery:
+    """Parses a beets query string and translates it into SQL.
+
+    The resulting condition applies to the `items` table and selects rows by
+    id, so it can be combined with any column list without ambiguity when the
+    query needs to join the `albums` table.
+
+    Args:
+        query: The beets query string. None or an empty string match everything.
+
+    Returns:
+        The compiled query.
+
+    Raises:
+        exceptions.QueryError: If the query cannot be parsed.
+    """
+    query = query or ""
+    try:
+        beets_query, sort = parse_query_string(query, Item)
+        clause, subvals = beets_query.clause()
+    except Exception as e:
+        raise exceptions.QueryError(f"Invalid query '{query}': {e}") from e
+
+    where = None
+    if clause:
+        if beets_query.field_names & Item.other_db_fields:
+            where = (
+                "items.id IN (SELECT items.id FROM items "
+                f"{Item.relation_join} WHERE {clause})"
+            )
+        else:
+            where = f"({clause})"
+    return CompiledQuery(
+        query=query,
+        beets_query=beets_query,
+        sort=sort,
+        where=where,
+        subvals=list(subvals),
+    )
+
+
+def sort_spec(compiled: CompiledQuery, sort: Optional[str]) -> tuple[str, bool]:
+    """Resolves the sort order of a query to a single fixed column.
+
+    Args:
+        compiled: The compiled query, whose own sort is used when `sort` is
+            not given.
+        sort: A beets-style sort term such as `year`, `year+` or `year-`.
+
+    Returns:
+        The column name and whether the order is ascending. Defaults to `id`
+        in ascending order.
+
+    Raises:
+        exceptions.QueryError: If the sort field is not a sortable column.
+    """
+    if sort:
+        field, ascending = sort.rstrip("+-"), not sort.endswith("-")
+    elif isinstance(compiled.sort, dbquery.FixedFieldSort):
+        field, ascending = compiled.sort.field, compiled.sort.ascending
+    else:
+        return "id", True
+    if field not in ITEM_COLUMNS or Item._fields[field].sql == "BLOB":
+        raise exceptions.QueryError(f"Cannot sort by '{field}'.")
+    return field, ascending
+
+
+def order_clause(compiled: CompiledQuery) -> Optional[str]:
+    """Returns the SQL ordering beets would apply to the results of a query.
+
+    The sort in the query string takes precedence over the default item sort
+    from the beets configuration. The item id is appended as a tie-breaker so
+    the order is deterministic.
+
+    Args:
+        compiled: The compiled query.
+
+    Returns:
+        The `ORDER BY` expression, or None if the sort can only be applied by
+        beets in Python.
+    """
+    sort = compiled.sort
+    if sort is None or isinstance(sort, dbquery.NullSort):
+        sort = Library.get_default_item_sort()
+    if sort.is_slow():
+        return None
+    clause = sort.order_clause()
+    return f"{clause}, id" if clause else "id"
+
+
+def projection(fields: Sequence[str]) -> tuple[list[str], list[Any]]:
+    """Returns the SQL expressions selecting item fields.
+
+    Missing values are replaced by the beets default of the field, so the
+    results match what a beets `Item` would report.
+
+    Args:
+        fields: Names of fixed item fields.
+
+    Returns:
+        One SQL expression per field and the parameters of the expressions.
+
+    Raises:
+        exceptions.QueryError: If a field is not a fixed item field or is
+            selected twice.
+    """
+    expressions = []
+    params = []
+    for i, field in enumerate(fields):
+        if field not in ITEM_COLUMNS:
+            raise exceptions.QueryError(f"Cannot select '{field}'.")
+        if field in fields[:i]:
+            raise exceptions.QueryError(f"Cannot select '{field}' twice.")
+        kind = Item._fields[field]
+        default = kind.to_sql(kind.null)
+        if default is None or isinstance(default, (bytes, memoryview)):
+            expressions.append(field)
+        else:
+            expressions.append(f"IFNULL({field}, ?)")
+            params.append(default)
+    return expressions, params
+
+
+def select_items(
+    compiled: CompiledQuery,
+    columns: Sequence[str],
+    where: Optional[str] = None,
+    params: Sequence[Any] = (),
+    order_by: Optional[str] = None,
+    limit: Optional[int] = None,
+    column_params: Sequence[Any] = (),
+) -> tuple[str, list[Any]]:
+    """Builds a `SELECT` statement over the items matching a fast query.
+
+    Args:
+        compiled: A compiled query for which `is_fast` is True.
+        columns: The SQL expressions to select.
+        where: An additional condition, e.g. a keyset pagination bound.
+        params: The parameters of the additional condition.
+        order_by: The `ORDER BY` expression.
+        limit: The maximum number of rows to return.
+        column_params: The parameters of the column expressions.
+
+    Returns:
+        The SQL statement and its parameters.
+    """
+    conditions = [compiled.where or "1"]
+    values = [*column_params, *compiled.subvals]
+    if where:
+        conditions.append(f"({where})")
+        values.extend(params)
+    sql = f"SELECT {', '.join(columns)} FROM items WHERE {' AND '.join(conditions)}"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        values.append(limit)
+    return sql, values
+
+
+def encode_cursor(field: str, ascending: bool, value: Any, item_id: int) -> str:
+    """Encodes a keyset pagination position into an opaque cursor.
+
+    Args:
+        field: The sort column.
+        ascending: Whether the order is ascending.
+        value: The sort column value of the last returned item.
+        item_id: The id of the last returned item.
+
+    Returns:
+        A URL-safe cursor string.
+    """
+    payload = json.dumps([field, ascending, value, item_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def decode_cursor(cursor: str, field: str, ascending: bool) -> tuple[Any, int]:
+    """Decodes a cursor produced by `encode_cursor`.
+
+    Args:
+        cursor: The cursor string.
+        field: The sort column of the current request.
+        ascending: The sort direction of the current request.
+
+    Returns:
+        The sort column value and id of the last item of the previous page.
+
+    Raises:
+        exceptions.QueryError: If the cursor is malformed or was produced for
+            a different sort order.
+    """
+    try:
+        cursor_field, cursor_ascending, value, item_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("ascii"))
+        )
+    except (binascii.Error, UnicodeError, ValueError, TypeError) as e:
+        raise exceptions.QueryError(f"Invalid cursor: {cursor}") from e
+    if (cursor_field, cursor_ascending) != (field, ascending):
+        raise exceptions.QueryError("Cursor does not match the requested sort order.")
+    return value, int(item_id)
@@ -0,0 +1,61 @@
+"""Files persisted next to the beets database.
+
+The facet, name and similarity indexes, the scan manifest and the playlist
+registry are all derived from the library and kept in its data directory.
+This module provides the helpers they share: `atomic_write`, so a reader
+never sees a partially written file, and the `PersistedIndex` protocol of
+the indexes tagged with the database revision they were built from.
+"""
+
+import contextlib
+import os
+import tempfile
+from typing import IO, Any, Iterator, Optional, Protocol
+
+
+class PersistedIndex(Protocol):
+    """An index built from the database and persisted with its revision.
+
+    Attributes:
+        revision: The database revision the index was built from, or None if
+            the index is empty.
+    """
+
+    revision: Optional[str]
+
+    def load(self, revision: str) -> bool:
+        """Loads the persisted index if it was built from the given revision."""
+        ...
+
+    def save(self) -> None:
+        """Persists the index, logging failures."""
+        ...
+
+
+@contextlib.contextmanager
+def atomic_write(path: str, mode: str = "w") -> Iterator[IO[Any]]:
+    """Opens a file that replaces `path` once it is completely written.
+
+    The data is written to a temporary file in the same directory, which is
+    renamed over `path` when the block exits, or removed if it raises.
+
+    Args:
+        path: Path to the file to replace.
+        mode: `w` to write text as UTF-8, or `wb` to write bytes.
+
+    Yields:
+        The open temporary file.
+
+    Raises:
+        OSError: If the file cannot be written or replaced.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        encoding = None if "b" in mode else "utf-8"
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
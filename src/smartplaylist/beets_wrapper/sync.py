@@ -0,0 +1,214 @@
+"""Incremental sync of a beets library with its music directory.
+
+This module compares a walk of the music directory with the scan manifest of
+the previous sync and the rows of the beets database. Only new and changed
+files have their tags read; rows of deleted files are removed.
+"""
+
+import logging
+import os
+import time
+from typing import Optional, Sequence
+
+from beets.library import Library  # type: ignore
+
+from . import importer, models
+from .manifest import FileSignature, Manifest, file_signature
+
+logger = logging.getLogger(__name__)
+
+PRESERVED_FIELDS = frozenset({"id", "album_id", "added"})
+"""Item fields kept from the database when a changed file is read again."""
+
+
+def scan_tree(
+    root: str, ignore: Sequence[str] = importer.DEFAULT_IGNORE
+) -> dict[str, FileSignature]:
+    """Returns the signature of every audio file under a directory.
+
+    Args:
+        root: The music directory.
+        ignore: Glob patterns of file and directory names to skip.
+
+    Returns:
+        The signature of each file, keyed by path.
+
+    Raises:
+        OSError: If the music directory cannot be read.
+    """
+    tree = {}
+    for _, entries in importer.scan_entries(root, ignore):
+        for entry in entries:
+            try:
+                tree[entry.path] = file_signature(entry.stat())
+            except OSError:
+                continue
+    return tree
+
+
+def _is_changed(
+    previous: Optional[FileSignature], current: FileSignature, db_mtime: float
+) -> bool:
+    """Tells whether a file changed since it was last read.
+
+    Args:
+        previous: The signature recorded by the last sync, if any.
+        current: The current signature of the file.
+        db_mtime: The modification time beets recorded when reading the file.
+
+    Returns:
+        True if the tags of the file must be read again.
+    """
+    if previous is not None:
+        return tuple(previous) != current
+    # Without a manifest entry, fall back to the whole-second mtime beets
+    # stores, as `beet update` does.
+    return current[1] // 1_000_000_000 != int(db_mtime or 0)
+
+
+def _reread_items(
+    lib: Library,
+    changed: Sequence[tuple[int, str]],
+    workers: int,
+    batch_size: int,
+    progress: Optional[importer.ProgressCallback],
+) -> int:
+    """Reads the tags of changed files again and stores them.
+
+    Args:
+        lib: The beets library.
+        changed: The id and path of each changed item.
+        workers: The number of processes reading tags.
+        batch_size: The number of items updated per transaction.
+        progress: Called with the number of files processed and the total
+            after each batch.
+
+    Returns:
+        The number of files that could not be read.
+    """
+    failed = 0
+    with importer.read_all([path for _, path in changed], workers) as results:
+        for start in range(0, len(changed), batch_size):
+            batch = changed[start : start + batch_size]
+            with lib.transaction():
+                for item_id, path in batch:
+                    values, error = next(results)
+                    if values is None:
+                        logger.warning(f"Error reading {path}: {error}")
+                        failed += 1
+                        continue
+                    item = lib.get_item(item_id)
+                    if item is None:
+                        logger.warning(f"Skipping {path}: item {item_id} was removed")
+                        failed += 1
+                        continue
+                    item.update(
+                        {
+                            key: value
+                            for key, value in values.items()
+                            if key not in PRESERVED_FIELDS
+                        }
+                    )
+                    item.store()
+            if progress is not None:
+                progress(start + len(batch), len(changed))
+    return failed
+
+
+def _remove_items(lib: Library, item_ids: Sequence[int], batch_size: int):
+    """Removes items, and the albums they leave empty, from the library."""
+    for start in range(0, len(item_ids), batch_size):
+        with lib.transaction():
+            for item_id in item_ids[start : start + batch_size]:
+                item = lib.get_item(item_id)
+                if item is not None:
+                    item.remove(with_album=True)
+
+
+def sync_tree(
+    lib: Library,
+    root: str,
+    manifest: Manifest,
+    workers: int = 1,
+    batch_size: int = 1000,
+    ignore: Sequence[str] = importer.DEFAULT_IGNORE,
+    progress: Optional[importer.ProgressCallback] = None,
+) -> models.SyncStats:
+    """Brings a beets library up to date with a music directory.
+
+    The manifest is loaded from disk if it describes `root`, and replaced with
+    the signatures of the current tree once the library is updated. Without a
+    manifest, files are compared with the mtime stored in the database. Files
+    whose tags cannot be read are retried once they change.
+
+    Args:
+        lib: The beets library to update.
+        root: The music directory.
+        manifest: The scan manifest of the previous sync.
+        workers: The number of processes reading tags.
+        batch_size: The number of items written per transaction.
+        ignore: Glob patterns of file and directory names to skip.
+        progress: Called with the number of files processed and the total
+            after each batch of new or changed files.
+
+    Returns:
+        The sync counts and duration.
+
+    Raises:
+        OSError: If the music directory cannot be read.
+        concurrent.futures.process.BrokenProcessPool: If a worker dies.
+    """
+    start = time.monotonic()
+    root = os.path.abspath(root)
+    if manifest.root != root:
+        manifest.load(root)
+    with lib.transaction() as tx:
+        rows = tx.query("SELECT id, path, mtime FROM items")
+    known = {os.fsdecode(path): (item_id, mtime) for item_id, path, mtime in rows}
+
+    stats = models.SyncStats()
+    tree: dict[str, FileSignature] = {}
+    new_albums = []
+    changed = []
+    for _, entries in importer.scan_entries(root, ignore):
+        new = []
+        for entry in entries:
+            try:
+                signature = file_signature(entry.stat())
+            except OSError:
+                continue
+            tree[entry.path] = signature
+            row = known.get(entry.path)
+            previous = manifest.files.get(entry.path)
+            if row is None:
+                # Files that could not be read are only retried once they change.
+                if previous is None or tuple(previous) != signature:
+                    new.append(entry.path)
+            elif _is_changed(previous, signature, row[1]):
+                changed.append((row[0], entry.path))
+        if new:
+            new_albums.append(new)
+
+    prefix = os.path.join(root, "")
+    removed = [
+        item_id
+        for path, (item_id, _) in known.items()
+        if path.startswith(prefix) and path not in tree
+    ]
+
+    _remove_items(lib, removed, batch_size)
+    failed = _reread_items(lib, changed, workers, batch_size, progress)
+    imported = importer.import_files(lib, new_albums, workers, batch_size, progress)
+
+    manifest.root = root
+    manifest.files = tree
+    manifest.save()
+
+    stats.files = len(tree)
+    stats.added = imported.imported
+    stats.changed = len(changed) - failed
+    stats.removed = len(removed)
+    stats.failed = imported.failed + failed
+    stats.unchanged = stats.files - imported.files - len(changed)
+    stats.elapsed = time.monotonic() - start
+    return stats
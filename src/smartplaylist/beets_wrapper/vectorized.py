@@ -0,0 +1,229 @@
+"""Vectorized evaluation of beets queries over a track snapshot.
+
+This module evaluates parsed beets queries as NumPy boolean masks over the
+columns of a `TrackSnapshot`, instead of testing one `Item` at a time. It
+supports the common query forms: substring, exact and regular expression
+matches on text fields, numeric values and ranges, `^` negation and `,`
+alternatives. Text predicates are evaluated once per distinct value of a
+column and then expanded to every row.
+
+Results follow what beets returns for the same query through SQLite, e.g.
+substring matches ignore the case of ASCII letters only. Queries using a
+form or field the snapshot does not cover are reported as unsupported, so
+callers can fall back to beets.
+"""
+
+from typing import Any, Callable, Optional
+
+import numpy as np
+from beets.dbcore import query as dbquery  # type: ignore
+
+from .snapshot import (
+    NUMERIC_COLUMNS,
+    STRING_COLUMNS,
+    StringColumn,
+    TrackSnapshot,
+    ascii_lower,
+)
+
+QUERY_FIELDS = frozenset(NUMERIC_COLUMNS) | frozenset(STRING_COLUMNS)
+"""The item fields the evaluator can query."""
+
+
+class _Unsupported(Exception):
+    """Raised when part of a query cannot be evaluated over the snapshot."""
+
+
+Mask = tuple[np.ndarray, Optional[np.ndarray]]
+"""Whether each row matches, and whether its result is unknown, as SQL gives
+for NULL values. The second array is None when no result is unknown."""
+
+
+def evaluate(query: Any, snapshot: TrackSnapshot) -> Optional[np.ndarray]:
+    """Evaluates a parsed beets query over every row of a snapshot.
+
+    NULL values follow the three-valued logic of SQL: a comparison with NULL
+    is unknown, so neither it nor its negation matches.
+
+    Args:
+        query: A beets query object, e.g. the `beets_query` of a compiled
+            query.
+        snapshot: The snapshot to evaluate the query on.
+
+    Returns:
+        A boolean array telling whether each row matches, or None if the
+        query uses a form or field the evaluator does not support.
+    """
+    try:
+        return _mask(query, snapshot)[0]
+    except _Unsupported:
+        return None
+
+
+def sorted_rows(
+    snapshot: TrackSnapshot,
+    mask: np.ndarray,
+    field: str,
+    ascending: bool,
+    after: Optional[tuple[Any, int]] = None,
+) -> np.ndarray:
+    """Orders the matching rows by a field and the item id.
+
+    The order is the one SQLite gives to `ORDER BY IFNULL(field, ''), id`,
+    so pages built from the snapshot and from SQL share the same cursors:
+    NULL numbers sort after every number.
+
+    Args:
+        snapshot: The snapshot the mask was computed on.
+        mask: Whether each row matches.
+        field: The sort field, a column of the snapshot.
+        ascending: Whether the order is ascending.
+        after: The sort value and id of the last item of the previous page.
+            Only rows ordered after it are returned.
+
+    Returns:
+        The matching row numbers, in order.
+    """
+    column = snapshot.columns[field]
+    keys: np.ndarray
+    bound: Any = None
+    if isinstance(column, StringColumn):
+        keys = column.ranks()[column.codes].astype(np.float64)
+        if after is not None:
+            value = after[0]
+            bound = column.rank_of(value if isinstance(value, str) else str(value))
+    else:
+        keys = column
+        null = snapshot.nulls.get(field)
+        if null is not None:
+            keys = np.where(null, np.inf, column.astype(np.float64))
+        if after is not None:
+            bound = after[0] if after[0] != "" else np.inf
+    ids = snapshot.numbers("id")
+    if after is not None:
+        item_id = after[1]
+        if ascending:
+            mask = mask & ((keys > bound) | ((keys == bound) & (ids > item_id)))
+        else:
+            mask = mask & ((keys < bound) | ((keys == bound) & (ids < item_id)))
+    rows = np.flatnonzero(mask)
+    order = np.lexsort((ids[rows], keys[rows]))
+    if not ascending:
+        order = order[::-1]
+    return rows[order]
+
+
+def _mask(query: Any, snapshot: TrackSnapshot) -> Mask:
+    kind = type(query)
+    if kind is dbquery.TrueQuery:
+        return np.ones(len(snapshot), dtype=bool), None
+    if kind is dbquery.FalseQuery:
+        return np.zeros(len(snapshot), dtype=bool), None
+    if kind is dbquery.NotQuery:
+        matches, unknown = _mask(query.subquery, snapshot)
+        if unknown is None:
+            return ~matches, None
+        return ~matches & ~unknown, unknown
+    if kind is dbquery.AndQuery:
+        matches = np.ones(len(snapshot), dtype=bool)
+        unknown = np.zeros(len(snapshot), dtype=bool)
+        failed = np.zeros(len(snapshot), dtype=bool)
+        for subquery in query.subqueries:
+            sub_matches, sub_unknown = _mask(subquery, snapshot)
+            matches &= sub_matches
+            if sub_unknown is None:
+                failed |= ~sub_matches
+            else:
+                failed |= ~sub_matches & ~sub_unknown
+                unknown |= sub_unknown
+        return matches, unknown & ~failed
+    if kind is dbquery.OrQuery:
+        matches = np.zeros(len(snapshot), dtype=bool)
+        unknown = np.zeros(len(snapshot), dtype=bool)
+        for subquery in query.subqueries:
+            sub_matches, sub_unknown = _mask(subquery, snapshot)
+            matches |= sub_matches
+            if sub_unknown is not None:
+                unknown |= sub_unknown
+        return matches, unknown & ~matches
+
+    handler = _FIELD_HANDLERS.get(kind)
+    if (
+        handler is None
+        or not query.fast
+        or query.table not in ("", "items")
+        or query.field_name not in QUERY_FIELDS
+    ):
+        raise _Unsupported(repr(query))
+    matches = handler(query, snapshot.columns[query.field_name])
+    null = snapshot.nulls.get(query.field_name)
+    if null is None:
+        return matches, None
+    if kind is dbquery.RegexpQuery:
+        # beets' REGEXP function is called with NULL and matches it as "None".
+        matches[null] = query.pattern.search("None") is not None
+        return matches, None
+    return matches & ~null, null
+
+
+def _substring(query: Any, column: Any) -> np.ndarray:
+    if not isinstance(column, StringColumn):
+        raise _Unsupported(repr(query))
+    hits = np.strings.find(column.folded(), ascii_lower(query.pattern)) >= 0
+    return column.select(hits)
+
+
+def _string(query: Any, column: Any) -> np.ndarray:
+    if not isinstance(column, StringColumn):
+        raise _Unsupported(repr(query))
+    return column.select(column.folded() == ascii_lower(query.pattern))
+
+
+def _match(query: Any, column: Any) -> np.ndarray:
+    if isinstance(column, StringColumn):
+        return column.select(column.array() == str(query.pattern))
+    try:
+        value = float(query.pattern)
+    except (TypeError, ValueError):
+        return np.zeros(len(column), dtype=bool)
+    return column == value
+
+
+def _regexp(query: Any, column: Any) -> np.ndarray:
+    pattern = query.pattern
+    if isinstance(column, StringColumn):
+        values = column.values
+        hits = np.fromiter(
+            (pattern.search(v) is not None for v in values), bool, len(values)
+        )
+        return column.select(hits)
+    distinct, inverse = np.unique(column, return_inverse=True)
+    hits = np.fromiter(
+        (pattern.search(str(v)) is not None for v in distinct.tolist()),
+        bool,
+        len(distinct),
+    )
+    return hits[inverse]
+
+
+def _numeric(query: Any, column: Any) -> np.ndarray:
+    if isinstance(column, StringColumn):
+        raise _Unsupported(repr(query))
+    if query.point is not None:
+        return column == query.point
+    mask = np.ones(len(column), dtype=bool)
+    if query.rangemin is not None:
+        mask &= column >= query.rangemin
+    if query.rangemax is not None:
+        mask &= column <= query.rangemax
+    return mask
+
+
+_FIELD_HANDLERS: dict[type, Callable[[Any, Any], np.ndarray]] = {
+    dbquery.SubstringQuery: _substring,
+    dbquery.StringQuery: _string,
+    dbquery.MatchQuery: _match,
+    dbquery.RegexpQuery: _regexp,
+    dbquery.NumericQuery: _numeric,
+    dbquery.DurationQuery: _numeric,
+}
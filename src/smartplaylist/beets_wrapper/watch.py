@@ -0,0 +1,165 @@
+"""Continuous sync of a beets library with its music directory.
+
+This module provides a `LibraryWatcher` that polls the music directory and
+applies changes with the incremental sync. Bursts of changes, such as an album
+being copied in, are coalesced: the sync only runs once the tree has stopped
+changing between two polls. Polling relies on `stat` alone, so it works the
+same on local disks and network shares where file events are unreliable.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, ContextManager, Optional
+
+from . import exceptions, models, sync
+from .library import Library
+
+logger = logging.getLogger(__name__)
+
+IDLE_DUTY_CYCLE = 0.1
+"""The maximum fraction of time spent scanning while the tree is unchanged."""
+
+
+class LibraryWatcher:
+    """Polls a music directory and syncs the library when it changes.
+
+    The library is leased again for each scan and sync, so a watcher sharing
+    the library of a long-running process follows it when it is reopened,
+    and the handle it holds is not closed under it meanwhile.
+
+    Attributes:
+        lease_library: Returns a context manager holding the library kept in
+            sync open.
+        music_dir: The music directory watched, or None for the beets
+            `directory` of the library.
+        interval: The number of seconds between two polls while idle.
+        debounce: The number of seconds between two polls while changes are
+            pending.
+        max_delay: The maximum number of seconds a pending change waits for
+            the tree to settle before it is synced anyway.
+        on_sync: Called with the result of each sync.
+    """
+
+    def __init__(
+        self,
+        lease_library: Callable[[], ContextManager[Library]],
+        music_dir: Optional[str] = None,
+        interval: float = 60.0,
+        debounce: float = 5.0,
+        max_delay: float = 300.0,
+        on_sync: Optional[Callable[[models.SyncStats], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initializes the watcher.
+
+        Args:
+            lease_library: Returns a context manager holding the library kept
+                in sync open, e.g. `contextlib.nullcontext(library)`.
+            music_dir: The music directory watched, or None for the beets
+                `directory` of the library.
+            interval: The number of seconds between two polls while idle.
+            debounce: The number of seconds between two polls while changes
+                are pending.
+            max_delay: The maximum number of seconds a pending change waits
+                for the tree to settle.
+            on_sync: Called with the result of each sync.
+            clock: The time source.
+        """
+        self.lease_library = lease_library
+        self.music_dir = music_dir
+        self.interval = interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.on_sync = on_sync
+        self._clock = clock
+        self._synced: Optional[dict] = None
+        self._pending: Optional[dict] = None
+        self._pending_since = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sync(self) -> models.SyncStats:
+        """Syncs the library now and records the tree it was synced with.
+
+        Returns:
+            The sync counts and duration.
+
+        Raises:
+            exceptions.UpdateError: If the sync fails.
+        """
+        with self.lease_library() as library:
+            stats = library.sync_library(self.music_dir)
+            self._synced = dict(library.manifest.files)
+        self._pending = None
+        if self.on_sync is not None:
+            self.on_sync(stats)
+        return stats
+
+    def poll(self) -> float:
+        """Scans the tree once and syncs the library if it has settled.
+
+        Returns:
+            The number of seconds to wait before the next poll.
+
+        Raises:
+            exceptions.UpdateError: If the sync fails.
+            OSError: If the music directory cannot be read.
+        """
+        if self._synced is None:
+            self.sync()
+            return self.interval
+
+        started = self._clock()
+        with self.lease_library() as library:
+            tree = sync.scan_tree(
+                self.music_dir or library.music_dir, library.ignore_patterns
+            )
+        now = self._clock()
+        idle_delay = max(self.interval, (now - started) / IDLE_DUTY_CYCLE)
+        if tree == self._synced:
+            self._pending = None
+            return idle_delay
+        if self._pending is None:
+            self._pending, self._pending_since = tree, now
+            return self.debounce
+        if tree != self._pending and now - self._pending_since < self.max_delay:
+            self._pending = tree
+            return self.debounce
+        logger.info("Music directory changed, syncing library")
+        self.sync()
+        return idle_delay
+
+    def run(self):
+        """Polls until `stop` is called. Sync failures are logged and retried."""
+        delay = 0.0
+        while not self._stop.wait(delay):
+            try:
+                delay = self.poll()
+            except (exceptions.BeetsWrapperError, OSError) as e:
+                logger.error(f"Error watching the music directory: {e}")
+                delay = self.interval
+
+    def start(self) -> threading.Thread:
+        """Starts polling in a background thread.
+
+        Returns:
+            The daemon thread running the watcher.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run, name="library-watcher", daemon=True
+        )
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops polling and waits for the background thread, if any.
+
+        Args:
+            timeout: The maximum number of seconds to wait for the thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
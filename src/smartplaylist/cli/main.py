@@ -1,11 +1,15 @@
-"""Command-line interface for smartplaylist."""
+"""Command-line interface for smartplaylist.
 
+Commands import the beets wrapper, the settings and the MCP server when they
+run rather than at module import, so that `--version`, `--help` and quick
+commands do not pay for loading the whole server stack.
+"""
+
+import contextlib
+import time
 import typer
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader
-from smartplaylist.beets_wrapper import library, exceptions
-from smartplaylist.settings import get_settings
-from smartplaylist.mcp_server.main import main as mcp_server_main
+from typing import Callable, List, Optional
 import importlib.metadata
 
 
@@ -25,6 +29,27 @@ def version_callback(value: bool):
         raise typer.Exit()
 
 
+def _progress_reporter(interval: float = 1.0) -> Callable[[int, int], None]:
+    """Returns a progress callback printing at most one line per interval.
+
+    Args:
+        interval: The minimum number of seconds between two lines.
+
+    Returns:
+        A callable receiving the number of files processed and the total.
+    """
+    last = 0.0
+
+    def report(processed: int, total: int):
+        nonlocal last
+        now = time.monotonic()
+        if processed == total or now - last >= interval:
+            last = now
+            typer.echo(f"Processed {processed}/{total} files")
+
+    return report
+
+
 @app.command()
 def sync(
     music_library_path: Path = typer.Argument(
@@ -42,16 +67,36 @@ def sync(
         "--force-init",
         help="Force re-initialization, deleting the existing database.",
     ),
+    workers: Optional[int] = typer.Option(
+        None,
+        "--workers",
+        min=1,
+        help="Number of processes reading tags. Defaults to one per CPU.",
+    ),
+    full_update: bool = typer.Option(
+        False,
+        "--full-update",
+        help="Run a full `beet update` instead of the incremental sync.",
+    ),
 ):
     """Initializes or updates the smartplaylist database.
 
     This command intelligently handles the database by either initializing it
-    (if it doesn't exist or --force-init is used) or updating it.
+    (if it doesn't exist or --force-init is used) or updating it. Updates are
+    incremental: only new, changed and deleted files are processed.
 
     Args:
         music_library_path: The path to the user's music library.
         force_init: If True, deletes and re-initializes the database.
+        workers: The number of processes reading tags during an import.
+        full_update: If True, runs `beet update` instead of the incremental
+            sync on an existing database.
     """
+    from jinja2 import Environment, FileSystemLoader
+
+    from smartplaylist.beets_wrapper import exceptions, library
+    from smartplaylist.settings import get_settings
+
     settings = get_settings()
     try:
         data_dir = music_library_path / ".smartplaylist"
@@ -86,13 +131,35 @@ def sync(
 
             typer.echo(f"Configuration file created at {config_path}")
             lib = library.Library(str(config_path.resolve()), settings)
-            lib.import_dir(str(music_library_path.resolve()))
+            import_stats = lib.import_dir(
+                str(music_library_path.resolve()),
+                workers=workers,
+                progress=_progress_reporter(),
+            )
             typer.echo(f"Successfully imported music from {music_library_path}")
+            typer.echo(
+                f"Imported {import_stats.imported} tracks in "
+                f"{import_stats.albums} albums ({import_stats.skipped} skipped, "
+                f"{import_stats.failed} unreadable) in {import_stats.elapsed:.1f}s"
+            )
             typer.echo(f"Beets database created at {db_path}")
         else:
             typer.echo("Database exists. Updating library...")
             lib = library.Library(str(config_path.resolve()), settings)
-            lib.update_library()
+            if full_update:
+                lib.update_library()
+            else:
+                sync_stats = lib.sync_library(
+                    str(music_library_path.resolve()),
+                    workers=workers,
+                    progress=_progress_reporter(),
+                )
+                typer.echo(
+                    f"{sync_stats.added} added, {sync_stats.changed} changed, "
+                    f"{sync_stats.removed} removed, {sync_stats.unchanged} "
+                    f"unchanged ({sync_stats.failed} unreadable) in "
+                    f"{sync_stats.elapsed:.1f}s"
+                )
             typer.echo("Library updated successfully.")
 
     except exceptions.BeetsWrapperError as e:
@@ -106,12 +173,256 @@ def sync(
         raise typer.Exit(code=1)
 
 
+@app.command("create-playlists")
+def create_playlists(
+    music_library_path: Path = typer.Argument(
+        ...,
+        help="The path to your music library directory.",
+        exists=True,
+        file_okay=False,
+        dir_okay=True,
+        readable=True,
+        resolve_path=True,
+    ),
+    field: Optional[str] = typer.Option(
+        None,
+        "--field",
+        help="Create one playlist per value of this field "
+        "(genre, artist, albumartist, year, decade or format).",
+    ),
+    queries: Optional[List[str]] = typer.Option(
+        None,
+        "--query",
+        help="A playlist to create, as NAME=QUERY. Can be repeated.",
+    ),
+    filter_query: Optional[str] = typer.Option(
+        None,
+        "--filter",
+        help="A beets query restricting the tracks considered.",
+    ),
+    prefix: str = typer.Option("", "--prefix", help="A prefix for the playlist names."),
+    playlist_format: Optional[str] = typer.Option(
+        None,
+        "--format",
+        help="The playlist format: m3u, extm3u, pls, xspf or jsonl. "
+        "Defaults to SMARTPLAYLIST_PLAYLIST_FORMAT or the playlist extension.",
+    ),
+):
+    """Creates many playlists from a single scan of the library.
+
+    Args:
+        music_library_path: The path to the user's music library.
+        field: The field whose values define the playlists.
+        queries: The playlists to create, as NAME=QUERY strings.
+        filter_query: A beets query restricting the tracks considered.
+        prefix: A prefix for the playlist names.
+        playlist_format: The name of the playlist format.
+    """
+    from smartplaylist.beets_wrapper import exceptions, formats, library
+    from smartplaylist.settings import get_settings
+
+    settings = get_settings()
+    config_path = music_library_path / ".smartplaylist" / "config.yaml"
+    named = {}
+    for spec in queries or []:
+        name, sep, query = spec.partition("=")
+        if not sep or not name:
+            typer.echo(
+                f"Error: invalid --query '{spec}', expected NAME=QUERY", err=True
+            )
+            raise typer.Exit(code=1)
+        named[name] = query
+    try:
+        extension = settings.playlist_extension
+        if playlist_format:
+            extension = formats.get_format(playlist_format).extension
+        lib = library.Library(str(config_path.resolve()), settings)
+        results = lib.create_playlists_by_field(
+            lib.playlist_dir,
+            extension,
+            field=field,
+            queries=named or None,
+            query=filter_query,
+            prefix=prefix,
+            playlist_format=playlist_format,
+        )
+    except exceptions.BeetsWrapperError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(code=1)
+    for result in results:
+        typer.echo(f"{result.track_count:>8} tracks  {result.path}")
+    typer.echo(f"{len(results)} playlists created.")
+
+
+@app.command("save-playlist")
+def save_playlist(
+    music_library_path: Path = typer.Argument(
+        ...,
+        help="The path to your music library directory.",
+        exists=True,
+        file_okay=False,
+        dir_okay=True,
+        readable=True,
+        resolve_path=True,
+    ),
+    name: str = typer.Argument(..., help="The name of the playlist."),
+    query: str = typer.Argument(..., help="The beets query selecting the tracks."),
+    sort: Optional[str] = typer.Option(
+        None, "--sort", help="A field to sort by, such as `year` or `year-`."
+    ),
+    limit: Optional[int] = typer.Option(
+        None, "--limit", min=1, help="The maximum number of tracks."
+    ),
+):
+    """Saves a smart playlist definition and writes its playlist.
+
+    Saved playlists are kept up to date by `refresh-playlists`.
+
+    Args:
+        music_library_path: The path to the user's music library.
+        name: The name of the playlist.
+        query: The beets query selecting the tracks.
+        sort: The sort term of the playlist.
+        limit: The maximum number of tracks.
+    """
+    from smartplaylist.beets_wrapper import exceptions, library
+    from smartplaylist.settings import get_settings
+
+    settings = get_settings()
+    config_path = music_library_path / ".smartplaylist" / "config.yaml"
+    try:
+        lib = library.Library(str(config_path.resolve()), settings)
+        lib.save_playlist(name, query, sort=sort, limit=limit)
+        (result,) = lib.refresh_playlists(settings.playlist_extension, names=[name])
+    except exceptions.BeetsWrapperError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(code=1)
+    typer.echo(f"{result.track_count:>8} tracks  {result.path}")
+    typer.echo(f"Playlist '{name}' saved.")
+
+
+@app.command("refresh-playlists")
+def refresh_playlists(
+    music_library_path: Path = typer.Argument(
+        ...,
+        help="The path to your music library directory.",
+        exists=True,
+        file_okay=False,
+        dir_okay=True,
+        readable=True,
+        resolve_path=True,
+    ),
+    names: Optional[List[str]] = typer.Option(
+        None,
+        "--name",
+        help="A saved playlist to refresh. Can be repeated. Defaults to all.",
+    ),
+    force: bool = typer.Option(
+        False, "--force", help="Rewrite every playlist, changed or not."
+    ),
+):
+    """Rewrites the saved playlists whose tracks changed.
+
+    Args:
+        music_library_path: The path to the user's music library.
+        names: The saved playlists to refresh.
+        force: If True, rewrites unchanged playlists too.
+    """
+    from smartplaylist.beets_wrapper import exceptions, library
+    from smartplaylist.settings import get_settings
+
+    settings = get_settings()
+    config_path = music_library_path / ".smartplaylist" / "config.yaml"
+    try:
+        lib = library.Library(str(config_path.resolve()), settings)
+        results = lib.refresh_playlists(
+            settings.playlist_extension, names=names or None, force=force
+        )
+    except exceptions.BeetsWrapperError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(code=1)
+    for result in results:
+        state = "updated" if result.changed else "unchanged"
+        typer.echo(f"{result.track_count:>8} tracks  {state:<9}  {result.path}")
+    changed = sum(r.changed for r in results)
+    typer.echo(f"{changed} of {len(results)} playlists rewritten.")
+
+
+@app.command()
+def watch(
+    music_library_path: Path = typer.Argument(
+        ...,
+        help="The path to your music library directory.",
+        exists=True,
+        file_okay=False,
+        dir_okay=True,
+        readable=True,
+        resolve_path=True,
+    ),
+    interval: Optional[float] = typer.Option(
+        None,
+        "--interval",
+        min=0.1,
+        help="Seconds between two scans. Defaults to SMARTPLAYLIST_WATCH_INTERVAL.",
+    ),
+):
+    """Keeps the smartplaylist database in sync with the music library.
+
+    The music directory is scanned periodically and changes are applied with
+    an incremental sync once they have settled. Stop with Ctrl+C.
+
+    Args:
+        music_library_path: The path to the user's music library.
+        interval: The number of seconds between two scans.
+    """
+    from smartplaylist.beets_wrapper import exceptions, library
+    from smartplaylist.beets_wrapper.watch import LibraryWatcher
+    from smartplaylist.settings import get_settings
+
+    settings = get_settings()
+    config_path = music_library_path / ".smartplaylist" / "config.yaml"
+    try:
+        if not library.Library.db_exists(str(config_path)):
+            typer.echo("No database found. Run `smartplaylist sync` first.", err=True)
+            raise typer.Exit(code=1)
+        lib = library.Library(str(config_path.resolve()), settings)
+        watcher = LibraryWatcher(
+            lambda: contextlib.nullcontext(lib),
+            music_dir=str(music_library_path),
+            interval=interval or settings.watch_interval,
+            debounce=settings.watch_debounce,
+            on_sync=lambda stats: typer.echo(
+                f"{stats.added} added, {stats.changed} changed, "
+                f"{stats.removed} removed in {stats.elapsed:.1f}s"
+            ),
+        )
+        typer.echo(f"Watching {music_library_path} for changes...")
+        watcher.run()
+    except KeyboardInterrupt:
+        typer.echo("Watch stopped.")
+    except exceptions.BeetsWrapperError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(code=1)
+    except PermissionError as e:
+        typer.echo(f"Permission Error: {e}", err=True)
+        raise typer.Exit(code=1)
+
+
 @app.command()
-def serve():
+def serve(
+    watch: bool = typer.Option(
+        False,
+        "--watch",
+        help="Keep the library in sync with the music directory while serving.",
+    ),
+):
     """Starts the MCP server using the configured settings."""
     import os
     import pprint
 
+    from smartplaylist.mcp_server.main import main as mcp_server_main
+    from smartplaylist.settings import get_settings
+
     pprint.pprint(dict(os.environ))
 
     settings = get_settings()
@@ -119,7 +430,7 @@ def serve():
         typer.echo(
             f"Starting MCP server on {settings.mcp_server_host}:{settings.mcp_server_port}"
         )
-        mcp_server_main(settings=settings)
+        mcp_server_main(settings=settings, watch=watch)
     except KeyboardInterrupt:
         typer.echo("Server stopped.")
 
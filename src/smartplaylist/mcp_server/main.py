@@ -1,20 +1,32 @@
 """Main MCP server application for SmartPlaylist.
 
 This module defines the MCP tools for interacting with the beets library and
-manages the server lifecycle.
+manages the server lifecycle. Tools doing blocking beets work are coroutines
+that run that work on a bounded worker pool, so the event loop keeps serving
+other clients meanwhile.
 """
 
+import asyncio
+import contextlib
 import logging
 import os
+from typing import Iterator, Optional
 
-from beets import config
 from mcp.server.fastmcp import FastMCP
 from mcp.server.transport_security import TransportSecuritySettings
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+
+from smartplaylist import metrics
 
 from smartplaylist.beets_wrapper import exceptions as beets_exceptions
+from smartplaylist.beets_wrapper import export, formats, fulltext
 from smartplaylist.beets_wrapper.library import Library as BeetsLibrary
+from smartplaylist.beets_wrapper.manager import LibraryManager
+from smartplaylist.beets_wrapper.watch import LibraryWatcher
 from smartplaylist.logging_config import setup_logging
 from smartplaylist.mcp_server import models
+from smartplaylist.mcp_server.workers import WorkerPool
 from smartplaylist.settings import Settings, get_settings
 
 setup_logging()
@@ -22,6 +34,10 @@ logger = logging.getLogger(__name__)
 
 mcp = FastMCP(name="smartplaylist-mcp-server")
 
+library_manager = LibraryManager()
+
+worker_pool = WorkerPool()
+
 TOOL_DEFINITIONS: list[dict[str, str]] = [
     {
         "name": "list_tools",
@@ -35,42 +51,115 @@ TOOL_DEFINITIONS: list[dict[str, str]] = [
         "name": "list_genres",
         "description": "Lists all genres in the library along with the number of tracks for each.",
     },
+    {
+        "name": "list_facet",
+        "description": "Lists the values of a field (genre, artist, albumartist, year, decade or format) with their track counts.",
+    },
+    {
+        "name": "resolve_names",
+        "description": "Resolves a possibly misspelled artist, album artist, album or genre name to the closest values in the library, with similarity scores.",
+    },
     {
         "name": "list_playlists",
-        "description": "Lists all existing playlists found in the beets configuration.",
+        "description": "Lists all existing playlists with their size, modification time, track count and saved query.",
     },
     {
         "name": "create_playlist",
-        "description": "Creates a new playlist file from a beets query.",
+        "description": "Creates a new playlist file from a beets query, optionally sequenced for smooth transitions.",
+    },
+    {
+        "name": "build_playlist",
+        "description": "Creates a playlist filling a total duration and/or file size from a beets query, with an optional limit of tracks per artist.",
+    },
+    {
+        "name": "create_playlists_by_field",
+        "description": "Creates one playlist per value of a field, or per named query, from a single library scan.",
+    },
+    {
+        "name": "save_playlist",
+        "description": "Saves a smart playlist definition (query, sort and limit) and writes its playlist file.",
+    },
+    {
+        "name": "delete_saved_playlist",
+        "description": "Deletes a saved smart playlist definition, keeping its playlist file.",
+    },
+    {
+        "name": "refresh_playlists",
+        "description": "Rewrites the saved smart playlists whose tracks changed since their last refresh.",
     },
     {
         "name": "search_library",
-        "description": "Searches the library using a beets query.",
+        "description": "Searches the library using a beets query, one page of results at a time.",
+    },
+    {
+        "name": "fulltext_search",
+        "description": "Finds the tracks whose title, artist, album, genre or composer best match free text, ranked by relevance.",
+    },
+    {
+        "name": "similar_tracks",
+        "description": "Finds the tracks most like a track by genre, year, bpm, length, bitrate and musical key.",
+    },
+    {
+        "name": "get_server_metrics",
+        "description": "Reports the latency, error and row counts of every tool and library call, and the state of the server pools and caches.",
     },
 ]
 
 
-def _get_library(settings: Settings) -> BeetsLibrary:
-    """Initializes and returns a BeetsLibrary instance.
+TRACK_FIELDS = ("id", "title", "artist", "album", "genre", "year", "path")
+"""The item fields returned for each track by `search_library`."""
+
+
+@contextlib.contextmanager
+def _library(settings: Settings) -> Iterator[BeetsLibrary]:
+    """Holds the shared BeetsLibrary instance for the duration of a block.
+
+    The library is opened once per process and reused by every tool call. It
+    is only reopened when the beets configuration file changes, and the
+    instance a call holds is not closed before the call is done with it.
 
     Args:
         settings: The application settings.
 
-    Returns:
+    Yields:
         A BeetsLibrary instance.
 
     Raises:
         beets_exceptions.BeetsWrapperError: If the library cannot be initialized.
     """
     config_path = str(settings.beets_config_path)
-    try:
-        return BeetsLibrary(config_path, settings)
-    except beets_exceptions.BeetsWrapperError as e:
-        logger.error(f"Error accessing beets library with config at {config_path}: {e}")
-        raise
+    with contextlib.ExitStack() as stack:
+        try:
+            library = stack.enter_context(library_manager.lease(settings))
+        except beets_exceptions.BeetsWrapperError as e:
+            logger.error(
+                f"Error accessing beets library with config at {config_path}: {e}"
+            )
+            raise
+        yield library
+
+
+def _playlist_extension(settings: Settings, playlist_format: Optional[str]) -> str:
+    """Returns the file extension of playlists written in a format.
+
+    Args:
+        settings: The application settings.
+        playlist_format: The format requested by the client, if any.
+
+    Returns:
+        The extension of the format, or the configured playlist extension if
+        no format was requested.
+
+    Raises:
+        beets_exceptions.QueryError: If the format is unknown.
+    """
+    if playlist_format:
+        return formats.get_format(playlist_format).extension
+    return settings.playlist_extension
 
 
 @mcp.tool()
+@metrics.instrument("tool")
 def list_tools() -> list[models.ToolInfo]:
     """Retrieves a list of all available tools on the server.
 
@@ -81,6 +170,8 @@ def list_tools() -> list[models.ToolInfo]:
 
 
 @mcp.tool()
+@metrics.instrument("tool")
+@worker_pool.offload
 def get_library_statistics() -> models.LibraryStatistics:
     """Retrieves high-level statistics about the music library.
 
@@ -88,18 +179,20 @@ def get_library_statistics() -> models.LibraryStatistics:
         An object containing library statistics.
     """
     settings = get_settings()
-    library = _get_library(settings)
-    stats = library.get_statistics()
-    genres = library.list_genres()
-    return models.LibraryStatistics(
-        total_tracks=stats.total_tracks,
-        total_albums=stats.total_albums,
-        total_artists=stats.total_artists,
-        total_genres=len(genres),
-    )
+    with _library(settings) as library:
+        stats = library.get_statistics(include_size=False)
+        return models.LibraryStatistics(
+            total_tracks=stats.total_tracks,
+            total_albums=stats.total_albums,
+            total_artists=stats.total_artists,
+            total_genres=stats.total_genres,
+            total_duration=stats.total_duration,
+        )
 
 
 @mcp.tool()
+@metrics.instrument("tool")
+@worker_pool.offload
 def list_genres() -> models.ListGenresResponse:
     """Lists all genres in the library along with the number of tracks for each.
 
@@ -107,61 +200,410 @@ def list_genres() -> models.ListGenresResponse:
         A response object containing a list of genres.
     """
     settings = get_settings()
-    library = _get_library(settings)
-    genres = library.list_genres()
-    return models.ListGenresResponse(
-        genres=[models.GenreInfo(name=g.name, track_count=g.count) for g in genres]
-    )
+    with _library(settings) as library:
+        genres = library.list_genres()
+        return models.ListGenresResponse(
+            genres=[models.GenreInfo(name=g.name, track_count=g.count) for g in genres]
+        )
+
+
+@mcp.tool()
+@metrics.instrument("tool")
+@worker_pool.offload
+def list_facet(field: str) -> models.ListFacetResponse:
+    """Lists the values of a field along with the number of tracks for each.
+
+    Args:
+        field: One of `genre`, `artist`, `albumartist`, `year`, `decade` or
+            `format`.
+
+    Returns:
+        A response object containing the values of the field.
+    """
+    settings = get_settings()
+    with _library(settings) as library:
+        try:
+            values = library.list_facet(field)
+        except beets_exceptions.BeetsWrapperError as e:
+            logger.error(f"Error listing facet: {e}")
+            raise
+        return models.ListFacetResponse(
+            field=field,
+            values=[
+                models.FacetValueInfo(value=v.value, track_count=v.count)
+                for v in values
+            ],
+        )
 
 
 @mcp.tool()
-def list_playlists() -> models.ListPlaylistsResponse:
+@metrics.instrument("tool")
+@worker_pool.offload
+def resolve_names(
+    name: str, field: Optional[str] = None, limit: int = 5
+) -> models.ResolveNamesResponse:
+    """Resolves a possibly misspelled name to the values stored in the library.
+
+    Use it before searching for an artist, album or genre whose exact
+    spelling is unknown, e.g. `Bjork`, `Guns and Roses` or `hiphop`. Case,
+    accents, punctuation and spaces are ignored.
+
+    Args:
+        name: The name to resolve.
+        field: One of `artist`, `albumartist`, `album` or `genre`. Defaults to
+            all of them.
+        limit: The maximum number of matches to return.
+
+    Returns:
+        A response object containing the closest values with their scores.
+    """
+    settings = get_settings()
+    with _library(settings) as library:
+        try:
+            matches = library.resolve_names(
+                name, fields=[field] if field else None, limit=max(1, limit)
+            )
+        except beets_exceptions.BeetsWrapperError as e:
+            logger.error(f"Error resolving names: {e}")
+            raise
+        return models.ResolveNamesResponse(
+            name=name,
+            matches=[
+                models.NameMatchInfo(
+                    field=m.field, value=m.value, score=m.score, track_count=m.count
+                )
+                for m in matches
+            ],
+        )
+
+
+@mcp.tool()
+@metrics.instrument("tool")
+@worker_pool.offload
+def list_playlists(include_track_counts: bool = True) -> models.ListPlaylistsResponse:
     """Lists all existing playlists found in the beets configuration.
 
+    Args:
+        include_track_counts: Whether to count the tracks of each playlist.
+            Counts are cached until the playlist file changes.
+
     Returns:
-        A response object containing a list of playlist names.
+        A response object containing the playlist names, with the size,
+        modification time, track count and query of each playlist.
     """
     settings = get_settings()
-    library = _get_library(settings)
-    playlists = library.list_playlists(settings.playlist_extension)
-    return models.ListPlaylistsResponse(playlists=[p.name for p in playlists])
+    with _library(settings) as library:
+        playlists = library.list_playlists(
+            settings.playlist_extension, track_counts=include_track_counts
+        )
+        return models.ListPlaylistsResponse(
+            playlists=[p.name for p in playlists],
+            details=[
+                models.PlaylistDetails(
+                    name=p.name,
+                    size=p.size,
+                    modified=p.mtime,
+                    track_count=p.track_count,
+                    query=p.query,
+                )
+                for p in playlists
+            ],
+        )
 
 
 @mcp.tool()
-def create_playlist(playlist_name: str, query: str) -> models.CreatePlaylistResponse:
+@metrics.instrument("tool")
+@worker_pool.offload
+def create_playlist(
+    playlist_name: str,
+    query: str,
+    playlist_format: Optional[str] = None,
+    order: Optional[str] = None,
+) -> models.CreatePlaylistResponse:
     """Creates a new playlist file from a beets query.
 
     Args:
-        playlist_name: The name of the playlist to create.
+        playlist_name: The name of the playlist to create. Path separators and
+            reserved characters are replaced by underscores.
         query: The beets query to use to generate the playlist.
+        playlist_format: One of `m3u`, `extm3u`, `pls`, `xspf` or `jsonl`.
+            Defaults to the server's configured format.
+        order: `smooth` to sequence the tracks like a DJ set, with small
+            changes of tempo, key and year between consecutive tracks and no
+            artist twice in a row. Defaults to the order of the query.
 
     Returns:
         A response object with the status of the operation and the path to the
         created playlist.
     """
     settings = get_settings()
-    library = _get_library(settings)
-    try:
-        playlist_dir = config["smartplaylist"]["playlist_dir"].get(str)
-        playlist_path = os.path.join(
-            playlist_dir, f"{playlist_name}.{settings.playlist_extension}"
+    with _library(settings) as library:
+        try:
+            playlist_dir = library.playlist_dir
+            extension = _playlist_extension(settings, playlist_format)
+            filename = export.safe_filename(playlist_name)
+            playlist_path = os.path.join(playlist_dir, f"{filename}.{extension}")
+            result = library.create_playlist(
+                query, playlist_path, playlist_format=playlist_format, order=order
+            )
+            return models.CreatePlaylistResponse(
+                status="Playlist created successfully",
+                playlist_path=playlist_path,
+                track_count=result.track_count,
+                bytes_written=result.bytes_written,
+            )
+        except beets_exceptions.BeetsWrapperError as e:
+            logger.error(f"Error creating playlist: {e}")
+            raise
+
+
+@mcp.tool()
+@metrics.instrument("tool")
+@worker_pool.offload
+def build_playlist(
+    playlist_name: str,
+    query: str,
+    max_minutes: Optional[float] = None,
+    max_megabytes: Optional[float] = None,
+    max_per_artist: Optional[int] = None,
+    playlist_format: Optional[str] = None,
+    order: Optional[str] = None,
+) -> models.BuildPlaylistResponse:
+    """Creates a playlist filling a total duration and/or file size.
+
+    Among the tracks matching the query, the selection coming closest to the
+    budgets without exceeding them is written, e.g. two hours of jazz or
+    enough music to fill a 700 MB card. At least one budget must be given.
+
+    Args:
+        playlist_name: The name of the playlist to create. Path separators and
+            reserved characters are replaced by underscores.
+        query: The beets query selecting the candidate tracks.
+        max_minutes: The largest total duration, in minutes.
+        max_megabytes: The largest total file size, in megabytes (10^6 bytes).
+        max_per_artist: The largest number of tracks of one artist. The first
+            tracks of each artist in query order are kept.
+        playlist_format: One of `m3u`, `extm3u`, `pls`, `xspf` or `jsonl`.
+            Defaults to the server's configured format.
+        order: `smooth` to sequence the selected tracks like a DJ set, see
+            `create_playlist`. Defaults to the order of the query.
+
+    Returns:
+        A response object with the path to the created playlist and the total
+        duration and size of its tracks.
+    """
+    settings = get_settings()
+    with _library(settings) as library:
+        try:
+            playlist_dir = library.playlist_dir
+            extension = _playlist_extension(settings, playlist_format)
+            filename = export.safe_filename(playlist_name)
+            playlist_path = os.path.join(playlist_dir, f"{filename}.{extension}")
+            result = library.build_playlist(
+                query,
+                playlist_path,
+                max_length=None if max_minutes is None else max_minutes * 60,
+                max_size=None if max_megabytes is None else int(max_megabytes * 1e6),
+                max_per_artist=max_per_artist,
+                playlist_format=playlist_format,
+                order=order,
+            )
+            return models.BuildPlaylistResponse(
+                status="Playlist created successfully",
+                playlist_path=playlist_path,
+                track_count=result.track_count,
+                bytes_written=result.bytes_written,
+                total_duration=result.total_length,
+                total_size=result.total_size,
+                candidate_count=result.candidates,
+            )
+        except beets_exceptions.BeetsWrapperError as e:
+            logger.error(f"Error building playlist: {e}")
+            raise
+
+
+@mcp.tool()
+@metrics.instrument("tool")
+@worker_pool.offload
+def create_playlists_by_field(
+    field: Optional[str] = None,
+    queries: Optional[dict[str, str]] = None,
+    query: Optional[str] = None,
+    prefix: str = "",
+    playlist_format: Optional[str] = None,
+) -> models.CreatePlaylistsResponse:
+    """Creates many playlists from a single scan of the library.
+
+    Pass either `field`, to write one playlist per value of the field, or
+    `queries`, to write one playlist per named beets query.
+
+    Args:
+        field: One of `genre`, `artist`, `albumartist`, `year`, `decade` or
+            `format`.
+        queries: The beets query of each playlist, keyed by playlist name.
+        query: A beets query restricting the tracks considered.
+        prefix: A prefix for the playlist names, e.g. `Genre - `.
+        playlist_format: One of `m3u`, `extm3u`, `pls`, `xspf` or `jsonl`.
+            Defaults to the server's configured format.
+
+    Returns:
+        A response object listing the created playlists with their track
+        counts.
+    """
+    settings = get_settings()
+    with _library(settings) as library:
+        try:
+            playlist_dir = library.playlist_dir
+            results = library.create_playlists_by_field(
+                playlist_dir,
+                _playlist_extension(settings, playlist_format),
+                field=field,
+                queries=queries,
+                query=query,
+                prefix=prefix,
+                playlist_format=playlist_format,
+            )
+            return models.CreatePlaylistsResponse(
+                status=f"{len(results)} playlists created successfully",
+                playlists=[
+                    models.PlaylistInfo(
+                        playlist_path=r.path,
+                        track_count=r.track_count,
+                        bytes_written=r.bytes_written,
+                    )
+                    for r in results
+                ],
+            )
+        except beets_exceptions.BeetsWrapperError as e:
+            logger.error(f"Error creating playlists: {e}")
+            raise
+
+
+@mcp.tool()
+@metrics.instrument("tool")
+@worker_pool.offload
+def save_playlist(
+    playlist_name: str,
+    query: str,
+    sort: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> models.CreatePlaylistResponse:
+    """Saves a smart playlist definition and writes its playlist file.
+
+    Saved playlists are kept up to date by `refresh_playlists`. Saving a
+    playlist under an existing name replaces its definition.
+
+    Args:
+        playlist_name: The name of the playlist.
+        query: The beets query selecting the tracks.
+        sort: A field to sort by, such as `year`, `year+` or `year-`.
+        limit: The maximum number of tracks.
+
+    Returns:
+        A response object with the path to the playlist and its track count.
+    """
+    settings = get_settings()
+    with _library(settings) as library:
+        try:
+            library.save_playlist(playlist_name, query, sort=sort, limit=limit)
+            (result,) = library.refresh_playlists(
+                settings.playlist_extension, names=[playlist_name]
+            )
+            return models.CreatePlaylistResponse(
+                status="Playlist saved successfully",
+                playlist_path=result.path,
+                track_count=result.track_count,
+                bytes_written=result.bytes_written,
+            )
+        except beets_exceptions.BeetsWrapperError as e:
+            logger.error(f"Error saving playlist: {e}")
+            raise
+
+
+@mcp.tool()
+@metrics.instrument("tool")
+@worker_pool.offload
+def delete_saved_playlist(playlist_name: str) -> models.DeleteSavedPlaylistResponse:
+    """Deletes a saved smart playlist definition.
+
+    The playlist file is kept, but is no longer refreshed.
+
+    Args:
+        playlist_name: The name of the saved playlist.
+
+    Returns:
+        A response object telling whether the playlist was saved.
+    """
+    settings = get_settings()
+    with _library(settings) as library:
+        try:
+            deleted = library.delete_saved_playlist(playlist_name)
+        except beets_exceptions.BeetsWrapperError as e:
+            logger.error(f"Error deleting saved playlist: {e}")
+            raise
+        return models.DeleteSavedPlaylistResponse(
+            status="Saved playlist deleted" if deleted else "No saved playlist found",
+            deleted=deleted,
         )
-        library.create_playlist(query, playlist_path)
-        track_count = len(library.items(query))
-        return models.CreatePlaylistResponse(
-            status="Playlist created successfully",
-            playlist_path=playlist_path,
-            track_count=track_count,
+
+
+@mcp.tool()
+@metrics.instrument("tool")
+@worker_pool.offload
+def refresh_playlists(
+    playlist_names: Optional[list[str]] = None, force: bool = False
+) -> models.RefreshPlaylistsResponse:
+    """Rewrites the saved smart playlists whose tracks changed.
+
+    Playlists whose tracks are unchanged since their last refresh are not
+    rewritten.
+
+    Args:
+        playlist_names: The saved playlists to refresh. Defaults to all.
+        force: Whether to rewrite every playlist, changed or not.
+
+    Returns:
+        A response object listing the saved playlists and whether each was
+        rewritten.
+    """
+    settings = get_settings()
+    with _library(settings) as library:
+        try:
+            results = library.refresh_playlists(
+                settings.playlist_extension, names=playlist_names, force=force
+            )
+        except beets_exceptions.BeetsWrapperError as e:
+            logger.error(f"Error refreshing playlists: {e}")
+            raise
+        changed = sum(r.changed for r in results)
+        return models.RefreshPlaylistsResponse(
+            status=f"{changed} of {len(results)} playlists rewritten",
+            playlists=[
+                models.SavedPlaylistInfo(
+                    name=r.name,
+                    playlist_path=r.path,
+                    track_count=r.track_count,
+                    changed=r.changed,
+                )
+                for r in results
+            ],
         )
-    except beets_exceptions.BeetsWrapperError as e:
-        logger.error(f"Error creating playlist: {e}")
-        raise
 
 
 @mcp.tool()
-def search_library(query: str) -> models.SearchLibraryResponse:
+@metrics.instrument("tool")
+@worker_pool.offload
+def search_library(
+    query: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+) -> models.SearchLibraryResponse:
     """Searches the library using a beets query.
 
+    Results are paginated. Pass the `next_cursor` of a response as `cursor`,
+    with the same query and sort, to fetch the next page.
+
     Note:
         The natural language to beets query translation has been removed as part
         of the refactoring. The client is now expected to provide a valid beets
@@ -169,37 +611,261 @@ def search_library(query: str) -> models.SearchLibraryResponse:
 
     Args:
         query: The beets query to execute.
+        limit: The maximum number of tracks to return. Defaults to the server's
+            default page size and is capped at its maximum page size.
+        cursor: The cursor returned by the previous page, if any.
+        sort: A field to sort by, such as `year`, `year+` or `year-`.
 
     Returns:
-        A response object containing a list of matching tracks.
+        A response object containing a page of matching tracks.
     """
     settings = get_settings()
-    library = _get_library(settings)
-    try:
-        beets_tracks = library.items(query)
-        tracks = [
-            models.Track(
-                id=track.id,
-                title=track.title,
-                artist=track.artist,
-                album=track.album,
-                genre=track.genre,
-                year=track.year,
-                path=track.path.decode("utf-8"),
+    with _library(settings) as library:
+        if limit is None or limit <= 0:
+            limit = settings.search_default_limit
+        limit = min(limit, settings.search_max_limit)
+        try:
+            page = library.records_page(
+                query, TRACK_FIELDS, limit=limit, cursor=cursor, sort=sort
+            )
+            # The records come straight from typed columns, so the tracks are
+            # built without running pydantic validation on every field.
+            tracks = [
+                models.Track.model_construct(
+                    id=track_id,
+                    title=title,
+                    artist=artist,
+                    album=album,
+                    genre=genre,
+                    year=year,
+                    path=path.decode("utf-8"),
+                )
+                for track_id, title, artist, album, genre, year, path in page.records
+            ]
+            return models.SearchLibraryResponse(
+                tracks=tracks,
+                beets_query_used=query,
+                total_count=page.total_count,
+                next_cursor=page.next_cursor,
+            )
+        except beets_exceptions.BeetsWrapperError as e:
+            logger.error(f"Error searching library: {e}")
+            raise
+
+
+@mcp.tool()
+@metrics.instrument("tool")
+@worker_pool.offload
+def fulltext_search(
+    text: str, limit: Optional[int] = None
+) -> models.FulltextSearchResponse:
+    """Finds the tracks best matching free text, ranked by relevance.
+
+    The title, artist, album artist, album, genre and composer of every track
+    are searched with a full-text index. Every word must match the start of a
+    word of the track, quoted words must match as a phrase, and a word can be
+    restricted to one field with `field:`, e.g. `artist:coltrane "giant steps"`.
+
+    Args:
+        text: The words to search for.
+        limit: The maximum number of tracks to return. Defaults to the server's
+            default page size and is capped at its maximum page size.
+
+    Returns:
+        A response object containing the best matching tracks with their scores.
+    """
+    settings = get_settings()
+    with _library(settings) as library:
+        if limit is None or limit <= 0:
+            limit = settings.search_default_limit
+        limit = min(limit, settings.search_max_limit)
+        try:
+            records = library.fulltext_search(text, limit=limit, fields=TRACK_FIELDS)
+            return models.FulltextSearchResponse(
+                tracks=[
+                    models.RankedTrack.model_construct(
+                        id=track_id,
+                        title=title,
+                        artist=artist,
+                        album=album,
+                        genre=genre,
+                        year=year,
+                        path=path.decode("utf-8"),
+                        score=score,
+                    )
+                    for track_id, title, artist, album, genre, year, path, score in records
+                ],
+                match_expression=fulltext.match_expression(text),
             )
-            for track in beets_tracks
-        ]
-        return models.SearchLibraryResponse(tracks=tracks, beets_query_used=query)
-    except beets_exceptions.BeetsWrapperError as e:
-        logger.error(f"Error searching library: {e}")
-        raise
+        except beets_exceptions.BeetsWrapperError as e:
+            logger.error(f"Error searching library: {e}")
+            raise
+
+
+@mcp.tool()
+@metrics.instrument("tool")
+@worker_pool.offload
+def similar_tracks(item_id: int, k: int = 10) -> models.SimilarTracksResponse:
+    """Finds the tracks most like a track.
+
+    Tracks are compared by genre, year, bpm, length, bitrate and musical key,
+    so the results suit a "more like this" playlist. Tracks missing some of
+    these fields are compared on the others.
+
+    Args:
+        item_id: The id of the track, as returned by `search_library`.
+        k: The number of tracks to return, capped at the server's maximum
+            page size.
+
+    Returns:
+        A response object containing the most similar tracks with their
+        distances.
+    """
+    settings = get_settings()
+    with _library(settings) as library:
+        k = min(max(1, k), settings.search_max_limit)
+        try:
+            records = library.similar_tracks(item_id, k=k, fields=TRACK_FIELDS)
+        except beets_exceptions.BeetsWrapperError as e:
+            logger.error(f"Error finding similar tracks: {e}")
+            raise
+        return models.SimilarTracksResponse(
+            item_id=item_id,
+            tracks=[
+                models.SimilarTrack.model_construct(
+                    id=track_id,
+                    title=title,
+                    artist=artist,
+                    album=album,
+                    genre=genre,
+                    year=year,
+                    path=path.decode("utf-8"),
+                    distance=distance,
+                )
+                for track_id, title, artist, album, genre, year, path, distance in records
+            ],
+        )
+
+
+def _operation_metrics(
+    stats: metrics.OperationStats,
+) -> models.OperationMetrics:
+    return models.OperationMetrics(
+        component=stats.component,
+        name=stats.name,
+        calls=stats.calls,
+        errors=stats.errors,
+        rows=stats.rows,
+        mean_seconds=stats.total_seconds / stats.calls if stats.calls else 0.0,
+        p50_seconds=stats.quantile(0.5),
+        p95_seconds=stats.quantile(0.95),
+        max_seconds=stats.max_seconds,
+    )
+
+
+def _server_metrics() -> models.ServerMetricsResponse:
+    """Collects the operation metrics and the state of the pools and caches.
+
+    The library is not opened just to report on it.
+    """
+    library = library_manager.current
+    return models.ServerMetricsResponse(
+        operations=[_operation_metrics(s) for s in metrics.registry.snapshot()],
+        workers=worker_pool.stats(),
+        connection_pool=library_manager.stats(),
+        cache=library.cache.stats() if library is not None else None,
+        snapshot=library.snapshot_stats() if library is not None else None,
+    )
+
+
+@mcp.tool()
+@metrics.instrument("tool")
+def get_server_metrics() -> models.ServerMetricsResponse:
+    """Reports the metrics of the server.
 
+    Returns:
+        A response object with the calls, errors, rows and latency of every
+        tool and library method, and the state of the worker pool, the
+        database connections, the query cache and the track snapshot.
+    """
+    return _server_metrics()
+
+
+def _prometheus_metrics() -> str:
+    """Renders the server metrics in the Prometheus text format."""
+    server = _server_metrics()
+    gauges = {
+        "worker_threads": server.workers.max_workers,
+        "worker_queued": server.workers.queued,
+        "worker_in_flight": server.workers.in_flight,
+    }
+    counters: dict[str, int] = {}
+    if server.connection_pool is not None:
+        gauges["db_connections_open"] = server.connection_pool.open_connections
+        gauges["db_connections_in_use"] = server.connection_pool.in_use_connections
+        counters["db_connection_waits"] = server.connection_pool.waits
+    if server.cache is not None:
+        gauges["cache_entries"] = server.cache.entries
+        gauges["cache_bytes"] = server.cache.bytes
+        counters["cache_hits"] = server.cache.hits
+        counters["cache_misses"] = server.cache.misses
+    if server.snapshot is not None:
+        gauges["snapshot_rows"] = server.snapshot.rows
+        gauges["snapshot_bytes"] = server.snapshot.total_bytes
+    return metrics.render_prometheus(metrics.registry.snapshot(), gauges, counters)
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> Response:
+    """Serves the server metrics to Prometheus.
+
+    The metrics are collected on a separate thread, so a scrape never blocks
+    the event loop, nor waits behind the tool calls queued on the workers.
+
+    Args:
+        request: The HTTP request.
+
+    Returns:
+        The metrics in the Prometheus text exposition format, or a 404 error
+        if metrics are disabled.
+    """
+    if not metrics.registry.enabled:
+        return PlainTextResponse("Metrics are disabled", status_code=404)
+    text = await asyncio.to_thread(_prometheus_metrics)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+def _start_watcher(settings: Settings) -> LibraryWatcher:
+    """Starts syncing the shared library with its music directory.
+
+    Args:
+        settings: The application settings.
 
-def main(settings: Settings):
+    Returns:
+        The running watcher.
+    """
+    watcher = LibraryWatcher(
+        lambda: _library(get_settings()),
+        interval=settings.watch_interval,
+        debounce=settings.watch_debounce,
+        on_sync=lambda stats: logger.info(
+            f"Library synced: {stats.added} added, {stats.changed} changed, "
+            f"{stats.removed} removed"
+        ),
+    )
+    with _library(settings) as library:
+        logger.info(f"Watching {library.music_dir} for changes")
+    watcher.start()
+    return watcher
+
+
+def main(settings: Settings, watch: bool = False):
     """Runs the SmartPlaylist MCP Server with the given settings.
 
     Args:
         settings: The application settings.
+        watch: Whether to keep the library in sync with the music directory
+            in a background thread while the server runs.
     """
     logging.basicConfig(
         level=getattr(logging, settings.log_level.upper()),
@@ -210,8 +876,19 @@ def main(settings: Settings):
     logger.info(
         f"Endpoint will be: http://{settings.mcp_server_host}:{settings.mcp_server_port}/mcp"
     )
+    if settings.metrics_enabled:
+        logger.info(
+            f"Metrics will be served at: http://{settings.mcp_server_host}:{settings.mcp_server_port}/metrics"
+        )
     logger.info(f"Allowed hosts: {settings.mcp_allowed_hosts}")
 
+    worker_pool.configure(settings.mcp_worker_threads, settings.mcp_tool_concurrency)
+    metrics.registry.enabled = settings.metrics_enabled
+    logger.info(
+        f"Running tools on {settings.mcp_worker_threads} worker threads "
+        f"with limits {settings.mcp_tool_concurrency}"
+    )
+
     mcp.settings.host = settings.mcp_server_host
     mcp.settings.port = settings.mcp_server_port
 
@@ -225,4 +902,17 @@ def main(settings: Settings):
         allowed_hosts=allowed_hosts
     )
 
-    mcp.run(transport="streamable-http")
+    if settings.snapshot_enabled:
+        try:
+            with _library(settings) as library:
+                library.load_snapshot()
+        except beets_exceptions.BeetsWrapperError:
+            logger.warning("Starting without a track snapshot")
+
+    watcher = _start_watcher(settings) if watch else None
+    try:
+        mcp.run(transport="streamable-http")
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        worker_pool.shutdown()
@@ -4,10 +4,12 @@ This module defines the data structures for tool inputs and outputs, ensuring
 that all communication with the MCP server is type-safe.
 """
 
-from typing import List
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
+from smartplaylist.beets_wrapper.models import CacheStats, PoolStats, SnapshotStats
+
 
 class Track(BaseModel):
     """Represents a track in the music library.
@@ -51,8 +53,10 @@ class LibraryStatistics(BaseModel):
     Attributes:
         total_tracks: The total number of tracks.
         total_albums: The total number of albums.
-        total_artists: The total number of unique artists.
+        total_artists: The total number of unique artists, not counting
+            tracks without an artist.
         total_genres: The total number of unique genres.
+        total_duration: The total length of all tracks in seconds.
     """
 
     total_tracks: int = Field(
@@ -62,11 +66,16 @@ class LibraryStatistics(BaseModel):
         ..., description="The total number of albums in the library."
     )
     total_artists: int = Field(
-        ..., description="The total number of unique artists in the library."
+        ...,
+        description="The total number of unique artists in the library, not "
+        "counting tracks without an artist.",
     )
     total_genres: int = Field(
         ..., description="The total number of unique genres in the library."
     )
+    total_duration: float = Field(
+        0.0, description="The total length of all tracks in the library, in seconds."
+    )
 
 
 class GenreInfo(BaseModel):
@@ -91,14 +100,110 @@ class ListGenresResponse(BaseModel):
     genres: List[GenreInfo] = Field(..., description="A list of genres in the library.")
 
 
+class FacetValueInfo(BaseModel):
+    """Represents one value of a facet field.
+
+    Attributes:
+        value: The field value.
+        track_count: The number of tracks with this value.
+    """
+
+    value: str = Field(..., description="The field value.")
+    track_count: int = Field(..., description="The number of tracks with this value.")
+
+
+class ListFacetResponse(BaseModel):
+    """Response model for the `list_facet` tool.
+
+    Attributes:
+        field: The field the values belong to.
+        values: The values of the field, most common first.
+    """
+
+    field: str = Field(..., description="The field the values belong to.")
+    values: List[FacetValueInfo] = Field(
+        ..., description="The values of the field, most common first."
+    )
+
+
+class NameMatchInfo(BaseModel):
+    """Represents a library value resembling a requested name.
+
+    Attributes:
+        field: The field holding the value.
+        value: The value, as stored in the library.
+        score: The similarity of the value and the name.
+        track_count: The number of tracks with this value.
+    """
+
+    field: str = Field(
+        ..., description="The field holding the value, e.g. `artist` or `genre`."
+    )
+    value: str = Field(..., description="The value, as stored in the library.")
+    score: float = Field(
+        ...,
+        description="The trigram similarity of the value and the name, from 0 to 1.",
+    )
+    track_count: int = Field(..., description="The number of tracks with this value.")
+
+
+class ResolveNamesResponse(BaseModel):
+    """Response model for the `resolve_names` tool.
+
+    Attributes:
+        name: The name that was resolved.
+        matches: The closest library values, most similar first.
+    """
+
+    name: str = Field(..., description="The name that was resolved.")
+    matches: List[NameMatchInfo] = Field(
+        ..., description="The closest library values, most similar first."
+    )
+
+
+class PlaylistDetails(BaseModel):
+    """Describes a playlist file.
+
+    Attributes:
+        name: The name of the playlist file.
+        size: The size of the file in bytes.
+        modified: The modification time of the file, in seconds since the epoch.
+        track_count: The number of tracks in the playlist.
+        query: The beets query the playlist is refreshed from, if it is a
+            saved playlist.
+    """
+
+    name: str = Field(..., description="The name of the playlist file.")
+    size: int = Field(..., description="The size of the file in bytes.")
+    modified: float = Field(
+        ...,
+        description="The modification time of the file, in seconds since the epoch.",
+    )
+    track_count: Optional[int] = Field(
+        None, description="The number of tracks, or null if they were not counted."
+    )
+    query: Optional[str] = Field(
+        None,
+        description="The beets query the playlist is refreshed from, or null if "
+        "it is not a saved playlist.",
+    )
+
+
 class ListPlaylistsResponse(BaseModel):
     """Response model for the `list_playlists` tool.
 
     Attributes:
         playlists: A list of playlist names.
+        details: The size, modification time, track count and query of each
+            playlist, in the same order.
     """
 
     playlists: List[str] = Field(..., description="A list of playlist names.")
+    details: List[PlaylistDetails] = Field(
+        default_factory=list,
+        description="The size, modification time, track count and query of each "
+        "playlist, in the same order as `playlists`.",
+    )
 
 
 class CreatePlaylistResponse(BaseModel):
@@ -108,6 +213,7 @@ class CreatePlaylistResponse(BaseModel):
         status: The status of the playlist creation.
         playlist_path: The path to the created playlist file.
         track_count: The number of tracks in the created playlist.
+        bytes_written: The size of the created playlist file in bytes.
     """
 
     status: str = Field(..., description="The status of the playlist creation.")
@@ -117,6 +223,105 @@ class CreatePlaylistResponse(BaseModel):
     track_count: int = Field(
         ..., description="The number of tracks in the created playlist."
     )
+    bytes_written: int = Field(
+        0, description="The size of the created playlist file in bytes."
+    )
+
+
+class BuildPlaylistResponse(CreatePlaylistResponse):
+    """Response model for the `build_playlist` tool.
+
+    Attributes:
+        total_duration: The total length of the selected tracks, in seconds.
+        total_size: The total file size of the selected tracks, in bytes.
+        candidate_count: The number of tracks the selection was made from.
+    """
+
+    total_duration: float = Field(
+        ..., description="The total length of the selected tracks, in seconds."
+    )
+    total_size: int = Field(
+        ..., description="The total file size of the selected tracks, in bytes."
+    )
+    candidate_count: int = Field(
+        ...,
+        description="The number of matching tracks the selection was made "
+        "from, after the limit per artist.",
+    )
+
+
+class PlaylistInfo(BaseModel):
+    """Represents a playlist file written by a tool.
+
+    Attributes:
+        playlist_path: The path to the playlist file.
+        track_count: The number of tracks in the playlist.
+        bytes_written: The size of the playlist file in bytes.
+    """
+
+    playlist_path: str = Field(..., description="The path to the playlist file.")
+    track_count: int = Field(..., description="The number of tracks in the playlist.")
+    bytes_written: int = Field(0, description="The size of the playlist file in bytes.")
+
+
+class CreatePlaylistsResponse(BaseModel):
+    """Response model for the `create_playlists_by_field` tool.
+
+    Attributes:
+        status: The status of the playlist creation.
+        playlists: The playlists that were written.
+    """
+
+    status: str = Field(..., description="The status of the playlist creation.")
+    playlists: List[PlaylistInfo] = Field(
+        ..., description="The playlists that were written."
+    )
+
+
+class SavedPlaylistInfo(BaseModel):
+    """Represents a saved playlist after a refresh.
+
+    Attributes:
+        name: The name of the saved playlist.
+        playlist_path: The path to the playlist file.
+        track_count: The number of tracks in the playlist.
+        changed: Whether the playlist file was rewritten.
+    """
+
+    name: str = Field(..., description="The name of the saved playlist.")
+    playlist_path: str = Field(..., description="The path to the playlist file.")
+    track_count: int = Field(..., description="The number of tracks in the playlist.")
+    changed: bool = Field(
+        ..., description="Whether the playlist file was rewritten by this refresh."
+    )
+
+
+class RefreshPlaylistsResponse(BaseModel):
+    """Response model for the `refresh_playlists` tool.
+
+    Attributes:
+        status: The status of the refresh.
+        playlists: The refreshed playlists.
+    """
+
+    status: str = Field(..., description="The status of the refresh.")
+    playlists: List[SavedPlaylistInfo] = Field(
+        ..., description="The refreshed playlists, ordered by name."
+    )
+
+
+class DeleteSavedPlaylistResponse(BaseModel):
+    """Response model for the `delete_saved_playlist` tool.
+
+    Attributes:
+        status: The status of the deletion.
+        deleted: Whether a saved playlist with this name existed.
+    """
+
+    status: str = Field(..., description="The status of the deletion.")
+    deleted: bool = Field(
+        ..., description="Whether a saved playlist with this name existed."
+    )
 
 
 class SearchLibraryResponse(BaseModel):
@@ -125,6 +330,8 @@ class SearchLibraryResponse(BaseModel):
     Attributes:
         tracks: A list of tracks matching the search query.
         beets_query_used: The underlying beets query that was used for the search.
+        total_count: The total number of tracks matching the search query.
+        next_cursor: The cursor to pass to fetch the next page of results.
     """
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -135,3 +342,157 @@ class SearchLibraryResponse(BaseModel):
     beets_query_used: str = Field(
         ..., description="The underlying beets query that was used for the asearch."
     )
+    total_count: int = Field(
+        0, description="The total number of tracks matching the search query."
+    )
+    next_cursor: Optional[str] = Field(
+        None,
+        description="The cursor to pass to fetch the next page, or null on the last page.",
+    )
+
+
+class RankedTrack(Track):
+    """Represents a track matching a full-text search.
+
+    Attributes:
+        score: The relevance of the match. Higher is better, and scores are
+            only comparable within one search.
+    """
+
+    score: float
+
+
+class FulltextSearchResponse(BaseModel):
+    """Response model for the `fulltext_search` tool.
+
+    Attributes:
+        tracks: The best matching tracks, most relevant first.
+        match_expression: The full-text query the text was translated into.
+    """
+
+    tracks: List[RankedTrack] = Field(
+        ..., description="The best matching tracks, most relevant first."
+    )
+    match_expression: str = Field(
+        ..., description="The SQLite FTS5 query the text was translated into."
+    )
+
+
+class SimilarTrack(Track):
+    """Represents a track similar to another track.
+
+    Attributes:
+        distance: How different the track is from the other track, from 0 for
+            identical features. Lower is more similar.
+    """
+
+    distance: float
+
+
+class SimilarTracksResponse(BaseModel):
+    """Response model for the `similar_tracks` tool.
+
+    Attributes:
+        item_id: The id of the track the others are similar to.
+        tracks: The most similar tracks, most similar first.
+    """
+
+    item_id: int = Field(
+        ..., description="The id of the track the others are similar to."
+    )
+    tracks: List[SimilarTrack] = Field(
+        ..., description="The most similar tracks, most similar first."
+    )
+
+
+class ToolWorkerStats(BaseModel):
+    """Represents the worker pool usage of a single tool.
+
+    Attributes:
+        name: The name of the tool.
+        limit: The maximum number of concurrent calls, if the tool is limited.
+        queued: The number of calls waiting for a slot or a worker thread.
+        in_flight: The number of calls currently running.
+        completed: The number of calls that have finished.
+    """
+
+    name: str = Field(..., description="The name of the tool.")
+    limit: Optional[int] = Field(
+        None, description="The maximum number of concurrent calls, if limited."
+    )
+    queued: int = Field(0, description="The number of calls waiting to run.")
+    in_flight: int = Field(0, description="The number of calls currently running.")
+    completed: int = Field(0, description="The number of calls that have finished.")
+
+
+class WorkerPoolStats(BaseModel):
+    """Represents the usage of the pool of threads running tool calls.
+
+    Attributes:
+        max_workers: The number of worker threads.
+        queued: The number of calls waiting for a slot or a worker thread.
+        in_flight: The number of calls currently running.
+        completed: The number of calls that have finished.
+        tools: The usage of each tool that has been called.
+    """
+
+    max_workers: int = Field(..., description="The number of worker threads.")
+    queued: int = Field(0, description="The number of calls waiting to run.")
+    in_flight: int = Field(0, description="The number of calls currently running.")
+    completed: int = Field(0, description="The number of calls that have finished.")
+    tools: List[ToolWorkerStats] = Field(
+        default_factory=list, description="The usage of each tool."
+    )
+
+
+class OperationMetrics(BaseModel):
+    """Represents the metrics of one tool or library method.
+
+    Attributes:
+        component: `tool` for MCP tools or `library` for library methods.
+        name: The name of the tool or method.
+        calls: The number of completed calls, successful or not.
+        errors: The number of failed calls, keyed by exception type.
+        rows: The total number of rows returned by successful calls.
+        mean_seconds: The mean duration of a call.
+        p50_seconds: The estimated median duration of a call.
+        p95_seconds: The estimated 95th percentile of the call durations.
+        max_seconds: The longest call.
+    """
+
+    component: str = Field(..., description="`tool` or `library`.")
+    name: str = Field(..., description="The name of the tool or method.")
+    calls: int = Field(0, description="The number of completed calls.")
+    errors: Dict[str, int] = Field(
+        default_factory=dict, description="Failed calls by exception type."
+    )
+    rows: int = Field(0, description="Rows returned by successful calls.")
+    mean_seconds: float = Field(0.0, description="The mean duration of a call.")
+    p50_seconds: float = Field(0.0, description="The estimated median duration.")
+    p95_seconds: float = Field(0.0, description="The estimated 95th percentile.")
+    max_seconds: float = Field(0.0, description="The longest call.")
+
+
+class ServerMetricsResponse(BaseModel):
+    """Represents the metrics of the running server.
+
+    Attributes:
+        operations: The metrics of each tool and library method called so far.
+        workers: The usage of the worker pool running tool calls.
+        connection_pool: The usage of the library read connections, if the
+            library has been opened.
+        cache: The state of the query cache, if the library has been opened.
+        snapshot: The size of the track snapshot, if one is loaded.
+    """
+
+    operations: List[OperationMetrics] = Field(
+        default_factory=list, description="The metrics of each operation."
+    )
+    workers: WorkerPoolStats = Field(..., description="The worker pool usage.")
+    connection_pool: Optional[PoolStats] = Field(
+        None, description="The usage of the library read connections."
+    )
+    cache: Optional[CacheStats] = Field(None, description="The query cache state.")
+    snapshot: Optional[SnapshotStats] = Field(
+        None, description="The size of the track snapshot."
+    )
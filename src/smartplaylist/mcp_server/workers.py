@@ -0,0 +1,195 @@
+"""Worker pool running blocking MCP tool calls off the event loop.
+
+This module provides a `WorkerPool` that runs the beets work of each tool call
+on a bounded pool of threads, so a slow query does not hold up the event loop
+serving other clients. Tools can be given a concurrency limit of their own;
+calls over the limit wait on the event loop without occupying a thread, which
+keeps threads free for cheap calls during a burst of heavy ones.
+"""
+
+import asyncio
+import concurrent.futures
+import dataclasses
+import functools
+import threading
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from smartplaylist.mcp_server import models
+
+T = TypeVar("T")
+
+
+@dataclasses.dataclass
+class _ToolCounters:
+    queued: int = 0
+    in_flight: int = 0
+    completed: int = 0
+
+
+class WorkerPool:
+    """A bounded thread pool with per-tool concurrency limits and metrics.
+
+    Attributes:
+        max_workers: The number of worker threads.
+        tool_limits: The maximum number of concurrent calls per tool name.
+    """
+
+    def __init__(
+        self, max_workers: int = 8, tool_limits: Optional[dict[str, int]] = None
+    ):
+        """Initializes the worker pool. Threads are started on first use.
+
+        Args:
+            max_workers: The number of worker threads.
+            tool_limits: The maximum number of concurrent calls per tool name.
+        """
+        self.max_workers = max_workers
+        self.tool_limits = dict(tool_limits or {})
+        self._lock = threading.Lock()
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._limiters: dict[str, asyncio.Semaphore] = {}
+        self._tools: dict[str, _ToolCounters] = {}
+
+    def configure(self, max_workers: int, tool_limits: Optional[dict[str, int]]):
+        """Changes the pool size and limits, replacing the running threads.
+
+        Args:
+            max_workers: The number of worker threads.
+            tool_limits: The maximum number of concurrent calls per tool name.
+        """
+        self.shutdown(wait=False)
+        with self._lock:
+            self.max_workers = max_workers
+            self.tool_limits = dict(tool_limits or {})
+            self._limiters = {}
+
+    def shutdown(self, wait: bool = True):
+        """Stops the worker threads once the calls already submitted finish.
+
+        Args:
+            wait: Whether to block until the running calls have finished.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="mcp-worker"
+                )
+            return self._executor
+
+    def _get_limiter(self, tool: str) -> Optional[asyncio.Semaphore]:
+        """Returns the semaphore limiting a tool on the running event loop."""
+        limit = self.tool_limits.get(tool)
+        if not limit or limit <= 0:
+            return None
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._limiters = {}
+        limiter = self._limiters.get(tool)
+        if limiter is None:
+            limiter = self._limiters[tool] = asyncio.Semaphore(limit)
+        return limiter
+
+    async def run(
+        self, tool: str, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """Runs a blocking function on a worker thread.
+
+        Args:
+            tool: The name of the tool the call belongs to.
+            func: The function to run.
+            *args: Positional arguments for `func`.
+            **kwargs: Keyword arguments for `func`.
+
+        Returns:
+            The return value of `func`. Exceptions raised by `func` propagate.
+        """
+        with self._lock:
+            counters = self._tools.setdefault(tool, _ToolCounters())
+            counters.queued += 1
+        # "queued" until a thread picks the call up, "abandoned" if it is
+        # cancelled first; whichever happens first settles the queue count.
+        state = "queued"
+
+        def call() -> T:
+            nonlocal state
+            with self._lock:
+                if state == "queued":
+                    counters.queued -= 1
+                state = "running"
+                counters.in_flight += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    counters.in_flight -= 1
+                    counters.completed += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            limiter = self._get_limiter(tool)
+            if limiter is None:
+                return await loop.run_in_executor(self._get_executor(), call)
+            async with limiter:
+                return await loop.run_in_executor(self._get_executor(), call)
+        finally:
+            with self._lock:
+                if state == "queued":
+                    state = "abandoned"
+                    counters.queued -= 1
+
+    def offload(
+        self, func: Callable[..., T], name: Optional[str] = None
+    ) -> Callable[..., Awaitable[T]]:
+        """Wraps a blocking function into a coroutine function run on the pool.
+
+        The wrapper keeps the signature and docstring of `func`, so it can be
+        registered as an MCP tool in its place.
+
+        Args:
+            func: The blocking function.
+            name: The tool name used for limits and metrics. Defaults to the
+                name of `func`.
+
+        Returns:
+            The coroutine function.
+        """
+        tool = name or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            return await self.run(tool, func, *args, **kwargs)
+
+        return wrapper
+
+    def stats(self) -> models.WorkerPoolStats:
+        """Returns a snapshot of the queue depth and in-flight calls.
+
+        Returns:
+            An object describing the current state of the pool.
+        """
+        with self._lock:
+            tools = [
+                models.ToolWorkerStats(
+                    name=name,
+                    limit=self.tool_limits.get(name),
+                    queued=c.queued,
+                    in_flight=c.in_flight,
+                    completed=c.completed,
+                )
+                for name, c in sorted(self._tools.items())
+            ]
+            return models.WorkerPoolStats(
+                max_workers=self.max_workers,
+                queued=sum(t.queued for t in tools),
+                in_flight=sum(t.in_flight for t in tools),
+                completed=sum(t.completed for t in tools),
+                tools=tools,
+            )
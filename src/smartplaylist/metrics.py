@@ -0,0 +1,340 @@
+"""In-process metrics for SmartPlaylist.
+
+This module provides a `MetricsRegistry` recording, for each instrumented
+operation, the number of calls, a latency histogram, the number of errors by
+exception type and the number of rows returned. Operations are instrumented
+with the `instrument` decorator, which works on plain functions, methods and
+coroutine functions. Recording a call costs a clock read and a short locked
+update, so metrics can stay enabled in production.
+
+The metrics can be rendered in the Prometheus text exposition format.
+"""
+
+import asyncio
+import bisect
+import dataclasses
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, TypeVar
+
+T = TypeVar("T")
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+"""The upper bounds of the latency histogram buckets, in seconds."""
+
+ROW_ATTRIBUTES = (
+    "items",
+    "records",
+    "tracks",
+    "genres",
+    "values",
+    "playlists",
+    "matches",
+)
+"""The attributes holding the rows of a result object, checked in order."""
+
+
+def count_rows(result: Any) -> Optional[int]:
+    """Returns the number of rows in the result of an operation.
+
+    Args:
+        result: The value returned by an instrumented operation.
+
+    Returns:
+        The length of a list result or of its first row attribute, the
+        `track_count` of a playlist result, or None if the result has no
+        notion of rows.
+    """
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    for attribute in ROW_ATTRIBUTES:
+        rows = getattr(result, attribute, None)
+        if isinstance(rows, (list, tuple)):
+            return len(rows)
+    track_count = getattr(result, "track_count", None)
+    return track_count if isinstance(track_count, int) else None
+
+
+@dataclasses.dataclass
+class OperationStats:
+    """Represents the metrics of one instrumented operation.
+
+    Attributes:
+        component: The part of the application, e.g. `tool` or `library`.
+        name: The name of the operation, e.g. `search_library`.
+        calls: The number of completed calls, successful or not.
+        errors: The number of failed calls, keyed by exception type.
+        rows: The total number of rows returned by successful calls.
+        total_seconds: The total time spent in the operation.
+        max_seconds: The longest call.
+        buckets: The number of calls in each latency bucket, not cumulative.
+            The last entry counts calls slower than the last bound.
+    """
+
+    component: str
+    name: str
+    calls: int = 0
+    errors: Dict[str, int] = dataclasses.field(default_factory=dict)
+    rows: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    buckets: List[int] = dataclasses.field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1)
+    )
+
+    def quantile(self, q: float) -> float:
+        """Estimates a latency quantile from the histogram.
+
+        Args:
+            q: The quantile, between 0 and 1.
+
+        Returns:
+            The upper bound of the bucket holding the quantile, capped at the
+            slowest call, or 0 if there were no calls.
+        """
+        if not self.calls:
+            return 0.0
+        rank = q * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_seconds)
+        return self.max_seconds
+
+
+class MetricsRegistry:
+    """A thread-safe store of operation metrics.
+
+    Attributes:
+        enabled: Whether calls are recorded. Disabled registries add no
+            measurable overhead.
+    """
+
+    def __init__(self, enabled: bool = True):
+        """Initializes an empty registry.
+
+        Args:
+            enabled: Whether calls are recorded.
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._operations: Dict[tuple[str, str], OperationStats] = {}
+
+    def observe(
+        self,
+        component: str,
+        name: str,
+        seconds: float,
+        rows: Optional[int] = None,
+        error: Optional[BaseException] = None,
+    ):
+        """Records one call of an operation.
+
+        Args:
+            component: The part of the application.
+            name: The name of the operation.
+            seconds: The duration of the call.
+            rows: The number of rows returned, if known.
+            error: The exception raised by the call, if any.
+        """
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            stats = self._operations.get((component, name))
+            if stats is None:
+                stats = self._operations[(component, name)] = OperationStats(
+                    component, name
+                )
+            stats.calls += 1
+            stats.buckets[bucket] += 1
+            stats.total_seconds += seconds
+            if seconds > stats.max_seconds:
+                stats.max_seconds = seconds
+            if error is not None:
+                kind = type(error).__name__
+                stats.errors[kind] = stats.errors.get(kind, 0) + 1
+            elif rows is not None:
+                stats.rows += rows
+
+    def instrument(
+        self, component: str, name: Optional[str] = None
+    ) -> Callable[[Callable[..., T]], Callable[..., T]]:
+        """Returns a decorator recording the calls of a function.
+
+        The wrapper keeps the signature and docstring of the function, so it
+        can be applied to MCP tools.
+
+        Args:
+            component: The part of the application, e.g. `tool`.
+            name: The name of the operation. Defaults to the function name.
+
+        Returns:
+            The decorator.
+        """
+
+        def decorator(func: Callable[..., T]) -> Callable[..., T]:
+            operation = name or func.__name__
+
+            if asyncio.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    start = time.perf_counter()
+                    try:
+                        result = await func(*args, **kwargs)
+                    except BaseException as e:
+                        self.observe(
+                            component, operation, time.perf_counter() - start, error=e
+                        )
+                        raise
+                    self.observe(
+                        component,
+                        operation,
+                        time.perf_counter() - start,
+                        rows=count_rows(result),
+                    )
+                    return result
+
+                return async_wrapper  # type: ignore[return-value]
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> T:
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException as e:
+                    self.observe(
+                        component, operation, time.perf_counter() - start, error=e
+                    )
+                    raise
+                self.observe(
+                    component,
+                    operation,
+                    time.perf_counter() - start,
+                    rows=count_rows(result),
+                )
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def snapshot(self) -> List[OperationStats]:
+        """Returns a copy of the metrics of every operation called so far.
+
+        Returns:
+            The metrics, ordered by component and name.
+        """
+        with self._lock:
+            return [
+                dataclasses.replace(
+                    stats, errors=dict(stats.errors), buckets=list(stats.buckets)
+                )
+                for _, stats in sorted(self._operations.items())
+            ]
+
+    def reset(self):
+        """Drops every recorded metric."""
+        with self._lock:
+            self._operations.clear()
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: Any) -> str:
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def render_prometheus(
+    operations: Iterable[OperationStats],
+    gauges: Optional[Mapping[str, float]] = None,
+    counters: Optional[Mapping[str, float]] = None,
+    prefix: str = "smartplaylist",
+) -> str:
+    """Renders metrics in the Prometheus text exposition format.
+
+    Args:
+        operations: The operation metrics, e.g. from `MetricsRegistry.snapshot`.
+        gauges: Additional values to export as gauges, keyed by metric name
+            without the prefix.
+        counters: Additional values that only ever grow, exported as
+            counters, keyed by metric name without the prefix or the
+            `_total` suffix.
+        prefix: The prefix of every metric name.
+
+    Returns:
+        The exposition text.
+    """
+    operations = list(operations)
+    lines = [
+        f"# HELP {prefix}_calls_total Calls of each operation.",
+        f"# TYPE {prefix}_calls_total counter",
+    ]
+    for op in operations:
+        labels = _labels(component=op.component, name=op.name)
+        lines.append(f"{prefix}_calls_total{labels} {op.calls}")
+    lines += [
+        f"# HELP {prefix}_errors_total Failed calls by exception type.",
+        f"# TYPE {prefix}_errors_total counter",
+    ]
+    for op in operations:
+        for kind, count in sorted(op.errors.items()):
+            labels = _labels(component=op.component, name=op.name, exception=kind)
+            lines.append(f"{prefix}_errors_total{labels} {count}")
+    lines += [
+        f"# HELP {prefix}_rows_total Rows returned by successful calls.",
+        f"# TYPE {prefix}_rows_total counter",
+    ]
+    for op in operations:
+        labels = _labels(component=op.component, name=op.name)
+        lines.append(f"{prefix}_rows_total{labels} {op.rows}")
+    lines += [
+        f"# HELP {prefix}_latency_seconds Duration of each call.",
+        f"# TYPE {prefix}_latency_seconds histogram",
+    ]
+    for op in operations:
+        cumulative = 0
+        for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), op.buckets):
+            cumulative += count
+            labels = _labels(component=op.component, name=op.name, le=bound)
+            lines.append(f"{prefix}_latency_seconds_bucket{labels} {cumulative}")
+        labels = _labels(component=op.component, name=op.name)
+        lines.append(f"{prefix}_latency_seconds_sum{labels} {op.total_seconds}")
+        lines.append(f"{prefix}_latency_seconds_count{labels} {op.calls}")
+    for metric, value in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE {prefix}_{metric} gauge")
+        lines.append(f"{prefix}_{metric} {value}")
+    for metric, value in sorted((counters or {}).items()):
+        lines.append(f"# TYPE {prefix}_{metric}_total counter")
+        lines.append(f"{prefix}_{metric}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+"""The registry shared by the whole process."""
+
+instrument = registry.instrument
@@ -11,9 +11,11 @@ from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
-from pydantic import AliasChoices, Field, field_validator
+from pydantic import AliasChoices, Field, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from smartplaylist.beets_wrapper import exceptions, formats
+
 
 class Settings(BaseSettings):
     """Defines application configuration settings, loaded from environment variables.
@@ -24,9 +26,42 @@ class Settings(BaseSettings):
         mcp_server_host: The host for the MCP server.
         mcp_server_port: The port for the MCP server.
         playlist_extension: The file extension for generated playlists.
+            Defaults to the extension of `playlist_format` when a format is
+            set.
+        playlist_format: The format of generated playlists, e.g. `extm3u`.
+            Defaults to the format of `playlist_extension`.
         music_library_path_from: The source path prefix to be replaced.
         music_library_path_to: The target path prefix to substitute.
         mcp_allowed_hosts: A list of allowed hosts for the MCP server.
+        library_pool_size: The maximum number of pooled read connections.
+            Defaults to `mcp_worker_threads`, so every worker can hold one.
+        search_default_limit: The number of tracks returned per search page
+            when the client does not ask for a limit.
+        search_max_limit: The maximum number of tracks returned per search page.
+        query_cache_max_entries: The maximum number of cached query results.
+        query_cache_max_bytes: The memory budget of the query cache in bytes.
+        query_cache_ttl: The number of seconds a cached query result stays valid.
+        mcp_worker_threads: The number of threads running MCP tool calls.
+        mcp_tool_concurrency: The maximum number of concurrent calls per tool.
+            Tools that are not listed are only bounded by the worker threads.
+        import_workers: The number of processes reading tags during an import.
+            0 uses one process per CPU.
+        import_batch_size: The number of tracks inserted per transaction
+            during an import.
+        watch_interval: The number of seconds between two scans of the music
+            directory while watching it.
+        watch_debounce: The number of seconds to wait for a burst of changes
+            to settle before syncing.
+        snapshot_enabled: Whether to keep a columnar in-memory snapshot of
+            the tracks to serve read-only requests.
+        fulltext_enabled: Whether to keep a full-text index of the tracks in
+            the beets database. It is created, or removed once disabled, by
+            the next sync or import.
+        similarity_approximate_min_tracks: The number of tracks from which
+            similar tracks are searched in an approximate index rather than
+            by comparing every track. 0 always compares every track.
+        metrics_enabled: Whether to record the latency, errors and rows of
+            every tool and library call.
     """
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
@@ -56,6 +91,12 @@ class Settings(BaseSettings):
         alias="SMARTPLAYLIST_PLAYLIST_EXTENSION",
         description="The file extension for generated playlists.",
     )
+    playlist_format: str | None = Field(
+        default=None,
+        alias="SMARTPLAYLIST_PLAYLIST_FORMAT",
+        description="The format of generated playlists: m3u, extm3u, pls, xspf "
+        "or jsonl. Defaults to the format of the playlist extension.",
+    )
     music_library_path_from: Path | None = Field(
         default=None,
         alias="SMARTPLAYLIST_MUSIC_LIBRARY_PATH_FROM",
@@ -73,6 +114,105 @@ class Settings(BaseSettings):
         ),
         description="A list of allowed hosts for the MCP server.",
     )
+    library_pool_size: int | None = Field(
+        default=None,
+        ge=1,
+        alias="SMARTPLAYLIST_LIBRARY_POOL_SIZE",
+        description="The maximum number of pooled read connections to the database.",
+    )
+    search_default_limit: int = Field(
+        default=100,
+        ge=1,
+        alias="SMARTPLAYLIST_SEARCH_DEFAULT_LIMIT",
+        description="The number of tracks returned per search page by default.",
+    )
+    search_max_limit: int = Field(
+        default=1000,
+        ge=1,
+        alias="SMARTPLAYLIST_SEARCH_MAX_LIMIT",
+        description="The maximum number of tracks returned per search page.",
+    )
+    query_cache_max_entries: int = Field(
+        default=256,
+        ge=0,
+        alias="SMARTPLAYLIST_QUERY_CACHE_MAX_ENTRIES",
+        description="The maximum number of cached query results. 0 disables the cache.",
+    )
+    query_cache_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        ge=0,
+        alias="SMARTPLAYLIST_QUERY_CACHE_MAX_BYTES",
+        description="The memory budget of the query cache in bytes.",
+    )
+    query_cache_ttl: float = Field(
+        default=300.0,
+        ge=0,
+        alias="SMARTPLAYLIST_QUERY_CACHE_TTL",
+        description="The number of seconds a cached query result stays valid.",
+    )
+    mcp_worker_threads: int = Field(
+        default=8,
+        ge=1,
+        alias="SMARTPLAYLIST_MCP_WORKER_THREADS",
+        description="The number of threads running MCP tool calls.",
+    )
+    mcp_tool_concurrency: dict[str, int] = Field(
+        default_factory=lambda: {
+            "build_playlist": 2,
+            "create_playlist": 2,
+            "create_playlists_by_field": 1,
+            "refresh_playlists": 1,
+            "search_library": 4,
+        },
+        alias="SMARTPLAYLIST_MCP_TOOL_CONCURRENCY",
+        description="The maximum number of concurrent calls per tool.",
+    )
+    import_workers: int = Field(
+        default=0,
+        ge=0,
+        alias="SMARTPLAYLIST_IMPORT_WORKERS",
+        description="The number of processes reading tags during an import.",
+    )
+    import_batch_size: int = Field(
+        default=1000,
+        ge=1,
+        alias="SMARTPLAYLIST_IMPORT_BATCH_SIZE",
+        description="The number of tracks inserted per transaction during an import.",
+    )
+    watch_interval: float = Field(
+        default=60.0,
+        gt=0,
+        alias="SMARTPLAYLIST_WATCH_INTERVAL",
+        description="The number of seconds between two scans of the music directory.",
+    )
+    watch_debounce: float = Field(
+        default=5.0,
+        gt=0,
+        alias="SMARTPLAYLIST_WATCH_DEBOUNCE",
+        description="The number of seconds to wait for a burst of changes to settle.",
+    )
+    snapshot_enabled: bool = Field(
+        default=False,
+        alias="SMARTPLAYLIST_SNAPSHOT_ENABLED",
+        description="Whether to serve read-only requests from an in-memory snapshot.",
+    )
+    fulltext_enabled: bool = Field(
+        default=False,
+        alias="SMARTPLAYLIST_FULLTEXT_ENABLED",
+        description="Whether to keep a full-text index of the tracks for searches.",
+    )
+    similarity_approximate_min_tracks: int = Field(
+        default=500_000,
+        ge=0,
+        alias="SMARTPLAYLIST_SIMILARITY_APPROXIMATE_MIN_TRACKS",
+        description="The number of tracks from which similar tracks are searched "
+        "approximately.",
+    )
+    metrics_enabled: bool = Field(
+        default=True,
+        alias="SMARTPLAYLIST_METRICS_ENABLED",
+        description="Whether to record metrics for tool and library calls.",
+    )
 
     @field_validator("playlist_extension")
     def empty_str_to_default(cls, v: str) -> str:
@@ -81,6 +221,36 @@ class Settings(BaseSettings):
             return "m3u8"
         return v
 
+    @field_validator("playlist_format")
+    def empty_format_to_none(cls, v: str | None) -> str | None:
+        """Uses the format of the extension if the variable is an empty string."""
+        return v or None
+
+    @model_validator(mode="after")
+    def playlist_extension_of_format(self) -> "Settings":
+        """Derives the playlist extension from the format, or checks they match.
+
+        Without this, a format such as `xspf` would be written to files with
+        the default `m3u8` extension.
+        """
+        if self.playlist_format is None:
+            return self
+        try:
+            fmt = formats.get_format(self.playlist_format)
+        except exceptions.QueryError as e:
+            raise ValueError(str(e)) from e
+        if "playlist_extension" not in self.model_fields_set:
+            self.playlist_extension = fmt.extension
+        elif formats.format_for_extension(self.playlist_extension).extension != (
+            fmt.extension
+        ):
+            raise ValueError(
+                f"Playlists in the '{fmt.name}' format cannot use the "
+                f"'{self.playlist_extension}' extension. Use '{fmt.extension}' "
+                "or leave SMARTPLAYLIST_PLAYLIST_EXTENSION unset."
+            )
+        return self
+
     @field_validator("mcp_allowed_hosts", mode="before")
     def robust_str_to_list(cls, v: Any) -> Any:
         """Parses a string from an env var into a list of strings."""
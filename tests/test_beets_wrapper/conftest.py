@@ -0,0 +1,113 @@
+"""Shared fixtures for the beets wrapper tests."""
+
+import wave
+from pathlib import Path
+from typing import Any, Iterator
+
+import mediafile  # type: ignore
+import pytest
+import yaml
+from beets import library as beets_library
+
+from smartplaylist.beets_wrapper import library
+from smartplaylist.settings import Settings
+
+SAMPLE_TRACKS: list[dict[str, Any]] = [
+    {"title": "So What", "artist": "Miles Davis", "genre": "Jazz", "year": 1959},
+    {"title": "Blue in Green", "artist": "Miles Davis", "genre": "Jazz", "year": 1959},
+    {"title": "Naima", "artist": "John Coltrane", "genre": "Jazz", "year": 1960},
+    {"title": "Paranoid", "artist": "Black Sabbath", "genre": "Rock", "year": 1970},
+    {"title": "Untitled", "artist": "", "genre": "", "year": 0},
+]
+
+
+@pytest.fixture
+def real_library(tmp_path: Path, monkeypatch) -> Iterator[library.Library]:
+    """Fixture creating a Library backed by a real beets database.
+
+    The database contains the `SAMPLE_TRACKS`, each backed by a small file in
+    the music directory, with the jazz tracks grouped into one album.
+    """
+    monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+    music_path = tmp_path / "music"
+    music_path.mkdir()
+    config_path = tmp_path / "config.yaml"
+    beets_config = {
+        "library": str((tmp_path / "test.db").resolve()),
+        "directory": str(music_path.resolve()),
+        "plugins": [],
+        "smartplaylist": {"playlist_dir": str(tmp_path / "playlists")},
+    }
+    with open(config_path, "w") as f:
+        yaml.dump(beets_config, f)
+
+    lib = library.Library(str(config_path.resolve()), settings=Settings())
+    jazz = []
+    for i, fields in enumerate(SAMPLE_TRACKS):
+        track_path = music_path / f"{i:02d}.mp3"
+        track_path.write_bytes(b"\0" * 100 * (i + 1))
+        item = beets_library.Item(
+            path=str(track_path).encode(),
+            album=f"Album {fields['genre']}",
+            format="MP3",
+            length=60.0 * (i + 1),
+            bitrate=320000,
+            **fields,
+        )
+        if fields["genre"] == "Jazz":
+            jazz.append(item)
+        else:
+            lib.lib.add(item)
+    lib.lib.add_album(jazz)
+    yield lib
+    lib.close()
+
+
+def _write_track(path: Path, **tags) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(b"\0\0" * 8000)
+    media = mediafile.MediaFile(str(path))
+    for key, value in tags.items():
+        setattr(media, key, value)
+    media.save()
+    return path
+
+
+@pytest.fixture
+def write_track():
+    """Fixture returning a function that writes a tagged, silent WAV file.
+
+    The function takes the file path and the tags as keyword arguments, and
+    returns the path.
+    """
+    return _write_track
+
+
+@pytest.fixture
+def music_dir(tmp_path: Path, write_track) -> Path:
+    """Fixture creating a music directory with two albums of WAV files.
+
+    The `Paranoid` directory also holds a cover image and an unreadable
+    `.mp3` file, and a hidden `.smartplaylist` directory holds a track that
+    must be ignored.
+    """
+    music = tmp_path / "music"
+    write_track(music / "Kind of Blue" / "01.wav", title="So What", artist="Miles")
+    write_track(music / "Kind of Blue" / "02.wav", title="Freddie", artist="Miles")
+    write_track(music / "Paranoid" / "01.wav", title="War Pigs", artist="Sabbath")
+    (music / "Paranoid" / "cover.jpg").write_bytes(b"jpeg")
+    (music / "Paranoid" / "broken.mp3").write_bytes(b"not audio")
+    write_track(music / ".smartplaylist" / "hidden.wav", title="Hidden")
+    return music
+
+
+@pytest.fixture
+def beets_lib(tmp_path: Path):
+    """Fixture opening an empty beets library in the temporary directory."""
+    lib = beets_library.Library(str(tmp_path / "test.db"))
+    yield lib
+    lib._close()
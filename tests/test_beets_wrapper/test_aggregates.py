@@ -0,0 +1,38 @@
+"""Tests for the SQL aggregates over the beets database."""
+
+from smartplaylist.beets_wrapper import aggregates
+
+
+def test_library_totals(real_library):
+    """Test that the totals are computed in one query."""
+    with real_library.read_connection() as conn:
+        stats = aggregates.library_totals(conn)
+
+    assert stats.total_tracks == 5
+    assert stats.total_albums == 1
+    assert stats.total_artists == 3
+    assert stats.total_genres == 2
+    assert stats.total_duration == 900.0
+    assert stats.total_size == 0
+
+
+def test_total_file_size(real_library):
+    """Test that file sizes are summed from the item paths."""
+    with real_library.read_connection() as conn:
+        assert aggregates.total_file_size(conn) == 1500
+
+
+def test_get_statistics_uses_aggregates(real_library, mocker):
+    """Test that get_statistics does not iterate over beets items."""
+    items = mocker.spy(real_library.lib, "items")
+
+    stats = real_library.get_statistics()
+
+    items.assert_not_called()
+    assert stats.total_tracks == 5
+    assert stats.total_size == 1500
+
+
+def test_get_statistics_without_size(real_library):
+    """Test that the file size can be skipped."""
+    assert real_library.get_statistics(include_size=False).total_size == 0
@@ -0,0 +1,127 @@
+"""Tests for the query result cache."""
+
+from beets import library as beets_library
+
+from smartplaylist.beets_wrapper import cache
+
+
+class FakeClock:
+    """A manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_normalize_query():
+    """Test that equivalent conjunctions share a cache key."""
+    assert cache.normalize_query("year:1959   genre:jazz") == cache.normalize_query(
+        "genre:jazz year:1959"
+    )
+    assert cache.normalize_query("genre:jazz , genre:rock") == (
+        "genre:jazz , genre:rock"
+    )
+    assert cache.normalize_query("genre:jazz year- artist+") == (
+        "genre:jazz year- artist+"
+    )
+    assert cache.normalize_query(None) == ""
+
+
+def test_get_and_put():
+    """Test hits, misses and revision-based invalidation."""
+    query_cache = cache.QueryCache()
+    query_cache.put("key", "rev1", (1, 2, 3))
+
+    assert query_cache.get("key", "rev1") == (1, 2, 3)
+    assert query_cache.get("key", "rev2") is None
+    assert query_cache.get("key", "rev1") is None
+
+    stats = query_cache.stats()
+    assert (stats.hits, stats.misses, stats.evictions) == (1, 2, 1)
+
+
+def test_ttl_expiry():
+    """Test that entries expire after their time-to-live."""
+    clock = FakeClock()
+    query_cache = cache.QueryCache(ttl=10, clock=clock)
+    query_cache.put("key", "rev", "value")
+
+    clock.now = 9.9
+    assert query_cache.get("key", "rev") == "value"
+    clock.now = 10.0
+    assert query_cache.get("key", "rev") is None
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    """Test that the least recently used entries are evicted first."""
+    query_cache = cache.QueryCache(max_entries=2, max_bytes=100)
+    query_cache.put("a", "rev", 1, size=10)
+    query_cache.put("b", "rev", 2, size=10)
+    query_cache.get("a", "rev")
+    query_cache.put("c", "rev", 3, size=10)
+
+    assert query_cache.get("b", "rev") is None
+    assert query_cache.get("a", "rev") == 1
+
+    query_cache.put("big", "rev", 4, size=95)
+    assert query_cache.stats().entries == 1
+    assert query_cache.stats().bytes == 95
+
+    query_cache.put("huge", "rev", 5, size=101)
+    assert query_cache.get("huge", "rev") is None
+
+
+def test_recorder_budget():
+    """Test that recording stops once the budget is exceeded."""
+    recorder = cache.Recorder(budget=200)
+    assert list(recorder.record(["a", "b"])) == ["a", "b"]
+    assert recorder.values == ["a", "b"]
+
+    recorder = cache.Recorder(budget=60)
+    assert list(recorder.record(["a", "b", "c"])) == ["a", "b", "c"]
+    assert recorder.values is None
+
+
+def test_library_caches_pages(real_library, mocker):
+    """Test that repeated searches are served from the cache."""
+    first = real_library.items_page("genre:jazz", limit=2)
+    execute = mocker.spy(real_library, "_page_ids_sql")
+    second = real_library.items_page("genre:jazz", limit=2)
+
+    execute.assert_not_called()
+    assert [i.id for i in second.items] == [i.id for i in first.items]
+    assert second.next_cursor == first.next_cursor
+    assert real_library.cache.stats().hits >= 1
+
+
+def test_library_cache_invalidated_by_writes(real_library):
+    """Test that writing to the library invalidates cached results."""
+    assert real_library.get_statistics().total_tracks == 5
+    real_library.lib.add(beets_library.Item(path=b"/x.mp3"))
+
+    assert real_library.get_statistics().total_tracks == 6
+
+
+def test_library_caches_playlist_entries(real_library, tmp_path, mocker):
+    """Test that a repeated playlist export does not run the query again."""
+    real_library.create_playlist("genre:jazz", str(tmp_path / "a.m3u8"))
+    stream = mocker.spy(real_library, "_stream_playlist")
+
+    result = real_library.create_playlist("genre:jazz", str(tmp_path / "b.m3u8"))
+
+    stream.assert_not_called()
+    assert result.track_count == 3
+    assert (tmp_path / "b.m3u8").read_text() == (tmp_path / "a.m3u8").read_text()
+
+
+def test_update_library_invalidates_cache(real_library, mocker):
+    """Test that updating the library drops every cached entry."""
+    mocker.patch("subprocess.run")
+    real_library.get_statistics()
+    assert real_library.cache.stats().entries == 1
+
+    real_library.update_library()
+
+    assert real_library.cache.stats().entries == 0
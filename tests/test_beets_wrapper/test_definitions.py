@@ -0,0 +1,158 @@
+"""Tests for saved playlist definitions and their refresh."""
+
+import os
+
+import pytest
+
+from smartplaylist.beets_wrapper import definitions, exceptions, library, models
+
+
+def _read(path: str) -> list[str]:
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def test_registry_persists_definitions(tmp_path):
+    """Tests that definitions survive a new registry instance."""
+    path = str(tmp_path / definitions.REGISTRY_FILENAME)
+    registry = definitions.PlaylistRegistry(path)
+
+    registry.put(models.PlaylistDefinition("B", "genre:Rock", limit=10))
+    registry.put(models.PlaylistDefinition("A", "year:1959", sort="title-"))
+
+    reloaded = definitions.PlaylistRegistry(path)
+    assert [d.name for d in reloaded.definitions()] == ["A", "B"]
+    assert reloaded.get("A").sort == "title-"
+    assert reloaded.remove("B")
+    assert not reloaded.remove("B")
+    assert [d.name for d in registry.definitions()] == ["A"]
+
+
+def test_result_digest_tracks_changes():
+    """Tests that the digest changes with the tracks and the definition."""
+    definition = models.PlaylistDefinition("Jazz", "genre:Jazz")
+    digest = definitions.result_digest(definition, [(1, 10.0), (2, 20.0)])
+
+    assert digest == definitions.result_digest(definition, [(1, 10.0), (2, 20.0)])
+    assert digest != definitions.result_digest(definition, [(2, 20.0), (1, 10.0)])
+    assert digest != definitions.result_digest(definition, [(1, 10.0), (2, 21.0)])
+    assert digest != definitions.result_digest(
+        models.PlaylistDefinition("Jazz", "genre:Jazz", limit=2),
+        [(1, 10.0), (2, 20.0)],
+    )
+
+
+def test_save_playlist_validates_definition(real_library):
+    """Tests that invalid queries, sorts and limits are not saved."""
+    with pytest.raises(exceptions.QueryError):
+        real_library.save_playlist("Bad", "genre:Jazz", sort="path")
+    with pytest.raises(exceptions.QueryError):
+        real_library.save_playlist("Bad", "genre:Jazz", limit=0)
+    with pytest.raises(exceptions.QueryError):
+        real_library.save_playlist(" ", "genre:Jazz")
+
+    assert real_library.saved_playlists() == []
+
+
+def test_save_playlist_rejects_file_collisions(real_library):
+    """Tests that two saved playlists cannot share a file."""
+    real_library.save_playlist("Jazz/Blues", "genre:Jazz")
+    real_library.save_playlist("Jazz/Blues", "genre:Blues")
+
+    with pytest.raises(exceptions.QueryError):
+        real_library.save_playlist("Jazz_Blues", "genre:Rock")
+    assert [d.query for d in real_library.saved_playlists()] == ["genre:Blues"]
+
+
+def test_refresh_playlists_writes_saved_playlists(real_library):
+    """Tests that saved playlists are written with their sort and limit."""
+    real_library.save_playlist("Jazz", "genre:Jazz", sort="year-", limit=2)
+    real_library.save_playlist("Rock", "genre:Rock")
+
+    results = real_library.refresh_playlists("m3u8")
+
+    assert [(r.name, r.track_count, r.changed) for r in results] == [
+        ("Jazz", 2, True),
+        ("Rock", 1, True),
+    ]
+    naima = real_library.lib.items("title:Naima").get()
+    assert _read(results[0].path)[0] == naima.path.decode()
+    saved = real_library.saved_playlists()
+    assert saved[0].path == results[0].path
+    assert saved[0].track_count == 2
+
+
+def test_refresh_playlists_skips_unchanged_playlists(real_library, mocker):
+    """Tests that only playlists whose tracks changed are rewritten."""
+    real_library.save_playlist("Jazz", "genre:Jazz")
+    real_library.save_playlist("Rock", "genre:Rock")
+    real_library.refresh_playlists("m3u8")
+
+    projected = mocker.spy(real_library, "items_projected")
+    assert not any(r.changed for r in real_library.refresh_playlists("m3u8"))
+    projected.assert_not_called()
+
+    item = real_library.lib.items("title:Paranoid").get()
+    item.mtime += 1
+    item.store()
+    write = mocker.spy(definitions.os, "replace")
+    results = real_library.refresh_playlists("m3u8")
+
+    assert [r.changed for r in results] == [False, True]
+    assert projected.call_count == 2
+    # Only the rock playlist and the registry are replaced.
+    assert write.call_count == 2
+
+
+def test_refresh_playlists_follows_path_rewriting(real_library):
+    """Tests that changing the path rewriting rewrites unchanged playlists."""
+    real_library.save_playlist("Jazz", "genre:Jazz")
+    real_library.refresh_playlists("m3u8")
+    music_dir = real_library.music_dir
+
+    real_library.settings.music_library_path_from = music_dir
+    real_library.settings.music_library_path_to = "/player"
+    (result,) = real_library.refresh_playlists("m3u8")
+
+    assert result.changed
+    assert all(line.startswith("/player/") for line in _read(result.path))
+
+
+def test_refresh_playlists_keeps_the_original_error(real_library, mocker):
+    """Tests that a failed registry save does not hide a failed refresh."""
+    real_library.save_playlist("Jazz", "genre:Jazz")
+    real_library.save_playlist("Rock", "genre:Rock")
+    write = mocker.patch.object(
+        library.export,
+        "write_playlist",
+        side_effect=[models.PlaylistExport("Jazz", 3, 30), OSError("full")],
+    )
+    mocker.patch.object(
+        real_library.playlist_registry, "put", side_effect=OSError("read-only")
+    )
+
+    with pytest.raises(exceptions.BeetsWrapperError, match="Rock"):
+        real_library.refresh_playlists("m3u8")
+    assert write.call_count == 2
+
+
+def test_refresh_playlists_rewrites_missing_files(real_library):
+    """Tests that deleted playlist files and forced refreshes are rewritten."""
+    real_library.save_playlist("Jazz", "genre:Jazz")
+    (result,) = real_library.refresh_playlists("m3u8")
+    os.unlink(result.path)
+
+    (missing,) = real_library.refresh_playlists("m3u8")
+    (forced,) = real_library.refresh_playlists("m3u8", force=True)
+
+    assert missing.changed and forced.changed
+    assert len(_read(result.path)) == 3
+
+
+def test_refresh_playlists_rejects_unknown_names(real_library):
+    """Tests that refreshing a playlist that was never saved fails."""
+    real_library.save_playlist("Jazz", "genre:Jazz")
+    assert real_library.delete_saved_playlist("Jazz")
+
+    with pytest.raises(exceptions.QueryError):
+        real_library.refresh_playlists("m3u8", names=["Jazz"])
@@ -0,0 +1,183 @@
+"""Tests for the streaming playlist export."""
+
+from pathlib import Path
+
+import pytest
+
+from smartplaylist.beets_wrapper import exceptions, export
+
+
+def test_write_playlist(tmp_path: Path):
+    """Test that entries are written one per line."""
+    path = tmp_path / "list.m3u8"
+
+    result = export.write_playlist(str(path), iter([("/a.mp3",), ("/b.mp3",)]))
+
+    assert path.read_text() == "/a.mp3\n/b.mp3\n"
+    assert result.track_count == 2
+    assert result.bytes_written == 14
+
+
+def test_write_playlist_is_atomic(tmp_path: Path):
+    """Test that a failed export leaves the previous playlist in place."""
+    path = tmp_path / "list.m3u8"
+    path.write_text("/old.mp3\n")
+
+    def entries():
+        yield ("/new.mp3",)
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        export.write_playlist(str(path), entries())
+
+    assert path.read_text() == "/old.mp3\n"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_create_playlist_streams_paths(real_library, tmp_path: Path, mocker):
+    """Test that playlists are written from SQL without hydrating items."""
+    expected = [item.path.decode() for item in real_library.lib.items("genre:jazz")]
+    items = mocker.spy(real_library.lib, "items")
+    path = tmp_path / "jazz.m3u8"
+
+    result = real_library.create_playlist("genre:jazz", str(path))
+
+    items.assert_not_called()
+    assert result.track_count == 3
+    assert path.read_text().splitlines() == expected
+
+
+def test_create_playlist_slow_query(real_library, tmp_path: Path):
+    """Test that queries on flexible attributes still produce a playlist."""
+    item = real_library.lib.items("title:Paranoid").get()
+    item["mood"] = "heavy"
+    item.store()
+    path = tmp_path / "heavy.m3u8"
+
+    result = real_library.create_playlist("mood:heavy", str(path))
+
+    assert result.track_count == 1
+    assert path.read_text().endswith("03.mp3\n")
+
+
+def test_playlist_set_writer_bounds_open_files(tmp_path: Path):
+    """Test that interleaved writes never keep more files open than allowed."""
+    paths = [str(tmp_path / f"{i}.m3u8") for i in range(5)]
+
+    with export.PlaylistSetWriter(max_open_files=2) as writer:
+        writer.add(str(tmp_path / "empty.m3u8"))
+        for n in range(3):
+            for path in paths:
+                writer.write(path, (f"/{n}.mp3",))
+                assert len(writer._open) <= 2
+        results = writer.commit()
+
+    assert [Path(r.path).name for r in results] == [
+        "empty.m3u8",
+        *[f"{i}.m3u8" for i in range(5)],
+    ]
+    assert (tmp_path / "3.m3u8").read_text() == "/0.mp3\n/1.mp3\n/2.mp3\n"
+    assert (tmp_path / "empty.m3u8").read_text() == ""
+    assert results[1].track_count == 3
+    assert not list(tmp_path.glob(".*.tmp"))
+
+
+def test_playlist_set_writer_discards_on_error(tmp_path: Path):
+    """Test that no playlist is written when the export fails."""
+    with pytest.raises(RuntimeError):
+        with export.PlaylistSetWriter() as writer:
+            writer.write(str(tmp_path / "a.m3u8"), ("/a.mp3",))
+            raise RuntimeError("boom")
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_playlist_set_writer_rejects_duplicate_paths(tmp_path: Path):
+    """Test that two playlists cannot be registered with the same path."""
+    with export.PlaylistSetWriter() as writer:
+        writer.add(str(tmp_path / "a.m3u8"))
+        with pytest.raises(ValueError):
+            writer.add(str(tmp_path / "a.m3u8"))
+
+
+def test_safe_filename():
+    """Test that names are turned into file names without path separators."""
+    assert export.safe_filename("AC/DC: Live?") == "AC_DC_ Live_"
+    assert export.safe_filename("..") == "_"
+
+
+def test_create_playlists_by_field(real_library, tmp_path: Path, mocker):
+    """Test that one playlist per genre is written from a single scan."""
+    items = mocker.spy(real_library.lib, "items")
+    jazz = [i.path.decode() for i in real_library.lib.items("genre:Jazz")]
+    items.reset_mock()
+
+    results = real_library.create_playlists_by_field(
+        str(tmp_path), "m3u8", field="genre", prefix="Genre - "
+    )
+
+    items.assert_not_called()
+    counts = {Path(r.path).name: r.track_count for r in results}
+    assert counts == {"Genre - Jazz.m3u8": 3, "Genre - Rock.m3u8": 1}
+    assert (tmp_path / "Genre - Jazz.m3u8").read_text().splitlines() == jazz
+
+
+def test_create_playlists_by_queries(real_library, tmp_path: Path):
+    """Test that named queries can overlap and produce empty playlists."""
+    results = real_library.create_playlists_by_field(
+        str(tmp_path),
+        "m3u8",
+        queries={
+            "Miles": "artist:Miles",
+            "Old": "year:1950..1965",
+            "None": "year:2020",
+        },
+    )
+
+    assert [(Path(r.path).stem, r.track_count) for r in results] == [
+        ("Miles", 2),
+        ("Old", 3),
+        ("None", 0),
+    ]
+
+
+def test_create_playlists_by_field_suffixes_colliding_names(
+    real_library, tmp_path: Path
+):
+    """Test that names mapping to the same file are written to separate files."""
+    results = real_library.create_playlists_by_field(
+        str(tmp_path),
+        "m3u8",
+        queries={
+            "Jazz/Miles": "artist:Miles",
+            "Jazz_Miles": "genre:Jazz",
+            "jazz_miles": "",
+        },
+    )
+
+    assert [(Path(r.path).stem, r.track_count) for r in results] == [
+        ("Jazz_Miles", 2),
+        ("Jazz_Miles (2)", 3),
+        ("jazz_miles (3)", 5),
+    ]
+
+
+def test_create_playlists_by_field_slow_query(real_library, tmp_path: Path):
+    """Test that queries beets evaluates in Python fall back to one item scan."""
+    item = real_library.lib.items("title:Naima").get()
+    item["mood"] = "calm"
+    item.store()
+
+    results = real_library.create_playlists_by_field(
+        str(tmp_path), "m3u8", field="decade", query="mood:calm"
+    )
+
+    assert [(Path(r.path).stem, r.track_count) for r in results] == [("1960", 1)]
+
+
+def test_create_playlists_by_field_requires_one_mode(real_library, tmp_path: Path):
+    """Test that exactly one partitioning must be requested."""
+    with pytest.raises(exceptions.QueryError):
+        real_library.create_playlists_by_field(str(tmp_path), "m3u8")
+    with pytest.raises(exceptions.QueryError):
+        real_library.create_playlists_by_field(str(tmp_path), "m3u8", field="path")
@@ -0,0 +1,57 @@
+"""Tests for the materialized facet index."""
+
+import os
+
+import pytest
+from beets import library as beets_library
+
+from smartplaylist.beets_wrapper import exceptions
+from smartplaylist.beets_wrapper.facets import FACET_INDEX_FILENAME
+
+
+def test_list_facet_counts(real_library):
+    """Test the value counts of the facet fields."""
+    genres = real_library.list_facet("genre")
+    decades = real_library.list_facet("decade")
+
+    assert [(v.value, v.count) for v in genres] == [("Jazz", 3), ("Rock", 1)]
+    assert [(v.value, v.count) for v in decades] == [
+        ("1950", 2),
+        ("1960", 1),
+        ("1970", 1),
+    ]
+    assert real_library.list_facet("format")[0].count == 5
+
+
+def test_list_facet_unknown_field(real_library):
+    """Test that unsupported fields are rejected."""
+    with pytest.raises(exceptions.QueryError):
+        real_library.list_facet("lyrics")
+
+
+def test_facet_index_is_persisted(real_library, mocker):
+    """Test that the index is written next to the database and reused."""
+    real_library.list_genres()
+    index_path = os.path.join(real_library.data_dir, FACET_INDEX_FILENAME)
+    assert os.path.exists(index_path)
+
+    real_library._facet_index = None
+    build = mocker.patch("smartplaylist.beets_wrapper.facets.FacetIndex.build")
+    genres = real_library.list_genres()
+
+    build.assert_not_called()
+    assert {g.name for g in genres} == {"Jazz", "Rock"}
+
+
+def test_facet_index_invalidated_on_change(real_library):
+    """Test that adding an item changes the revision and refreshes the index."""
+    revision = real_library.revision()
+    assert real_library.list_facet("artist")[0].value == "Miles Davis"
+
+    for i in range(3):
+        real_library.lib.add(
+            beets_library.Item(path=f"/x/{i}.mp3".encode(), artist="Nina Simone")
+        )
+
+    assert real_library.revision() != revision
+    assert real_library.list_facet("artist")[0].value == "Nina Simone"
@@ -0,0 +1,153 @@
+"""Tests for the playlist formats."""
+
+import json
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+
+from smartplaylist.beets_wrapper import exceptions, export, formats
+
+ROWS = [
+    ("/music/a.mp3", 61.4, "Miles Davis", "So What"),
+    ("/music/b c.mp3", 0.0, "", "Line\nbreak"),
+]
+
+
+def _rows(fmt: formats.PlaylistFormat):
+    fields = ("length", "artist", "title")
+    for location, *values in ROWS:
+        record = dict(zip(fields, values), id=1, album="Kind of Blue")
+        yield (location, *(record[f] for f in fmt.fields))
+
+
+def test_format_lookup():
+    """Tests that formats are found by name and by extension."""
+    assert formats.get_format("XSPF").extension == "xspf"
+    assert formats.format_for_extension(".pls").name == "pls"
+    assert formats.format_for_extension("m3u8").name == "m3u"
+    assert formats.format_for_extension("txt").name == "m3u"
+    with pytest.raises(exceptions.QueryError):
+        formats.get_format("wpl")
+
+
+def test_extended_m3u(tmp_path: Path):
+    """Tests that extended M3U entries carry the duration, artist and title."""
+    fmt = formats.get_format("extm3u")
+    path = tmp_path / "list.m3u8"
+
+    result = export.write_playlist(str(path), _rows(fmt), fmt)
+
+    assert path.read_text().splitlines() == [
+        "#EXTM3U",
+        "#EXTINF:61,Miles Davis - So What",
+        "/music/a.mp3",
+        "#EXTINF:-1,Line break",
+        "/music/b c.mp3",
+    ]
+    assert result.track_count == 2
+
+
+def test_pls(tmp_path: Path):
+    """Tests that PLS playlists are numbered and counted."""
+    fmt = formats.get_format("pls")
+    path = tmp_path / "list.pls"
+
+    export.write_playlist(str(path), _rows(fmt), fmt)
+
+    lines = path.read_text().splitlines()
+    assert lines[:4] == [
+        "[playlist]",
+        "File1=/music/a.mp3",
+        "Title1=So What",
+        "Length1=61",
+    ]
+    assert lines[-2:] == ["NumberOfEntries=2", "Version=2"]
+
+
+def test_xspf(tmp_path: Path):
+    """Tests that XSPF playlists are valid XML with file URIs."""
+    fmt = formats.get_format("xspf")
+    path = tmp_path / "list.xspf"
+
+    export.write_playlist(str(path), _rows(fmt), fmt)
+
+    ns = {"x": "http://xspf.org/ns/0/"}
+    tracks = ET.parse(path).getroot().findall("x:trackList/x:track", ns)
+    assert [t.findtext("x:location", namespaces=ns) for t in tracks] == [
+        "file:///music/a.mp3",
+        "file:///music/b%20c.mp3",
+    ]
+    assert tracks[0].findtext("x:creator", namespaces=ns) == "Miles Davis"
+    assert tracks[0].findtext("x:duration", namespaces=ns) == "61400"
+    assert tracks[1].find("x:creator", ns) is None
+
+
+def test_json_lines(tmp_path: Path):
+    """Tests that JSON lines hold one object per track."""
+    fmt = formats.get_format("jsonl")
+    path = tmp_path / "list.jsonl"
+
+    export.write_playlist(str(path), _rows(fmt), fmt)
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert records[0] == {
+        "id": 1,
+        "title": "So What",
+        "artist": "Miles Davis",
+        "album": "Kind of Blue",
+        "length": 61.4,
+        "path": "/music/a.mp3",
+    }
+
+
+def test_set_writer_renders_headers_and_footers(tmp_path: Path):
+    """Tests that every playlist of a set is a complete file, even if empty."""
+    fmt = formats.get_format("pls")
+    full, empty = str(tmp_path / "full.pls"), str(tmp_path / "empty.pls")
+
+    with export.PlaylistSetWriter(max_open_files=1, playlist_format=fmt) as writer:
+        writer.add(empty)
+        for row in _rows(fmt):
+            writer.write(full, row)
+        writer.commit()
+
+    assert Path(full).read_text().count("File") == 2
+    assert Path(full).read_text().endswith("NumberOfEntries=2\nVersion=2\n")
+    assert Path(empty).read_text() == "[playlist]\nNumberOfEntries=0\nVersion=2\n"
+
+
+def test_create_playlist_in_format(real_library, tmp_path: Path, mocker):
+    """Tests that the fields of a format are read from SQL, not from items."""
+    items = mocker.spy(real_library.lib, "items")
+    path = tmp_path / "jazz.m3u8"
+
+    result = real_library.create_playlist("genre:Jazz", str(path), "extm3u")
+
+    items.assert_not_called()
+    lines = path.read_text().splitlines()
+    assert lines[0] == "#EXTM3U"
+    assert "#EXTINF:60,Miles Davis - So What" in lines
+    assert result.track_count == 3
+
+
+def test_create_playlist_format_from_extension(real_library, tmp_path: Path):
+    """Tests that the file extension picks the format by default."""
+    path = tmp_path / "jazz.jsonl"
+
+    real_library.create_playlist("genre:Jazz", str(path))
+
+    titles = [json.loads(line)["title"] for line in path.read_text().splitlines()]
+    assert sorted(titles) == ["Blue in Green", "Naima", "So What"]
+
+
+def test_create_playlists_by_field_in_format(real_library, tmp_path: Path):
+    """Tests that playlist sets are written in the requested format."""
+    results = real_library.create_playlists_by_field(
+        str(tmp_path), "pls", field="genre", playlist_format="pls"
+    )
+
+    rock = next(r for r in results if r.path.endswith("Rock.pls"))
+    lines = Path(rock.path).read_text().splitlines()
+    assert lines[2:4] == ["Title1=Paranoid", "Length1=240"]
+    assert lines[-2] == "NumberOfEntries=1"
@@ -0,0 +1,153 @@
+"""Tests for the full-text index."""
+
+from pathlib import Path
+
+import pytest
+from beets import library as beets_library
+
+from smartplaylist.beets_wrapper import exceptions, fulltext
+
+
+def _titles(real_library, text):
+    return [r.title for r in real_library.fulltext_search(text, fields=("title",))]
+
+
+def _installed(real_library):
+    with real_library.read_connection() as conn:
+        return fulltext.is_installed(conn)
+
+
+@pytest.fixture
+def indexed_library(real_library):
+    """Fixture enabling the full-text index and building it, as a sync would."""
+    real_library.settings.fulltext_enabled = True
+    real_library._update_fulltext_index()
+    return real_library
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("coltrane", '"coltrane"*'),
+        ("miles  davis", '"miles"* "davis"*'),
+        ('"blue in green"', '"blue in green"'),
+        ("artist:davis", 'artist : "davis"*'),
+        ("mood:calm", '"mood calm"*'),
+        ('say "hi', '"say"* "hi"'),
+        ('AND OR NOT ^ ( "x""y"', '"AND"* "OR"* "NOT"* "x" "y"'),
+    ],
+)
+def test_match_expression(text, expected):
+    """Tests that free text becomes a safe FTS5 query."""
+    assert fulltext.match_expression(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "  ", "-- ^ ()"])
+def test_match_expression_without_words(text):
+    """Tests that text without words is rejected."""
+    with pytest.raises(exceptions.QueryError):
+        fulltext.match_expression(text)
+
+
+def test_fulltext_search_never_installs(real_library):
+    """Tests that searches fail rather than build a missing index."""
+    with pytest.raises(exceptions.BeetsWrapperError, match="disabled"):
+        real_library.fulltext_search("coltr")
+
+    real_library.settings.fulltext_enabled = True
+    with pytest.raises(exceptions.BeetsWrapperError, match="not built"):
+        real_library.fulltext_search("coltr")
+    assert not _installed(real_library)
+
+
+def test_fulltext_search_ranks(indexed_library):
+    """Tests that matches are ranked with their relevance score."""
+    records = indexed_library.fulltext_search("coltr", fields=("id", "title", "artist"))
+
+    assert [(r.title, r.artist) for r in records] == [("Naima", "John Coltrane")]
+    assert records[0]._fields == ("id", "title", "artist", "score")
+    assert records[0].score > 0
+
+
+def test_fulltext_search_ranks_title_before_album(indexed_library):
+    """Tests that title matches rank before matches in other fields."""
+    item = indexed_library.lib.items("title:Paranoid").get()
+    item.album = "Jazz Classics"
+    item.store()
+    indexed_library.lib.add(beets_library.Item(path=b"/x.mp3", title="Jazz Suite"))
+
+    assert _titles(indexed_library, "jazz")[0] == "Jazz Suite"
+    assert len(_titles(indexed_library, "jazz")) == 5
+
+
+def test_fulltext_search_field_and_phrase(indexed_library):
+    """Tests field restrictions and exact phrases."""
+    assert _titles(indexed_library, "artist:miles") == ["So What", "Blue in Green"]
+    assert _titles(indexed_library, "title:miles") == []
+    assert _titles(indexed_library, '"blue in green"') == ["Blue in Green"]
+    assert _titles(indexed_library, '"green in blue"') == []
+
+
+def test_fulltext_search_ignores_diacritics(indexed_library):
+    """Tests that accents do not need to be typed."""
+    indexed_library.lib.add(beets_library.Item(path=b"/b.mp3", artist="Björk"))
+
+    assert len(indexed_library.fulltext_search("bjork")) == 1
+    assert len(indexed_library.fulltext_search("BJÖRK")) == 1
+
+
+def test_fulltext_index_follows_library_writes(indexed_library):
+    """Tests that triggers keep the index in sync with the items table."""
+    item = indexed_library.lib.items("title:Naima").get()
+
+    item.title = "Giant Steps"
+    item.store()
+    assert _titles(indexed_library, "naima") == []
+    assert _titles(indexed_library, "giant steps") == ["Giant Steps"]
+
+    added = beets_library.Item(path=b"/n.mp3", title="Naima", composer="Coltrane")
+    indexed_library.lib.add(added)
+    assert _titles(indexed_library, "naima") == ["Naima"]
+
+    item.remove()
+    added.remove()
+    assert _titles(indexed_library, "giant") == []
+    assert _titles(indexed_library, "coltrane") == []
+
+
+def test_install_replaces_incomplete_index(indexed_library):
+    """Tests that an index missing a trigger is rebuilt."""
+    with indexed_library.lib.transaction() as tx:
+        tx.mutate(f"DROP TRIGGER {fulltext.FULLTEXT_TABLE}_au")
+    assert not _installed(indexed_library)
+
+    indexed_library._update_fulltext_index()
+
+    assert _installed(indexed_library)
+    assert _titles(indexed_library, "naima") == ["Naima"]
+
+
+def test_sync_library_installs_index(real_library, write_track):
+    """Tests that synced tracks are indexed as they are added."""
+    music_path = Path(real_library.db_path).parent / "music"
+    write_track(music_path / "New" / "track.wav", title="Fresh Start")
+    real_library.settings.fulltext_enabled = True
+
+    real_library.sync_library(workers=1)
+
+    assert _installed(real_library)
+    assert _titles(real_library, "fresh") == ["Fresh Start"]
+
+
+def test_sync_library_removes_disabled_index(indexed_library):
+    """Tests that turning the setting off removes the index and its triggers."""
+    indexed_library.settings.fulltext_enabled = False
+
+    indexed_library.sync_library(workers=1)
+
+    with indexed_library.read_connection() as conn:
+        (count,) = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name LIKE ?",
+            (f"{fulltext.FULLTEXT_TABLE}%",),
+        ).fetchone()
+    assert count == 0
@@ -0,0 +1,122 @@
+"""Tests for the in-process parallel importer."""
+
+import concurrent.futures
+import os
+from pathlib import Path
+
+import pytest
+
+from smartplaylist.beets_wrapper import importer, sync
+from smartplaylist.beets_wrapper.manifest import Manifest
+
+
+def test_scan_directory_skips_ignored_and_non_audio_files(music_dir: Path):
+    """Tests that only audio files outside ignored directories are listed."""
+    groups = list(importer.scan_directory(str(music_dir)))
+
+    assert [os.path.basename(d) for d, _ in groups] == ["Kind of Blue", "Paranoid"]
+    assert [os.path.basename(p) for p in groups[1][1]] == ["01.wav", "broken.mp3"]
+
+
+def test_scan_directory_missing_root(tmp_path: Path):
+    """Tests that a missing root directory is reported."""
+    with pytest.raises(OSError):
+        list(importer.scan_directory(str(tmp_path / "missing")))
+
+
+def test_import_tree_adds_one_album_per_directory(music_dir: Path, beets_lib):
+    """Tests that tags are imported and each directory becomes an album."""
+    before = (music_dir / "Paranoid" / "01.wav").stat().st_mtime_ns
+    progress = []
+
+    stats = importer.import_tree(
+        beets_lib, str(music_dir), progress=lambda n, t: progress.append((n, t))
+    )
+
+    assert (stats.files, stats.imported, stats.failed, stats.albums) == (4, 3, 1, 2)
+    assert progress[-1] == (4, 4)
+    titles = sorted(item.title for item in beets_lib.items())
+    assert titles == ["Freddie", "So What", "War Pigs"]
+    assert sorted(len(album.items()) for album in beets_lib.albums()) == [1, 2]
+    assert all(item.added for item in beets_lib.items())
+    assert (music_dir / "Paranoid" / "01.wav").stat().st_mtime_ns == before
+
+
+def test_import_tree_skips_existing_files(music_dir: Path, beets_lib, write_track):
+    """Tests that files already in the library are not imported twice."""
+    importer.import_tree(beets_lib, str(music_dir))
+    write_track(music_dir / "New" / "01.wav", title="New")
+
+    stats = importer.import_tree(beets_lib, str(music_dir))
+
+    assert (stats.imported, stats.skipped) == (1, 3)
+    assert len(beets_lib.items()) == 4
+
+
+def test_import_tree_reads_tags_in_worker_processes(
+    music_dir: Path, beets_lib, monkeypatch, mocker
+):
+    """Tests that a process pool import gives the same result in order."""
+    monkeypatch.setattr(importer, "READ_CHUNK_SIZE", 1)
+    pool = mocker.spy(importer.concurrent.futures, "ProcessPoolExecutor")
+
+    stats = importer.import_tree(beets_lib, str(music_dir), workers=2, batch_size=1)
+
+    assert pool.call_args.kwargs["mp_context"].get_start_method() == "forkserver"
+
+    assert (stats.imported, stats.failed, stats.albums) == (3, 1, 2)
+    by_path = {os.path.basename(os.path.dirname(i.path)): i for i in beets_lib.items()}
+    assert by_path[b"Paranoid"].title == "War Pigs"
+
+
+def test_import_tree_writes_the_manifest(music_dir: Path, beets_lib, tmp_path: Path):
+    """Tests that the first sync after an import reads no file again."""
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    importer.import_tree(beets_lib, str(music_dir), manifest=manifest)
+
+    loaded = Manifest(manifest.path)
+    assert loaded.load(str(music_dir))
+    assert len(loaded.files) == 4
+    stats = sync.sync_tree(beets_lib, str(music_dir), loaded)
+    assert (stats.added, stats.changed, stats.failed) == (0, 0, 0)
+
+
+class _Executor:
+    """Runs submitted reads at once and records how many were submitted."""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        future = concurrent.futures.Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def test_read_in_windows_bounds_pending_reads(monkeypatch):
+    """Tests that chunks are submitted as the results are consumed."""
+    monkeypatch.setattr(importer, "READ_CHUNK_SIZE", 2)
+    monkeypatch.setattr(importer, "read_item_values", lambda path: (None, path))
+    executor = _Executor()
+
+    results = importer._read_in_windows(executor, [str(i) for i in range(20)], 3)
+
+    assert next(results) == (None, "0")
+    assert executor.submitted == 3
+    assert [error for _, error in results] == [str(i) for i in range(1, 20)]
+    assert executor.submitted == 10
+
+
+def test_read_all_cancels_pending_reads(music_dir: Path, mocker, monkeypatch):
+    """Tests that reads not yet started are cancelled when reading stops."""
+    monkeypatch.setattr(importer, "READ_CHUNK_SIZE", 1)
+    shutdown = mocker.spy(concurrent.futures.ProcessPoolExecutor, "shutdown")
+    paths = [str(music_dir / "Paranoid" / "01.wav")] * 20
+
+    with pytest.raises(RuntimeError):
+        with importer.read_all(paths, workers=2) as results:
+            next(results)
+            raise RuntimeError("stop")
+
+    shutdown.assert_called_once_with(mocker.ANY, cancel_futures=True)
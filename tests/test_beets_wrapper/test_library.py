@@ -1,5 +1,6 @@
 """Tests for the beets wrapper library."""
 
+import os
 import subprocess
 import unittest.mock
 from pathlib import Path
@@ -7,7 +8,8 @@ from pathlib import Path
 import pytest
 import yaml
 
-from smartplaylist.beets_wrapper import exceptions, library
+from smartplaylist import metrics
+from smartplaylist.beets_wrapper import exceptions, formats, library
 from smartplaylist.settings import Settings
 
 
@@ -39,25 +41,33 @@ def test_library_init_failure(mock_beets_config, mock_settings):
         library.Library(config_path="/fake/config.yaml", settings=mock_settings)
 
 
-def test_import_dir_success(tmp_path: Path, mock_settings):
+def test_import_dir_success(tmp_path: Path, music_dir: Path, mock_settings):
     """Test successful directory import."""
     db_path = tmp_path / "test.db"
     config_path = tmp_path / "config.yaml"
-    music_path = tmp_path / "music"
-    music_path.mkdir()
-    (music_path / "track.mp3").touch()
 
     beets_config = {
         "library": str(db_path.resolve()),
-        "directory": str(music_path.resolve()),
+        "directory": str(music_dir.resolve()),
         "plugins": [],
     }
     with open(config_path, "w") as f:
         yaml.dump(beets_config, f)
 
-    db_path.touch()
     lib = library.Library(str(config_path.resolve()), settings=mock_settings)
-    lib.import_dir(str(music_path.resolve()))
+    try:
+        stats = lib.import_dir(str(music_dir.resolve()))
+
+        assert (stats.imported, stats.albums, stats.failed) == (3, 2, 1)
+        titles = sorted(item.title for item in lib.lib.items())
+        assert titles == ["Freddie", "So What", "War Pigs"]
+
+        stats = lib.import_dir(str(music_dir.resolve()))
+
+        assert (stats.imported, stats.skipped) == (0, 3)
+        assert len(lib.lib.items()) == 3
+    finally:
+        lib.close()
 
 
 def test_import_dir_failure(tmp_path: Path, mock_settings):
@@ -114,22 +124,23 @@ def test_albums_failure(mock_beets_config, mock_settings):
         lib.albums(query="year:2023")
 
 
-@unittest.mock.patch("builtins.open", new_callable=unittest.mock.mock_open)
-def test_create_playlist_success(mock_open, mock_beets_config, mock_settings):
+def test_create_playlist_success(tmp_path: Path, mock_beets_config, mock_settings):
     """Test successful playlist creation."""
     lib = library.Library(config_path="/fake/config.yaml", settings=mock_settings)
     mock_item = unittest.mock.Mock()
     mock_item.path = b"/path/to/music.mp3"
     lib.lib.items.return_value = [mock_item]  # type: ignore
+    playlist_path = tmp_path / "playlist.m3u"
 
-    lib.create_playlist(query="genre:Rock", path="/fake/playlist.m3u")
+    result = lib.create_playlist(query="genre:Rock", path=str(playlist_path))
 
-    mock_open.assert_called_once_with("/fake/playlist.m3u", "w")
-    mock_open().write.assert_called_once_with("/path/to/music.mp3\n")
+    assert playlist_path.read_text() == "/path/to/music.mp3\n"
+    assert result.track_count == 1
+    assert result.bytes_written == len("/path/to/music.mp3\n")
+    assert list(tmp_path.iterdir()) == [playlist_path]
 
 
-@unittest.mock.patch("builtins.open", new_callable=unittest.mock.mock_open)
-def test_create_playlist_with_rewrite(mock_open, mock_beets_config, monkeypatch):
+def test_create_playlist_with_rewrite(tmp_path: Path, mock_beets_config, monkeypatch):
     """Test successful playlist creation with path rewriting."""
     monkeypatch.setenv("SMARTPLAYLIST_MUSIC_LIBRARY_PATH_FROM", "/path/to")
     monkeypatch.setenv("SMARTPLAYLIST_MUSIC_LIBRARY_PATH_TO", "/new/path")
@@ -138,21 +149,25 @@ def test_create_playlist_with_rewrite(mock_open, mock_beets_config, monkeypatch)
     mock_item = unittest.mock.Mock()
     mock_item.path = b"/path/to/music.mp3"
     lib.lib.items.return_value = [mock_item]  # type: ignore
+    playlist_path = tmp_path / "playlist.m3u"
 
-    lib.create_playlist(query="genre:Rock", path="/fake/playlist.m3u")
+    lib.create_playlist(query="genre:Rock", path=str(playlist_path))
 
-    mock_open.assert_called_once_with("/fake/playlist.m3u", "w")
-    mock_open().write.assert_called_once_with("/new/path/music.mp3\n")
+    assert playlist_path.read_text() == "/new/path/music.mp3\n"
 
 
-def test_get_statistics_success(mock_beets_config, mock_settings):
-    """Test successful statistics retrieval."""
+def test_get_statistics_success(mock_beets_config, mock_settings, caplog):
+    """Test that statistics are counted from the items when SQL fails."""
     lib = library.Library(config_path="/fake/config.yaml", settings=mock_settings)
     mock_item1 = unittest.mock.Mock()
     mock_item1.artist = "Artist1"
+    mock_item1.genre = "Rock"
+    mock_item1.length = 120.0
     mock_item1.filesize = 1000
     mock_item2 = unittest.mock.Mock()
     mock_item2.artist = "Artist2"
+    mock_item2.genre = "Rock"
+    mock_item2.length = 60.0
     mock_item2.filesize = 2000
 
     lib.lib.items.return_value = [mock_item1, mock_item2]  # type: ignore
@@ -164,6 +179,9 @@ def test_get_statistics_success(mock_beets_config, mock_settings):
     assert stats.total_albums == 1
     assert stats.total_artists == 2
     assert stats.total_size == 3000
+    assert stats.total_duration == 180.0
+    assert stats.total_genres == 1
+    assert "counting items instead" in caplog.text
 
 
 def test_list_genres_success(mock_beets_config, mock_settings):
@@ -190,20 +208,107 @@ def test_list_genres_success(mock_beets_config, mock_settings):
     assert sorted_genres[1].count == 2
 
 
-@unittest.mock.patch("smartplaylist.beets_wrapper.library.os")
-def test_list_playlists_success(mock_os, mock_beets_config, mock_settings):
-    """Test successful playlist listing."""
-    mock_beets_config["smartplaylist"][
-        "playlist_dir"
-    ].get.return_value = "/fake/playlists"
-    mock_os.path.isdir.return_value = True
-    mock_os.listdir.return_value = ["Rock Classics.m3u8", "Pop Hits.m3u8"]
-    lib = library.Library(config_path="/fake/config.yaml", settings=mock_settings)
+@pytest.mark.parametrize("method", ["get_statistics", "list_genres"])
+def test_pool_timeout_is_not_a_fallback(real_library, mocker, method):
+    """Test that a busy pool fails the call instead of scanning every item."""
+    real_library.settings.snapshot_enabled = False
+    mocker.patch.object(
+        real_library.pool,
+        "_acquire",
+        side_effect=exceptions.PoolTimeoutError("Timed out"),
+    )
+    items = mocker.spy(real_library.lib, "items")
+
+    with pytest.raises(exceptions.PoolTimeoutError):
+        getattr(real_library, method)()
+    items.assert_not_called()
+
+
+def test_pool_size_defaults_to_worker_threads(real_library):
+    """Test that every worker thread can hold a connection by default."""
+    real_library.settings.mcp_worker_threads = 6
+
+    assert real_library.pool.max_size == 6
+
+
+def test_pool_stats_do_not_create_the_pool(real_library):
+    """Test that reading the pool statistics never opens the pool."""
+    real_library.settings.mcp_worker_threads = 6
+    assert real_library._pool is None
+
+    stats = real_library.pool_stats()
+
+    assert (stats.max_size, stats.open_connections) == (6, 0)
+    assert real_library._pool is None
+
+
+def test_list_playlists_success(real_library):
+    """Test that playlists are listed with their size, tracks and query."""
+    real_library.save_playlist("Jazz", "genre:Jazz")
+    real_library.refresh_playlists("m3u8")
+    playlist_dir = Path(real_library.playlist_dir)
+    (playlist_dir / "Old.m3u8").write_text("#EXTM3U\n/a.mp3\n\n/b.mp3\n")
+    (playlist_dir / "notes.txt").write_text("not a playlist\n")
 
-    playlists = lib.list_playlists(playlist_extension=".m3u8")
+    playlists = real_library.list_playlists(playlist_extension=".m3u8")
 
-    assert len(playlists) == 2
-    assert playlists[0].name == "Rock Classics.m3u8"
+    assert [p.name for p in playlists] == ["Jazz.m3u8", "Old.m3u8"]
+    assert [p.track_count for p in playlists] == [3, 2]
+    assert [p.query for p in playlists] == ["genre:Jazz", None]
+    assert playlists[1].size == 23
+    assert playlists[1].mtime > 0
+
+
+def test_list_playlists_caches_listing_and_counts(real_library, mocker):
+    """Test that unchanged directories and files are not read again."""
+    playlist_dir = Path(real_library.playlist_dir)
+    playlist_dir.mkdir()
+    old = playlist_dir / "Old.m3u8"
+    old.write_text("/a.mp3\n")
+    past = 1_000_000_000
+    os.utime(old, ns=(past, past))
+    os.utime(playlist_dir, ns=(past, past))
+    real_library.list_playlists(".m3u8")
+    scandir = mocker.spy(library.os, "scandir")
+    count = mocker.spy(real_library, "_track_count")
+    counted = mocker.spy(formats.PlaylistFormat, "count_entries")
+
+    assert real_library.list_playlists(".m3u8")[0].track_count == 1
+    scandir.assert_not_called()
+    counted.assert_not_called()
+    assert count.call_count == 1
+
+    (playlist_dir / "New.m3u8").write_text("/a.mp3\n/b.mp3\n")
+    playlists = real_library.list_playlists(".m3u8", track_counts=False)
+
+    assert scandir.call_count == 1
+    assert [(p.name, p.track_count) for p in playlists] == [
+        ("New.m3u8", None),
+        ("Old.m3u8", None),
+    ]
+
+
+def test_list_playlists_sees_files_rewritten_in_place(real_library):
+    """Test that a cached listing still reports the current size of each file."""
+    playlist_dir = Path(real_library.playlist_dir)
+    playlist_dir.mkdir()
+    old = playlist_dir / "Old.m3u8"
+    old.write_text("/a.mp3\n")
+    past = 1_000_000_000
+    os.utime(old, ns=(past, past))
+    os.utime(playlist_dir, ns=(past, past))
+    real_library.list_playlists(".m3u8")
+
+    old.write_text("/a.mp3\n/b.mp3\n")
+    os.utime(playlist_dir, ns=(past, past))
+    (playlist,) = real_library.list_playlists(".m3u8")
+
+    assert (playlist.size, playlist.track_count) == (14, 2)
+
+
+def test_list_playlists_missing_directory(real_library):
+    """Test that a missing playlist directory has no playlists."""
+    assert real_library.list_playlists(".m3u8") == []
 
 
 def test_update_library_success(mocker, tmp_path: Path, mock_settings):
@@ -249,3 +354,22 @@ def test_update_library_failure(mocker, tmp_path: Path, mock_settings):
     mock_run.side_effect = subprocess.CalledProcessError(1, "beet", "stdout", "stderr")
     with pytest.raises(exceptions.UpdateError):
         lib.update_library()
+
+
+def test_library_methods_record_metrics(real_library):
+    """Test that library calls are counted with their rows and errors."""
+    metrics.registry.reset()
+
+    real_library.items("genre:Jazz")
+    real_library.records_page("genre:Jazz", ("title",), limit=2)
+    with pytest.raises(exceptions.QueryError):
+        real_library.items_page("year:abc")
+
+    by_name = {
+        s.name: s for s in metrics.registry.snapshot() if s.component == "library"
+    }
+    assert by_name["items"].calls == 1
+    assert by_name["items"].rows == 3
+    assert by_name["records_page"].rows == 2
+    assert by_name["items_page"].errors == {"QueryError": 1}
+    metrics.registry.reset()
@@ -0,0 +1,128 @@
+"""Tests for the process-wide library manager."""
+
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from smartplaylist.beets_wrapper import library
+from smartplaylist.beets_wrapper.manager import LibraryManager
+from smartplaylist.settings import Settings
+
+
+@pytest.fixture
+def config_file(tmp_path: Path) -> Path:
+    """Fixture creating an empty configuration file."""
+    path = tmp_path / "config.yaml"
+    path.write_text("library: test.db\n")
+    return path
+
+
+@pytest.fixture
+def mock_library(mocker):
+    """Fixture to mock the wrapped Library class."""
+    mock = mocker.patch("smartplaylist.beets_wrapper.manager.Library")
+    mock.side_effect = lambda config_path, settings: mocker.Mock(
+        config_path=config_path
+    )
+    return mock
+
+
+def test_get_returns_same_library(mock_library, config_file, monkeypatch):
+    """Test that the library is opened once and reused."""
+    monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", str(config_file))
+    settings = Settings()
+    manager = LibraryManager()
+
+    first = manager.get(settings)
+    second = manager.get(settings)
+
+    assert first is second
+    mock_library.assert_called_once_with(str(config_file), settings)
+
+
+def test_get_reloads_on_config_change(mock_library, config_file, monkeypatch):
+    """Test that the library is reopened when the config file changes."""
+    monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", str(config_file))
+    settings = Settings()
+    manager = LibraryManager()
+
+    first = manager.get(settings)
+    config_file.write_text("library: other.db\n")
+    st = config_file.stat()
+    os.utime(config_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    second = manager.get(settings)
+
+    assert first is not second
+    first.close.assert_called_once()
+    assert manager.stats().reloads == 1
+
+
+def _touch(path: str):
+    """Moves the modification time of a file forward."""
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def test_reload_waits_for_leases(real_library: library.Library, monkeypatch, mocker):
+    """Test that a reload does not close the library under a transaction."""
+    monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", real_library.config_path)
+    settings = Settings()
+    manager = LibraryManager()
+    old = manager.get(settings)
+    close = mocker.spy(old, "close")
+    entered, release = threading.Event(), threading.Event()
+    counts, errors = [], []
+
+    def query():
+        try:
+            with manager.lease(settings) as lib, lib.lib.transaction() as tx:
+                entered.set()
+                release.wait(5)
+                counts.append(tx.query("SELECT COUNT(*) FROM items")[0][0])
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=query)
+    thread.start()
+    try:
+        assert entered.wait(5)
+        _touch(real_library.config_path)
+        with manager.lease(settings) as new:
+            assert new is not old
+            assert len(new.items()) == 5
+        close.assert_not_called()
+    finally:
+        release.set()
+        thread.join(5)
+        manager.close()
+
+    assert errors == []
+    assert counts == [5]
+    close.assert_called_once()
+    assert manager.stats() is None
+
+
+def test_close_waits_for_leases(mock_library, config_file, monkeypatch):
+    """Test that closing the manager keeps a leased library open until released."""
+    monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", str(config_file))
+    manager = LibraryManager()
+
+    with manager.lease(Settings()) as library:
+        manager.close()
+        library.close.assert_not_called()
+
+    library.close.assert_called_once()
+
+
+def test_close_releases_library(mock_library, config_file, monkeypatch):
+    """Test that closing the manager closes the shared library."""
+    monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", str(config_file))
+    manager = LibraryManager()
+    library = manager.get(Settings())
+
+    manager.close()
+
+    library.close.assert_called_once()
+    assert manager.stats() is None
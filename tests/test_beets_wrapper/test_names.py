@@ -0,0 +1,95 @@
+"""Tests for the trigram name index."""
+
+import os
+from pathlib import Path
+
+import pytest
+from beets import library as beets_library
+
+from smartplaylist.beets_wrapper import exceptions, names
+
+
+def _resolved(real_library, name, **kwargs):
+    return [(m.field, m.value) for m in real_library.resolve_names(name, **kwargs)]
+
+
+@pytest.mark.parametrize(
+    "name, normalized",
+    [("Hip-Hop", "hiphop"), ("Björk", "bjork"), ("Guns N' Roses", "gunsnroses")],
+)
+def test_normalize(name, normalized):
+    """Tests that case, accents, punctuation and spaces are dropped."""
+    assert names.normalize(name) == normalized
+
+
+def test_trigrams():
+    """Tests that names are padded before being split into trigrams."""
+    assert names.trigrams("U-2") == {"  u", " u2", "u2 "}
+    assert names.trigrams("!?") == set()
+
+
+def test_resolve_names_ranks_closest_values(real_library):
+    """Tests that misspelled names resolve to the stored values."""
+    matches = real_library.resolve_names("miles davs")
+
+    assert [(m.field, m.value, m.count) for m in matches] == [
+        ("artist", "Miles Davis", 2)
+    ]
+    assert 0.5 < matches[0].score < 1
+    assert _resolved(real_library, "jon coltrane") == [("artist", "John Coltrane")]
+    assert _resolved(real_library, "jaz")[0] == ("genre", "Jazz")
+
+
+def test_resolve_names_ignores_spelling_variants(real_library):
+    """Tests that accents and punctuation do not lower the score."""
+    real_library.lib.add(beets_library.Item(path=b"/b.mp3", artist="Björk"))
+    real_library.lib.add(beets_library.Item(path=b"/h.mp3", genre="Hip-Hop"))
+
+    (bjork,) = real_library.resolve_names("Bjork")
+    (hiphop,) = real_library.resolve_names("hiphop", fields=["genre"])
+
+    assert (bjork.value, bjork.score) == ("Björk", 1.0)
+    assert (hiphop.value, hiphop.score) == ("Hip-Hop", 1.0)
+
+
+def test_resolve_names_filters_fields_and_limits(real_library):
+    """Tests the field filter, the limit and the minimum score."""
+    assert _resolved(real_library, "album jaz", fields=["album"])[0] == (
+        "album",
+        "Album Jazz",
+    )
+    assert len(real_library.resolve_names("a", min_score=0)) == 3
+    assert len(real_library.resolve_names("a", limit=2, min_score=0)) == 2
+    assert real_library.resolve_names("a") == []
+    with pytest.raises(exceptions.QueryError):
+        real_library.resolve_names("jazz", fields=["title"])
+    with pytest.raises(exceptions.QueryError):
+        real_library.resolve_names("--")
+
+
+def test_name_index_is_persisted(real_library, mocker):
+    """Tests that the index is written next to the database and reused."""
+    expected = real_library.resolve_names("sabath")
+    assert os.path.exists(
+        os.path.join(real_library.data_dir, names.NAME_INDEX_FILENAME)
+    )
+
+    real_library._name_index = None
+    build = mocker.patch("smartplaylist.beets_wrapper.names.NameIndex.build")
+
+    assert real_library.resolve_names("sabath") == expected
+    build.assert_not_called()
+
+
+def test_name_index_refreshed_on_sync(real_library, write_track):
+    """Tests that the index is rebuilt when the library is synced."""
+    real_library.resolve_names("miles")
+    music_path = Path(real_library.db_path).parent / "music"
+    write_track(music_path / "New" / "01.wav", artist="Nina Simone")
+
+    real_library.sync_library(workers=1)
+    index = real_library._name_index
+
+    assert index.revision == real_library.revision()
+    assert _resolved(real_library, "nina simon") == [("artist", "Nina Simone")]
+    assert real_library._name_index is index
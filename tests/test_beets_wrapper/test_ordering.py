@@ -0,0 +1,151 @@
+"""Tests for the sequencing of playlist tracks."""
+
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from smartplaylist.beets_wrapper import exceptions, ordering
+
+
+def _random_rows(count: int, seed: int = 0) -> list[tuple]:
+    rng = random.Random(seed)
+    keys = ["C", "Am", "G", "Em", "D", "Bm", "F#m", "Db", "Bbm", ""]
+    return [
+        (
+            rng.choice([0, *range(70, 180)]),
+            rng.choice(keys),
+            rng.choice([0, *range(1960, 2024)]),
+            rng.choice(["A", "B", "C", "D", ""]),
+        )
+        for _ in range(count)
+    ]
+
+
+def test_costs():
+    """Tests the cost of tempo, key, year and artist changes."""
+    transitions = ordering.Transitions(
+        [
+            (120, "8A", 1990, "A"),
+            (120, "8A", 1990, "B"),
+            (120, "8A", 1990, "A"),
+            (120, "9A", 2000, "B"),
+            (120, "8B", 1990, "B"),
+            (0, "", 0, ""),
+        ]
+    )
+
+    assert transitions.costs(0, 1) == 0
+    assert transitions.costs(0, 2) == ordering.SAME_ARTIST_COST
+    assert transitions.costs(0, 3) == pytest.approx(2.0)
+    assert transitions.costs(3, 0) == transitions.costs(0, 3)
+    assert transitions.costs(0, 4) == 1
+    assert transitions.costs(5, 5) == 3 * ordering.MISSING_COST
+    np.testing.assert_allclose(
+        transitions.costs(0, np.arange(3)), [ordering.SAME_ARTIST_COST, 0, 4]
+    )
+
+
+def test_sequence_builds_up_in_tempo():
+    """Tests that a walk starts slow and keeps compatible keys together."""
+    rows = [
+        (128, "8A", 2000, "A"),
+        (90, "8A", 2000, "B"),
+        (126, "9A", 2000, "C"),
+        (92, "9A", 2000, "D"),
+    ]
+
+    assert ordering.sequence(rows).tolist() == [1, 3, 2, 0]
+    assert ordering.sequence([]).tolist() == []
+    assert ordering.sequence(rows[:1]).tolist() == [0]
+
+
+def test_sequence_separates_artists():
+    """Tests that the same artist is not played twice in a row if avoidable."""
+    rows = [(120, "8A", 2000, artist) for artist in "AAABBB"]
+
+    order = ordering.sequence(rows).tolist()
+
+    artists = [rows[i][3] for i in order]
+    assert all(a != b for a, b in zip(artists, artists[1:]))
+
+
+@pytest.mark.parametrize("count", [3, 50, 400])
+def test_sequence_lowers_total_cost(count):
+    """Tests that the order is a permutation cheaper than the query order."""
+    rows = _random_rows(count)
+    transitions = ordering.Transitions(rows)
+    greedy = transitions.greedy(np.arange(count), 0)
+
+    order = ordering.sequence(rows)
+
+    assert sorted(order.tolist()) == list(range(count))
+    assert transitions.total(order) <= transitions.total(np.arange(count))
+    assert transitions.total(transitions.two_opt(greedy)) <= transitions.total(greedy)
+
+
+def test_sequence_in_sections(monkeypatch):
+    """Tests that large playlists are sequenced section by section."""
+    monkeypatch.setattr(ordering, "_SECTION_SIZE", 64)
+    rows = _random_rows(300)
+
+    order = ordering.sequence(rows)
+
+    assert sorted(order.tolist()) == list(range(300))
+
+
+def test_create_playlist_smooth_order(real_library, tmp_path: Path):
+    """Tests that playlists can be written in smooth order."""
+    for title, bpm, key in [
+        ("So What", 136, "Dm"),
+        ("Blue in Green", 60, "F#"),
+        ("Naima", 132, "Am"),
+    ]:
+        item = real_library.lib.items(f"title:{title}").get()
+        item.bpm = bpm
+        item.initial_key = key
+        item.store()
+    path = tmp_path / "jazz.m3u8"
+
+    result = real_library.create_playlist(
+        "genre:Jazz", str(path), "extm3u", order="smooth"
+    )
+
+    assert result.track_count == 3
+    titles = [line for line in path.read_text().splitlines() if line[0] == "#"]
+    assert [t.rsplit(" - ", 1)[1] for t in titles[1:]] == [
+        "Blue in Green",
+        "Naima",
+        "So What",
+    ]
+
+
+def test_create_playlist_releases_connection_before_ordering(
+    real_library, tmp_path: Path, mocker
+):
+    """Tests that no pooled connection is held while the tracks are ordered."""
+    in_use = []
+    sequence = ordering.sequence
+
+    def spy(rows):
+        in_use.append(real_library.pool_stats().in_use_connections)
+        return sequence(rows)
+
+    mocker.patch.object(ordering, "sequence", side_effect=spy)
+
+    result = real_library.create_playlist(
+        "genre:Jazz", str(tmp_path / "jazz.m3u8"), order="smooth"
+    )
+
+    assert result.track_count == 3
+    assert in_use == [0]
+
+
+def test_create_playlist_unknown_order(real_library, tmp_path: Path):
+    """Tests that an unknown order is rejected before writing anything."""
+    path = tmp_path / "jazz.m3u8"
+
+    with pytest.raises(exceptions.QueryError):
+        real_library.create_playlist("genre:Jazz", str(path), order="random")
+    assert not path.exists()
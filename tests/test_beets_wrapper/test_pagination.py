@@ -0,0 +1,60 @@
+"""Tests for the paginated item queries."""
+
+import pytest
+
+from smartplaylist.beets_wrapper import exceptions
+
+
+def _walk(library, query, sort=None, limit=2):
+    """Collects every page of a query."""
+    titles, cursor, pages = [], None, 0
+    while True:
+        page = library.items_page(query, limit=limit, cursor=cursor, sort=sort)
+        titles.extend(item.title for item in page.items)
+        pages += 1
+        cursor = page.next_cursor
+        if cursor is None:
+            return titles, page.total_count, pages
+
+
+def test_items_page_walks_all_matches(real_library):
+    """Test that following cursors returns every match exactly once."""
+    titles, total, pages = _walk(real_library, "genre:jazz")
+
+    assert titles == ["So What", "Blue in Green", "Naima"]
+    assert total == 3
+    assert pages == 2
+
+
+def test_items_page_sorted_descending(real_library):
+    """Test keyset pagination over a sorted column with ties."""
+    titles, total, _ = _walk(real_library, "", sort="year-")
+
+    assert titles == ["Paranoid", "Naima", "Blue in Green", "So What", "Untitled"]
+    assert total == 5
+
+
+def test_items_page_slow_query(real_library):
+    """Test pagination of queries on flexible attributes."""
+    for item in real_library.lib.items("genre:jazz"):
+        item["mood"] = "cool"
+        item.store()
+
+    titles, total, _ = _walk(real_library, "mood:cool", sort="title")
+
+    assert titles == ["Blue in Green", "Naima", "So What"]
+    assert total == 3
+
+
+def test_items_page_rejects_mismatched_cursor(real_library):
+    """Test that a cursor cannot be reused with another sort order."""
+    page = real_library.items_page("", limit=1, sort="year")
+
+    with pytest.raises(exceptions.QueryError):
+        real_library.items_page("", limit=1, cursor=page.next_cursor, sort="title")
+
+
+def test_items_page_rejects_unknown_sort(real_library):
+    """Test that only fixed columns can be used for sorting."""
+    with pytest.raises(exceptions.QueryError):
+        real_library.items_page("", sort="mood")
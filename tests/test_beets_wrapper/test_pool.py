@@ -0,0 +1,92 @@
+"""Tests for the read connection pool."""
+
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+
+from smartplaylist.beets_wrapper import exceptions
+from smartplaylist.beets_wrapper.pool import ConnectionPool
+
+
+@pytest.fixture
+def db_path(tmp_path: Path) -> str:
+    """Fixture creating a small SQLite database."""
+    path = tmp_path / "test.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+    conn.execute("INSERT INTO items VALUES (1)")
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def test_connection_is_reused(db_path):
+    """Test that a released connection is handed out again."""
+    pool = ConnectionPool(db_path, max_size=2)
+    with pool.connection() as first:
+        assert first.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+    with pool.connection() as second:
+        assert second is first
+
+    stats = pool.stats()
+    assert stats.created == 1
+    assert stats.acquisitions == 2
+    assert stats.idle_connections == 1
+
+
+def test_nested_reads_share_connection(db_path):
+    """Test that nested checkouts on one thread use the same connection."""
+    pool = ConnectionPool(db_path, max_size=1)
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+        assert pool.stats().in_use_connections == 1
+
+
+def test_connections_are_read_only(db_path):
+    """Test that pooled connections cannot write to the database."""
+    pool = ConnectionPool(db_path)
+    with pool.connection() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO items VALUES (2)")
+
+
+def test_pool_is_bounded(db_path):
+    """Test that checkouts beyond max_size wait and then time out."""
+    pool = ConnectionPool(db_path, max_size=1, timeout=0.05)
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with pool.connection():
+            held.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    try:
+        with pytest.raises(exceptions.PoolTimeoutError):
+            with pool.connection():
+                pass
+    finally:
+        release.set()
+        thread.join()
+
+    assert pool.stats().waits == 1
+    assert pool.stats().open_connections == 1
+
+
+def test_close_rejects_checkouts(db_path):
+    """Test that a closed pool refuses new checkouts."""
+    pool = ConnectionPool(db_path)
+    with pool.connection():
+        pass
+    pool.close()
+
+    assert pool.stats().open_connections == 0
+    with pytest.raises(exceptions.BeetsWrapperError):
+        with pool.connection():
+            pass
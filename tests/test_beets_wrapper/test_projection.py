@@ -0,0 +1,84 @@
+"""Tests for projected item queries."""
+
+import pytest
+
+from smartplaylist.beets_wrapper import exceptions
+
+FIELDS = ("id", "title", "artist", "year", "length", "path")
+
+
+def _expected(real_library, query, key):
+    items = sorted(real_library.lib.items(query), key=key)
+    return [tuple(item[f] for f in FIELDS) for item in items]
+
+
+@pytest.fixture
+def snapshot_library(real_library):
+    real_library.settings = real_library.settings.model_copy(
+        update={"snapshot_enabled": True}
+    )
+    return real_library
+
+
+def test_items_projected_selects_requested_fields(real_library, mocker):
+    """Tests that a fast query is answered from the columns alone."""
+    items = mocker.spy(real_library.lib, "items")
+
+    records = real_library.items_projected("genre:Jazz", FIELDS, sort="title")
+
+    items.assert_not_called()
+    assert records == _expected(real_library, "genre:Jazz", lambda i: i.title)
+    assert records[0]._fields == FIELDS
+    assert records[0].title == "Blue in Green"
+    assert isinstance(records[0].path, bytes)
+
+
+def test_items_projected_slow_query(real_library):
+    """Tests that queries beets evaluates in Python are projected too."""
+    item = real_library.lib.items("title:Naima").get()
+    item["mood"] = "calm"
+    item.store()
+
+    records = real_library.items_projected("mood:calm", FIELDS)
+
+    assert [r.title for r in records] == ["Naima"]
+
+
+def test_items_projected_from_snapshot(snapshot_library, mocker):
+    """Tests that snapshot fields are projected without SQL or items."""
+    expected = snapshot_library.items_projected("year:1950..1969", FIELDS, "year-")
+    snapshot_library.load_snapshot()
+    connection = mocker.spy(snapshot_library, "read_connection")
+
+    records = snapshot_library.items_projected("year:1950..1969", FIELDS, "year-")
+
+    connection.assert_not_called()
+    assert records == expected
+    assert [r.year for r in records] == [1960, 1959, 1959]
+
+
+@pytest.mark.parametrize("fields", [["title", "mood"], ["title", "title"]])
+def test_items_projected_rejects_invalid_fields(real_library, fields):
+    """Tests that only distinct fixed item fields can be projected."""
+    with pytest.raises(exceptions.QueryError):
+        real_library.items_projected("", fields)
+    with pytest.raises(exceptions.QueryError):
+        real_library.records_page("", fields)
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_records_page_matches_items_page(real_library, enabled):
+    """Tests that pages of records hold the fields of the pages of items."""
+    real_library.settings = real_library.settings.model_copy(
+        update={"snapshot_enabled": enabled}
+    )
+    real_library.load_snapshot()
+    items = real_library.items_page("genre:Jazz", limit=2, sort="title")
+
+    page = real_library.records_page("genre:Jazz", FIELDS, limit=2, sort="title")
+    cached = real_library.records_page("genre:Jazz", ("title",), limit=2, sort="title")
+
+    assert [r.id for r in page.records] == [i.id for i in items.items]
+    assert page.records[0] == tuple(getattr(items.items[0], f) for f in FIELDS)
+    assert page.next_cursor == items.next_cursor
+    assert [r.title for r in cached.records] == ["Blue in Green", "Naima"]
@@ -0,0 +1,196 @@
+"""Tests for the selection of tracks filling a length or size."""
+
+import itertools
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from smartplaylist.beets_wrapper import exceptions, selection
+
+
+def _best_total(weights, capacity):
+    totals = (
+        sum(subset)
+        for count in range(len(weights) + 1)
+        for subset in itertools.combinations(weights, count)
+    )
+    return max(t for t in totals if t <= capacity)
+
+
+def test_limit_per_artist():
+    """Tests that the first tracks of each artist are kept."""
+    artists = ["A", "B", "A", "", "A", "B", ""]
+
+    assert selection.limit_per_artist(artists, 1).tolist() == [0, 1, 3, 6]
+    assert selection.limit_per_artist(artists, 2).tolist() == [0, 1, 2, 3, 5, 6]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fill_finds_the_best_total(seed):
+    """Tests that the selection matches the best subset of whole seconds."""
+    rng = np.random.default_rng(seed)
+    weights = rng.integers(60, 600, 12).astype(float)
+    capacity = float(rng.integers(600, 3000))
+
+    selected = selection.fill(weights, capacity)
+
+    assert weights[selected].sum() == _best_total(weights.tolist(), capacity)
+    assert selected.tolist() == sorted(set(selected.tolist()))
+
+
+def test_fill_large_selection():
+    """Tests that a large selection comes close to its budget and never over."""
+    rng = np.random.default_rng(0)
+    weights = rng.uniform(90, 600, 20_000)
+    capacity = 7200.0 * 24
+
+    selected = selection.fill(weights, capacity)
+
+    assert capacity * 0.999 <= weights[selected].sum() <= capacity
+
+
+def test_fill_edge_cases():
+    """Tests empty budgets, weightless tracks and budgets holding everything."""
+    weights = np.array([120.0, 0.0, 240.0, 3600.0])
+
+    assert selection.fill(weights, 0).tolist() == []
+    assert selection.fill(weights, 100).tolist() == []
+    assert selection.fill(weights, 10_000).tolist() == [0, 2, 3]
+    assert selection.fill(weights, 400).tolist() == [0, 2]
+
+
+def test_select_with_both_budgets():
+    """Tests that a selection fits the length and size budgets at once."""
+    lengths = np.array([200.0, 200.0, 100.0, 100.0])
+    sizes = np.array([800, 100, 100, 100])
+
+    selected = selection.select(lengths, sizes, max_length=400, max_size=300)
+
+    assert selected.tolist() == [1, 2, 3]
+    assert selection.select(lengths, sizes, max_length=400).tolist() == [0, 1]
+    assert selection.select(lengths, sizes, max_size=300).tolist() == [1, 2, 3]
+
+
+def test_trim_drops_the_largest_files_per_second():
+    """Tests that the tracks with the most bytes per second are dropped."""
+    lengths = np.array([100.0, 100.0, 100.0, 50.0])
+    sizes = np.array([100, 400, 200, 50])
+
+    selected = selection.trim(np.arange(3), lengths, sizes, 300, 350)
+
+    assert selected.tolist() == [0, 2, 3]
+
+
+def test_file_size(tmp_path: Path):
+    """Tests that missing files are estimated from their bitrate."""
+    path = tmp_path / "track.mp3"
+    path.write_bytes(b"\0" * 1234)
+
+    assert selection.file_size(str(path).encode(), 320000, 60.0) == 1234
+    assert selection.file_size(b"/missing.mp3", 320000, 60.0) == 2_400_000
+    assert selection.file_size(b"/missing.mp3", None, None) == 0
+
+
+def _titles(path: Path) -> list[str]:
+    lines = path.read_text().splitlines()
+    return [line.rsplit(" - ", 1)[1] for line in lines if line.startswith("#EXTINF")]
+
+
+def test_build_playlist_fills_the_length(real_library, tmp_path: Path):
+    """Tests that the tracks filling the length best are written."""
+    path = tmp_path / "jazz.m3u8"
+
+    result = real_library.build_playlist(
+        "genre:Jazz", str(path), max_length=300, playlist_format="extm3u"
+    )
+
+    assert _titles(path) == ["Blue in Green", "Naima"]
+    assert result.track_count == 2
+    assert result.total_length == 300
+    assert result.total_size == 500
+    assert result.candidates == 3
+    assert result.bytes_written == path.stat().st_size
+
+
+def test_build_playlist_limits_artists(real_library, tmp_path: Path):
+    """Tests that only the first tracks of each artist are candidates."""
+    path = tmp_path / "jazz.m3u8"
+
+    result = real_library.build_playlist(
+        "genre:Jazz", str(path), max_length=300, max_per_artist=1, order="smooth"
+    )
+
+    assert result.candidates == 2
+    assert result.total_length == 240
+
+
+def _match_bitrates(real_library):
+    """Gives each sample track the bitrate its small file was encoded at."""
+    for item in real_library.lib.items():
+        item.bitrate = 14
+        item.store()
+
+
+def test_select_measured_only_measures_selected_tracks():
+    """Tests that a size budget is met with real sizes of few measured files."""
+    lengths = np.array([60.0, 120.0, 180.0, 240.0])
+    real = np.array([100, 200, 300, 400])
+    measured = []
+
+    def measure(indexes):
+        measured.extend(indexes)
+        return real[indexes].tolist()
+
+    selected, sizes = selection.select_measured(
+        lengths, np.array([105, 210, 315, 420]), measure, None, 350
+    )
+
+    assert real[selected].sum() <= 350
+    assert set(selected.tolist()) <= set(measured)
+    assert len(measured) < 4
+    assert sizes[selected].tolist() == real[selected].tolist()
+
+
+def test_estimate_sizes():
+    """Tests that sizes are estimated from bitrates and lengths."""
+    sizes = selection.estimate_sizes(np.array([320000, 0]), np.array([60.0, 60.0]))
+
+    assert sizes.tolist() == [2_400_000, 0]
+
+
+def test_build_playlist_fills_both_budgets(real_library, tmp_path: Path):
+    """Tests that a playlist fits both a length and a size."""
+    _match_bitrates(real_library)
+    path = tmp_path / "jazz.m3u8"
+
+    result = real_library.build_playlist(
+        "genre:Jazz", str(path), max_length=200, max_size=250, playlist_format="extm3u"
+    )
+
+    assert _titles(path) == ["Blue in Green"]
+    assert (result.total_length, result.total_size) == (120, 200)
+
+
+def test_build_playlist_stats_shortlisted_files(real_library, tmp_path: Path, mocker):
+    """Tests that a size budget only reads the size of shortlisted files."""
+    _match_bitrates(real_library)
+    file_size = mocker.spy(selection, "file_size")
+
+    result = real_library.build_playlist("", str(tmp_path / "all.m3u8"), max_size=350)
+
+    assert result.total_size == 300
+    assert file_size.call_count < 5
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{}, {"max_length": 0}, {"max_length": 60, "max_per_artist": 0}],
+)
+def test_build_playlist_invalid_budget(real_library, tmp_path: Path, kwargs):
+    """Tests that invalid budgets are rejected before writing anything."""
+    path = tmp_path / "jazz.m3u8"
+
+    with pytest.raises(exceptions.QueryError):
+        real_library.build_playlist("genre:Jazz", str(path), **kwargs)
+    assert not path.exists()
@@ -0,0 +1,176 @@
+"""Tests for the track similarity index."""
+
+import os
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from smartplaylist.beets_wrapper import exceptions, similarity
+
+
+def _titles(real_library, item_id, k=10):
+    return [r.title for r in real_library.similar_tracks(item_id, k, fields=("title",))]
+
+
+def _id(real_library, title):
+    return real_library.lib.items(f"title:{title}").get().id
+
+
+@pytest.mark.parametrize(
+    "key, expected",
+    [
+        ("C", (8, "B")),
+        ("Am", (8, "A")),
+        ("C#m", (12, "A")),
+        ("Dbm", (12, "A")),
+        ("F#", (2, "B")),
+        ("Bb", (6, "B")),
+        ("Ebmin", (2, "A")),
+        ("8a", (8, "A")),
+        ("12B", (12, "B")),
+        ("", None),
+        (None, None),
+        ("H", None),
+        ("13A", None),
+    ],
+)
+def test_camelot_key(key, expected):
+    """Tests that keys are placed on the Camelot wheel."""
+    assert similarity.camelot_key(key) == expected
+
+
+def test_similar_tracks_ranks_nearest_first(real_library):
+    """Tests that tracks sharing the genre and era rank first."""
+    so_what = _id(real_library, "So What")
+
+    records = real_library.similar_tracks(so_what, k=10, fields=("id", "title"))
+
+    assert [r.title for r in records][:2] == ["Blue in Green", "Naima"]
+    assert len(records) == 4
+    assert so_what not in [r.id for r in records]
+    assert records[0]._fields == ("id", "title", "distance")
+    assert [r.distance for r in records] == sorted(r.distance for r in records)
+    assert _titles(real_library, so_what, k=1) == ["Blue in Green"]
+
+
+def test_similar_tracks_compares_keys_and_bpm(real_library):
+    """Tests that a compatible key and tempo make tracks closer."""
+    items = {i.title: i for i in real_library.lib.items("genre:Jazz")}
+    for title, key, bpm in [
+        ("So What", "Dm", 136),
+        ("Blue in Green", "F#", 60),
+        ("Naima", "Am", 132),
+    ]:
+        items[title].initial_key = key
+        items[title].bpm = bpm
+        items[title].store()
+
+    assert _titles(real_library, items["So What"].id)[0] == "Naima"
+
+
+def test_similar_tracks_unknown_id(real_library):
+    """Tests that an unknown track id is rejected."""
+    with pytest.raises(exceptions.QueryError):
+        real_library.similar_tracks(999)
+
+
+def test_similarity_index_is_persisted(real_library, mocker):
+    """Tests that the index is written next to the database and reused."""
+    so_what = _id(real_library, "So What")
+    expected = real_library.similar_tracks(so_what)
+    assert os.path.exists(
+        os.path.join(real_library.data_dir, similarity.SIMILARITY_INDEX_FILENAME)
+    )
+
+    real_library._similarity_index = None
+    build = mocker.patch("smartplaylist.beets_wrapper.similarity.SimilarityIndex.build")
+
+    assert real_library.similar_tracks(so_what) == expected
+    build.assert_not_called()
+
+
+def test_similarity_index_follows_library_writes(real_library):
+    """Tests that the index is rebuilt after the library changes."""
+    so_what = _id(real_library, "So What")
+    real_library.similar_tracks(so_what)
+    item = real_library.lib.items("title:Paranoid").get()
+    item.genre = "Jazz"
+    item.year = 1959
+    item.length = 60.0
+    item.store()
+
+    assert _titles(real_library, so_what, k=1) == ["Paranoid"]
+
+
+def test_similarity_index_rebuilt_on_sync(real_library, write_track, mocker):
+    """Tests that a sync rebuilds the index rather than the next search."""
+    so_what = _id(real_library, "So What")
+    real_library.similar_tracks(so_what)
+    music_path = Path(real_library.db_path).parent / "music"
+    write_track(music_path / "New" / "01.wav", title="Modal", genre="Jazz")
+
+    real_library.sync_library(workers=1)
+    build = mocker.spy(similarity.SimilarityIndex, "build")
+
+    assert real_library._similarity_index.revision == real_library.revision()
+    assert "Modal" in _titles(real_library, so_what)
+    build.assert_not_called()
+
+
+def test_similar_tracks_with_approximate_index(real_library):
+    """Tests that the clustered index is used from the configured size."""
+    so_what = _id(real_library, "So What")
+    expected = real_library.similar_tracks(so_what)
+    real_library.settings.similarity_approximate_min_tracks = 3
+    real_library._similarity_index = None
+    os.remove(os.path.join(real_library.data_dir, "similarity.npz"))
+
+    assert real_library.similar_tracks(so_what) == expected
+    assert real_library._similarity_index.approximate
+
+
+def _random_library(rows: int) -> sqlite3.Connection:
+    rng = np.random.default_rng(1)
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE items (id INTEGER PRIMARY KEY, genre TEXT, initial_key TEXT,"
+        " year INTEGER, bpm INTEGER, length REAL, bitrate INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                i + 1,
+                str(rng.choice(["Jazz", "Rock", "Pop", ""])),
+                str(rng.choice(["C", "Am", "F#m", "Eb", ""])),
+                int(rng.integers(1950, 2024)),
+                int(rng.integers(0, 180)),
+                float(rng.uniform(60, 600)),
+                int(rng.choice([128000, 256000, 320000])),
+            )
+            for i in range(rows)
+        ],
+    )
+    return conn
+
+
+def test_approximate_index_matches_exact_search(tmp_path):
+    """Tests that probing every cell returns the exact neighbours."""
+    conn = _random_library(2000)
+    exact = similarity.SimilarityIndex(str(tmp_path / "exact.npz"))
+    exact.build(conn, "1")
+    approximate = similarity.SimilarityIndex(str(tmp_path / "ivf.npz"))
+    approximate.build(conn, "1", cells=32)
+    approximate.save()
+
+    loaded = similarity.SimilarityIndex(approximate.path)
+    assert loaded.load("1")
+    assert not loaded.load("2")
+    assert loaded.approximate and not exact.approximate
+    for item_id in (1, 500, 2000):
+        expected = exact.nearest(item_id, 20)
+        assert loaded.nearest(item_id, 20, probes=32) == expected
+        found = {i for i, _ in loaded.nearest(item_id, 20, probes=8)}
+        assert len(found & {i for i, _ in expected}) >= 15
@@ -0,0 +1,125 @@
+"""Tests for the columnar track snapshot."""
+
+import numpy as np
+import pytest
+
+from smartplaylist.beets_wrapper.snapshot import (
+    SNAPSHOT_FIELDS,
+    StringColumn,
+    TrackSnapshot,
+)
+
+
+@pytest.fixture
+def snapshot_library(real_library):
+    real_library.settings = real_library.settings.model_copy(
+        update={"snapshot_enabled": True}
+    )
+    return real_library
+
+
+def test_string_column_interns_values():
+    """Tests that repeated strings are stored once."""
+    column = StringColumn.from_values(["Jazz", "Rock", None, "Jazz"])
+
+    assert column.values == ["Jazz", "Rock", ""]
+    assert column.codes.tolist() == [0, 1, 2, 0]
+    assert column[3] == "Jazz"
+    assert column.distinct_nonempty() == 2
+    assert column.nbytes > column.codes.nbytes
+
+
+def test_load_matches_database(real_library):
+    """Tests that every snapshot field matches the beets items."""
+    with real_library.read_connection() as conn:
+        snapshot = TrackSnapshot.load(conn, "rev")
+
+    items = list(real_library.lib.items("id+"))
+    assert len(snapshot) == len(items)
+    for row, item in enumerate(items):
+        record = snapshot.record(row)
+        for field in SNAPSHOT_FIELDS:
+            assert record[field] == item[field], field
+    assert snapshot.columns["year"].dtype == np.int32
+
+
+def test_snapshot_is_disabled_by_default(real_library):
+    """Tests that no snapshot is loaded unless enabled."""
+    assert real_library.snapshot() is None
+    assert real_library.snapshot_stats() is None
+
+
+def test_snapshot_is_loaded_explicitly(snapshot_library):
+    """Tests that reads never wait for the snapshot to load."""
+    snapshot_library._reload_snapshot_in_background = lambda: None
+
+    assert snapshot_library.snapshot() is None
+    first = snapshot_library.load_snapshot()
+    assert snapshot_library.snapshot() is first
+    assert snapshot_library.load_snapshot() is first
+
+
+def test_snapshot_reloads_in_background(snapshot_library):
+    """Tests that the previous snapshot is served while a new one loads."""
+    first = snapshot_library.load_snapshot()
+    item = snapshot_library.lib.items("title:Paranoid").get()
+    item.title = "Iron Man"
+    item.store()
+
+    with snapshot_library._snapshot_lock:
+        assert snapshot_library.snapshot() is first
+        assert snapshot_library._cache_revision() is None
+    snapshot_library._snapshot_thread.join()
+
+    second = snapshot_library.snapshot()
+    assert second is not first
+    assert "Iron Man" in second.strings("title").values
+    assert snapshot_library._cache_revision() == second.revision
+
+
+def test_snapshot_reloads_after_sync(snapshot_library):
+    """Tests that writes through the wrapper reload the snapshot at once."""
+    first = snapshot_library.load_snapshot()
+    item = snapshot_library.lib.items("title:Paranoid").get()
+    item.title = "Iron Man"
+    item.store()
+
+    snapshot_library._library_changed()
+
+    assert snapshot_library.snapshot() is not first
+    assert "Iron Man" in snapshot_library.snapshot().strings("title").values
+
+
+def test_statistics_from_snapshot(snapshot_library, mocker):
+    """Tests that statistics are computed from the columns."""
+    expected = snapshot_library._get_statistics_from_items(include_size=True)
+    snapshot_library.load_snapshot()
+    totals = mocker.patch("smartplaylist.beets_wrapper.aggregates.library_totals")
+
+    stats = snapshot_library.get_statistics()
+
+    totals.assert_not_called()
+    assert stats == expected
+
+
+def test_items_page_served_from_snapshot(snapshot_library, mocker):
+    """Tests that search results are built without hydrating beets items."""
+    snapshot_library.load_snapshot()
+    items = mocker.spy(snapshot_library.lib, "items")
+
+    page = snapshot_library.items_page("genre:Jazz", limit=2, sort="title")
+
+    items.assert_not_called()
+    assert [i.title for i in page.items] == ["Blue in Green", "Naima"]
+    assert page.items[0].path.endswith(b"01.mp3")
+
+
+def test_snapshot_stats_reports_every_column(snapshot_library):
+    """Tests that memory use is reported per column."""
+    snapshot_library.load_snapshot()
+
+    stats = snapshot_library.snapshot_stats()
+
+    assert stats.rows == 5
+    assert set(stats.column_bytes) == set(SNAPSHOT_FIELDS)
+    assert stats.total_bytes == sum(stats.column_bytes.values())
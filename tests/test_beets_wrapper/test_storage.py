@@ -0,0 +1,33 @@
+"""Tests for the files persisted next to the beets database."""
+
+from pathlib import Path
+
+import pytest
+
+from smartplaylist.beets_wrapper import storage
+
+
+def test_atomic_write_replaces_the_file(tmp_path: Path):
+    """Test that the file is replaced once written, without leftovers."""
+    path = tmp_path / "index.json"
+    path.write_text("old")
+
+    with storage.atomic_write(str(path)) as f:
+        f.write("new")
+        assert path.read_text() == "old"
+
+    assert path.read_text() == "new"
+    assert [p.name for p in tmp_path.iterdir()] == ["index.json"]
+
+
+def test_atomic_write_keeps_the_file_on_failure(tmp_path: Path):
+    """Test that a failed write leaves the previous file untouched."""
+    path = tmp_path / "index.npz"
+    path.write_bytes(b"old")
+
+    with pytest.raises(RuntimeError), storage.atomic_write(str(path), "wb") as f:
+        f.write(b"partial")
+        raise RuntimeError("interrupted")
+
+    assert path.read_bytes() == b"old"
+    assert [p.name for p in tmp_path.iterdir()] == ["index.npz"]
@@ -0,0 +1,109 @@
+"""Tests for the manifest-based incremental sync."""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from smartplaylist.beets_wrapper import importer, sync
+from smartplaylist.beets_wrapper.manifest import Manifest
+
+
+@pytest.fixture
+def manifest(tmp_path: Path) -> Manifest:
+    return Manifest(str(tmp_path / "manifest.json"))
+
+
+def titles(lib) -> list[str]:
+    return sorted(item.title for item in lib.items())
+
+
+def test_first_sync_adds_every_file(music_dir: Path, beets_lib, manifest):
+    """Tests that a sync of an empty library imports the whole tree."""
+    stats = sync.sync_tree(beets_lib, str(music_dir), manifest)
+
+    assert (stats.files, stats.added, stats.failed) == (4, 3, 1)
+    assert (stats.changed, stats.removed, stats.unchanged) == (0, 0, 0)
+    assert titles(beets_lib) == ["Freddie", "So What", "War Pigs"]
+    assert Manifest(manifest.path).load(str(music_dir))
+
+
+def test_sync_only_reads_new_and_changed_files(
+    music_dir: Path, beets_lib, manifest, write_track, monkeypatch
+):
+    """Tests that unchanged files are not read again."""
+    sync.sync_tree(beets_lib, str(music_dir), manifest)
+    changed = music_dir / "Kind of Blue" / "02.wav"
+    write_track(changed, title="Freddie Freeloader", artist="Miles")
+    os.utime(changed, ns=(0, changed.stat().st_mtime_ns + 10**9))
+    write_track(music_dir / "New" / "01.wav", title="Naima")
+    read = []
+    original = importer.read_item_values
+
+    def read_item_values(path):
+        read.append(path)
+        return original(path)
+
+    monkeypatch.setattr(importer, "read_item_values", read_item_values)
+
+    stats = sync.sync_tree(beets_lib, str(music_dir), Manifest(manifest.path))
+
+    assert (stats.added, stats.changed, stats.removed) == (1, 1, 0)
+    assert (stats.unchanged, stats.failed) == (3, 0)
+    assert sorted(os.path.basename(os.path.dirname(p)) for p in read) == [
+        "Kind of Blue",
+        "New",
+    ]
+    assert titles(beets_lib) == ["Freddie Freeloader", "Naima", "So What", "War Pigs"]
+    item = beets_lib.items("title:Freeloader").get()
+    assert item.album_id is not None
+
+
+def test_sync_removes_deleted_files_and_empty_albums(
+    music_dir: Path, beets_lib, manifest
+):
+    """Tests that rows of deleted files are removed with their empty album."""
+    sync.sync_tree(beets_lib, str(music_dir), manifest)
+    (music_dir / "Paranoid" / "01.wav").unlink()
+
+    stats = sync.sync_tree(beets_lib, str(music_dir), manifest)
+
+    assert (stats.added, stats.changed, stats.removed) == (0, 0, 1)
+    assert titles(beets_lib) == ["Freddie", "So What"]
+    assert len(beets_lib.albums()) == 1
+
+
+def test_sync_without_manifest_compares_database_mtime(
+    music_dir: Path, beets_lib, manifest
+):
+    """Tests that a library imported before manifests existed is not re-read."""
+    importer.import_tree(beets_lib, str(music_dir))
+
+    stats = sync.sync_tree(beets_lib, str(music_dir), manifest)
+
+    assert (stats.added, stats.changed, stats.removed) == (0, 0, 0)
+    assert stats.unchanged == 3
+    assert os.path.exists(manifest.path)
+
+
+def test_manifest_for_another_root_is_ignored(tmp_path: Path, manifest):
+    """Tests that a manifest is only loaded for the directory it describes."""
+    manifest.root = "/music"
+    manifest.files = {"/music/a.mp3": (1, 2, 3)}
+    manifest.save()
+
+    assert Manifest(manifest.path).load("/music")
+    assert not Manifest(manifest.path).load("/other")
+    assert Manifest(manifest.path).files == {}
+
+
+def test_library_sync_library(real_library, write_track):
+    """Tests that Library.sync_library syncs the configured directory."""
+    music_path = Path(real_library.db_path).parent / "music"
+    write_track(music_path / "New" / "track.wav", title="Fresh")
+
+    stats = real_library.sync_library(workers=1)
+
+    assert stats.added == 1
+    assert os.path.exists(os.path.join(real_library.data_dir, "manifest.json"))
+    assert [i.title for i in real_library.items("title:Fresh")] == ["Fresh"]
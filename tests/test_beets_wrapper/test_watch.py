@@ -0,0 +1,146 @@
+"""Tests for the library watcher."""
+
+import contextlib
+from pathlib import Path
+
+import pytest
+import yaml
+
+from smartplaylist.beets_wrapper import library
+from smartplaylist.beets_wrapper.watch import LibraryWatcher
+from smartplaylist.settings import Settings
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def watched_library(tmp_path: Path, music_dir: Path, monkeypatch):
+    """Fixture creating a Library over the `music_dir` tracks."""
+    monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    config_path = data_dir / "config.yaml"
+    with open(config_path, "w") as f:
+        yaml.dump(
+            {
+                "library": str(data_dir / "library.db"),
+                "directory": str(music_dir),
+                "plugins": [],
+            },
+            f,
+        )
+    lib = library.Library(str(config_path), settings=Settings())
+    yield lib
+    lib.close()
+
+
+@pytest.fixture
+def watcher(watched_library):
+    synced = []
+    watcher = LibraryWatcher(
+        lambda: contextlib.nullcontext(watched_library),
+        interval=60.0,
+        debounce=2.0,
+        max_delay=30.0,
+        on_sync=synced.append,
+        clock=FakeClock(),
+    )
+    watcher.synced = synced
+    watcher.library = watched_library
+    return watcher
+
+
+def test_first_poll_syncs_the_library(watcher):
+    """Tests that the watcher brings the library up to date on start."""
+    delay = watcher.poll()
+
+    assert delay == 60.0
+    assert [s.added for s in watcher.synced] == [3]
+    assert len(watcher.library.items()) == 3
+
+
+def test_unchanged_tree_does_not_sync(watcher):
+    """Tests that polling an unchanged tree does not touch the library."""
+    watcher.poll()
+
+    assert watcher.poll() == 60.0
+    assert len(watcher.synced) == 1
+
+
+def test_changes_are_synced_once_settled(watcher, music_dir: Path, write_track):
+    """Tests that a burst of changes is coalesced into a single sync."""
+    watcher.poll()
+    write_track(music_dir / "New" / "01.wav", title="One")
+
+    assert watcher.poll() == 2.0
+    write_track(music_dir / "New" / "02.wav", title="Two")
+    assert watcher.poll() == 2.0
+    assert len(watcher.synced) == 1
+
+    assert watcher.poll() == 60.0
+    assert [s.added for s in watcher.synced] == [3, 2]
+    assert len(watcher.library.items("title:One , title:Two")) == 2
+
+
+def test_changes_are_synced_after_max_delay(watcher, music_dir: Path, write_track):
+    """Tests that a tree that keeps changing is synced after the max delay."""
+    watcher.poll()
+    for i in range(3):
+        write_track(music_dir / "New" / f"{i:02d}.wav", title=f"Track {i}")
+        watcher._clock.now += 20.0
+        watcher.poll()
+
+    assert [s.added for s in watcher.synced] == [3, 3]
+
+
+def test_start_and_stop(watcher):
+    """Tests that the background thread syncs and stops on request."""
+    thread = watcher.start()
+    for _ in range(100):
+        if watcher.synced:
+            break
+        thread.join(0.05)
+    watcher.stop(timeout=5)
+
+    assert not thread.is_alive()
+    assert len(watcher.synced) == 1
+
+
+def test_library_is_resolved_for_each_scan(watched_library, music_dir, write_track):
+    """Tests that a reopened library is used instead of the closed handle."""
+    libraries = [watched_library]
+    watcher = LibraryWatcher(
+        lambda: contextlib.nullcontext(libraries[-1]), clock=FakeClock()
+    )
+    watcher.poll()
+    watched_library.close()
+    libraries.append(library.Library(watched_library.config_path, Settings()))
+    write_track(music_dir / "New" / "01.wav", title="One")
+
+    try:
+        watcher.poll()
+        watcher.poll()
+        assert len(libraries[-1].items("title:One")) == 1
+    finally:
+        libraries[-1].close()
+
+
+def test_watches_the_given_directory(watched_library, tmp_path: Path, write_track):
+    """Tests that a music directory other than the beets one can be watched."""
+    other = tmp_path / "other"
+    write_track(other / "Album" / "01.wav", title="Elsewhere")
+    watcher = LibraryWatcher(
+        lambda: contextlib.nullcontext(watched_library),
+        music_dir=str(other),
+        clock=FakeClock(),
+    )
+
+    watcher.poll()
+
+    assert [i.title for i in watched_library.items()] == ["Elsewhere"]
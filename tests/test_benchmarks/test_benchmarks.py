@@ -0,0 +1,80 @@
+"""Tests for the benchmark library generator and runner."""
+
+import json
+
+from benchmarks import __main__ as cli
+from benchmarks.generate import GENRES, generate_rows, prepare_library
+from benchmarks.runner import run_case
+from smartplaylist.beets_wrapper.library import Library
+from smartplaylist.settings import Settings
+
+
+def test_generate_rows_is_reproducible():
+    """Tests that a seed always produces the same library."""
+    first = list(generate_rows(50, seed=1))
+    second = list(generate_rows(50, seed=1))
+
+    assert first == second
+    assert sum(len(tracks) for _, tracks in first) == 50
+    for album, tracks in first:
+        assert album["genre"] in GENRES
+        assert all(t["album"] == album["album"] for t in tracks)
+
+
+def test_prepare_library_is_readable_by_beets(tmp_path, monkeypatch):
+    """Tests that the generated database is a valid beets library."""
+    monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+    config_path = prepare_library(str(tmp_path), 120)
+
+    library = Library(config_path, Settings())
+    try:
+        stats = library.get_statistics(include_size=False)
+        item = library.lib.items("track:1").get()
+    finally:
+        library.close()
+
+    assert stats.total_tracks == 120
+    assert stats.total_albums > 1
+    assert item.album_id is not None
+    assert item.path.startswith(b"/music/")
+
+
+def test_run_case_measures_latency_and_memory(tmp_path, monkeypatch):
+    """Tests that a case reports its latency, memory and rows."""
+    monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+    config_path = prepare_library(str(tmp_path), 120)
+
+    result = run_case(config_path, "library.list_genres", 3, {})
+
+    assert result["rows"] > 0
+    assert result["repeat"] == 3
+    assert 0 <= result["latency"]["min"] <= result["latency"]["max"]
+    assert result["peak_rss_bytes"] > 0
+    assert result["peak_alloc_bytes"] >= 0
+
+
+def test_main_writes_json_report(tmp_path, mocker):
+    """Tests that the report is written as JSON."""
+    mocker.patch.object(
+        cli,
+        "run_benchmarks",
+        return_value={"commit": "abc", "results": [{"case": "library.items"}]},
+    )
+    output = tmp_path / "bench.json"
+
+    cli.main(
+        [
+            "--sizes",
+            "50",
+            "--cases",
+            "library.items",
+            "--workdir",
+            str(tmp_path),
+            "--output",
+            str(output),
+        ]
+    )
+
+    assert json.loads(output.read_text())["results"][0]["case"] == "library.items"
+    names = cli.run_benchmarks.call_args.args[1]
+    assert names == ["library.items"]
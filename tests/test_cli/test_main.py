@@ -1,4 +1,10 @@
 from typer.testing import CliRunner
+from smartplaylist.beets_wrapper.models import (
+    ImportStats,
+    PlaylistExport,
+    PlaylistRefresh,
+    SyncStats,
+)
 from smartplaylist.cli.main import app, __version__
 from smartplaylist.settings import get_settings
 
@@ -20,6 +26,9 @@ def test_sync_initialization_success(mocker, tmp_path):
 
     mock_library = mocker.patch("smartplaylist.beets_wrapper.library.Library")
     mock_library.db_exists.return_value = False
+    mock_library.return_value.import_dir.return_value = ImportStats(
+        files=3, imported=3, albums=1
+    )
 
     # Act
     result = runner.invoke(app, ["sync", str(music_dir)])
@@ -28,19 +37,40 @@ def test_sync_initialization_success(mocker, tmp_path):
     assert result.exit_code == 0
     assert "No database found. Initializing new database..." in result.stdout
     assert "Successfully imported music" in result.stdout
+    assert "Imported 3 tracks in 1 albums" in result.stdout
 
     mock_library.db_exists.assert_called_once()
     config_path = music_dir / ".smartplaylist" / "config.yaml"
 
     mock_library.assert_called_once_with(str(config_path.resolve()), get_settings())
     mock_library.return_value.import_dir.assert_called_once_with(
-        str(music_dir.resolve())
+        str(music_dir.resolve()), workers=None, progress=mocker.ANY
+    )
+
+
+def test_sync_update_is_incremental(mocker, tmp_path):
+    """Test that sync on an existing database runs the incremental sync."""
+    music_dir = tmp_path / "music"
+    music_dir.mkdir()
+    mock_library = mocker.patch("smartplaylist.beets_wrapper.library.Library")
+    mock_library.db_exists.return_value = True
+    mock_library.return_value.sync_library.return_value = SyncStats(
+        files=10, added=2, changed=1, removed=3, unchanged=7
+    )
+
+    result = runner.invoke(app, ["sync", str(music_dir), "--workers", "2"])
+
+    assert result.exit_code == 0
+    assert "2 added, 1 changed, 3 removed, 7 unchanged" in result.stdout
+    mock_library.return_value.sync_library.assert_called_once_with(
+        str(music_dir.resolve()), workers=2, progress=mocker.ANY
     )
+    mock_library.return_value.update_library.assert_not_called()
 
 
 def test_serve_command(mocker, monkeypatch):
     """Test that the serve command calls the mcp server with the correct settings."""
-    mock_mcp_main = mocker.patch("smartplaylist.cli.main.mcp_server_main")
+    mock_mcp_main = mocker.patch("smartplaylist.mcp_server.main.main")
 
     monkeypatch.setenv("SMARTPLAYLIST_MCP_SERVER_HOST", "testhost")
     monkeypatch.setenv("SMARTPLAYLIST_MCP_SERVER_PORT", "9999")
@@ -61,3 +91,72 @@ def test_serve_command(mocker, monkeypatch):
     assert passed_settings.mcp_server_port == 9999
     assert passed_settings.log_level == "DEBUG"
     assert passed_settings.mcp_allowed_hosts == ["testhost.local"]
+    assert kwargs["watch"] is False
+
+
+def test_watch_requires_database(mocker, tmp_path):
+    """Test that watch refuses to start before the first sync."""
+    mock_library = mocker.patch("smartplaylist.beets_wrapper.library.Library")
+    mock_library.db_exists.return_value = False
+
+    result = runner.invoke(app, ["watch", str(tmp_path)])
+
+    assert result.exit_code == 1
+    assert "Run `smartplaylist sync` first" in result.output
+    mock_library.assert_not_called()
+
+
+def test_watch_reports_unreadable_config(mocker, tmp_path):
+    """Test that watch exits cleanly when the configuration is not readable."""
+    mock_library = mocker.patch("smartplaylist.beets_wrapper.library.Library")
+    mock_library.db_exists.side_effect = PermissionError("config.yaml")
+
+    result = runner.invoke(app, ["watch", str(tmp_path)])
+
+    assert result.exit_code == 1
+    assert "Permission Error: config.yaml" in result.output
+
+
+def test_create_playlists_command(mocker, tmp_path):
+    """Test that create-playlists passes the named queries to the library."""
+    mock_library = mocker.patch("smartplaylist.beets_wrapper.library.Library")
+    mock_instance = mock_library.return_value
+    mock_instance.playlist_dir = "/playlists"
+    mock_instance.create_playlists_by_field.return_value = [
+        PlaylistExport("/playlists/Old.m3u8", 3, 60)
+    ]
+
+    result = runner.invoke(
+        app,
+        ["create-playlists", str(tmp_path), "--query", "Old=year:..1965"],
+    )
+
+    assert result.exit_code == 0
+    assert "1 playlists created." in result.stdout
+    mock_instance.create_playlists_by_field.assert_called_once_with(
+        "/playlists",
+        get_settings().playlist_extension,
+        field=None,
+        queries={"Old": "year:..1965"},
+        query=None,
+        prefix="",
+        playlist_format=None,
+    )
+
+
+def test_refresh_playlists_command(mocker, tmp_path):
+    """Test that refresh-playlists reports which playlists were rewritten."""
+    mock_library = mocker.patch("smartplaylist.beets_wrapper.library.Library")
+    mock_instance = mock_library.return_value
+    mock_instance.refresh_playlists.return_value = [
+        PlaylistRefresh("Jazz", "/playlists/Jazz.m3u8", 3, changed=True),
+        PlaylistRefresh("Rock", "/playlists/Rock.m3u8", 1, changed=False),
+    ]
+
+    result = runner.invoke(app, ["refresh-playlists", str(tmp_path), "--name", "Jazz"])
+
+    assert result.exit_code == 0
+    assert "1 of 2 playlists rewritten." in result.stdout
+    mock_instance.refresh_playlists.assert_called_once_with(
+        get_settings().playlist_extension, names=["Jazz"], force=False
+    )
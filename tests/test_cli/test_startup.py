@@ -0,0 +1,50 @@
+"""Startup time budget of the command line interface."""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from benchmarks.startup import CLI_MODULE, cold_start, parse_import_times
+
+STARTUP_BUDGET_US = 300_000
+"""The import time allowed for the CLI module, well above the ~50ms it takes."""
+
+SERVER_MODULES = ("beets", "mcp", "numpy", "starlette", "uvicorn", "jinja2")
+"""Top-level packages that only the commands needing them may import."""
+
+SRC_DIR = str(Path(__file__).resolve().parents[2] / "src")
+
+
+@pytest.fixture(scope="module")
+def version_import_times():
+    pythonpath = os.pathsep.join(filter(None, [SRC_DIR, os.environ.get("PYTHONPATH")]))
+    return cold_start(["--version"], env={"PYTHONPATH": pythonpath})
+
+
+def test_version_does_not_load_the_server_stack(version_import_times):
+    """Tests that `--version` imports none of the heavy dependencies."""
+    loaded = {module.split(".")[0] for module in version_import_times}
+
+    assert CLI_MODULE in version_import_times
+    assert loaded.isdisjoint(SERVER_MODULES)
+    assert "smartplaylist.settings" not in version_import_times
+
+
+def test_version_import_time_budget(version_import_times):
+    """Tests that importing the CLI for `--version` stays within budget."""
+    assert version_import_times[CLI_MODULE] < STARTUP_BUDGET_US
+
+
+def test_parse_import_times():
+    """Tests the parsing of `-X importtime` reports."""
+    report = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   typer.core\n"
+        "import time:      5435 |      52334 | smartplaylist.cli.main\n"
+    )
+
+    assert parse_import_times(report) == {
+        "typer.core": 120,
+        "smartplaylist.cli.main": 52334,
+    }
@@ -1,6 +1,7 @@
 """Unit tests for the MCP server tools."""
 
-from unittest.mock import MagicMock, patch
+import asyncio
+from unittest.mock import patch
 
 import pytest
 
@@ -14,6 +15,13 @@ def clear_get_settings_cache():
     get_settings.cache_clear()
 
 
+@pytest.fixture(autouse=True)
+def reset_library_manager():
+    main.library_manager.close()
+    yield
+    main.library_manager.close()
+
+
 class TestMCPServerTools:
     def test_list_tools(self):
         """Tests that the list_tools tool returns the expected list of tools."""
@@ -23,25 +31,32 @@ class TestMCPServerTools:
         assert len(tools) == len(main.TOOL_DEFINITIONS)
         assert main.TOOL_DEFINITIONS[0]["name"] in tool_names
 
-    @patch("smartplaylist.mcp_server.main.BeetsLibrary")
+    @patch("smartplaylist.beets_wrapper.manager.Library")
     def test_get_library_statistics(self, mock_beets_library, monkeypatch):
         """Tests that the get_library_statistics tool returns the expected statistics."""
         monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
 
         mock_instance = mock_beets_library.return_value
         mock_instance.get_statistics.return_value = beets_models.Statistics(
-            total_tracks=100, total_albums=10, total_artists=20, total_size=12345
+            total_tracks=100,
+            total_albums=10,
+            total_artists=20,
+            total_size=12345,
+            total_duration=3600.0,
+            total_genres=1,
         )
-        mock_instance.list_genres.return_value = [beets_models.Genre("Rock", 10)]
 
-        stats = main.get_library_statistics()
+        stats = asyncio.run(main.get_library_statistics())
 
+        mock_instance.get_statistics.assert_called_once_with(include_size=False)
+        mock_instance.list_genres.assert_not_called()
         assert stats.total_tracks == 100
         assert stats.total_albums == 10
         assert stats.total_artists == 20
         assert stats.total_genres == 1
+        assert stats.total_duration == 3600.0
 
-    @patch("smartplaylist.mcp_server.main.BeetsLibrary")
+    @patch("smartplaylist.beets_wrapper.manager.Library")
     def test_list_genres(self, mock_beets_library, monkeypatch):
         """Tests that the list_genres tool returns the expected list of genres."""
         monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
@@ -51,67 +66,409 @@ class TestMCPServerTools:
             beets_models.Genre("Pop", 20),
         ]
 
-        response = main.list_genres()
+        response = asyncio.run(main.list_genres())
 
         assert len(response.genres) == 2
         assert response.genres[0].name == "Rock"
         assert response.genres[0].track_count == 10
 
-    @patch("smartplaylist.mcp_server.main.BeetsLibrary")
+    @patch("smartplaylist.beets_wrapper.manager.Library")
     def test_list_playlists(self, mock_beets_library, monkeypatch):
         """Tests that the list_playlists tool returns the expected list of playlists."""
         monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
         mock_instance = mock_beets_library.return_value
         mock_instance.list_playlists.return_value = [
             beets_models.Playlist("My Playlist"),
-            beets_models.Playlist("Another Playlist"),
+            beets_models.Playlist(
+                "Jazz.m3u8", size=120, mtime=1.5, track_count=3, query="genre:Jazz"
+            ),
         ]
 
-        response = main.list_playlists()
+        response = asyncio.run(main.list_playlists())
 
         assert len(response.playlists) == 2
         assert response.playlists[0] == "My Playlist"
+        assert response.details[1].track_count == 3
+        assert response.details[1].query == "genre:Jazz"
+        mock_instance.list_playlists.assert_called_once_with(
+            get_settings().playlist_extension, track_counts=True
+        )
 
-    @patch("smartplaylist.mcp_server.main.config")
-    @patch("smartplaylist.mcp_server.main.BeetsLibrary")
-    def test_create_playlist(self, mock_beets_library, mock_config, monkeypatch):
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_create_playlist(self, mock_beets_library, monkeypatch):
         """Tests that the create_playlist tool returns the expected response."""
         monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
-        mock_config.__getitem__.return_value = {
-            "playlist_dir": MagicMock(get=lambda T: "/playlists")
-        }
 
         mock_instance = mock_beets_library.return_value
-        mock_instance.items.return_value = [MagicMock()] * 10  # 10 tracks
+        mock_instance.playlist_dir = "/playlists"
+        mock_instance.create_playlist.return_value = beets_models.PlaylistExport(
+            path="/playlists/My Playlist.m3u8", track_count=10, bytes_written=420
+        )
 
-        response = main.create_playlist("My Playlist", "artist:Test Artist")
+        response = asyncio.run(
+            main.create_playlist("My Playlist", "artist:Test Artist")
+        )
 
         mock_instance.create_playlist.assert_called_with(
-            "artist:Test Artist", "/playlists/My Playlist.m3u8"
+            "artist:Test Artist",
+            "/playlists/My Playlist.m3u8",
+            playlist_format=None,
+            order=None,
         )
         assert response.status == "Playlist created successfully"
         assert response.playlist_path == "/playlists/My Playlist.m3u8"
         assert response.track_count == 10
+        assert response.bytes_written == 420
+        mock_instance.items.assert_not_called()
 
-    @patch("smartplaylist.mcp_server.main.BeetsLibrary")
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_create_playlist_with_format(self, mock_beets_library, monkeypatch):
+        """Tests that a requested format also picks the file extension."""
+        monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+        mock_instance = mock_beets_library.return_value
+        mock_instance.playlist_dir = "/playlists"
+        mock_instance.create_playlist.return_value = beets_models.PlaylistExport(
+            path="/playlists/Jazz.xspf", track_count=3, bytes_written=900
+        )
+
+        response = asyncio.run(main.create_playlist("Jazz", "genre:Jazz", "xspf"))
+
+        mock_instance.create_playlist.assert_called_with(
+            "genre:Jazz", "/playlists/Jazz.xspf", playlist_format="xspf", order=None
+        )
+        assert response.playlist_path == "/playlists/Jazz.xspf"
+
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_create_playlist_sanitizes_the_name(self, mock_beets_library, monkeypatch):
+        """Tests that the playlist name cannot escape the playlist directory."""
+        monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+        mock_instance = mock_beets_library.return_value
+        mock_instance.playlist_dir = "/playlists"
+        mock_instance.create_playlist.return_value = beets_models.PlaylistExport(
+            path="/playlists/Jazz_.._Home.m3u8", track_count=3, bytes_written=900
+        )
+
+        response = asyncio.run(main.create_playlist("Jazz/../Home", "genre:Jazz"))
+
+        mock_instance.create_playlist.assert_called_with(
+            "genre:Jazz",
+            "/playlists/Jazz_.._Home.m3u8",
+            playlist_format=None,
+            order=None,
+        )
+        assert response.playlist_path == "/playlists/Jazz_.._Home.m3u8"
+
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_build_playlist(self, mock_beets_library, monkeypatch):
+        """Tests that budgets are converted to seconds and bytes."""
+        monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+        mock_instance = mock_beets_library.return_value
+        mock_instance.playlist_dir = "/playlists"
+        mock_instance.build_playlist.return_value = beets_models.PlaylistSelection(
+            path="/playlists/Drive.m3u8",
+            track_count=30,
+            bytes_written=1200,
+            total_length=7190.0,
+            total_size=180_000_000,
+            candidates=500,
+        )
+
+        response = asyncio.run(
+            main.build_playlist(
+                "Drive/../Home",
+                "genre:Rock",
+                max_minutes=120,
+                max_megabytes=700.5,
+                max_per_artist=2,
+            )
+        )
+
+        mock_instance.build_playlist.assert_called_with(
+            "genre:Rock",
+            "/playlists/Drive_.._Home.m3u8",
+            max_length=7200,
+            max_size=700_500_000,
+            max_per_artist=2,
+            playlist_format=None,
+            order=None,
+        )
+        assert response.track_count == 30
+        assert response.total_duration == 7190.0
+        assert response.total_size == 180_000_000
+        assert response.candidate_count == 500
+
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_save_playlist(self, mock_beets_library, monkeypatch):
+        """Tests that save_playlist saves the definition and writes it."""
+        monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+
+        mock_instance = mock_beets_library.return_value
+        mock_instance.refresh_playlists.return_value = [
+            beets_models.PlaylistRefresh("Jazz", "/playlists/Jazz.m3u8", 3, True, 120)
+        ]
+
+        response = asyncio.run(main.save_playlist("Jazz", "genre:Jazz", limit=50))
+
+        mock_instance.save_playlist.assert_called_once_with(
+            "Jazz", "genre:Jazz", sort=None, limit=50
+        )
+        mock_instance.refresh_playlists.assert_called_once_with(
+            get_settings().playlist_extension, names=["Jazz"]
+        )
+        assert response.playlist_path == "/playlists/Jazz.m3u8"
+        assert response.track_count == 3
+        assert response.bytes_written == 120
+
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_refresh_playlists(self, mock_beets_library, monkeypatch):
+        """Tests that refresh_playlists reports the rewritten playlists."""
+        monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+
+        mock_instance = mock_beets_library.return_value
+        mock_instance.refresh_playlists.return_value = [
+            beets_models.PlaylistRefresh("Jazz", "/playlists/Jazz.m3u8", 3, True),
+            beets_models.PlaylistRefresh("Rock", "/playlists/Rock.m3u8", 1, False),
+        ]
+
+        response = asyncio.run(main.refresh_playlists())
+
+        mock_instance.refresh_playlists.assert_called_once_with(
+            get_settings().playlist_extension, names=None, force=False
+        )
+        assert response.status == "1 of 2 playlists rewritten"
+        assert [p.changed for p in response.playlists] == [True, False]
+
+    @patch("smartplaylist.beets_wrapper.manager.Library")
     def test_search_library(self, mock_beets_library, monkeypatch):
         """Tests that the search_library tool returns the expected response."""
         monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
 
         mock_instance = mock_beets_library.return_value
-        mock_item = MagicMock()
-        mock_item.id = 1
-        mock_item.title = "Track 1"
-        mock_item.artist = "Artist 1"
-        mock_item.album = "Album 1"
-        mock_item.genre = "Rock"
-        mock_item.year = 2023
-        mock_item.path = b"/path/1"
+        record = beets_models.record_type(main.TRACK_FIELDS)(
+            1, "Track 1", "Artist 1", "Album 1", "Rock", 2023, b"/path/1"
+        )
 
-        mock_instance.items.return_value = [mock_item]
+        mock_instance.records_page.return_value = beets_models.RecordPage(
+            records=[record], total_count=250, next_cursor="abc"
+        )
 
-        response = main.search_library("genre:rock")
+        response = asyncio.run(main.search_library("genre:rock"))
 
+        mock_instance.records_page.assert_called_once_with(
+            "genre:rock", main.TRACK_FIELDS, limit=100, cursor=None, sort=None
+        )
         assert len(response.tracks) == 1
         assert response.tracks[0].title == "Track 1"
+        assert response.tracks[0].path == "/path/1"
+        assert response.model_dump()["tracks"][0]["year"] == 2023
         assert response.beets_query_used == "genre:rock"
+        assert response.total_count == 250
+        assert response.next_cursor == "abc"
+
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_search_library_caps_limit(self, mock_beets_library, monkeypatch):
+        """Tests that search_library never returns more than the maximum page."""
+        monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+        monkeypatch.setenv("SMARTPLAYLIST_SEARCH_MAX_LIMIT", "50")
+        mock_instance = mock_beets_library.return_value
+        mock_instance.records_page.return_value = beets_models.RecordPage([], 0)
+
+        asyncio.run(main.search_library("genre:rock", limit=10_000, sort="year-"))
+
+        mock_instance.records_page.assert_called_once_with(
+            "genre:rock", main.TRACK_FIELDS, limit=50, cursor=None, sort="year-"
+        )
+
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_resolve_names(self, mock_beets_library, monkeypatch):
+        """Tests that the resolve_names tool returns scored library values."""
+        monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+        mock_instance = mock_beets_library.return_value
+        mock_instance.resolve_names.return_value = [
+            beets_models.NameMatch("artist", "Björk", 12, 1.0)
+        ]
+
+        response = asyncio.run(main.resolve_names("Bjork", field="artist"))
+
+        mock_instance.resolve_names.assert_called_once_with(
+            "Bjork", fields=["artist"], limit=5
+        )
+        assert response.name == "Bjork"
+        assert response.matches[0].value == "Björk"
+        assert response.matches[0].track_count == 12
+        assert response.matches[0].score == 1.0
+
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_fulltext_search(self, mock_beets_library, monkeypatch):
+        """Tests that the fulltext_search tool returns ranked tracks."""
+        monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+        monkeypatch.setenv("SMARTPLAYLIST_SEARCH_MAX_LIMIT", "50")
+        mock_instance = mock_beets_library.return_value
+        record = beets_models.record_type((*main.TRACK_FIELDS, "score"))(
+            3, "Naima", "John Coltrane", "Giant Steps", "Jazz", 1960, b"/n.mp3", 7.5
+        )
+        mock_instance.fulltext_search.return_value = [record]
+
+        response = asyncio.run(main.fulltext_search("coltrane naima", limit=500))
+
+        mock_instance.fulltext_search.assert_called_once_with(
+            "coltrane naima", limit=50, fields=main.TRACK_FIELDS
+        )
+        assert response.match_expression == '"coltrane"* "naima"*'
+        assert response.tracks[0].title == "Naima"
+        assert response.tracks[0].path == "/n.mp3"
+        assert response.model_dump()["tracks"][0]["score"] == 7.5
+
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_similar_tracks(self, mock_beets_library, monkeypatch):
+        """Tests that the similar_tracks tool returns tracks with distances."""
+        monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+        monkeypatch.setenv("SMARTPLAYLIST_SEARCH_MAX_LIMIT", "50")
+        mock_instance = mock_beets_library.return_value
+        record = beets_models.record_type((*main.TRACK_FIELDS, "distance"))(
+            2,
+            "Blue in Green",
+            "Miles Davis",
+            "Kind of Blue",
+            "Jazz",
+            1959,
+            b"/b.mp3",
+            0.5,
+        )
+        mock_instance.similar_tracks.return_value = [record]
+
+        response = asyncio.run(main.similar_tracks(1, k=500))
+
+        mock_instance.similar_tracks.assert_called_once_with(
+            1, k=50, fields=main.TRACK_FIELDS
+        )
+        assert response.item_id == 1
+        assert response.tracks[0].title == "Blue in Green"
+        assert response.tracks[0].path == "/b.mp3"
+        assert response.model_dump()["tracks"][0]["distance"] == 0.5
+
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_library_is_reused_across_calls(self, mock_beets_library, monkeypatch):
+        """Tests that tools share a single library instance between calls."""
+        monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+        mock_instance = mock_beets_library.return_value
+        mock_instance.config_path = "/dummy/path"
+        mock_instance.list_playlists.return_value = []
+
+        asyncio.run(main.list_playlists())
+        asyncio.run(main.list_playlists())
+
+        mock_beets_library.assert_called_once()
+
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_list_facet(self, mock_beets_library, monkeypatch):
+        """Tests that the list_facet tool returns the facet values."""
+        monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+        mock_instance = mock_beets_library.return_value
+        mock_instance.list_facet.return_value = [
+            beets_models.FacetValue("1970", 12),
+            beets_models.FacetValue("1960", 3),
+        ]
+
+        response = asyncio.run(main.list_facet("decade"))
+
+        mock_instance.list_facet.assert_called_once_with("decade")
+        assert response.field == "decade"
+        assert response.values[0].value == "1970"
+        assert response.values[0].track_count == 12
+
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_create_playlists_by_field(self, mock_beets_library, monkeypatch):
+        """Tests that create_playlists_by_field reports every playlist."""
+        monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+        mock_instance = mock_beets_library.return_value
+        mock_instance.playlist_dir = "/playlists"
+        mock_instance.create_playlists_by_field.return_value = [
+            beets_models.PlaylistExport("/playlists/Jazz.m3u8", 3, 60),
+            beets_models.PlaylistExport("/playlists/Rock.m3u8", 1, 20),
+        ]
+
+        response = asyncio.run(main.create_playlists_by_field(field="genre"))
+
+        mock_instance.create_playlists_by_field.assert_called_once_with(
+            "/playlists",
+            "m3u8",
+            field="genre",
+            queries=None,
+            query=None,
+            prefix="",
+            playlist_format=None,
+        )
+        assert response.status == "2 playlists created successfully"
+        assert [p.track_count for p in response.playlists] == [3, 1]
+        assert response.playlists[0].playlist_path == "/playlists/Jazz.m3u8"
+
+
+class TestServerMetrics:
+    @pytest.fixture(autouse=True)
+    def reset_metrics(self):
+        main.metrics.registry.reset()
+        yield
+        main.metrics.registry.reset()
+
+    @patch("smartplaylist.beets_wrapper.manager.Library")
+    def test_tools_are_instrumented(self, mock_beets_library, monkeypatch):
+        """Tests that tool calls and failures show up in get_server_metrics."""
+        monkeypatch.setenv("SMARTPLAYLIST_CONFIG_PATH", "/dummy/path")
+        mock_instance = mock_beets_library.return_value
+        mock_instance.list_facet.side_effect = main.beets_exceptions.QueryError(
+            "Unknown field"
+        )
+        mock_instance.list_genres.return_value = [beets_models.Genre("Jazz", 3)]
+        mock_instance.cache.stats.return_value = beets_models.CacheStats(
+            entries=1,
+            bytes=10,
+            hits=2,
+            misses=1,
+            evictions=0,
+            max_entries=4,
+            max_bytes=100,
+        )
+        mock_instance.snapshot_stats.return_value = None
+        mock_instance.pool_stats.return_value = beets_models.PoolStats(max_size=4)
+
+        asyncio.run(main.list_genres())
+        with pytest.raises(main.beets_exceptions.QueryError):
+            asyncio.run(main.list_facet("mood"))
+        response = main.get_server_metrics()
+
+        by_name = {(o.component, o.name): o for o in response.operations}
+        assert by_name[("tool", "list_genres")].rows == 1
+        assert by_name[("tool", "list_facet")].errors == {"QueryError": 1}
+        assert response.cache.hits == 2
+        assert response.connection_pool.max_size == 4
+        assert response.workers.completed >= 2
+
+    def test_metrics_route(self):
+        """Tests that /metrics serves the Prometheus text format."""
+        from starlette.testclient import TestClient
+
+        main.list_tools()
+        client = TestClient(main.mcp.streamable_http_app())
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert (
+            'smartplaylist_calls_total{component="tool",name="list_tools"} 1'
+            in response.text
+        )
+        assert "smartplaylist_worker_threads" in response.text
+
+    def test_metrics_route_disabled(self, monkeypatch):
+        """Tests that /metrics is not served when metrics are disabled."""
+        from starlette.testclient import TestClient
+
+        monkeypatch.setattr(main.metrics.registry, "enabled", False)
+        client = TestClient(main.mcp.streamable_http_app())
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 404
+        assert "smartplaylist_" not in response.text
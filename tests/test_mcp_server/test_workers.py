@@ -0,0 +1,110 @@
+"""Unit tests for the MCP tool worker pool."""
+
+import asyncio
+import threading
+
+import pytest
+
+from smartplaylist.mcp_server.workers import WorkerPool
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(max_workers=4, tool_limits={"heavy": 1})
+    yield pool
+    pool.shutdown()
+
+
+def test_run_executes_on_worker_thread(pool):
+    """Tests that calls run off the event loop thread and return their value."""
+
+    async def scenario():
+        return await pool.run("light", threading.current_thread)
+
+    thread = asyncio.run(scenario())
+
+    assert thread is not threading.main_thread()
+    assert thread.name.startswith("mcp-worker")
+
+
+def test_run_propagates_exceptions(pool):
+    """Tests that exceptions raised by a call reach the caller."""
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        asyncio.run(pool.run("light", fail))
+
+    assert pool.stats().tools[0].completed == 1
+
+
+def test_tool_limit_does_not_starve_other_tools(pool):
+    """Tests that a limited tool queues while other tools keep running."""
+    release = threading.Event()
+
+    async def scenario():
+        heavy = [asyncio.create_task(pool.run("heavy", release.wait)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        during = pool.stats()
+        light = await asyncio.wait_for(pool.run("light", lambda: "done"), timeout=2)
+        release.set()
+        await asyncio.gather(*heavy)
+        return during, light
+
+    during, light = asyncio.run(scenario())
+
+    heavy_stats = next(t for t in during.tools if t.name == "heavy")
+    assert heavy_stats.limit == 1
+    assert heavy_stats.in_flight == 1
+    assert heavy_stats.queued == 2
+    assert light == "done"
+    after = pool.stats()
+    assert after.queued == 0
+    assert after.in_flight == 0
+    assert after.completed == 4
+
+
+def test_cancelled_call_leaves_the_queue(pool):
+    """Tests that a call cancelled while waiting is not counted as queued."""
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(pool.run("heavy", release.wait))
+        waiting = asyncio.create_task(pool.run("heavy", release.wait))
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+
+    stats = pool.stats()
+    assert stats.queued == 0
+    assert stats.completed == 1
+
+
+def test_offload_keeps_function_metadata(pool):
+    """Tests that offloaded functions keep their name, docstring and result."""
+
+    def add(a: int, b: int = 1) -> int:
+        """Adds two numbers."""
+        return a + b
+
+    wrapped = pool.offload(add)
+
+    assert wrapped.__name__ == "add"
+    assert wrapped.__doc__ == "Adds two numbers."
+    assert asyncio.iscoroutinefunction(wrapped)
+    assert asyncio.run(wrapped(2, b=3)) == 5
+
+
+def test_configure_replaces_limits(pool):
+    """Tests that reconfiguring the pool applies the new size and limits."""
+    pool.configure(2, {"light": 3})
+
+    stats = pool.stats()
+
+    assert stats.max_workers == 2
+    assert pool.tool_limits == {"light": 3}
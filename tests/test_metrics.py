@@ -0,0 +1,124 @@
+# tests/test_metrics.py
+
+import asyncio
+
+import pytest
+
+from smartplaylist.beets_wrapper import exceptions
+from smartplaylist.metrics import (
+    LATENCY_BUCKETS,
+    MetricsRegistry,
+    count_rows,
+    render_prometheus,
+)
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_instrument_records_calls_and_rows(registry):
+    """Test that successful calls are counted with their rows."""
+
+    @registry.instrument("library")
+    def items(query):
+        return [query] * 3
+
+    items("a")
+    items("b")
+
+    (stats,) = registry.snapshot()
+    assert (stats.component, stats.name) == ("library", "items")
+    assert stats.calls == 2
+    assert stats.rows == 6
+    assert sum(stats.buckets) == 2
+    assert stats.errors == {}
+
+
+def test_instrument_counts_errors_by_type(registry):
+    """Test that failures are counted by exception type and re-raised."""
+
+    @registry.instrument("library", name="update")
+    def update():
+        raise exceptions.UpdateError("boom")
+
+    with pytest.raises(exceptions.UpdateError):
+        update()
+
+    (stats,) = registry.snapshot()
+    assert stats.name == "update"
+    assert stats.errors == {"UpdateError": 1}
+    assert stats.rows == 0
+
+
+def test_instrument_coroutine_functions(registry):
+    """Test that coroutine functions stay coroutine functions."""
+
+    @registry.instrument("tool")
+    async def search():
+        return [1]
+
+    assert asyncio.iscoroutinefunction(search)
+    assert asyncio.run(search()) == [1]
+    assert registry.snapshot()[0].rows == 1
+
+
+def test_disabled_registry_records_nothing(registry):
+    """Test that a disabled registry only calls through."""
+    registry.enabled = False
+
+    @registry.instrument("tool")
+    def ping():
+        return "pong"
+
+    assert ping() == "pong"
+    assert registry.snapshot() == []
+
+
+def test_quantile_uses_bucket_bounds(registry):
+    """Test that quantiles are estimated from the histogram."""
+    for seconds in (0.002, 0.002, 0.002, 0.4):
+        registry.observe("tool", "search", seconds)
+
+    (stats,) = registry.snapshot()
+    assert stats.quantile(0.5) == 0.0025
+    assert stats.quantile(0.99) == 0.4
+
+
+def test_count_rows():
+    """Test that rows are found in lists and response objects."""
+
+    class Page:
+        items = (1, 2)
+
+    class Export:
+        track_count = 7
+
+    assert count_rows([1, 2, 3]) == 3
+    assert count_rows(Page()) == 2
+    assert count_rows(Export()) == 7
+    assert count_rows("text") is None
+
+
+def test_render_prometheus(registry):
+    """Test the Prometheus text exposition of the metrics."""
+    registry.observe("tool", "search_library", 0.003, rows=5)
+    registry.observe("tool", "search_library", 120.0, error=exceptions.QueryError())
+
+    text = render_prometheus(
+        registry.snapshot(), {"worker_threads": 8}, {"cache_hits": 3}
+    )
+
+    labels = 'component="tool",name="search_library"'
+    assert f"smartplaylist_calls_total{{{labels}}} 2" in text
+    assert f'smartplaylist_errors_total{{{labels},exception="QueryError"}} 1' in text
+    assert f"smartplaylist_rows_total{{{labels}}} 5" in text
+    assert f'smartplaylist_latency_seconds_bucket{{{labels},le="0.005"}} 1' in text
+    assert f'smartplaylist_latency_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f"smartplaylist_latency_seconds_count{{{labels}}} 2" in text
+    assert "# TYPE smartplaylist_worker_threads gauge" in text
+    assert "smartplaylist_worker_threads 8" in text
+    assert "# TYPE smartplaylist_cache_hits_total counter" in text
+    assert "smartplaylist_cache_hits_total 3" in text
+    assert text.count("_bucket{") == len(LATENCY_BUCKETS) + 1
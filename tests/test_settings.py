@@ -50,6 +50,23 @@ def test_playlist_extension_setting(monkeypatch):
     assert settings.playlist_extension == "m3u8"
 
 
+def test_playlist_extension_follows_format(monkeypatch):
+    """Test that the playlist format sets the extension unless one is given."""
+    monkeypatch.setenv("SMARTPLAYLIST_PLAYLIST_FORMAT", "xspf")
+    assert Settings().playlist_extension == "xspf"
+
+    monkeypatch.setenv("SMARTPLAYLIST_PLAYLIST_EXTENSION", "m3u")
+    with pytest.raises(ValidationError):
+        Settings()
+
+    monkeypatch.setenv("SMARTPLAYLIST_PLAYLIST_FORMAT", "extm3u")
+    assert Settings().playlist_extension == "m3u"
+
+    monkeypatch.setenv("SMARTPLAYLIST_PLAYLIST_FORMAT", "wpl")
+    with pytest.raises(ValidationError):
+        Settings()
+
+
 def test_mcp_server_aliases(monkeypatch):
     """Test that the aliases for MCP server settings work correctly."""
     monkeypatch.setenv("MCP_HOST", "0.0.0.0")